@@ -0,0 +1,823 @@
+"""
+Server-side index of archive relics (ZIP, tar, tar.gz).
+
+A ZIP archive ends with its table of contents: the end-of-central-directory
+record (EOCD) points at the central directory, which lists every member
+with its sizes and the offset of its local header. Listing an archive only
+needs the tail probe and the central directory, fetched with ranged reads;
+extracting one member needs its local header and its compressed bytes. The
+rest of the archive is never read, so a multi-GB relic is listed with a few
+kilobytes of I/O.
+
+Tar has no directory: the archive_index job makes one streaming pass over
+each tar (or tar.gz) relic after upload and stores what it found in a
+sidecar object (see build_tar_sidecar): the offset of each member's data
+and, for gzip, zran-style checkpoints (backend.zran) every
+ARCHIVE_CHECKPOINT_SPAN_MB of output. A member is then read with one ranged
+GET, starting at the nearest checkpoint for tar.gz.
+
+Parsed listings are cached per worker, keyed by content (relic content is
+immutable).
+"""
+import asyncio
+import bisect
+import bz2
+import json
+import struct
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_
+
+from backend.blobs import stream_content
+from backend.config import settings
+from backend.models import BlobArchiveIndex, Relic
+from backend.storage import storage_service
+from backend.zran import Checkpoint, GzipStream, ZranError, gunzip_slice, resume_offset
+from backend import zran
+
+# Opens an async chunk iterator over bytes [start, end] (inclusive) of an archive
+OpenRange = Callable[[int, int], Awaitable[AsyncIterator[bytes]]]
+
+EOCD = struct.Struct("<4s4H2LH")
+EOCD_SIGNATURE = b"PK\x05\x06"
+ZIP64_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+ZIP64_EXTRA_ID = 0x0001
+
+# The EOCD is 22 bytes plus a comment of up to 64 KiB; most archives have no
+# comment, so a small probe usually finds it (and often the whole directory)
+TAIL_PROBE_SIZE = 4096
+MAX_TAIL_SIZE = EOCD.size + 0xFFFF + ZIP64_LOCATOR.size
+# Decompressed output is produced in pieces of this size, so a small
+# compressed chunk cannot expand into an unbounded buffer
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+FLAG_ENCRYPTED = 0x0001
+FLAG_UTF8 = 0x0800
+
+METHODS = {0: "stored", 8: "deflate", 9: "deflate64", 12: "bzip2", 14: "lzma", 93: "zstd", 95: "xz", 99: "aes"}
+EXTRACTABLE_METHODS = {0, 8, 12}
+
+TAR_BLOCK_SIZE = 512
+TAR_FORMATS = ("tar", "tar.gz")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz")
+TAR_CONTENT_TYPES = {"application/x-tar", "application/x-gtar", "application/x-compressed-tar", "application/x-tgz"}
+# GNU long names and pax headers larger than this are refused
+TAR_MAX_META_SIZE = 1024 * 1024
+SIDECAR_HEADER = struct.Struct("<8sQ")
+SIDECAR_MAGIC = b"RLCARIX1"
+# First read of a sidecar; the listing of most archives fits
+SIDECAR_PROBE_SIZE = 64 * 1024
+
+
+class ArchiveError(Exception):
+    """The content is not a readable ZIP archive, or a member is corrupt."""
+
+
+class UnsupportedArchiveError(ArchiveError):
+    """The member uses encryption or a compression method that cannot be extracted."""
+
+
+class ArchiveNotIndexed(ArchiveError):
+    """A tar relic queued for indexing whose index has not been built yet."""
+
+
+class ArchiveEntry(NamedTuple):
+    path: str
+    is_dir: bool
+    size: int
+    compressed_size: int
+    method: int
+    offset: int  # ZIP: of the local header; tar: of the member data in the uncompressed stream
+    crc32: Optional[int]  # None for tar members
+    modified: Optional[datetime]
+    flags: int
+
+    @property
+    def method_name(self) -> str:
+        return METHODS.get(self.method, str(self.method))
+
+
+class ArchiveIndex:
+    """
+    Members of one archive, in archive order and by path.
+
+    Tar indexes also carry where their sidecar is and, for tar.gz, the
+    checkpoints as (in_offset, bits, out_offset, window_start, window_length)
+    with windows stored in the sidecar from windows_at.
+    """
+
+    def __init__(
+        self,
+        entries: List[ArchiveEntry],
+        format: str = "zip",
+        checkpoints: Sequence[Tuple[int, int, int, int, int]] = (),
+        sidecar_key: Optional[str] = None,
+        windows_at: int = 0,
+    ):
+        self.entries = entries
+        self.format = format
+        self.checkpoints = checkpoints
+        self.sidecar_key = sidecar_key
+        self.windows_at = windows_at
+        # Duplicate names: the last one wins, as in most extractors
+        self.by_path: Dict[str, ArchiveEntry] = {entry.path: entry for entry in entries}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+async def read_range(open_range: OpenRange, start: int, end: int) -> bytes:
+    """Bytes [start, end] (inclusive) read into memory."""
+    chunks = await open_range(start, end)
+    try:
+        return b"".join([chunk async for chunk in chunks])
+    finally:
+        await chunks.aclose()
+
+
+async def read_zip_index(open_range: OpenRange, size: int, max_entries: int) -> ArchiveIndex:
+    """
+    Parse the central directory of a ZIP archive of size bytes.
+
+    Raises:
+        ArchiveError: not a ZIP archive, a damaged directory, or more than max_entries members
+    """
+    if size < EOCD.size:
+        raise ArchiveError("Not a ZIP archive")
+
+    tail_start = max(0, size - TAIL_PROBE_SIZE)
+    tail = await read_range(open_range, tail_start, size - 1)
+    eocd_at = tail.rfind(EOCD_SIGNATURE, 0, len(tail) - EOCD.size + len(EOCD_SIGNATURE))
+    if eocd_at < 0 and tail_start > 0:
+        # A long archive comment: search the largest tail the EOCD can be in
+        tail_start = max(0, size - MAX_TAIL_SIZE)
+        tail = await read_range(open_range, tail_start, size - 1)
+        eocd_at = tail.rfind(EOCD_SIGNATURE, 0, len(tail) - EOCD.size + len(EOCD_SIGNATURE))
+    if eocd_at < 0:
+        raise ArchiveError("Not a ZIP archive")
+
+    (_, disk, _, _, count, cd_size, cd_offset, _) = EOCD.unpack_from(tail, eocd_at)
+    if disk != 0:
+        raise UnsupportedArchiveError("Multi-volume ZIP archives are not supported")
+    eocd_position = tail_start + eocd_at
+    directory_end = eocd_position
+
+    # ZIP64: the 32-bit EOCD fields are saturated and the real values live
+    # in a ZIP64 EOCD record, found through the locator just before the EOCD
+    locator_at = eocd_at - ZIP64_LOCATOR.size
+    if locator_at >= 0 and tail[locator_at:locator_at + 4] == ZIP64_LOCATOR_SIGNATURE:
+        _, _, zip64_position, _ = ZIP64_LOCATOR.unpack_from(tail, locator_at)
+        if zip64_position + ZIP64_EOCD.size > size:
+            raise ArchiveError("Damaged ZIP64 end of central directory")
+        if zip64_position >= tail_start:
+            record = tail[zip64_position - tail_start:zip64_position - tail_start + ZIP64_EOCD.size]
+        else:
+            record = await read_range(open_range, zip64_position, zip64_position + ZIP64_EOCD.size - 1)
+        if record[:4] != ZIP64_EOCD_SIGNATURE:
+            raise ArchiveError("Damaged ZIP64 end of central directory")
+        (_, _, _, _, _, _, _, count, cd_size, cd_offset) = ZIP64_EOCD.unpack(record)
+        directory_end = zip64_position
+        prefix = 0
+    else:
+        # Data prepended to the archive (self-extracting stubs) shifts every offset
+        prefix = directory_end - cd_size - cd_offset
+
+    if count > max_entries:
+        raise ArchiveError(f"Archive has {count} entries (limit {max_entries})")
+    cd_start = cd_offset + prefix
+    if prefix < 0 or cd_start + cd_size > directory_end:
+        raise ArchiveError("Damaged ZIP central directory")
+
+    if cd_size == 0:
+        directory = b""
+    elif cd_start >= tail_start:
+        directory = tail[cd_start - tail_start:cd_start - tail_start + cd_size]
+    else:
+        directory = await read_range(open_range, cd_start, cd_start + cd_size - 1)
+    return ArchiveIndex(_parse_central_directory(directory, count, prefix))
+
+
+def _parse_central_directory(directory: bytes, count: int, prefix: int) -> List[ArchiveEntry]:
+    entries = []
+    position = 0
+    for _ in range(count):
+        if position + CENTRAL_HEADER.size > len(directory):
+            raise ArchiveError("Truncated ZIP central directory")
+        (signature, _, _, flags, method, mtime, mdate, crc, compressed_size, size,
+         name_length, extra_length, comment_length, _, _, _, offset) = CENTRAL_HEADER.unpack_from(directory, position)
+        if signature != CENTRAL_HEADER_SIGNATURE:
+            raise ArchiveError("Damaged ZIP central directory")
+        position += CENTRAL_HEADER.size
+        raw_name = directory[position:position + name_length]
+        extra = directory[position + name_length:position + name_length + extra_length]
+        position += name_length + extra_length + comment_length
+
+        if 0xFFFFFFFF in (size, compressed_size, offset):
+            size, compressed_size, offset = _zip64_extra(extra, size, compressed_size, offset)
+        path = raw_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437", errors="replace")
+        entries.append(ArchiveEntry(
+            path=path,
+            is_dir=path.endswith("/"),
+            size=size,
+            compressed_size=compressed_size,
+            method=method,
+            offset=offset + prefix,
+            crc32=crc,
+            modified=_dos_datetime(mdate, mtime),
+            flags=flags,
+        ))
+    return entries
+
+
+def _zip64_extra(extra: bytes, size: int, compressed_size: int, offset: int):
+    """Replace saturated 32-bit fields with the values of the ZIP64 extended information field."""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<2H", extra, position)
+        position += 4
+        if header_id == ZIP64_EXTRA_ID:
+            # Only the saturated fields are present, in this order
+            values = iter(struct.unpack_from(f"<{length // 8}Q", extra, position))
+            try:
+                if size == 0xFFFFFFFF:
+                    size = next(values)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = next(values)
+                if offset == 0xFFFFFFFF:
+                    offset = next(values)
+            except StopIteration:
+                raise ArchiveError("Damaged ZIP64 extra field")
+            return size, compressed_size, offset
+        position += length
+    raise ArchiveError("Missing ZIP64 extra field")
+
+
+def _dos_datetime(date: int, time: int) -> Optional[datetime]:
+    try:
+        return datetime(
+            (date >> 9) + 1980, (date >> 5) & 0xF, date & 0x1F,
+            time >> 11, (time >> 5) & 0x3F, min((time & 0x1F) * 2, 59),
+        )
+    except ValueError:
+        return None
+
+
+async def stream_member(open_range: OpenRange, entry: ArchiveEntry) -> AsyncIterator[bytes]:
+    """
+    Async iterator of a member's decompressed content.
+
+    Only the member's local header and compressed bytes are read. The
+    size and CRC-32 from the central directory are checked as the content
+    streams; a mismatch raises ArchiveError from the iterator.
+
+    Raises:
+        UnsupportedArchiveError: encrypted member or unsupported compression method
+        ArchiveError: damaged local header
+    """
+    if entry.flags & FLAG_ENCRYPTED:
+        raise UnsupportedArchiveError("Encrypted archive members are not supported")
+    if entry.method not in EXTRACTABLE_METHODS:
+        raise UnsupportedArchiveError(f"Compression method {entry.method_name} is not supported")
+
+    header = await read_range(open_range, entry.offset, entry.offset + LOCAL_HEADER.size - 1)
+    if len(header) != LOCAL_HEADER.size or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise ArchiveError(f"Damaged local header for {entry.path}")
+    name_length, extra_length = LOCAL_HEADER.unpack(header)[-2:]
+    data_start = entry.offset + LOCAL_HEADER.size + name_length + extra_length
+
+    if entry.compressed_size == 0:
+        chunks = _empty()
+    else:
+        chunks = await open_range(data_start, data_start + entry.compressed_size - 1)
+    return _checked(_decompress(chunks, entry.method), entry)
+
+
+async def _empty():
+    return
+    yield
+
+
+def _decompressor(method: int):
+    if method == 8:
+        return zlib.decompressobj(-15)
+    if method == 12:
+        return bz2.BZ2Decompressor()
+    return None
+
+
+def _inflate_step(decompressor, data: bytes):
+    """
+    Decompress at most OUTPUT_CHUNK_SIZE bytes of data.
+
+    Returns the output and the input to call again with, or None once the
+    input is used up.
+    """
+    out = decompressor.decompress(data, OUTPUT_CHUNK_SIZE)
+    if isinstance(decompressor, bz2.BZ2Decompressor):
+        pending = b"" if not (decompressor.needs_input or decompressor.eof) else None
+    else:
+        pending = decompressor.unconsumed_tail or None
+    return out, pending
+
+
+async def _decompress(chunks: AsyncIterator[bytes], method: int) -> AsyncIterator[bytes]:
+    decompressor = _decompressor(method)
+    try:
+        async for chunk in chunks:
+            if decompressor is None:
+                yield chunk
+                continue
+            pending = chunk
+            while pending is not None:
+                out, pending = await asyncio.to_thread(_inflate_step, decompressor, pending)
+                if out:
+                    yield out
+        if decompressor is not None and not decompressor.eof:
+            raise ArchiveError(f"Truncated {METHODS[method]} stream")
+    finally:
+        await chunks.aclose()
+
+
+async def _checked(chunks: AsyncIterator[bytes], entry: ArchiveEntry) -> AsyncIterator[bytes]:
+    """Pass chunks through, failing if they exceed or fall short of the entry's size or CRC (if it has one)."""
+    size = 0
+    crc = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > entry.size:
+                raise ArchiveError(f"{entry.path} is larger than its directory entry says")
+            if entry.crc32 is not None:
+                crc = zlib.crc32(chunk, crc)
+            yield chunk
+        if size != entry.size:
+            raise ArchiveError(f"{entry.path} is truncated")
+        if entry.crc32 is not None and crc != entry.crc32:
+            raise ArchiveError(f"{entry.path} fails its CRC check")
+    finally:
+        await chunks.aclose()
+
+
+def looks_like_tar(name: Optional[str], content_type: Optional[str]) -> bool:
+    """Whether a relic is expected to be a tar or tar.gz archive (and so gets indexed)."""
+    mime = (content_type or "").split(";", 1)[0].strip().lower()
+    return (name or "").lower().endswith(TAR_SUFFIXES) or mime in TAR_CONTENT_TYPES
+
+
+def tar_condition():
+    """SQL condition for relics looks_like_tar accepts (a superset: content type parameters are not stripped)."""
+    return or_(
+        *[func.lower(Relic.name).like(f"%{suffix}") for suffix in TAR_SUFFIXES],
+        func.lower(Relic.content_type).in_(TAR_CONTENT_TYPES),
+    )
+
+
+def _tar_number(field: bytes) -> int:
+    """Octal tar header number, or GNU base-256 when the high bit of the first byte is set."""
+    if field[:1] and field[0] & 0x80:
+        return int.from_bytes(field[1:], "big")
+    digits = field.split(b"\0", 1)[0].strip()
+    try:
+        return int(digits, 8) if digits else 0
+    except ValueError:
+        raise ArchiveError("Damaged tar header")
+
+
+def _pax_records(data: bytes) -> Dict[str, str]:
+    records = {}
+    position = 0
+    while position < len(data):
+        space = data.find(b" ", position)
+        if space < 0:
+            break
+        try:
+            length = int(data[position:space])
+        except ValueError:
+            raise ArchiveError("Damaged pax header")
+        if length <= 0:
+            break
+        key, _, value = data[space + 1:position + length - 1].partition(b"=")
+        records[key.decode("utf-8", errors="replace")] = value.decode("utf-8", errors="replace")
+        position += length
+    return records
+
+
+class TarScanner:
+    """
+    Incremental parser of a tar stream that records member offsets.
+
+    Feed the uncompressed stream in order with write(); member data is
+    skipped, never buffered. Regular files and directories are listed
+    (links and special files are not), with ustar prefixes, GNU long names
+    and pax path/size/mtime applied. finished is set at the end-of-archive
+    marker.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: List[ArchiveEntry] = []
+        self.position = 0
+        self.finished = False
+        self._skip = 0
+        self._header = bytearray()
+        # Type and remaining size of a GNU long name or pax header being read
+        self._meta: Optional[Tuple[bytes, int]] = None
+        self._meta_data = bytearray()
+        self._skip_after_meta = 0
+        self._long_name: Optional[str] = None
+        self._pax: Dict[str, str] = {}
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view and not self.finished:
+            if self._skip:
+                n = min(self._skip, len(view))
+                self._skip -= n
+            elif self._meta is not None:
+                kind, remaining = self._meta
+                n = min(remaining, len(view))
+                self._meta_data += view[:n]
+                self._meta = (kind, remaining - n)
+                if remaining == n:
+                    self._end_meta(kind)
+            else:
+                n = min(TAR_BLOCK_SIZE - len(self._header), len(view))
+                self._header += view[:n]
+                if len(self._header) == TAR_BLOCK_SIZE:
+                    header, self._header = bytes(self._header), bytearray()
+                    self.position += n
+                    view = view[n:]
+                    self._parse_header(header)
+                    continue
+            self.position += n
+            view = view[n:]
+
+    @property
+    def complete(self) -> bool:
+        """True at the end-of-archive marker, or when input stopped between members."""
+        return self.finished or (
+            self.position > 0 and not self._skip and self._meta is None and not self._header
+        )
+
+    def _parse_header(self, block: bytes) -> None:
+        if block == bytes(TAR_BLOCK_SIZE):
+            self.finished = True
+            return
+        checksum = _tar_number(block[148:156])
+        if checksum != sum(block[:148]) + 8 * 0x20 + sum(block[156:]):
+            raise ArchiveError("Not a tar archive" if self.position == TAR_BLOCK_SIZE else "Damaged tar header")
+
+        kind = block[156:157]
+        size = _tar_number(block[124:136])
+        padded = -(-size // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE
+        if kind in (b"L", b"K", b"x", b"g"):
+            if size > TAR_MAX_META_SIZE:
+                raise ArchiveError("Oversized tar extended header")
+            self._meta = (kind, size)
+            self._meta_data = bytearray()
+            self._skip_after_meta = padded - size
+            if size == 0:
+                self._end_meta(kind)
+            return
+
+        name = block[:100].split(b"\0", 1)[0]
+        if block[257:263] == b"ustar\0" and block[345]:
+            name = block[345:500].split(b"\0", 1)[0] + b"/" + name
+        path = self._long_name or self._pax.get("path") or name.decode("utf-8", errors="replace")
+        if "size" in self._pax:
+            size = int(self._pax["size"])
+            padded = -(-size // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE
+        mtime = float(self._pax["mtime"]) if "mtime" in self._pax else _tar_number(block[136:148])
+        self._long_name = None
+        self._pax = {}
+
+        is_dir = kind == b"5"
+        if is_dir or kind in (b"0", b"\0", b"7"):
+            if len(self.entries) >= self.max_entries:
+                raise ArchiveError(f"Archive has more than {self.max_entries} entries")
+            if is_dir and not path.endswith("/"):
+                path += "/"
+            self.entries.append(ArchiveEntry(
+                path=path,
+                is_dir=is_dir,
+                size=0 if is_dir else size,
+                compressed_size=0 if is_dir else size,
+                method=0,
+                offset=self.position,
+                crc32=None,
+                modified=_epoch_datetime(mtime),
+                flags=0,
+            ))
+        self._skip = padded
+
+    def _end_meta(self, kind: bytes) -> None:
+        data = bytes(self._meta_data)
+        self._meta = None
+        self._meta_data = bytearray()
+        self._skip = self._skip_after_meta
+        if kind == b"L":
+            self._long_name = data.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+        elif kind == b"x":
+            self._pax = _pax_records(data)
+
+
+def _epoch_datetime(seconds: float) -> Optional[datetime]:
+    try:
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+class TarIndexBuilder:
+    """
+    One pass over a tar or tar.gz stream, fed in order with write().
+
+    The format is told by the gzip magic. For gzip, checkpoints are taken
+    about every span bytes of uncompressed output and their windows
+    compressed as they come. done is set once the end-of-archive marker
+    has been seen (the rest of the stream need not be read).
+    """
+
+    def __init__(self, span: int, max_entries: int):
+        self.span = span
+        self.format: Optional[str] = None
+        self.scanner = TarScanner(max_entries)
+        self.checkpoints: List[Tuple[int, int, int, bytes]] = []
+        self._gzip: Optional[GzipStream] = None
+        self._head = b""
+
+    @property
+    def done(self) -> bool:
+        return self.scanner.finished
+
+    def write(self, data: bytes) -> None:
+        if self.format is None:
+            self._head += data
+            if len(self._head) < len(zran.GZIP_MAGIC):
+                return
+            data, self._head = self._head, b""
+            if data.startswith(zran.GZIP_MAGIC):
+                if not zran.available():
+                    raise UnsupportedArchiveError("tar.gz indexing needs the system zlib library")
+                self.format = "tar.gz"
+                self._gzip = GzipStream(span=self.span)
+            else:
+                self.format = "tar"
+
+        if self._gzip is None:
+            self.scanner.write(data)
+            return
+        try:
+            for piece in self._gzip.pieces(data):
+                self.scanner.write(piece)
+                if self.scanner.finished:
+                    break
+        except ZranError as e:
+            raise ArchiveError(str(e))
+        for checkpoint in self._gzip.checkpoints:
+            self.checkpoints.append((
+                checkpoint.in_offset, checkpoint.bits, checkpoint.out_offset, zlib.compress(checkpoint.window, 9)
+            ))
+        self._gzip.checkpoints.clear()
+
+    def finish(self) -> bytes:
+        """The sidecar for everything written; raises ArchiveError if the stream was cut short."""
+        if self._gzip is not None:
+            complete = self._gzip.complete
+            self._gzip.close()
+            if not (complete or self.scanner.finished):
+                raise ArchiveError("Truncated gzip stream")
+        if self.format is None or not self.scanner.complete:
+            raise ArchiveError("Truncated tar archive")
+        return encode_sidecar(self.format, self.scanner.entries, self.checkpoints)
+
+
+def encode_sidecar(format: str, entries: List[ArchiveEntry], checkpoints: List[Tuple[int, int, int, bytes]]) -> bytes:
+    """
+    Serialize a tar index.
+
+    Layout: magic and listing length, the zlib-compressed JSON listing, then
+    the zlib-compressed checkpoint windows back to back, so the listing is
+    read without them and each window with one ranged GET.
+    """
+    windows = bytearray()
+    points = []
+    for in_offset, bits, out_offset, window in checkpoints:
+        points.append([in_offset, bits, out_offset, len(windows), len(window)])
+        windows += window
+    listing = zlib.compress(json.dumps({
+        "format": format,
+        "entries": [
+            [entry.path, entry.size, entry.offset, entry.modified.timestamp() if entry.modified else None]
+            for entry in entries
+        ],
+        "checkpoints": points,
+    }, separators=(",", ":")).encode())
+    return SIDECAR_HEADER.pack(SIDECAR_MAGIC, len(listing)) + listing + bytes(windows)
+
+
+async def read_sidecar_index(open_range: OpenRange, sidecar_key: Optional[str] = None) -> ArchiveIndex:
+    """Load the listing of a sidecar written by encode_sidecar (windows stay in storage)."""
+    head = await read_range(open_range, 0, SIDECAR_PROBE_SIZE - 1)
+    if len(head) < SIDECAR_HEADER.size:
+        raise ArchiveError("Damaged archive index")
+    magic, length = SIDECAR_HEADER.unpack_from(head)
+    if magic != SIDECAR_MAGIC:
+        raise ArchiveError("Damaged archive index")
+    windows_at = SIDECAR_HEADER.size + length
+    if windows_at > len(head):
+        head += await read_range(open_range, len(head), windows_at - 1)
+    listing = json.loads(zlib.decompress(head[SIDECAR_HEADER.size:windows_at]))
+    entries = [
+        ArchiveEntry(
+            path=path,
+            is_dir=path.endswith("/"),
+            size=size,
+            compressed_size=size,
+            method=0,
+            offset=offset,
+            crc32=None,
+            modified=datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None) if mtime is not None else None,
+            flags=0,
+        )
+        for path, size, offset, mtime in listing["entries"]
+    ]
+    return ArchiveIndex(
+        entries, listing["format"], [tuple(point) for point in listing["checkpoints"]], sidecar_key, windows_at
+    )
+
+
+async def stream_tar_member(
+    open_range: OpenRange, open_sidecar: OpenRange, index: ArchiveIndex, entry: ArchiveEntry, archive_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Async iterator of a tar or tar.gz member's content.
+
+    tar: one ranged read of the member's bytes. tar.gz: the checkpoint
+    window is read from the sidecar, then the archive from the checkpoint
+    on is decompressed until the member has been produced.
+    """
+    if entry.size == 0:
+        return _empty()
+    if index.format == "tar":
+        chunks = await open_range(entry.offset, entry.offset + entry.size - 1)
+        return _checked(chunks, entry)
+
+    checkpoint = None
+    at = bisect.bisect_right([point[2] for point in index.checkpoints], entry.offset) - 1
+    if at >= 0:
+        in_offset, bits, out_offset, window_start, window_length = index.checkpoints[at]
+        window_at = index.windows_at + window_start
+        window = zlib.decompress(await read_range(open_sidecar, window_at, window_at + window_length - 1))
+        checkpoint = Checkpoint(in_offset, bits, out_offset, window)
+    chunks = await open_range(resume_offset(checkpoint), archive_size - 1)
+    return _checked(_gunzip_slice(chunks, checkpoint, entry.offset, entry.offset + entry.size), entry)
+
+
+async def _gunzip_slice(
+    chunks: AsyncIterator[bytes], checkpoint: Optional[Checkpoint], start: int, stop: int
+) -> AsyncIterator[bytes]:
+    """zran.gunzip_slice, with corrupt data reported as ArchiveError."""
+    pieces = gunzip_slice(chunks, checkpoint, start, stop)
+    try:
+        async for piece in pieces:
+            yield piece
+    except ZranError as e:
+        raise ArchiveError(str(e))
+    finally:
+        await pieces.aclose()
+
+
+async def build_tar_sidecar(chunks: AsyncIterator[bytes], span: int, max_entries: int) -> Tuple[str, int, int, bytes]:
+    """
+    Index a tar or tar.gz stream.
+
+    Returns:
+        (format, entry count, checkpoint count, sidecar bytes)
+
+    Raises:
+        ArchiveError: not a tar archive, damaged, truncated or too many entries
+    """
+    builder = TarIndexBuilder(span, max_entries)
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(builder.write, chunk)
+            if builder.done:
+                break
+    finally:
+        await chunks.aclose()
+    sidecar = builder.finish()
+    return builder.format, len(builder.scanner.entries), len(builder.checkpoints), sidecar
+
+
+def relic_range_opener(relic: Relic) -> OpenRange:
+    """OpenRange over a relic's content (loaded with with_inline_content())."""
+    async def open_range(start: int, end: int) -> AsyncIterator[bytes]:
+        chunks, _ = await stream_content(relic, byte_range=(start, end))
+        return chunks
+    return open_range
+
+
+def storage_range_opener(s3_key: str) -> OpenRange:
+    """OpenRange over an S3 object that is not relic content (index sidecars)."""
+    async def open_range(start: int, end: int) -> AsyncIterator[bytes]:
+        chunks, _ = await storage_service.stream(s3_key, byte_range=(start, end))
+        return chunks
+    return open_range
+
+
+class ArchiveIndexCache:
+    """LRU cache of parsed archive listings, bounded by the total number of entries held."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, ArchiveIndex]" = OrderedDict()
+        self._entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[ArchiveIndex]:
+        index = self._indexes.get(key)
+        if index is None:
+            self.misses += 1
+            return None
+        self._indexes.move_to_end(key)
+        self.hits += 1
+        return index
+
+    def put(self, key: str, index: ArchiveIndex) -> None:
+        if len(index) > self.max_entries or key in self._indexes:
+            return
+        self._indexes[key] = index
+        self._entries += len(index)
+        while self._entries > self.max_entries:
+            _, evicted = self._indexes.popitem(last=False)
+            self._entries -= len(evicted)
+
+    def snapshot(self) -> dict:
+        return {
+            "archives": len(self._indexes),
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global listing cache (per worker process)
+archive_index_cache = ArchiveIndexCache(settings.ARCHIVE_INDEX_CACHE_ENTRIES)
+
+
+def archive_content_key(relic: Relic) -> str:
+    """Key of the relic's content in blob_archive_index and the listing cache: its blob, else its own object."""
+    return relic.blob_sha256 or relic.s3_key
+
+
+async def relic_archive_index(relic: Relic, record: Optional[BlobArchiveIndex] = None) -> ArchiveIndex:
+    """
+    The relic's archive listing, from the cache, its tar index sidecar, or its ZIP central directory.
+
+    record is the blob_archive_index row of the relic's content, if any.
+    The relic must be loaded with with_inline_content().
+
+    Raises:
+        ArchiveNotIndexed: a tar relic the archive_index job has not reached yet
+        ArchiveError: not an archive, damaged, or a tar relic never queued for
+            indexing (stored before it existed, and not backfilled)
+    """
+    key = archive_content_key(relic)
+    index = archive_index_cache.get(key)
+    if index is not None:
+        return index
+
+    if record is not None and record.format in TAR_FORMATS:
+        index = await read_sidecar_index(storage_range_opener(record.sidecar_key), record.sidecar_key)
+    elif looks_like_tar(relic.name, relic.content_type):
+        if record is None:
+            raise ArchiveError("The archive has not been indexed")
+        if record.format in ("queued", "pending"):
+            raise ArchiveNotIndexed("The archive is still being indexed")
+        raise ArchiveError(record.error or "Not an archive")
+    else:
+        index = await read_zip_index(relic_range_opener(relic), relic.size_bytes, settings.ARCHIVE_MAX_ENTRIES)
+    archive_index_cache.put(key, index)
+    return index
+
+
+async def relic_member_stream(relic: Relic, index: ArchiveIndex, entry: ArchiveEntry) -> AsyncIterator[bytes]:
+    """Async iterator of one member of the relic's archive (see stream_member / stream_tar_member)."""
+    if index.format == "zip":
+        return await stream_member(relic_range_opener(relic), entry)
+    return await stream_tar_member(
+        relic_range_opener(relic), storage_range_opener(index.sidecar_key), index, entry, relic.size_bytes
+    )
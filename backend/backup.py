@@ -3,7 +3,7 @@ Database backup service with tiered retention.
 
 Handles:
 - Automatic PostgreSQL backups (pg_dump via subprocess)
-- Gzip compression (~70-90% reduction)
+- Streaming gzip or zstd compression (~70-90% reduction), bounded memory
 - S3/MinIO storage under db/ folder
 - Tiered retention (daily/weekly/monthly)
 - APScheduler integration for twice-daily backups
@@ -11,30 +11,107 @@ Handles:
 """
 
 import logging
-import gzip
 import asyncio
 import re
 import time
-import tempfile
-import os
+from collections import deque
 from datetime import datetime
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 from urllib.parse import urlparse
 
 from sqlalchemy import text
 
+from backend.compression import make_compressor, make_decompressor
 from backend.config import settings
 from backend.storage import storage_service
 
 logger = logging.getLogger('relic.backup')
 
 
+# ===== Compression Codecs =====
+
+# codec -> (filename extension, content type, default level)
+BACKUP_CODECS = {
+    'gzip': ('.sql.gz', 'application/gzip', 9),
+    'zstd': ('.sql.zst', 'application/zstd', 3),
+}
+
+# Bytes read from pg_dump per compression step
+DUMP_READ_SIZE = 1024 * 1024
+
+
+def backup_codec(filename: str) -> Optional[str]:
+    """Return the codec a backup filename was written with, or None if it is not a backup."""
+    for codec, (extension, _, _) in BACKUP_CODECS.items():
+        if filename.endswith(extension):
+            return codec
+    return None
+
+
+def is_backup_filename(filename: str) -> bool:
+    """Validate a bare backup filename (no path) as produced by generate_backup_filename."""
+    return filename.startswith('backup-') and '/' not in filename and backup_codec(filename) is not None
+
+
+class _DumpReader:
+    """
+    Adapts a running pg_dump to the read(n) interface of StorageService.upload_stream.
+
+    stdout is read in DUMP_READ_SIZE chunks and compressed in a worker thread,
+    so memory is bounded by one chunk plus compressed output not yet handed
+    to the uploader. pg_dump's exit status is checked before EOF is reported,
+    so a failed dump makes the upload abort instead of completing a truncated
+    object.
+    """
+
+    def __init__(self, process, codec: str, level: int):
+        self.process = process
+        self._compress, self._flush = make_compressor(codec, level)
+        self._buffer = bytearray()
+        self._eof = False
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        # Drain stderr concurrently so a chatty pg_dump cannot block on a full pipe
+        self._stderr = asyncio.create_task(process.stderr.read())
+
+    async def read(self, n: int) -> bytes:
+        while len(self._buffer) < n and not self._eof:
+            chunk = await self.process.stdout.read(DUMP_READ_SIZE)
+            if chunk:
+                self.raw_bytes += len(chunk)
+                self._buffer.extend(await asyncio.to_thread(self._compress, chunk))
+                continue
+            returncode = await self.process.wait()
+            stderr = await self._stderr
+            if returncode != 0:
+                error_msg = stderr.decode(errors='replace') if stderr else "Unknown error"
+                raise Exception(f"pg_dump failed with exit code {returncode}: {error_msg}")
+            self._buffer.extend(self._flush())
+            self._eof = True
+
+        out = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        self.compressed_bytes += len(out)
+        return out
+
+    async def close(self) -> None:
+        """Stop pg_dump if the upload ended early."""
+        if self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        if not self._stderr.done():
+            self._stderr.cancel()
+
+
 # ===== Core Backup Functions =====
 
 async def perform_backup(backup_type: str = 'scheduled') -> bool:
     """
     Execute a single backup operation.
 
+    pg_dump output is compressed and uploaded to S3 as it is produced
+    (multipart), so neither the dump nor the compressed copy is held in memory.
+
     Args:
         backup_type: Type of backup ('scheduled', 'startup', 'shutdown', 'manual')
 
@@ -42,8 +119,12 @@ async def perform_backup(backup_type: str = 'scheduled') -> bool:
         True if backup succeeded, False otherwise
     """
     logger.info(f"Starting {backup_type} backup...")
+    codec = settings.BACKUP_COMPRESSION if settings.BACKUP_COMPRESSION in BACKUP_CODECS else 'gzip'
+    _, content_type, default_level = BACKUP_CODECS[codec]
+    level = settings.BACKUP_COMPRESSION_LEVEL or default_level
 
     for attempt in range(1, 4):  # 3 attempts with exponential backoff
+        reader = None
         try:
             # Parse DATABASE_URL for connection details
             db_info = parse_database_url(settings.DATABASE_URL)
@@ -64,27 +145,21 @@ async def perform_backup(backup_type: str = 'scheduled') -> bool:
                 stderr=asyncio.subprocess.PIPE,
                 env={'PGPASSWORD': db_info['password']}
             )
+            reader = _DumpReader(process, codec, level)
 
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown error"
-                raise Exception(f"pg_dump failed with exit code {process.returncode}: {error_msg}")
-
-            # Compress with gzip
-            logger.debug("Compressing backup...")
-            compressed = await asyncio.to_thread(gzip.compress, stdout, 9)
-            compression_ratio = (1 - len(compressed) / len(stdout)) * 100 if len(stdout) > 0 else 0
-
-            # Generate filename and upload to S3
-            key = generate_backup_filename(backup_type)
-            logger.debug(f"Uploading to S3: {key}")
-            await storage_service.upload(key, compressed, 'application/gzip')
+            # Generate filename and stream to S3
+            key = generate_backup_filename(backup_type, codec)
+            logger.debug(f"Streaming {codec} (level {level}) backup to S3: {key}")
+            t_start = time.monotonic()
+            await storage_service.upload_stream(key, reader.read, content_type, wait_for_budget=True)
+            elapsed = time.monotonic() - t_start
 
+            raw, compressed = reader.raw_bytes, reader.compressed_bytes
+            compression_ratio = (1 - compressed / raw) * 100 if raw > 0 else 0
             logger.info(
                 f"Backup completed successfully: {key} "
-                f"({len(compressed):,} bytes compressed from {len(stdout):,} bytes, "
-                f"{compression_ratio:.1f}% reduction)"
+                f"({compressed:,} bytes compressed from {raw:,} bytes, "
+                f"{compression_ratio:.1f}% reduction, {elapsed:.1f}s)"
             )
             return True
 
@@ -97,16 +172,156 @@ async def perform_backup(backup_type: str = 'scheduled') -> bool:
             else:
                 logger.error(f"Backup failed after {attempt} attempts", exc_info=True)
                 return False
+        finally:
+            if reader:
+                await reader.close()
 
     return False
 
 
-async def _run_restore(sql_bytes: bytes, engine, label: str) -> dict:
+# ===== Restore =====
+
+# Bytes read from S3 / the uploaded file per decompression step
+RESTORE_READ_SIZE = 1024 * 1024
+# Seconds between progress lines in the restore log
+RESTORE_PROGRESS_INTERVAL = 10
+# psql output lines kept for the restore result (older lines are only counted)
+RESTORE_OUTPUT_TAIL_LINES = 2000
+
+TRANSACTION_TIMEOUT_RE = re.compile(rb'^\s*SET transaction_timeout\s*=\s*[^;]+;\s*$')
+CREATE_TABLE_RE = re.compile(rb'CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(?:public\.)?(\w+)', re.IGNORECASE)
+ALTER_TABLE_RE = re.compile(rb'ALTER TABLE\s+(?:ONLY\s+)?(?:public\.)?(\w+)\s+(?:ADD|DROP|ENABLE|DISABLE|OWNER|RENAME)', re.IGNORECASE)
+COPY_RE = re.compile(rb'COPY\s+(?:public\.)?(\w+)\s*\([^)]*\)\s+FROM\s+stdin', re.IGNORECASE)
+CREATE_INDEX_RE = re.compile(rb'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF NOT EXISTS\s+)?(\w+)\s+ON\s+(?:ONLY\s+)?(?:public\.)?(\w+)', re.IGNORECASE)
+CREATE_SEQUENCE_RE = re.compile(rb'CREATE SEQUENCE\s+(?:IF NOT EXISTS\s+)?(?:public\.)?(\w+)', re.IGNORECASE)
+
+
+class _RestoreFilter:
+    """
+    Incremental decompress + line filter for a compressed pg_dump.
+
+    feed() takes compressed bytes and returns SQL ready for psql's stdin:
+    complete lines only, with `SET transaction_timeout` dropped (older
+    servers reject it). Statement and object statistics are collected on
+    the way. COPY data blocks are passed through without per-line work.
     """
-    Core restore: terminate active connections, dispose pool, run psql.
+
+    def __init__(self, codec: str):
+        self.codec = codec
+        self._decompressor = None
+        self._pending = b''
+        self._in_copy = False
+        self.compressed_bytes = 0
+        self.sql_bytes = 0
+        self.stripped_bytes = 0
+        self.statements = 0
+        self.tables = set()
+        self.alter_tables = set()
+        self.copy_tables = []
+        self.indexes: Dict[str, List[str]] = {}
+        self.sequences = set()
+
+    def feed(self, data: bytes) -> bytes:
+        self.compressed_bytes += len(data)
+        block = self._pending + self._decompress(data)
+        cut = block.rfind(b'\n') + 1
+        self._pending = block[cut:]
+        return self._filter(block[:cut])
+
+    def finish(self) -> bytes:
+        """Return the final unterminated line; raise if the stream was truncated or empty."""
+        if self._decompressor is not None:
+            raise RuntimeError("Backup stream is truncated (incomplete compressed data)")
+        if self.compressed_bytes == 0:
+            raise RuntimeError("Backup is empty")
+        tail, self._pending = self._pending, b''
+        return self._filter(tail + b'\n') if tail else b''
+
+    def _decompress(self, data: bytes) -> bytes:
+        # Concatenated gzip members / zstd frames are decompressed back to back
+        out = []
+        while data:
+            if self._decompressor is None:
+                self._decompressor = make_decompressor(self.codec)
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = None
+        return b''.join(out)
+
+    def _filter(self, block: bytes) -> bytes:
+        out = []
+        pos, end = 0, len(block)
+        while pos < end:
+            if self._in_copy:
+                # COPY data runs until a line consisting of "\."
+                if block.startswith(b'\\.\n', pos):
+                    stop = pos
+                else:
+                    stop = block.find(b'\n\\.\n', pos)
+                    if stop == -1:
+                        out.append(block[pos:])
+                        break
+                    stop += 1
+                out.append(block[pos:stop + 3])
+                pos = stop + 3
+                self._in_copy = False
+                continue
+
+            nl = block.index(b'\n', pos) + 1
+            line = block[pos:nl]
+            pos = nl
+            if TRANSACTION_TIMEOUT_RE.match(line):
+                self.stripped_bytes += len(line)
+                continue
+            self._inspect(line)
+            out.append(line)
+
+        filtered = b''.join(out)
+        self.sql_bytes += len(filtered)
+        return filtered
+
+    def _inspect(self, line: bytes) -> None:
+        if line.rstrip().endswith(b';'):
+            self.statements += 1
+        head = line[:1]
+        if head == b'C':
+            if match := COPY_RE.match(line):
+                self.copy_tables.append(match.group(1).decode())
+                self._in_copy = True
+            elif match := CREATE_TABLE_RE.match(line):
+                self.tables.add(match.group(1).decode())
+            elif match := CREATE_INDEX_RE.match(line):
+                self.indexes.setdefault(match.group(2).decode(), []).append(match.group(1).decode())
+            elif match := CREATE_SEQUENCE_RE.match(line):
+                self.sequences.add(match.group(1).decode())
+        elif head == b'A':
+            if match := ALTER_TABLE_RE.match(line):
+                self.alter_tables.add(match.group(1).decode())
+
+
+async def _drain_output(stream, tail: deque) -> int:
+    """Read a psql output stream to EOF, keeping the last lines in tail; returns the line count."""
+    count = 0
+    while line := await stream.readline():
+        tail.append(line.decode(errors='replace').rstrip('\n'))
+        count += 1
+    return count
+
+
+async def _run_restore(source: AsyncIterator[bytes], codec: str, engine, label: str,
+                       size: Optional[int] = None) -> dict:
+    """
+    Core restore: terminate active connections, dispose pool, stream SQL into psql.
+
+    source yields the compressed backup; it is decompressed, filtered and
+    written to psql's stdin chunk by chunk, so memory stays constant
+    regardless of dump size.
 
     Returns:
-        Dict with returncode, stdout, stderr, and detailed log lines from each phase
+        Dict with returncode, stdout, stderr (last RESTORE_OUTPUT_TAIL_LINES
+        lines each), and detailed log lines from each phase
     """
     db_info = parse_database_url(settings.DATABASE_URL)
     log_lines = []
@@ -122,12 +337,7 @@ async def _run_restore(sql_bytes: bytes, engine, label: str) -> dict:
     log(f"{'='*60}")
     log(f"Source: {label}")
     log(f"Target: {db_info['user']}@{db_info['host']}:{db_info['port']}/{db_info['database']}")
-    log(f"Raw SQL size: {len(sql_bytes):,} bytes")
-
-    # Count SQL statements
-    sql_text_preview = sql_bytes.decode(errors='replace')
-    stmt_count = sql_text_preview.count(';')
-    log(f"Approximate statements: {stmt_count}")
+    log(f"Compressed size: {f'{size:,} bytes' if size is not None else 'unknown'} ({codec})")
 
     # ===== Phase 2: Connection Termination =====
     log(f"\n{'='*60}")
@@ -177,148 +387,141 @@ async def _run_restore(sql_bytes: bytes, engine, label: str) -> dict:
     engine.dispose()
     log(f"Pool disposed successfully")
 
-    # ===== Phase 4: SQL Preprocessing & Analysis =====
+    # ===== Phase 4: Streaming psql Execution =====
     log(f"\n{'='*60}")
-    log(f"[Phase 4] SQL PREPROCESSING & ANALYSIS")
+    log(f"[Phase 4] STREAMING SQL INTO PSQL")
     log(f"{'='*60}")
-
-    # Strip incompatible parameters
-    sql_text = re.sub(
-        r'^\s*SET transaction_timeout\s*=\s*[^;]+;\s*$', '',
-        sql_bytes.decode(errors='replace'),
-        flags=re.MULTILINE
+    log(f"Command: psql -h {db_info['host']} -p {db_info['port']} -U {db_info['user']} -d {db_info['database']} --echo-errors --set=VERBOSITY=verbose (SQL on stdin)")
+    log(f"Starting psql subprocess...")
+
+    sql_filter = _RestoreFilter(codec)
+    stdout_tail: deque = deque(maxlen=RESTORE_OUTPUT_TAIL_LINES)
+    stderr_tail: deque = deque(maxlen=RESTORE_OUTPUT_TAIL_LINES)
+
+    t_psql = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        'psql',
+        '--echo-errors',
+        f'--set=VERBOSITY=verbose',
+        '-h', db_info['host'],
+        '-p', str(db_info['port']),
+        '-U', db_info['user'],
+        '-d', db_info['database'],
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env={'PGPASSWORD': db_info['password']}
+    )
+    log(f"psql process started (PID: {process.pid})")
+    readers = asyncio.gather(
+        _drain_output(process.stdout, stdout_tail),
+        _drain_output(process.stderr, stderr_tail),
     )
-    sql_bytes_cleaned = sql_text.encode()
-    stripped_size = len(sql_bytes) - len(sql_bytes_cleaned)
-
-    if stripped_size > 0:
-        log(f"Stripped incompatible parameters: {stripped_size:,} bytes")
-    log(f"Final SQL size: {len(sql_bytes_cleaned):,} bytes")
-
-    # Parse SQL structure for informational logging
-    sql_text = sql_bytes_cleaned.decode(errors='replace')
-
-    # Log the SQL statements themselves (for visibility)
-    log(f"\n[SQL STATEMENTS TO BE EXECUTED]")
-    log(f"{'-'*60}")
-    # Split by semicolon and log each statement (limit to reasonable output)
-    statements = [s.strip() for s in sql_text.split(';') if s.strip()]
-    log(f"Total statements: {len(statements)}")
-    for i, stmt in enumerate(statements[:100], 1):  # Log first 100 statements in detail
-        # Truncate very long statements
-        if len(stmt) > 300:
-            log(f"{i}. {stmt[:300]}...")
-        else:
-            log(f"{i}. {stmt}")
-    if len(statements) > 100:
-        log(f"... and {len(statements) - 100} more statements")
-    log(f"{'-'*60}\n")
-
-    # Extract CREATE TABLE statements (capture table name properly)
-    create_tables = re.findall(r'CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(?:public\.)?(\w+)', sql_text, re.IGNORECASE)
-    if create_tables:
-        log(f"\nTables to be created/restored: {len(set(create_tables))}")
-        for tbl in sorted(set(create_tables)):
-            log(f"  • {tbl}")
 
-    # Extract ALTER TABLE statements (look for ADD CONSTRAINT, ADD COLUMN, etc. after table name)
-    alter_tables = re.findall(r'ALTER TABLE\s+(?:ONLY\s+)?(?:public\.)?(\w+)\s+(?:ADD|DROP|ENABLE|DISABLE|OWNER|RENAME)', sql_text, re.IGNORECASE)
-    if alter_tables:
-        log(f"\nAlterations to apply: {len(set(alter_tables))} table(s)")
-        for tbl in sorted(set(alter_tables)):
-            log(f"  • {tbl}")
+    def progress():
+        percent = f" ({sql_filter.compressed_bytes / size * 100:.1f}%)" if size else ""
+        rate = sql_filter.sql_bytes / max(time.monotonic() - t_psql, 1e-6) / 1024 / 1024
+        log(f"Progress: {sql_filter.compressed_bytes:,} compressed bytes read{percent}, "
+            f"{sql_filter.sql_bytes:,} SQL bytes sent, {sql_filter.statements:,} statements, "
+            f"{rate:.1f} MB/s")
 
-    # Extract COPY statements (data loading) with row counts
-    copy_stmts = re.findall(r'COPY\s+(?:public\.)?(\w+)\s*\([^)]*\)\s+FROM\s+stdin', sql_text, re.IGNORECASE)
-    if copy_stmts:
-        log(f"\nData loading: {len(copy_stmts)} COPY statement(s)")
-        for tbl in sorted(set(copy_stmts)):
-            log(f"  • {tbl}")
+    stdin_closed = False
+    try:
+        last_progress = time.monotonic()
+        async for chunk in source:
+            sql = await asyncio.to_thread(sql_filter.feed, chunk)
+            if sql:
+                try:
+                    process.stdin.write(sql)
+                    await process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    log(f"psql closed its input early; stopping stream")
+                    stdin_closed = True
+                    break
+            if time.monotonic() - last_progress >= RESTORE_PROGRESS_INTERVAL:
+                progress()
+                last_progress = time.monotonic()
+
+        if not stdin_closed:
+            tail = sql_filter.finish()
+            if tail:
+                process.stdin.write(tail)
+                await process.stdin.drain()
+            process.stdin.close()
+    except BaseException as e:
+        # Source or decompression failure: stop psql rather than let it commit a partial tail
+        log(f"Restore stream failed: {e}")
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        await readers
+        raise
+    finally:
+        if hasattr(source, 'aclose'):
+            await source.aclose()
+    progress()
 
-    # Extract CREATE INDEX statements
-    create_indexes = re.findall(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF NOT EXISTS\s+)?(\w+)\s+ON\s+(?:public\.)?(\w+)', sql_text, re.IGNORECASE)
-    if create_indexes:
-        log(f"\nIndexes to create: {len(create_indexes)}")
-        idx_by_table = {}
-        for idx_name, tbl in create_indexes:
-            if tbl not in idx_by_table:
-                idx_by_table[tbl] = []
-            idx_by_table[tbl].append(idx_name)
-        for tbl in sorted(idx_by_table.keys()):
-            log(f"  • on table {tbl}: {len(idx_by_table[tbl])} index(es)")
-
-    # Extract sequence operations
-    sequences = re.findall(r'CREATE SEQUENCE\s+(?:IF NOT EXISTS\s+)?(?:public\.)?(\w+)', sql_text, re.IGNORECASE)
-    if sequences:
-        log(f"\nSequences to create: {len(set(sequences))}")
-        for seq in sorted(set(sequences)):
-            log(f"  • {seq}")
+    stdout_lines, stderr_lines = await readers
+    await process.wait()
+    psql_elapsed = time.monotonic() - t_psql
 
-    # ===== Phase 5: psql Execution =====
+    stdout_text = '\n'.join(stdout_tail)
+    stderr_text = '\n'.join(stderr_tail)
+
+    log(f"psql exited with code: {process.returncode}")
+    log(f"psql execution time: {psql_elapsed:.2f}s")
+    log(f"stdout: {stdout_lines} lines, stderr: {stderr_lines} lines")
+
+    # ===== Phase 5: SQL Analysis =====
     log(f"\n{'='*60}")
-    log(f"[Phase 5] RUNNING PSQL RESTORE")
+    log(f"[Phase 5] SQL ANALYSIS")
     log(f"{'='*60}")
+    if sql_filter.stripped_bytes > 0:
+        log(f"Stripped incompatible parameters: {sql_filter.stripped_bytes:,} bytes")
+    log(f"SQL bytes sent: {sql_filter.sql_bytes:,}")
+    log(f"Approximate statements: {sql_filter.statements:,}")
+
+    if sql_filter.tables:
+        log(f"\nTables created/restored: {len(sql_filter.tables)}")
+        for tbl in sorted(sql_filter.tables):
+            log(f"  • {tbl}")
 
-    # Write SQL to temp file for better logging
-    with tempfile.NamedTemporaryFile(mode='wb', suffix='.sql', delete=False) as tmp:
-        tmp.write(sql_bytes_cleaned)
-        tmp_path = tmp.name
-
-    try:
-        log(f"SQL written to temp file: {tmp_path}")
-        log(f"Command: psql -h {db_info['host']} -p {db_info['port']} -U {db_info['user']} -d {db_info['database']} -f {tmp_path} --echo-all --echo-errors --set=VERBOSITY=verbose")
-        log(f"Starting psql subprocess...")
-
-        t_psql = time.monotonic()
-        process = await asyncio.create_subprocess_exec(
-            'psql',
-            '--echo-all',
-            '--echo-errors',
-            f'--set=VERBOSITY=verbose',
-            '-h', db_info['host'],
-            '-p', str(db_info['port']),
-            '-U', db_info['user'],
-            '-d', db_info['database'],
-            '-f', tmp_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env={'PGPASSWORD': db_info['password']}
-        )
+    if sql_filter.alter_tables:
+        log(f"\nAlterations applied: {len(sql_filter.alter_tables)} table(s)")
+        for tbl in sorted(sql_filter.alter_tables):
+            log(f"  • {tbl}")
 
-        log(f"psql process started (PID: {process.pid})")
-        stdout, stderr = await process.communicate()
-        psql_elapsed = time.monotonic() - t_psql
-    finally:
-        # Clean up temp file
-        try:
-            os.unlink(tmp_path)
-        except Exception as e:
-            logger.warning(f"Failed to delete temp file {tmp_path}: {e}")
+    if sql_filter.copy_tables:
+        log(f"\nData loading: {len(sql_filter.copy_tables)} COPY statement(s)")
+        for tbl in sorted(set(sql_filter.copy_tables)):
+            log(f"  • {tbl}")
 
-    stdout_text = stdout.decode(errors='replace')
-    stderr_text = stderr.decode(errors='replace')
+    if sql_filter.indexes:
+        log(f"\nIndexes created: {sum(len(v) for v in sql_filter.indexes.values())}")
+        for tbl in sorted(sql_filter.indexes.keys()):
+            log(f"  • on table {tbl}: {len(sql_filter.indexes[tbl])} index(es)")
 
-    log(f"psql exited with code: {process.returncode}")
-    log(f"psql execution time: {psql_elapsed:.2f}s")
-    log(f"stdout size: {len(stdout_text):,} bytes ({len(stdout_text.splitlines())} lines)")
-    log(f"stderr size: {len(stderr_text):,} bytes ({len(stderr_text.splitlines())} lines)")
+    if sql_filter.sequences:
+        log(f"\nSequences created: {len(sql_filter.sequences)}")
+        for seq in sorted(sql_filter.sequences):
+            log(f"  • {seq}")
 
-    # Include full psql output in process log
+    # Include psql output in process log
     if stdout_text:
         log(f"\n{'-'*60}")
-        log(f"[psql STDOUT - FULL OUTPUT]")
+        log(f"[psql STDOUT - LAST {len(stdout_tail)} OF {stdout_lines} LINES]")
         log(f"{'-'*60}")
-        for line in stdout_text.splitlines():
+        for line in stdout_tail:
             log(line)
 
     if stderr_text:
         log(f"\n{'-'*60}")
-        log(f"[psql STDERR - FULL OUTPUT]")
+        log(f"[psql STDERR - LAST {len(stderr_tail)} OF {stderr_lines} LINES]")
         log(f"{'-'*60}")
-        for line in stderr_text.splitlines():
+        for line in stderr_tail:
             log(line)
 
-    if process.returncode != 0:
+    if process.returncode != 0 or stdin_closed:
         logger.error(f"psql restore failed (rc={process.returncode}): {stderr_text}")
         raise RuntimeError(f"psql restore failed (rc={process.returncode}):\n{stderr_text}")
 
@@ -329,7 +532,7 @@ async def _run_restore(sql_bytes: bytes, engine, label: str) -> dict:
     log(f"{'='*60}")
     log(f"Total elapsed time: {total_elapsed:.2f}s")
     log(f"Connections terminated: {terminated}")
-    log(f"SQL bytes processed: {len(sql_bytes_cleaned):,}")
+    log(f"SQL bytes processed: {sql_filter.sql_bytes:,}")
     log(f"Success: ✓")
     log(f"{'='*60}\n")
 
@@ -345,32 +548,40 @@ async def perform_restore(filename: str, engine) -> dict:
     """
     Restore the database from a backup file stored in S3.
 
+    The object is streamed from S3 straight into psql; it is never held
+    in memory or written to local disk.
+
     Note: After restore, the DB reflects the backup's Alembic migration state.
     The service does NOT auto-run 'alembic upgrade head'.
     """
-    if not filename.startswith('backup-') or not filename.endswith('.sql.gz'):
+    if not is_backup_filename(filename):
         raise ValueError(f"Invalid backup filename: {filename}")
 
-    logger.info(f"Downloading backup from S3: db/{filename}")
-    compressed = await storage_service.download(f"db/{filename}")
-    sql_bytes = gzip.decompress(compressed)
-    logger.info(f"Decompressed {len(compressed):,} -> {len(sql_bytes):,} bytes")
+    logger.info(f"Streaming backup from S3: db/{filename}")
+    body, size = await storage_service.stream(f"db/{filename}", chunk_size=RESTORE_READ_SIZE)
 
-    psql_result = await _run_restore(sql_bytes, engine, label=filename)
+    psql_result = await _run_restore(body, backup_codec(filename), engine, label=filename, size=size)
     return {'success': True, 'filename': filename, 'message': 'Restore completed successfully', **psql_result}
 
 
-async def perform_restore_upload(compressed: bytes, original_filename: str, engine) -> dict:
+async def perform_restore_upload(read, original_filename: str, engine, size: Optional[int] = None) -> dict:
     """
-    Restore the database from an uploaded .sql.gz file.
+    Restore the database from an uploaded .sql.gz or .sql.zst file.
+
+    Args:
+        read: async read(n) callable over the uploaded file (e.g. UploadFile.read)
+        original_filename: Uploaded filename, used to pick the codec
+        size: Upload size in bytes, if known (progress reporting only)
 
     Note: After restore, the DB reflects the backup's Alembic migration state.
     The service does NOT auto-run 'alembic upgrade head'.
     """
-    sql_bytes = gzip.decompress(compressed)
-    logger.info(f"Decompressed upload {original_filename}: {len(compressed):,} -> {len(sql_bytes):,} bytes")
+    async def chunks():
+        while chunk := await read(RESTORE_READ_SIZE):
+            yield chunk
 
-    psql_result = await _run_restore(sql_bytes, engine, label=original_filename)
+    codec = backup_codec(original_filename) or 'gzip'
+    psql_result = await _run_restore(chunks(), codec, engine, label=original_filename, size=size)
     return {'success': True, 'filename': original_filename, 'message': 'Restore completed successfully', **psql_result}
 
 
@@ -562,37 +773,39 @@ def parse_database_url(url: str) -> Dict[str, any]:
         raise ValueError(f"Failed to parse DATABASE_URL: {e}")
 
 
-def generate_backup_filename(backup_type: str = 'scheduled') -> str:
+def generate_backup_filename(backup_type: str = 'scheduled', codec: str = 'gzip') -> str:
     """
     Generate S3 key for backup file.
 
-    Naming convention:
+    Naming convention (.sql.zst instead of .sql.gz for zstd):
     - Scheduled: db/backup-YYYY-MM-DD-HH-MM-SS.sql.gz
     - Startup/Shutdown: db/backup-YYYY-MM-DD-{type}.sql.gz
     - Manual: db/backup-YYYY-MM-DD-HH-MM-SS.sql.gz
 
     Args:
         backup_type: Type of backup (scheduled, startup, shutdown, manual)
+        codec: Compression codec, a key of BACKUP_CODECS
 
     Returns:
         S3 key (e.g., "db/backup-2024-01-15-02-00-00.sql.gz")
     """
     now = datetime.utcnow()
+    extension = BACKUP_CODECS[codec][0]
 
     if backup_type in ('startup', 'shutdown'):
         # For startup/shutdown, use type in filename instead of exact timestamp
         # This prevents multiple backups if service restarts multiple times same day
-        return f"db/backup-{now.strftime('%Y-%m-%d')}-{backup_type}.sql.gz"
+        return f"db/backup-{now.strftime('%Y-%m-%d')}-{backup_type}{extension}"
     else:
         # For scheduled and manual backups, use exact timestamp
-        return f"db/backup-{now.strftime('%Y-%m-%d-%H-%M-%S')}.sql.gz"
+        return f"db/backup-{now.strftime('%Y-%m-%d-%H-%M-%S')}{extension}"
 
 
 def parse_backup_timestamp(s3_key: str) -> datetime:
     """
     Extract timestamp from backup filename.
 
-    Supports two formats:
+    Supports two formats (with .sql.gz or .sql.zst):
     1. db/backup-YYYY-MM-DD-HH-MM-SS.sql.gz (scheduled/manual)
     2. db/backup-YYYY-MM-DD-{type}.sql.gz (startup/shutdown)
 
@@ -606,7 +819,7 @@ def parse_backup_timestamp(s3_key: str) -> datetime:
         ValueError: If filename doesn't match expected pattern
     """
     # Try full timestamp pattern first (scheduled/manual backups)
-    pattern_full = r'backup-(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})\.sql\.gz'
+    pattern_full = r'backup-(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})\.sql\.(?:gz|zst)'
     match = re.search(pattern_full, s3_key)
 
     if match:
@@ -614,7 +827,7 @@ def parse_backup_timestamp(s3_key: str) -> datetime:
         return datetime(year, month, day, hour, minute, second)
 
     # Try date-only pattern (startup/shutdown backups)
-    pattern_date = r'backup-(\d{4})-(\d{2})-(\d{2})-(startup|shutdown)\.sql\.gz'
+    pattern_date = r'backup-(\d{4})-(\d{2})-(\d{2})-(startup|shutdown)\.sql\.(?:gz|zst)'
     match = re.search(pattern_date, s3_key)
 
     if match:
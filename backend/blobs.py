@@ -0,0 +1,376 @@
+"""Content-addressed, reference-counted storage of relic content.
+
+Each distinct payload is stored once: uploads are hashed with SHA-256 as they
+stream to S3, and a relic whose content matches an existing blob references
+that blob instead of keeping its own copy. Forks without new content just add
+a reference. relic.s3_key always mirrors the blob's key.
+
+New blobs live at blobs/{sha256} (blob_key): an upload is staged under the
+relic's own key and moved there by register_blob, so a shared object's key
+says nothing about which relic stored it first (a relic id is the access
+token of a private relic). Blobs registered before content addressing keep
+their relics/{id} key, as do relics stored before deduplication. Writers
+and deleters of a content-addressed object serialise on an advisory lock
+(lock_blob_key), so releasing a blob can never delete an object that a new
+upload of the same content has just registered.
+
+Content up to INLINE_CONTENT_MAX_SIZE is kept inline in the blob row instead
+of S3 (no PUT on create, no GET on read). Readers load it together with the
+relic (with_inline_content) and go through stream_content, which serves
+either placement. Larger text-like content may be stored compressed
+(COMPRESS_AT_REST); stream_content decodes it unless asked for the stored
+bytes.
+
+None of these helpers commit; reference changes ride in the caller's
+transaction, and S3 objects released to zero are deleted by the caller only
+after that transaction commits.
+"""
+import hashlib
+import logging
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import case, delete, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from backend.compression import CONTENT_CODECS, CompressingReader, decompress_stream, is_compressible
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models import Blob, Relic
+from backend.storage import storage_service, FileTooLargeError, DOWNLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+BLOB_KEY_PREFIX = "blobs/"
+
+
+class UploadedBlob(NamedTuple):
+    """Result of upload_blob: content written to S3, not yet referenced."""
+    sha256: str
+    s3_key: str
+    size_bytes: int
+    etag: Optional[str]
+    # Set when the content is small enough to be stored inline; nothing was written to S3
+    content: Optional[bytes] = None
+    # Codec the S3 object is compressed with (size_bytes stays the logical size)
+    content_encoding: Optional[str] = None
+    stored_size_bytes: Optional[int] = None
+    content_type: Optional[str] = None
+
+
+class StoredBlob(NamedTuple):
+    """Result of register_blob."""
+    sha256: str
+    s3_key: str
+    size_bytes: int
+    etag: Optional[str]
+    # False when the upload duplicated an existing blob and was discarded
+    created: bool
+
+
+def blob_key(sha256: str) -> str:
+    """S3 key of a blob's content."""
+    return f"{BLOB_KEY_PREFIX}{sha256}"
+
+
+async def lock_blob_key(db: AsyncSession, key: str) -> None:
+    """Serialise with other writers and deleters of the object at key until db's transaction ends."""
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(key))))
+
+
+async def upload_blob(
+    key: str,
+    read,
+    content_type: str,
+    max_size: Optional[int] = None,
+    size_hint: Optional[int] = None,
+) -> UploadedBlob:
+    """
+    Stream an upload to key (a staging key owned by the caller) while hashing it.
+
+    Content that fits INLINE_CONTENT_MAX_SIZE is returned in memory instead
+    (UploadedBlob.content) and stored by register_blob. Larger text-like
+    content is compressed on the way when COMPRESS_AT_REST is set; the
+    digest is always taken over the logical bytes. Touches no database
+    session, so callers can run it after returning their connection to the
+    pool and only check one out again for register_blob. Until
+    register_blob succeeds the caller owns the object at key.
+    """
+    digest = hashlib.sha256()
+
+    inline_limit = settings.INLINE_CONTENT_MAX_SIZE
+    if inline_limit > 0 and (size_hint is None or size_hint <= inline_limit):
+        head = await _read_up_to(read, inline_limit + 1)
+        if len(head) <= inline_limit:
+            if max_size is not None and len(head) > max_size:
+                raise FileTooLargeError()
+            digest.update(head)
+            # Same value S3 reports for a single PUT, so the ETag survives relocation
+            etag = hashlib.md5(head).hexdigest()
+            return UploadedBlob(digest.hexdigest(), key, len(head), etag, head, content_type=content_type)
+        read = _prepend(head, read)
+
+    async def hashing_read(n: int) -> bytes:
+        chunk = await read(n)
+        digest.update(chunk)
+        return chunk
+
+    codec = settings.COMPRESS_AT_REST_CODEC
+    if settings.COMPRESS_AT_REST and codec in CONTENT_CODECS and is_compressible(content_type):
+        reader = CompressingReader(hashing_read, codec, settings.COMPRESS_AT_REST_LEVEL, max_size=max_size)
+        stored_size, etag = await storage_service.upload_stream(
+            key, reader.read, content_type, size_hint=size_hint
+        )
+        return UploadedBlob(digest.hexdigest(), key, reader.raw_bytes, etag, None, codec, stored_size, content_type)
+
+    size_bytes, etag = await storage_service.upload_stream(
+        key, hashing_read, content_type, max_size=max_size, size_hint=size_hint
+    )
+    return UploadedBlob(digest.hexdigest(), key, size_bytes, etag, None, None, size_bytes, content_type)
+
+
+async def _read_up_to(read, size: int) -> bytes:
+    """Read up to size bytes from an async read(n) callable, tolerating short reads."""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = await read(size - len(buf))
+        if not chunk:
+            break
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _prepend(head: bytes, read):
+    """read(n) that returns head before continuing with read."""
+    async def read_after_head(n: int) -> bytes:
+        nonlocal head
+        if head:
+            out, head = head[:n], head[n:]
+            return out
+        return await read(n)
+    return read_after_head
+
+
+async def register_blob(db: AsyncSession, uploaded: UploadedBlob) -> StoredBlob:
+    """
+    Take a reference on the blob for uploaded content.
+
+    A new S3-stored blob is copied server-side from the staging key to
+    blob_key(sha256); if a blob with the same digest already exists, it is
+    referenced instead. Either way the staged object is deleted. If the
+    caller's transaction rolls back and created is True, the caller owns
+    the object at the returned s3_key and should delete it.
+    """
+    sha256, size_bytes, content = uploaded.sha256, uploaded.size_bytes, uploaded.content
+    key = blob_key(sha256)
+    stored_size_bytes = size_bytes if uploaded.stored_size_bytes is None else uploaded.stored_size_bytes
+    if content is None:
+        # Held until commit, so a release of an earlier blob with this digest cannot delete the copy
+        await lock_blob_key(db, key)
+    stmt = pg_insert(Blob).values(
+        sha256=sha256, s3_key=key, size_bytes=size_bytes, etag=uploaded.etag, ref_count=1, content=content,
+        content_encoding=uploaded.content_encoding, stored_size_bytes=stored_size_bytes,
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + 1})
+    row = (await db.execute(
+        stmt.returning(Blob.s3_key, Blob.etag, literal_column("xmax = 0").label("inserted"))
+    )).one()
+    if content is not None:
+        return StoredBlob(sha256, row.s3_key, size_bytes, row.etag, row.inserted)
+
+    etag = row.etag
+    if row.inserted:
+        copied = await storage_service.copy(
+            uploaded.s3_key, key, stored_size_bytes, uploaded.content_type or "application/octet-stream"
+        )
+        # A copy of a multipart upload gets a single-part ETag
+        if copied and copied != etag:
+            etag = copied
+            await db.execute(update(Blob).where(Blob.sha256 == sha256).values(etag=etag))
+
+    try:
+        await storage_service.delete(uploaded.s3_key)
+    except Exception as e:
+        logger.warning(f"Failed to delete staged upload {uploaded.s3_key} (content stored as {row.s3_key}): {e}")
+    return StoredBlob(sha256, row.s3_key, size_bytes, etag, row.inserted)
+
+
+async def add_blob_reference(db: AsyncSession, sha256: str) -> Optional[Blob]:
+    """Take another reference on an existing blob; returns None if it no longer exists."""
+    result = await db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count + 1)
+        .returning(Blob)
+    )
+    return result.scalar_one_or_none()
+
+
+# Key to delete when a blob is released; inline blobs have no S3 object
+_released_object_key = case((Blob.content.is_(None), Blob.s3_key), else_=None)
+
+
+def with_inline_content():
+    """Loader option for Relic queries whose results are read with stream_content."""
+    return joinedload(Relic.blob).undefer(Blob.content)
+
+
+def inline_content(relic: Relic) -> Optional[bytes]:
+    """The relic's inline content, or None if it lives in S3 (needs with_inline_content)."""
+    return relic.blob.content if relic.blob is not None else None
+
+
+def stored_encoding(relic: Relic) -> Optional[str]:
+    """Codec the relic's S3 object is compressed with, None if stored as is (needs with_inline_content)."""
+    return relic.blob.content_encoding if relic.blob is not None else None
+
+
+async def stream_content(relic: Relic, byte_range=None, decode: bool = True):
+    """
+    storage_service.stream for a relic's content, wherever and however it is stored.
+
+    The relic must be loaded with with_inline_content(). S3 reads go
+    through the local content cache. Compressed content is decompressed
+    unless decode is False, in which case the stored bytes (and byte_range
+    within them) are returned. A byte_range over decoded content is served
+    by decompressing from the start and skipping.
+
+    Returns:
+        (async chunk iterator, content length in bytes of the returned slice)
+    """
+    content = inline_content(relic)
+    if content is not None:
+        if byte_range is not None:
+            content = content[byte_range[0]:byte_range[1] + 1]
+
+        async def iterator():
+            for start in range(0, len(content), DOWNLOAD_CHUNK_SIZE):
+                yield content[start:start + DOWNLOAD_CHUNK_SIZE]
+
+        return iterator(), len(content)
+
+    codec = stored_encoding(relic)
+    if codec is None or not decode:
+        return await storage_service.stream(relic.s3_key, byte_range=byte_range, cache=True)
+
+    chunks, _ = await storage_service.stream(relic.s3_key, cache=True)
+    decoded = decompress_stream(chunks, codec)
+    if byte_range is None:
+        return decoded, relic.size_bytes
+    return _slice_stream(decoded, byte_range[0], byte_range[1] + 1), byte_range[1] - byte_range[0] + 1
+
+
+async def _slice_stream(chunks, start: int, stop: int):
+    """Bytes [start, stop) of an async chunk iterator."""
+    position = 0
+    try:
+        async for chunk in chunks:
+            end = position + len(chunk)
+            if end > start:
+                yield chunk[max(start - position, 0):stop - position]
+            position = end
+            if position >= stop:
+                break
+    finally:
+        await chunks.aclose()
+
+
+async def release_relic_content(db: AsyncSession, relic: Relic) -> Optional[str]:
+    """
+    Drop the relic's reference on its content.
+
+    Returns the S3 key that is no longer referenced (delete it once the
+    transaction commits), or None while other relics still use the blob
+    or when it was stored inline.
+    Relics stored before deduplication own their object, so their key is
+    always returned.
+    """
+    if not relic.blob_sha256:
+        return relic.s3_key
+
+    await db.execute(
+        update(Blob)
+        .where(Blob.sha256 == relic.blob_sha256, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count - 1)
+    )
+    result = await db.execute(
+        delete(Blob)
+        .where(Blob.sha256 == relic.blob_sha256, Blob.ref_count <= 0)
+        .returning(_released_object_key)
+    )
+    return result.scalar_one_or_none()
+
+
+async def release_blob_references(db: AsyncSession, sha256s: Iterable[str]) -> List[str]:
+    """
+    Batch form of release_relic_content for relics that reference blobs.
+
+    sha256s holds one entry per released reference (duplicates allowed).
+    Returns the S3 keys of S3-stored blobs that dropped to zero references.
+    """
+    counts = Counter(sha256s)
+    if not counts:
+        return []
+    # One UPDATE per distinct decrement; in practice almost always just -1
+    by_delta: dict = {}
+    for sha256, n in counts.items():
+        by_delta.setdefault(n, []).append(sha256)
+    for n, digests in by_delta.items():
+        await db.execute(
+            update(Blob)
+            .where(Blob.sha256.in_(digests), Blob.ref_count > 0)
+            .values(ref_count=func.greatest(Blob.ref_count - n, 0))
+            .execution_options(synchronize_session=False)
+        )
+    result = await db.execute(
+        delete(Blob)
+        .where(Blob.sha256.in_(list(counts)), Blob.ref_count <= 0)
+        .returning(_released_object_key)
+        .execution_options(synchronize_session=False)
+    )
+    return [key for key in result.scalars() if key]
+
+
+async def delete_released_objects(s3_keys: Iterable[str]) -> List[str]:
+    """
+    Delete objects returned by release_relic_content / release_blob_references.
+
+    A content-addressed key is skipped when a blob stored in S3 has been
+    registered under it again since it was released. Returns the keys that
+    could not be deleted.
+    """
+    s3_keys = [key for key in s3_keys if key]
+    blob_keys = sorted(key for key in s3_keys if key.startswith(BLOB_KEY_PREFIX))
+    keys = [key for key in s3_keys if not key.startswith(BLOB_KEY_PREFIX)]
+    if not blob_keys:
+        return await storage_service.delete_many(keys) if keys else []
+
+    async with AsyncSessionLocal() as db:
+        # Sorted, so two deleters cannot wait on each other's locks
+        for key in blob_keys:
+            await lock_blob_key(db, key)
+        reused = set((await db.execute(
+            select(Blob.s3_key).where(
+                Blob.sha256.in_([key[len(BLOB_KEY_PREFIX):] for key in blob_keys]),
+                Blob.s3_key.in_(blob_keys), Blob.content.is_(None),
+            )
+        )).scalars())
+        keys += [key for key in blob_keys if key not in reused]
+        # The locks are held until the objects are gone
+        failed = await storage_service.delete_many(keys) if keys else []
+        await db.commit()
+    return failed
+
+
+async def delete_released_object(s3_key: Optional[str]) -> None:
+    """Delete an object returned by release_relic_content, logging instead of raising."""
+    if not s3_key:
+        return
+    try:
+        if await delete_released_objects([s3_key]):
+            logger.warning(f"Unreferenced S3 object {s3_key} left in the bucket")
+    except Exception as e:
+        # An orphaned object is harmless and reclaimable; a failed request is not
+        logger.warning(f"Failed to delete unreferenced S3 object {s3_key}: {e}")
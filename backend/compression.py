@@ -0,0 +1,172 @@
+"""Incremental gzip/zstd codecs shared by backups and compressed relic storage."""
+import asyncio
+import zlib
+from typing import Optional
+
+from sqlalchemy import func, or_
+
+from backend.storage import FileTooLargeError
+
+# Content types worth compressing at rest besides text/*
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/x-javascript",
+    "application/x-yaml",
+    "application/yaml",
+    "application/toml",
+    "application/sql",
+    "application/x-sh",
+    "application/csv",
+    "image/svg+xml",
+}
+
+# Codecs relic content can be stored with; the names double as HTTP content-codings
+CONTENT_CODECS = ("zstd", "gzip")
+
+# Logical bytes compressed per step while an upload streams
+COMPRESS_READ_SIZE = 1024 * 1024
+# zstd content is written as independent frames of this many logical bytes, so that it can be
+# decompressed from a frame start (line windows, see backend.line_index); gzip has zran checkpoints
+ZSTD_FRAME_SIZE = 4 * 1024 * 1024
+
+
+def make_compressor(codec: str, level: int):
+    """Return (compress(chunk) -> bytes, flush() -> bytes) for an incremental compressor."""
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+    # wbits=31 writes a gzip container, readable by gzip/gunzip
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def make_decompressor(codec: str):
+    """Return an incremental decompressor for one gzip member / zstd frame (see FrameDecompressor)."""
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd decompression requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(31)
+
+
+class FrameDecompressor:
+    """Incremental decompressor of concatenated gzip members / zstd frames, as CompressingReader writes."""
+
+    def __init__(self, codec: str):
+        self.codec = codec
+        self._decompressor = make_decompressor(codec)
+
+    @property
+    def eof(self) -> bool:
+        """Whether the data so far ends at the end of a member / frame."""
+        return self._decompressor is None
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            if self._decompressor is None:
+                self._decompressor = make_decompressor(self.codec)
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = None
+        return b"".join(out)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Whether content of this MIME type is worth compressing at rest."""
+    if not content_type:
+        return False
+    mime = content_type.split(";", 1)[0].strip().lower()
+    return (
+        mime.startswith("text/")
+        or mime in COMPRESSIBLE_TYPES
+        or mime.endswith("+json")
+        or mime.endswith("+xml")
+    )
+
+
+def compressible_condition(content_type):
+    """SQL counterpart of is_compressible for a content type column."""
+    mime = func.lower(content_type)
+    return or_(
+        mime.like("text/%"),
+        mime.like("%+json%"),
+        mime.like("%+xml%"),
+        *[mime.like(f"{name}%") for name in sorted(COMPRESSIBLE_TYPES)],
+    )
+
+
+class CompressingReader:
+    """
+    Wraps an async read(n) so that it returns the compressed stream.
+
+    Used in front of StorageService.upload_stream. Compression runs in a
+    worker thread one COMPRESS_READ_SIZE chunk at a time, so memory is
+    bounded by one chunk plus compressed output not yet read. raw_bytes is
+    the logical size read so far; max_size applies to it. zstd output is a
+    new frame every ZSTD_FRAME_SIZE logical bytes.
+    """
+
+    def __init__(self, read, codec: str, level: int, max_size: Optional[int] = None):
+        self._read = read
+        self._codec = codec
+        self._level = level
+        self._compress, self._flush = make_compressor(codec, level)
+        self._frame_size = ZSTD_FRAME_SIZE if codec == 'zstd' else None
+        self._frame_bytes = 0
+        self._max_size = max_size
+        self._buffer = bytearray()
+        self._eof = False
+        self.raw_bytes = 0
+
+    def _compress_chunk(self, chunk: bytes) -> bytes:
+        out = self._compress(chunk)
+        self._frame_bytes += len(chunk)
+        if self._frame_size is not None and self._frame_bytes >= self._frame_size:
+            out += self._flush()
+            self._compress, self._flush = make_compressor(self._codec, self._level)
+            self._frame_bytes = 0
+        return out
+
+    async def read(self, n: int) -> bytes:
+        while len(self._buffer) < n and not self._eof:
+            chunk = await self._read(COMPRESS_READ_SIZE)
+            if chunk:
+                self.raw_bytes += len(chunk)
+                if self._max_size is not None and self.raw_bytes > self._max_size:
+                    raise FileTooLargeError()
+                self._buffer.extend(await asyncio.to_thread(self._compress_chunk, chunk))
+                continue
+            if self._frame_bytes or not self.raw_bytes:
+                # A frame that just ended is not followed by an empty one
+                self._buffer.extend(self._flush())
+            self._eof = True
+
+        out = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return out
+
+
+async def decompress_stream(chunks, codec: str):
+    """Async iterator of decompressed bytes from an async iterator of compressed chunks."""
+    decompressor = FrameDecompressor(codec)
+    try:
+        async for chunk in chunks:
+            out = await asyncio.to_thread(decompressor.decompress, chunk)
+            if out:
+                yield out
+        if not decompressor.eof:
+            raise RuntimeError(f"Truncated {codec} stream")
+    finally:
+        await chunks.aclose()
@@ -23,9 +23,94 @@ class Settings(BaseSettings):
     S3_SECRET_KEY: str = os.getenv("S3_SECRET_KEY") or os.getenv("MINIO_SECRET_KEY", "minioadmin")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME") or os.getenv("MINIO_BUCKET", "relics")
     S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    # S3 endpoint as reached by clients, for presigned URLs (defaults to S3_ENDPOINT_URL)
+    S3_PUBLIC_ENDPOINT_URL: str = os.getenv("S3_PUBLIC_ENDPOINT_URL", "")
 
     # Upload limits
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024 * 1024  # 50 GB
+    # Process-wide budget for buffered multipart parts across all concurrent uploads
+    UPLOAD_MEMORY_BUDGET_MB: int = int(os.getenv("UPLOAD_MEMORY_BUDGET_MB", "1024"))
+    # Seconds a new upload waits for budget before it is rejected with 503 (0 = reject at once)
+    UPLOAD_MEMORY_WAIT_TIMEOUT: int = int(os.getenv("UPLOAD_MEMORY_WAIT_TIMEOUT", "10"))
+    UPLOAD_MEMORY_RETRY_AFTER: int = int(os.getenv("UPLOAD_MEMORY_RETRY_AFTER", "5"))  # Seconds
+    # Resumable uploads (/api/v1/uploads): size of the parts clients send (raised as needed to stay
+    # within S3's 10,000 parts), and idle time before an abandoned upload is aborted
+    RESUMABLE_UPLOAD_PART_SIZE_MB: int = int(os.getenv("RESUMABLE_UPLOAD_PART_SIZE_MB", "16"))
+    RESUMABLE_UPLOAD_TTL_HOURS: int = int(os.getenv("RESUMABLE_UPLOAD_TTL_HOURS", "24"))
+    UPLOAD_CLEANUP_INTERVAL: int = int(os.getenv("UPLOAD_CLEANUP_INTERVAL", "60"))  # Minutes
+    # Direct uploads: clients PUT content to presigned S3 URLs instead of through the API.
+    # Needs S3_PUBLIC_ENDPOINT_URL reachable by clients (and bucket CORS for browsers).
+    DIRECT_UPLOAD_ENABLED: bool = os.getenv("DIRECT_UPLOAD_ENABLED", "false").lower() == "true"
+    PRESIGNED_URL_EXPIRY: int = int(os.getenv("PRESIGNED_URL_EXPIRY", "3600"))  # Seconds
+
+    # Raw downloads: "proxy" streams content through the API process; "accel" hands the transfer
+    # to nginx with X-Accel-Redirect to DOWNLOAD_ACCEL_PREFIX (an internal location proxying to
+    # S3_ENDPOINT_URL); "redirect" answers 307 to a presigned URL on S3_PUBLIC_ENDPOINT_URL.
+    # Relics below DOWNLOAD_OFFLOAD_MIN_SIZE bytes are always proxied, as are redirects whose
+    # key would name another relic (content deduplicated before blobs/ keys).
+    DOWNLOAD_MODE: str = os.getenv("DOWNLOAD_MODE", "proxy").lower()
+    DOWNLOAD_OFFLOAD_MIN_SIZE: int = int(os.getenv("DOWNLOAD_OFFLOAD_MIN_SIZE", str(1024 * 1024)))
+    DOWNLOAD_ACCEL_PREFIX: str = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/_relic_s3")
+    DOWNLOAD_URL_EXPIRY: int = int(os.getenv("DOWNLOAD_URL_EXPIRY", "300"))  # Seconds
+
+    # Relic content up to this many bytes is stored in Postgres next to the relic instead of S3
+    # (0 disables; existing content is moved with POST /api/v1/admin/storage/relocate)
+    INLINE_CONTENT_MAX_SIZE: int = int(os.getenv("INLINE_CONTENT_MAX_SIZE", "0"))
+
+    # Compress text-like relic content (text/*, JSON, XML, ...) stored in S3. Clients accepting the
+    # codec get the stored bytes with Content-Encoding; others get it decompressed by the server.
+    COMPRESS_AT_REST: bool = os.getenv("COMPRESS_AT_REST", "false").lower() == "true"
+    COMPRESS_AT_REST_CODEC: str = os.getenv("COMPRESS_AT_REST_CODEC", "zstd").lower()  # "zstd" or "gzip"
+    COMPRESS_AT_REST_LEVEL: int = int(os.getenv("COMPRESS_AT_REST_LEVEL", "3"))
+
+    # Local-disk LRU cache of relic content in front of S3 (disabled when CONTENT_CACHE_DIR is empty).
+    # Objects larger than CONTENT_CACHE_MAX_OBJECT_MB are always read from S3.
+    CONTENT_CACHE_DIR: str = os.getenv("CONTENT_CACHE_DIR", "")
+    CONTENT_CACHE_MAX_MB: int = int(os.getenv("CONTENT_CACHE_MAX_MB", "1024"))
+    CONTENT_CACHE_MAX_OBJECT_MB: int = int(os.getenv("CONTENT_CACHE_MAX_OBJECT_MB", "64"))
+
+    # ZIP relics are listed from their central directory (read with ranged GETs) and members are
+    # extracted individually. Archives with more entries are refused; parsed listings are kept
+    # in memory per worker, up to ARCHIVE_INDEX_CACHE_ENTRIES entries in total.
+    ARCHIVE_MAX_ENTRIES: int = int(os.getenv("ARCHIVE_MAX_ENTRIES", "100000"))
+    ARCHIVE_INDEX_CACHE_ENTRIES: int = int(os.getenv("ARCHIVE_INDEX_CACHE_ENTRIES", "500000"))
+    # tar and tar.gz relics are queued on upload and indexed in the background (one pass, sidecar object
+    # in S3) by one worker, which checks the queue every ARCHIVE_INDEX_INTERVAL seconds; tar.gz checkpoints
+    # are taken every ARCHIVE_CHECKPOINT_SPAN_MB of uncompressed data (smaller: faster member reads,
+    # larger sidecars at ~32 KiB per checkpoint)
+    ARCHIVE_INDEX_ENABLED: bool = os.getenv("ARCHIVE_INDEX_ENABLED", "true").lower() == "true"
+    ARCHIVE_INDEX_INTERVAL: int = int(os.getenv("ARCHIVE_INDEX_INTERVAL", "60"))  # Seconds
+    ARCHIVE_CHECKPOINT_SPAN_MB: int = int(os.getenv("ARCHIVE_CHECKPOINT_SPAN_MB", "8"))
+
+    # Previews shown in listings, made after upload (and for existing relics every DERIVATIVE_INTERVAL
+    # seconds): WebP thumbnails of images, PDFs (first page, needs PyMuPDF) and Excalidraw drawings up to
+    # DERIVATIVE_MAX_SOURCE_MB, rendered by DERIVATIVE_WORKERS processes per worker; first lines of text
+    DERIVATIVES_ENABLED: bool = os.getenv("DERIVATIVES_ENABLED", "true").lower() == "true"
+    DERIVATIVE_INTERVAL: int = int(os.getenv("DERIVATIVE_INTERVAL", "60"))  # Seconds
+    DERIVATIVE_WORKERS: int = int(os.getenv("DERIVATIVE_WORKERS", "1"))
+    DERIVATIVE_THUMBNAIL_SIZE: int = int(os.getenv("DERIVATIVE_THUMBNAIL_SIZE", "320"))  # Pixels, longest side
+    DERIVATIVE_MAX_SOURCE_MB: int = int(os.getenv("DERIVATIVE_MAX_SOURCE_MB", "32"))
+    DERIVATIVE_SNIPPET_LINES: int = int(os.getenv("DERIVATIVE_SNIPPET_LINES", "10"))
+
+    # Text relics over LINE_INDEX_MIN_SIZE_MB are queued on upload and indexed in the background by one
+    # worker (checking the queue every LINE_INDEX_INTERVAL seconds) for GET /api/v1/relics/{id}/lines: the
+    # offset of every LINE_INDEX_SAMPLE_LINES-th line is kept (smaller: less read around each window, larger
+    # sidecars at 8 bytes per sample)
+    LINE_INDEX_ENABLED: bool = os.getenv("LINE_INDEX_ENABLED", "true").lower() == "true"
+    LINE_INDEX_MIN_SIZE_MB: int = int(os.getenv("LINE_INDEX_MIN_SIZE_MB", "1"))
+    LINE_INDEX_SAMPLE_LINES: int = int(os.getenv("LINE_INDEX_SAMPLE_LINES", "1000"))
+    LINE_INDEX_INTERVAL: int = int(os.getenv("LINE_INDEX_INTERVAL", "60"))  # Seconds
+
+    # GET /api/v1/relics/{id}/diff/{other_id}: text relics up to DIFF_MAX_SIZE_MB each, diffed by
+    # DIFF_WORKERS processes per worker; edit scripts of up to DIFF_CACHE_OPCODES opcodes in total are
+    # cached per worker (an opcode is one run of equal, added or removed lines)
+    DIFF_MAX_SIZE_MB: int = int(os.getenv("DIFF_MAX_SIZE_MB", "10"))
+    DIFF_WORKERS: int = int(os.getenv("DIFF_WORKERS", "1"))
+    DIFF_CACHE_OPCODES: int = int(os.getenv("DIFF_CACHE_OPCODES", "500000"))
+    # Diffs holding both contents in memory at once per worker; others wait up to DIFF_WAIT_TIMEOUT
+    # seconds for a slot, then get 503
+    DIFF_CONCURRENCY: int = int(os.getenv("DIFF_CONCURRENCY", "2"))
+    DIFF_WAIT_TIMEOUT: int = int(os.getenv("DIFF_WAIT_TIMEOUT", "10"))
 
     # Database Backup Configuration
     BACKUP_ENABLED: bool = os.getenv("BACKUP_ENABLED", "true").lower() == "true"
@@ -36,10 +121,33 @@ class Settings(BaseSettings):
     BACKUP_CLEANUP_ENABLED: bool = os.getenv("BACKUP_CLEANUP_ENABLED", "true").lower() == "true"
     BACKUP_ON_STARTUP: bool = os.getenv("BACKUP_ON_STARTUP", "true").lower() == "true"
     BACKUP_ON_SHUTDOWN: bool = os.getenv("BACKUP_ON_SHUTDOWN", "true").lower() == "true"
+    # Backup compression codec ("gzip" or "zstd"; zstd needs the zstandard package)
+    BACKUP_COMPRESSION: str = os.getenv("BACKUP_COMPRESSION", "gzip").lower()
+    # Compression level, 0 = codec default (gzip 9, zstd 3)
+    BACKUP_COMPRESSION_LEVEL: int = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "0"))
 
     # Profiling
     PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
 
+    # Access counting (write-behind): flush every N seconds or after M buffered views
+    ACCESS_COUNT_FLUSH_INTERVAL: int = int(os.getenv("ACCESS_COUNT_FLUSH_INTERVAL", "10"))  # Seconds
+    ACCESS_COUNT_FLUSH_THRESHOLD: int = int(os.getenv("ACCESS_COUNT_FLUSH_THRESHOLD", "1000"))
+
+    # Authenticated-user cache (per process): TTL in seconds for known and unknown keys
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "30"))
+    USER_CACHE_NEGATIVE_TTL: int = int(os.getenv("USER_CACHE_NEGATIVE_TTL", "5"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+    # Relic search: "fulltext" uses the pg_trgm/tsvector indexes and enables sort_by=relevance,
+    # "basic" falls back to unindexed ILIKE. Both match substrings of names, descriptions and tags;
+    # "fulltext" matches relic ids by prefix only. Without the pg_trgm extension (detected at startup)
+    # "fulltext" still works: name and description matches are unindexed and relevance uses
+    # full-text matching only
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "fulltext")
+
+    # Expired relic reaper: relics deleted per transaction (S3 objects are removed 1000 per request)
+    EXPIRED_RELIC_BATCH_SIZE: int = int(os.getenv("EXPIRED_RELIC_BATCH_SIZE", "500"))
+
     # Admin Configuration
     RELIC_CLEANUP_INTERVAL: int = int(os.getenv("RELIC_CLEANUP_INTERVAL", "60"))  # Minutes
     ADMIN_USER_IDS: str = os.getenv("ADMIN_USER_IDS", "")
@@ -0,0 +1,274 @@
+"""Local-disk read-through cache of relic content."""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Temporary files left behind by a crashed worker (and tombstones) are removed after this long
+STALE_TEMP_AGE = 3600
+# Eviction trims the cache to this fraction of its budget, so scans are rare
+EVICT_LOW_WATERMARK = 0.9
+TEMP_SUFFIX = ".part"
+TOMBSTONE_SUFFIX = ".gone"
+# Seconds a tombstone may predate the read it cancels (coarse filesystem timestamps)
+TOMBSTONE_SLACK = 2
+
+
+class ContentCache:
+    """
+    Byte-bounded LRU cache of S3 objects in a local directory.
+
+    Keys are S3 keys (immutable: a key is never rewritten with different
+    content). Files are named after the SHA-256 of the key; the file mtime
+    is the recency stamp, bumped on every hit. The directory is the only
+    shared state, so gunicorn workers sharing it see each other's entries
+    and invalidations; each worker only estimates the total size and
+    re-measures the directory when it evicts.
+
+    An entry is written while its first full read streams to the client and
+    only becomes visible once the whole object has been received.
+    invalidate() leaves a tombstone next to the entry, so that a read
+    started before it (in any worker) does not publish the deleted content
+    afterwards.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_object_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.evictions = 0
+        # None until the directory is first measured
+        self._approx_bytes: Optional[int] = None
+        self._evicting = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def lookup(self, key: str) -> Optional[Tuple[str, os.stat_result]]:
+        """Path and stat of the cached copy of key, marking it recently used; None on a miss."""
+        if not self.enabled:
+            return None
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError as e:
+            logger.warning(f"Content cache lookup failed for {key}: {e}")
+            return None
+        self.hits += 1
+        return path, stat_result
+
+    def admits(self, size: Optional[int]) -> bool:
+        """Whether an object of this size should be cached on read."""
+        return self.enabled and size is not None and 0 < size <= self.max_object_bytes
+
+    async def read(
+        self, path: str, chunk_size: int, byte_range: Optional[Tuple[int, int]] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield a cached file (or the inclusive byte_range of it) in chunks."""
+        with open(path, 'rb') as f:
+            remaining = None
+            if byte_range is not None:
+                f.seek(byte_range[0])
+                remaining = byte_range[1] - byte_range[0] + 1
+            while remaining is None or remaining > 0:
+                n = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, n)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def fill(
+        self, key: str, chunks: AsyncIterator[bytes], size: int, started: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Pass chunks through while writing them to the cache.
+
+        The entry is published (atomic rename) only if exactly size bytes
+        went through and key was not invalidated since started (the time
+        the read from S3 began; defaults to now); an abandoned or failed
+        read leaves nothing behind. Cache write errors are logged and never
+        interrupt the download.
+        """
+        started = time.time() if started is None else started
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}-{secrets.token_hex(4)}{TEMP_SUFFIX}"
+        try:
+            f = open(temp_path, 'wb')
+        except OSError as e:
+            logger.warning(f"Content cache cannot write {temp_path}: {e}")
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        written = 0
+        try:
+            async for chunk in chunks:
+                if f is not None:
+                    try:
+                        await asyncio.to_thread(f.write, chunk)
+                        written += len(chunk)
+                    except OSError as e:
+                        logger.warning(f"Content cache write failed for {key}: {e}")
+                        f.close()
+                        f = None
+                yield chunk
+            if f is not None:
+                f.close()
+                f = None
+                if written == size and not self._invalidated(path, started):
+                    os.replace(temp_path, path)
+                    # invalidate() writes the tombstone before unlinking: if it ran after the
+                    # check above, either it removes the entry or the tombstone is seen here
+                    if self._invalidated(path, started):
+                        self._unlink(path)
+                    else:
+                        self.fills += 1
+                        await self._added(size)
+        finally:
+            if f is not None:
+                f.close()
+            # Closing early (client went away) must also release the S3 body
+            await chunks.aclose()
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Content cache cannot remove {temp_path}: {e}")
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Drop the cached copies of keys (deleted or expired objects), cancelling fills in progress."""
+        if not self.enabled:
+            return
+        for key in keys:
+            path = self.path_for(key)
+            try:
+                with open(path + TOMBSTONE_SUFFIX, 'wb'):
+                    pass
+                os.utime(path + TOMBSTONE_SUFFIX)
+            except OSError as e:
+                logger.warning(f"Content cache cannot mark {key} deleted: {e}")
+            try:
+                size = os.stat(path).st_size
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Content cache cannot drop {key}: {e}")
+                continue
+            if self._approx_bytes is not None:
+                self._approx_bytes = max(0, self._approx_bytes - size)
+
+    @staticmethod
+    def _invalidated(path: str, started: float) -> bool:
+        """Whether the entry at path was invalidated after a read that started at started."""
+        try:
+            return os.stat(path + TOMBSTONE_SUFFIX).st_mtime >= started - TOMBSTONE_SLACK
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return True
+
+    def snapshot(self) -> dict:
+        """Counters for this worker process, plus the last measured cache size."""
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "approx_bytes": self._approx_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fills": self.fills,
+            "evictions": self.evictions,
+        }
+
+    async def _added(self, size: int) -> None:
+        if self._approx_bytes is None:
+            self._approx_bytes = await asyncio.to_thread(self._evict)
+        else:
+            self._approx_bytes += size
+        if self._approx_bytes > self.max_bytes and not self._evicting:
+            self._evicting = True
+            try:
+                self._approx_bytes = await asyncio.to_thread(self._evict)
+            finally:
+                self._evicting = False
+
+    def _evict(self) -> int:
+        """Measure the directory and drop least recently used entries down to the low watermark."""
+        entries = []
+        total = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith((TEMP_SUFFIX, TOMBSTONE_SUFFIX)):
+                    if now - stat_result.st_mtime > STALE_TEMP_AGE:
+                        self._unlink(entry.path)
+                    continue
+                entries.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+                total += stat_result.st_size
+
+        if total <= self.max_bytes:
+            return total
+        target = int(self.max_bytes * EVICT_LOW_WATERMARK)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._unlink(path):
+                total -= size
+                self.evictions += 1
+        return total
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Content cache cannot remove {path}: {e}")
+            return False
+
+
+def _create_cache() -> ContentCache:
+    directory = settings.CONTENT_CACHE_DIR
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Content cache disabled, cannot create {directory}: {e}")
+            directory = ""
+    return ContentCache(
+        directory,
+        settings.CONTENT_CACHE_MAX_MB * 1024 * 1024,
+        settings.CONTENT_CACHE_MAX_OBJECT_MB * 1024 * 1024,
+    )
+
+
+# Global content cache (disabled unless CONTENT_CACHE_DIR is set)
+content_cache = _create_cache()
@@ -0,0 +1,99 @@
+"""Write-behind aggregation of relic access counts."""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import Integer, String, column, func, update, values
+
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models import Relic
+
+logger = logging.getLogger(__name__)
+
+
+class AccessCounter:
+    """
+    Coalesces relic view increments in memory and writes them in bulk.
+
+    A read used to be an UPDATE + commit of its own, which made popular relics
+    row-lock hotspots. Increments are now summed per relic and written with a
+    single UPDATE ... FROM (VALUES ...) by the scheduler, as soon as the pending
+    total reaches ``flush_threshold``, and on shutdown.
+    """
+
+    def __init__(self, flush_threshold: int):
+        self.flush_threshold = flush_threshold
+        self._pending: Dict[str, int] = {}
+        self._pending_total = 0
+        # Deltas taken by a flush that has not committed yet; still reported by pending()
+        self._in_flight: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def increment(self, relic_id: str) -> None:
+        """Record one view of a relic; triggers a background flush at the threshold."""
+        self._pending[relic_id] = self._pending.get(relic_id, 0) + 1
+        self._pending_total += 1
+        if self._pending_total >= self.flush_threshold and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def pending(self, relic_id: str) -> int:
+        """Views of a relic recorded in memory but not yet written to the database."""
+        return self._pending.get(relic_id, 0) + self._in_flight.get(relic_id, 0)
+
+    def live_count(self, relic: Relic) -> int:
+        """A relic's stored access_count plus its not-yet-flushed views."""
+        return (relic.access_count or 0) + self.pending(relic.id)
+
+    async def flush(self) -> int:
+        """
+        Write all pending increments in one bulk UPDATE.
+
+        On failure before the commit the deltas are merged back so the next
+        flush retries them.
+
+        Returns:
+            Number of relics updated
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending, self._pending_total = {}, 0
+            self._in_flight = batch
+
+            deltas = values(
+                column("id", String), column("delta", Integer), name="deltas"
+            ).data(list(batch.items()))
+            stmt = (
+                update(Relic)
+                .where(Relic.id == deltas.c.id)
+                .values(access_count=func.coalesce(Relic.access_count, 0) + deltas.c.delta)
+            )
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(stmt)
+                    await db.commit()
+                    # access_count includes the batch from here on, even before the session closes
+                    self._in_flight = {}
+            except Exception as e:
+                if self._in_flight is batch:
+                    self._in_flight = {}
+                    for relic_id, delta in batch.items():
+                        self._pending[relic_id] = self._pending.get(relic_id, 0) + delta
+                        self._pending_total += delta
+                logger.error(f"Failed to flush access counts for {len(batch)} relic(s): {e}")
+                return 0
+
+            logger.debug(f"Flushed {sum(batch.values())} view(s) across {len(batch)} relic(s)")
+            return len(batch)
+
+
+# Global per-process counter (each worker flushes its own increments)
+access_counter = AccessCounter(settings.ACCESS_COUNT_FLUSH_THRESHOLD)
+
+
+async def flush_access_counts() -> None:
+    """Scheduler entry point: flush buffered access counts."""
+    await access_counter.flush()
@@ -1,24 +1,49 @@
 """Shared dependencies and helper functions for route modules."""
 from fastapi import Request, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 from typing import Optional, List
 
 from backend.config import settings
 from backend.models import Relic, User, Tag, Space, space_relics
-from backend.utils import generate_relic_id
+from backend.derivatives import derivative_kind
+from backend.storage import UploadBudgetExceeded
+from backend.tasks import enqueue_background_work, request_derivation
+from backend.utils import generate_relic_id, parse_expiry_string, is_expired, hash_password
+from backend.user_cache import CachedUser, user_cache
+
+
+async def _lookup_user(db: AsyncSession, user_key: str) -> Optional[CachedUser]:
+    """Resolve a user key through the in-process cache, querying only on a miss."""
+    hit, cached = user_cache.get(user_key)
+    if hit:
+        return cached
+
+    result = await db.execute(
+        select(User.id, User.public_id, User.name, User.is_admin).where(User.id == user_key)
+    )
+    row = result.first()
+    cached = CachedUser(row.id, row.public_id, row.name, bool(row.is_admin)) if row else None
+    user_cache.put(user_key, cached)
+    return cached
 
 
 async def get_current_user(request: Request, db: AsyncSession) -> Optional[User]:
-    """Extract and validate the user key from request headers."""
+    """
+    Extract and validate the user key from request headers.
+
+    Served from the user cache, so the returned User is transient (not bound
+    to ``db``): persist changes with explicit UPDATEs and invalidate the cache.
+    """
     x_user_key = request.headers.get("X-User-Key")
     if not x_user_key:
         return None
 
-    result = await db.execute(select(User).where(User.id == x_user_key))
-    return result.scalar_one_or_none()
+    cached = await _lookup_user(db, x_user_key)
+    return cached.to_user() if cached else None
 
 
 async def get_or_create_user(request: Request, db: AsyncSession) -> Optional[User]:
@@ -34,6 +59,7 @@ async def get_or_create_user(request: Request, db: AsyncSession) -> Optional[Use
         .on_conflict_do_nothing()
     )
     await db.commit()
+    user_cache.invalidate(x_user_key)
 
     result = await db.execute(select(User).where(User.id == x_user_key))
     return result.scalar_one()
@@ -57,14 +83,15 @@ async def is_admin_user_id(db: AsyncSession, user_id: Optional[str]) -> bool:
     Check admin privileges given only a user ID string.
 
     Env super-admins are resolved without a query; otherwise the User.is_admin
-    flag is looked up. Used by call sites that hold a user_id but not a User.
+    flag comes from the user cache. Used by call sites that hold a user_id but
+    not a User.
     """
     if not user_id:
         return False
     if user_id in settings.get_admin_user_ids():
         return True
-    result = await db.execute(select(User.is_admin).where(User.id == user_id))
-    return bool(result.scalar_one_or_none())
+    cached = await _lookup_user(db, user_id)
+    return bool(cached and cached.is_admin)
 
 
 async def get_admin_user(request: Request, db: AsyncSession) -> User:
@@ -123,6 +150,46 @@ def check_ownership_or_admin(
     return relic.user_id == user.id
 
 
+async def get_readable_relic(
+    db: AsyncSession, request: Request, relic_id: str, password: Optional[str], *options
+) -> Relic:
+    """
+    Load a relic for reading its content, enforcing expiry, password and restricted access.
+
+    Extra loader options (e.g. with_inline_content()) are applied to the query.
+
+    Raises:
+        HTTPException: 404 missing, 410 expired, 403 wrong password or no access
+    """
+    result = await db.execute(
+        select(Relic).options(selectinload(Relic.access_list), *options).where(Relic.id == relic_id)
+    )
+    relic = result.scalar_one_or_none()
+
+    if not relic:
+        raise HTTPException(status_code=404, detail="Relic not found")
+
+    if is_expired(relic.expires_at):
+        raise HTTPException(status_code=410, detail="Relic has expired")
+
+    # Check password protection
+    if relic.password_hash:
+        if not password:
+            raise HTTPException(status_code=403, detail="This relic requires a password")
+        if hash_password(password) != relic.password_hash:
+            raise HTTPException(status_code=403, detail="Invalid password")
+
+    # Enforce restricted access
+    if relic.access_level == "restricted":
+        user = await get_current_user(request, db)
+        if not check_ownership_or_admin(relic, user, require_auth=False):
+            allowed_ids = {a.user_id for a in relic.access_list}
+            if not user or user.id not in allowed_ids:
+                raise HTTPException(status_code=403, detail="Access restricted")
+
+    return relic
+
+
 async def process_tags(db: AsyncSession, tag_names: List[str]) -> List[Tag]:
     """Process a list of tag names and return Tag objects (creating new ones if needed)."""
     if not tag_names:
@@ -162,6 +229,87 @@ async def generate_unique_relic_id(db: AsyncSession, max_retries: int = 5) -> st
     )
 
 
+async def create_relic_record(
+    db: AsyncSession,
+    user: Optional[User],
+    relic_id: str,
+    s3_key: str,
+    size_bytes: int,
+    *,
+    name: Optional[str],
+    content_type: str,
+    language_hint: Optional[str],
+    access_level: str,
+    expires_in: Optional[str],
+    tags: Optional[List[str]],
+    space_id: Optional[str],
+    etag: Optional[str] = None,
+    blob_sha256: Optional[str] = None,
+) -> dict:
+    """Create the relic DB record after content is already in storage. Commits with its background work queued."""
+    expires_at = parse_expiry_string(expires_in)
+    tag_objects = await process_tags(db, tags) if tags else []
+
+    relic = Relic(
+        id=relic_id,
+        user_id=user.id if user else None,
+        name=name,
+        content_type=content_type,
+        language_hint=language_hint,
+        size_bytes=size_bytes,
+        s3_key=s3_key,
+        etag=etag,
+        blob_sha256=blob_sha256,
+        access_level=access_level,
+        created_at=datetime.utcnow(),
+        expires_at=expires_at
+    )
+
+    if tag_objects:
+        relic.tags = tag_objects
+
+    # Update user relic count atomically (user comes from the cache and is not session-bound)
+    if user:
+        await db.execute(
+            update(User).where(User.id == user.id).values(relic_count=User.relic_count + 1)
+        )
+
+    db.add(relic)
+
+    # Add to space if space_id is provided
+    if space_id:
+        space_result = await db.execute(select(Space).where(Space.id == space_id))
+        space = space_result.scalar_one_or_none()
+        if space and user and await check_space_access(space, user.id, db, "editor"):
+            await db.flush()
+            await db.execute(pg_insert(space_relics).values(space_id=space.id, relic_id=relic.id).on_conflict_do_nothing())
+
+    # Preview, archive index and line index, built in the background
+    await enqueue_background_work(db, relic)
+    await db.commit()
+    if derivative_kind(relic.name, relic.content_type):
+        request_derivation()
+
+    return {
+        "id": relic.id,
+        "name": relic.name,
+        "content_type": relic.content_type,
+        "language_hint": relic.language_hint,
+        "url": f"/{relic.id}",
+        "created_at": relic.created_at,
+        "size_bytes": relic.size_bytes
+    }
+
+
+def upload_busy_error(e: UploadBudgetExceeded) -> HTTPException:
+    """503 for an upload refused because the upload memory budget stayed exhausted."""
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, retry later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 async def get_space_relic_count(space_id: str, db: AsyncSession) -> int:
     """Get the count of relics in a space efficiently using COUNT query."""
     result = await db.execute(
@@ -0,0 +1,197 @@
+"""
+Previews derived from relic content after upload.
+
+The derivatives job (backend.tasks.derive_previews) gives each relic one
+relic_derivative row: a WebP thumbnail at derived/{relic_id}/thumbnail.webp
+for images, PDFs (first page) and Excalidraw drawings, or the first
+DERIVATIVE_SNIPPET_LINES lines of text content. Rendering is CPU-bound and
+runs in a pool of DERIVATIVE_WORKERS processes per app worker, off the
+event loop; a snippet only needs the first few KiB and is cut in-process.
+
+Listings carry the result as PreviewResponse fields (relic_preview), loaded
+with the page by one extra query (with_derivative).
+"""
+import asyncio
+import codecs
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import selectinload
+
+from backend.blobs import stream_content
+from backend.compression import compressible_condition, is_compressible
+from backend.config import settings
+from backend.models import Relic
+from backend.storage import storage_service
+from backend import thumbnails
+from backend.thumbnails import THUMBNAIL_CONTENT_TYPE, ThumbnailError
+
+RASTER_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp", "image/tiff")
+PDF_TYPE = "application/pdf"
+EXCALIDRAW_TYPE = "application/vnd.excalidraw+json"
+EXCALIDRAW_SUFFIXES = (".excalidraw", ".excalidraw.json")
+# Text snippets are cut from this much of the start of the content
+SNIPPET_READ_SIZE = 4096
+# Larger images are not decoded (about 256 MiB of RGBA)
+MAX_IMAGE_PIXELS = 64 * 1024 * 1024
+# A render process is replaced after this many thumbnails, giving back memory decoders held on to
+RENDERS_PER_PROCESS = 100
+
+RENDERERS = {
+    "image": thumbnails.render_image,
+    "pdf": thumbnails.render_pdf,
+    "excalidraw": thumbnails.render_excalidraw,
+}
+
+
+class DerivativeError(Exception):
+    """No preview can be made for this content."""
+
+
+def derivative_kind(name: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Preview kind for a relic ("image", "pdf", "excalidraw", "text"), or None."""
+    mime = (content_type or "").split(";", 1)[0].strip().lower()
+    if mime == EXCALIDRAW_TYPE or (name or "").lower().endswith(EXCALIDRAW_SUFFIXES):
+        return "excalidraw"
+    if mime == PDF_TYPE:
+        return "pdf"
+    if mime in RASTER_TYPES:
+        return "image"
+    if is_compressible(mime):
+        return "text"
+    return None
+
+
+def derivable():
+    """SQL condition for relics derivative_kind may give a kind (a superset, checked again per relic)."""
+    content_type = func.lower(Relic.content_type)
+    return or_(
+        *[func.lower(Relic.name).like(f"%{suffix}") for suffix in EXCALIDRAW_SUFFIXES],
+        *[content_type.like(f"{mime}%") for mime in (PDF_TYPE, *RASTER_TYPES)],
+        compressible_condition(Relic.content_type),
+    )
+
+
+def with_derivative():
+    """Loader option for relic_preview (one query for the whole page)."""
+    return selectinload(Relic.derivative)
+
+
+def thumbnail_key(relic_id: str) -> str:
+    return f"derived/{relic_id}/thumbnail.webp"
+
+
+def relic_preview(relic: Relic) -> Optional[dict]:
+    """
+    PreviewResponse fields for a relic loaded with with_derivative().
+
+    None until the preview exists, and always for password-protected and
+    restricted relics: listings must not show their content.
+    """
+    derivative = relic.derivative
+    if derivative is None or derivative.status != "done":
+        return None
+    if relic.password_hash or relic.access_level == "restricted":
+        return None
+    if derivative.thumbnail_key:
+        return {
+            "type": derivative.kind,
+            "metadata": {"width": derivative.width, "height": derivative.height},
+            "preview": {"thumbnail_url": f"/api/v1/relics/{relic.id}/thumbnail"},
+        }
+    return {
+        "type": derivative.kind,
+        "metadata": {"truncated": bool(derivative.truncated)},
+        "preview": {"snippet": derivative.snippet},
+    }
+
+
+def text_snippet(head: bytes, max_lines: int, complete: bool) -> Tuple[str, bool]:
+    """
+    First max_lines lines of text content, from its first bytes.
+
+    complete tells whether head is the whole content; if not, a cut-off
+    last line is dropped (unless it is the only one). Returns (snippet,
+    truncated).
+    """
+    if b"\x00" in head:
+        raise DerivativeError("Content is not text")
+    text = codecs.getincrementaldecoder("utf-8-sig")(errors="replace").decode(head, final=complete)
+    lines = text.splitlines()
+    if not complete and len(lines) > 1 and not text.endswith(("\n", "\r")):
+        lines.pop()
+    truncated = not complete or len(lines) > max_lines
+    return "\n".join(lines[:max_lines]), truncated
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _render_pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process running an event loop (and S3/DB pools) is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, settings.DERIVATIVE_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=RENDERS_PER_PROCESS,
+        )
+    return _executor
+
+
+def shutdown_render_pool() -> None:
+    """Stop the render processes (at app shutdown); renders in progress are abandoned."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _read_content(relic: Relic, size: Optional[int] = None) -> bytes:
+    byte_range = (0, min(size, relic.size_bytes) - 1) if size is not None and relic.size_bytes else None
+    chunks, _ = await stream_content(relic, byte_range=byte_range)
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def derive(relic: Relic) -> dict:
+    """
+    Make a relic's preview; returns the relic_derivative column values.
+
+    The relic must be loaded with with_inline_content(). A thumbnail is
+    uploaded before returning. Raises DerivativeError when no preview can
+    be made.
+    """
+    kind = derivative_kind(relic.name, relic.content_type)
+    if kind is None:
+        raise DerivativeError("No preview for this content type")
+    if not relic.size_bytes:
+        raise DerivativeError("Content is empty")
+
+    if kind == "text":
+        head = await _read_content(relic, SNIPPET_READ_SIZE)
+        snippet, truncated = text_snippet(
+            head, settings.DERIVATIVE_SNIPPET_LINES, complete=len(head) >= relic.size_bytes
+        )
+        return {"status": "done", "kind": kind, "snippet": snippet, "truncated": truncated}
+
+    max_size = settings.DERIVATIVE_MAX_SOURCE_MB * 1024 * 1024
+    if relic.size_bytes > max_size:
+        raise DerivativeError(f"Content larger than {settings.DERIVATIVE_MAX_SOURCE_MB} MB")
+    data = await _read_content(relic)
+    try:
+        image, width, height = await asyncio.get_running_loop().run_in_executor(
+            _render_pool(), RENDERERS[kind], data, settings.DERIVATIVE_THUMBNAIL_SIZE, MAX_IMAGE_PIXELS
+        )
+    except ThumbnailError as e:
+        raise DerivativeError(str(e))
+    except BrokenProcessPool:
+        # The content crashed the decoder; later renders get a fresh pool
+        shutdown_render_pool()
+        raise DerivativeError("Renderer process crashed")
+
+    key = thumbnail_key(relic.id)
+    await storage_service.upload(key, image, content_type=THUMBNAIL_CONTENT_TYPE)
+    return {"status": "done", "kind": kind, "thumbnail_key": key, "width": width, "height": height}
@@ -0,0 +1,224 @@
+"""
+Line diffs between text relics, for comparing a fork with its original.
+
+Both contents (up to DIFF_MAX_SIZE_MB each) are read from storage and
+diffed in a pool of DIFF_WORKERS processes per app worker
+(backend.line_diff), off the event loop; hunks are then formatted and sent
+one at a time. At most DIFF_CONCURRENCY diffs per worker hold contents in
+memory at once (diff_slot). Relic content never changes, so the edit script of a pair
+is kept in diff_cache and a summary of a cached pair reads no content.
+Concurrent requests for the same pair share one computation.
+"""
+import asyncio
+import multiprocessing
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from backend.blobs import stream_content
+from backend.compression import is_compressible
+from backend.config import settings
+from backend.line_diff import DiffScript, diff_contents, format_hunk, group_hunks, split_lines
+from backend.models import Relic
+
+# Work bound for one diff (lines scanned for anchors, see line_diff.diff_lines); a few seconds
+MAX_DIFF_COST = 20_000_000
+# A diff process is replaced after this many diffs, giving back memory
+DIFFS_PER_PROCESS = 100
+
+
+class DiffError(Exception):
+    """The relics cannot be compared (not text, or too large)."""
+
+
+class DiffBusy(Exception):
+    """No diff slot came free within DIFF_WAIT_TIMEOUT."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many diffs in progress")
+        self.retry_after = retry_after
+
+
+class DiffCache:
+    """LRU cache of edit scripts by relic pair, bounded by the total number of opcodes held."""
+
+    def __init__(self, max_opcodes: int):
+        self.max_opcodes = max_opcodes
+        self._scripts: "OrderedDict[Tuple[str, str], DiffScript]" = OrderedDict()
+        self._opcodes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[DiffScript]:
+        script = self._scripts.get(key)
+        if script is None:
+            self.misses += 1
+            return None
+        self._scripts.move_to_end(key)
+        self.hits += 1
+        return script
+
+    def put(self, key: Tuple[str, str], script: DiffScript) -> None:
+        size = len(script.opcodes) // 5
+        if size > self.max_opcodes or key in self._scripts:
+            return
+        self._scripts[key] = script
+        self._opcodes += size
+        while self._opcodes > self.max_opcodes:
+            _, evicted = self._scripts.popitem(last=False)
+            self._opcodes -= len(evicted.opcodes) // 5
+
+    def snapshot(self) -> dict:
+        return {
+            "pairs": len(self._scripts),
+            "opcodes": self._opcodes,
+            "max_opcodes": self.max_opcodes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global edit script cache (per worker process)
+diff_cache = DiffCache(settings.DIFF_CACHE_OPCODES)
+
+_computing: Dict[Tuple[str, str], "asyncio.Future[DiffScript]"] = {}
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _diff_pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process running an event loop (and S3/DB pools) is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, settings.DIFF_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=DIFFS_PER_PROCESS,
+        )
+    return _executor
+
+
+# Diffs holding contents in memory in this worker
+_diff_slots = asyncio.Semaphore(max(1, settings.DIFF_CONCURRENCY))
+
+
+class DiffSlot:
+    """
+    One of DIFF_CONCURRENCY diff slots, from diff_slot().
+
+    release() gives it back (once; later calls do nothing). A slot that is
+    never released explicitly, e.g. by a response body that was never
+    iterated, comes back when the object is garbage collected.
+    """
+
+    def __init__(self):
+        self.release = weakref.finalize(self, _diff_slots.release)
+        self.release.atexit = False
+
+
+async def diff_slot() -> DiffSlot:
+    """Wait up to DIFF_WAIT_TIMEOUT for a diff slot; raises DiffBusy."""
+    try:
+        await asyncio.wait_for(_diff_slots.acquire(), settings.DIFF_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise DiffBusy(settings.DIFF_WAIT_TIMEOUT)
+    return DiffSlot()
+
+
+def shutdown_diff_pool() -> None:
+    """Stop the diff processes (at app shutdown); diffs in progress are abandoned."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def read_pair(relic: Relic, other: Relic) -> Tuple[bytes, bytes]:
+    """
+    Both relics' content, for relic_diff and unified_diff.
+
+    The relics must be loaded with with_inline_content(). Raises DiffError
+    for content that is not text or over DIFF_MAX_SIZE_MB.
+    """
+    max_size = settings.DIFF_MAX_SIZE_MB * 1024 * 1024
+    for item in (relic, other):
+        if not is_compressible(item.content_type):
+            raise DiffError("Only text relics can be compared")
+        if (item.size_bytes or 0) > max_size:
+            raise DiffError(f"Relics larger than {settings.DIFF_MAX_SIZE_MB} MB cannot be compared")
+
+    contents = []
+    for item in (relic, other):
+        chunks, _ = await stream_content(item)
+        data = b"".join([chunk async for chunk in chunks])
+        if b"\x00" in data:
+            raise DiffError("Only text relics can be compared")
+        contents.append(data)
+    return contents[0], contents[1]
+
+
+async def _compute(relic: Relic, other: Relic, contents: Optional[Tuple[bytes, bytes]]) -> DiffScript:
+    # A caller passing contents already holds a slot for them
+    slot = await diff_slot() if contents is None else None
+    try:
+        old, new = contents or await read_pair(relic, other)
+        script = await asyncio.get_running_loop().run_in_executor(
+            _diff_pool(), diff_contents, old, new, MAX_DIFF_COST
+        )
+    except BrokenProcessPool:
+        # Out of memory, most likely; later diffs get a fresh pool
+        shutdown_diff_pool()
+        raise DiffError("Diff process crashed")
+    finally:
+        if slot is not None:
+            slot.release()
+    diff_cache.put((relic.id, other.id), script)
+    return script
+
+
+async def relic_diff(relic: Relic, other: Relic, contents: Optional[Tuple[bytes, bytes]] = None) -> DiffScript:
+    """
+    Edit script from relic's lines to other's, cached per pair.
+
+    contents is their read_pair() when the caller has it already (holding
+    a diff_slot); otherwise it is read on a cache miss, in a slot of its
+    own. Raises DiffError, or DiffBusy when no slot comes free.
+    """
+    key = (relic.id, other.id)
+    script = diff_cache.get(key)
+    if script is not None:
+        return script
+    future = _computing.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_compute(relic, other, contents))
+        _computing[key] = future
+        future.add_done_callback(lambda _: _computing.pop(key, None))
+    # A client going away does not cancel the diff for others waiting on it
+    return await asyncio.shield(future)
+
+
+def _header_name(relic: Relic) -> str:
+    return " ".join((relic.name or relic.id).split())
+
+
+async def unified_diff(
+    relic: Relic, other: Relic, contents: Tuple[bytes, bytes], script: DiffScript, context: int,
+    slot: Optional[DiffSlot] = None,
+) -> AsyncIterator[bytes]:
+    """
+    The diff in unified format, one hunk per chunk (nothing for identical content).
+
+    slot, the diff_slot the contents were read in, is released when the
+    last hunk has been sent.
+    """
+    try:
+        if not (script.additions or script.deletions):
+            return
+        old, new = await asyncio.to_thread(lambda: (split_lines(contents[0]), split_lines(contents[1])))
+        yield f"--- a/{_header_name(relic)}\n+++ b/{_header_name(other)}\n".encode()
+        for group in group_hunks(script, context):
+            yield format_hunk(group, old, new)
+    finally:
+        if slot is not None:
+            slot.release()
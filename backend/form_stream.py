@@ -0,0 +1,254 @@
+"""Incremental multipart/form-data parsing for upload endpoints.
+
+FastAPI's File()/Form() parameters make Starlette parse the whole body before
+the handler runs, spooling file parts to a temporary file on local disk. The
+upload endpoints instead parse the request stream themselves: form fields are
+collected as they arrive and the file part is exposed as a read(n) callable
+that pulls from the request only as fast as the consumer (upload_stream)
+reads, so memory and disk use match the raw-body upload path.
+"""
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from starlette.requests import Request
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Same limits Starlette applies to non-file form parts
+MAX_FORM_FIELDS = 1000
+MAX_FIELD_SIZE = 1024 * 1024
+
+
+class FormStreamError(ValueError):
+    """Raised when the request body is not a well-formed form."""
+
+
+class FilePart:
+    """The streamed file part of a form. Read it with read(n) until b''."""
+
+    def __init__(self, form: "StreamingForm", field_name: str, filename: str, content_type: Optional[str]):
+        self._form = form
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+
+    async def read(self, n: int) -> bytes:
+        return await self._form._read_file(n)
+
+
+class StreamingForm:
+    """
+    Form body reader that does not buffer file content.
+
+    Usage::
+
+        form = StreamingForm(request)
+        file = await form.next_file("file")   # fields before the file are available
+        ... stream file.read into storage ...
+        await form.finish()                    # fields after the file are available
+        name = form.get("name")
+
+    Only the first part named file_field that carries a filename is streamed;
+    other file parts are discarded. Non-multipart bodies are accepted as
+    application/x-www-form-urlencoded (fields only) or ignored when empty.
+    """
+
+    def __init__(self, request: Request):
+        self._request = request
+        self._body = request.stream().__aiter__()
+        self._fields: Dict[str, List[str]] = {}
+        self._field_count = 0
+        self._eof = False
+
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        self._multipart = content_type == b"multipart/form-data"
+        self._urlencoded = content_type == b"application/x-www-form-urlencoded"
+        self._parser = None
+        if self._multipart:
+            boundary = params.get(b"boundary")
+            if not boundary:
+                raise FormStreamError("Missing multipart boundary")
+            self._parser = multipart.MultipartParser(boundary, {
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            })
+
+        # Per-part parser state
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part_name: Optional[str] = None
+        self._part_kind: Optional[str] = None  # "field", "file" (streamed) or "skip"
+        self._field_data = bytearray()
+
+        # Streamed file state
+        self._file_field: Optional[str] = None
+        self._file: Optional[FilePart] = None
+        self._file_buffer = bytearray()
+        self._file_done = False
+
+    # ----- public API -----
+
+    def get(self, name: str) -> Optional[str]:
+        """Last value of a form field, or None."""
+        values = self._fields.get(name)
+        return values[-1] if values else None
+
+    def getlist(self, name: str) -> List[str]:
+        """All values of a repeated form field."""
+        return list(self._fields.get(name, []))
+
+    async def next_file(self, field_name: str) -> Optional[FilePart]:
+        """
+        Parse up to the start of the file part named field_name.
+
+        Fields that precede it are available on return. Returns None (with
+        the whole body consumed) when the form has no such file part.
+        """
+        if not self._multipart:
+            await self.finish()
+            return None
+        self._file_field = field_name
+        while self._file is None and not self._eof:
+            await self._feed()
+        return self._file
+
+    async def finish(self) -> None:
+        """Consume the rest of the body, discarding unread file data and collecting fields."""
+        if self._urlencoded:
+            await self._read_urlencoded()
+            return
+        self._file_done = True
+        self._file_buffer.clear()
+        while not self._eof:
+            await self._feed()
+
+    # ----- body feeding -----
+
+    async def _feed(self) -> None:
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            chunk = b""
+        if not chunk:
+            self._eof = True
+            if self._parser is not None:
+                self._parser.finalize()
+                if self._file is not None and not self._file_done:
+                    raise FormStreamError("Request body ended inside the file part")
+            return
+        if self._parser is None:
+            return
+        try:
+            self._parser.write(chunk)
+        except multipart.exceptions.MultipartParseError as e:
+            raise FormStreamError(f"Malformed multipart body: {e}")
+
+    async def _read_file(self, n: int) -> bytes:
+        while len(self._file_buffer) < n and not self._file_done:
+            if self._eof:
+                raise FormStreamError("Request body ended inside the file part")
+            await self._feed()
+        out = bytes(self._file_buffer[:n])
+        del self._file_buffer[:n]
+        return out
+
+    async def _read_urlencoded(self) -> None:
+        body = bytearray()
+        while not self._eof:
+            try:
+                chunk = await self._body.__anext__()
+            except StopAsyncIteration:
+                break
+            body.extend(chunk)
+            if len(body) > MAX_FIELD_SIZE:
+                raise FormStreamError("Form body too large")
+        self._eof = True
+        for name, value in parse_qsl(body.decode("latin-1"), keep_blank_values=True):
+            self._add_field(name, value)
+
+    def _add_field(self, name: str, value: str) -> None:
+        self._field_count += 1
+        if self._field_count > MAX_FORM_FIELDS:
+            raise FormStreamError("Too many form fields")
+        self._fields.setdefault(name, []).append(value)
+
+    # ----- python-multipart callbacks -----
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._part_name = None
+        self._part_kind = None
+        self._field_data = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        name = options.get(b"name")
+        if name is None:
+            raise FormStreamError("Form part without a name")
+        self._part_name = name.decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part_kind = "field"
+        elif self._file is None and self._part_name == self._file_field:
+            self._part_kind = "file"
+            content_type = self._headers.get(b"content-type")
+            self._file = FilePart(
+                self,
+                self._part_name,
+                filename.decode("utf-8", errors="replace"),
+                content_type.decode("latin-1") if content_type else None,
+            )
+        else:
+            self._part_kind = "skip"
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part_kind == "file":
+            if not self._file_done:
+                self._file_buffer.extend(data[start:end])
+        elif self._part_kind == "field":
+            self._field_data.extend(data[start:end])
+            if len(self._field_data) > MAX_FIELD_SIZE:
+                raise FormStreamError(f"Form field '{self._part_name}' too large")
+
+    def _on_part_end(self) -> None:
+        if self._part_kind == "file":
+            self._file_done = True
+        elif self._part_kind == "field":
+            self._add_field(self._part_name, self._field_data.decode("utf-8", errors="replace"))
+
+
+def multipart_openapi(file_field: str, fields: List[str], required: bool = False) -> dict:
+    """openapi_extra describing a multipart body parsed by StreamingForm (FastAPI cannot infer it)."""
+    properties = {name: {"type": "string"} for name in fields}
+    properties[file_field] = {"type": "string", "format": "binary"}
+    if "tags" in properties:
+        properties["tags"] = {"type": "array", "items": {"type": "string"}}
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = [file_field]
+    return {"requestBody": {"required": required, "content": {"multipart/form-data": {"schema": schema}}}}
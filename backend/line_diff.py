@@ -0,0 +1,215 @@
+"""
+Line diff of two texts, for comparing relics.
+
+Histogram diff, as in git diff --histogram: within a region that differs,
+the run of matching lines containing the rarest line (fewest occurrences
+on the old side) anchors the split, and the regions before and after it
+are diffed the same way. Memory is linear in the line count. Regions with
+no anchor (only lines occurring more than MAX_CHAIN times, or none in
+common) become one replacement, as do the regions left once max_cost is
+spent; the script is then valid but not minimal (exact=False).
+
+diff_contents runs in worker processes (backend.diffs), so this module
+imports nothing from the app. Hunks are formatted in unified diff format.
+"""
+from array import array
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+EQUAL, DELETE, INSERT, REPLACE = 0, 1, 2, 3
+# Lines occurring more often than this in a region do not anchor it
+MAX_CHAIN = 64
+NO_NEWLINE = b"\\ No newline at end of file\n"
+
+Opcode = Tuple[int, int, int, int, int]
+
+
+class DiffScript(NamedTuple):
+    """Edit script from old to new lines, as difflib-style opcodes."""
+    opcodes: array  # (tag, old start, old end, new start, new end) flattened
+    old_lines: int
+    new_lines: int
+    additions: int
+    deletions: int
+    exact: bool
+
+    def ops(self) -> Iterator[Opcode]:
+        codes = self.opcodes
+        for i in range(0, len(codes), 5):
+            yield codes[i], codes[i + 1], codes[i + 2], codes[i + 3], codes[i + 4]
+
+
+def split_lines(data: bytes) -> List[bytes]:
+    """
+    Lines of content without their \\n.
+
+    A last line with no \\n keeps one instead, which tells it apart from
+    the same line with a newline and marks it when formatted.
+    """
+    lines = data.split(b"\n")
+    last = lines.pop()
+    if last:
+        lines.append(last + b"\n")
+    return lines
+
+
+def _find_anchor(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> Optional[Tuple[int, int, int]]:
+    """(old start, new start, length) of the rarest run of matching lines in a region, or None."""
+    positions = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], []).append(i)
+
+    best = None
+    best_rarity = MAX_CHAIN
+    best_length = 0
+    covered = {}  # Diagonal (i - j) -> end of the run already extended on it
+    for j in range(blo, bhi):
+        occurrences = positions.get(b[j])
+        # A run rarer than the best so far has a line rarer than it
+        if occurrences is None or len(occurrences) > best_rarity:
+            continue
+        for i in occurrences:
+            if i < covered.get(i - j, alo):
+                continue
+            start_i, start_j = i, j
+            while start_i > alo and start_j > blo and a[start_i - 1] == b[start_j - 1]:
+                start_i -= 1
+                start_j -= 1
+            end_i, end_j = i + 1, j + 1
+            while end_i < ahi and end_j < bhi and a[end_i] == b[end_j]:
+                end_i += 1
+                end_j += 1
+            covered[i - j] = end_i
+            rarity = min(len(positions[line]) for line in a[start_i:end_i])
+            if rarity < best_rarity or (rarity == best_rarity and end_i - start_i > best_length):
+                best = (start_i, start_j, end_i - start_i)
+                best_rarity, best_length = rarity, end_i - start_i
+    return best
+
+
+def _append(opcodes: array, tag: int, i1: int, i2: int, j1: int, j2: int) -> None:
+    if opcodes and opcodes[-5] == tag:
+        opcodes[-3], opcodes[-1] = i2, j2
+    else:
+        opcodes.extend((tag, i1, i2, j1, j2))
+
+
+def _append_change(opcodes: array, i1: int, i2: int, j1: int, j2: int) -> None:
+    if i1 < i2 and j1 < j2:
+        _append(opcodes, REPLACE, i1, i2, j1, j2)
+    elif i1 < i2:
+        _append(opcodes, DELETE, i1, i2, j1, j2)
+    elif j1 < j2:
+        _append(opcodes, INSERT, i1, i2, j1, j2)
+
+
+def diff_lines(old: List[bytes], new: List[bytes], max_cost: int) -> DiffScript:
+    """
+    Diff two lists of lines (from split_lines).
+
+    max_cost bounds the work (lines scanned for anchors) before the
+    remaining regions are replaced whole.
+    """
+    # Lines as ints: cheaper to hash and compare
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in old]
+    b = [ids.setdefault(line, len(ids)) for line in new]
+    del ids
+
+    runs = []  # (old start, new start, length) of matching lines
+    exact = True
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            runs.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < end:
+            runs.append((ahi, bhi, end - ahi))
+        if alo == ahi or blo == bhi:
+            continue
+        if max_cost <= 0:
+            exact = False
+            continue
+        max_cost -= (ahi - alo) + (bhi - blo)
+        anchor = _find_anchor(a, alo, ahi, b, blo, bhi)
+        if anchor is None:
+            exact = exact and not (set(a[alo:ahi]) & set(b[blo:bhi]))
+            continue
+        i, j, length = anchor
+        runs.append(anchor)
+        regions.append((i + length, ahi, j + length, bhi))
+        regions.append((alo, i, blo, j))
+
+    opcodes = array("q")
+    i = j = 0
+    for start_i, start_j, length in sorted(runs):
+        _append_change(opcodes, i, start_i, j, start_j)
+        _append(opcodes, EQUAL, start_i, start_i + length, start_j, start_j + length)
+        i, j = start_i + length, start_j + length
+    _append_change(opcodes, i, len(a), j, len(b))
+
+    script = DiffScript(opcodes, len(a), len(b), 0, 0, exact)
+    additions = sum(j2 - j1 for tag, _, _, j1, j2 in script.ops() if tag != EQUAL)
+    deletions = sum(i2 - i1 for tag, i1, i2, _, _ in script.ops() if tag != EQUAL)
+    return script._replace(additions=additions, deletions=deletions)
+
+
+def diff_contents(old: bytes, new: bytes, max_cost: int) -> DiffScript:
+    """diff_lines of two contents (the worker process entry point)."""
+    return diff_lines(split_lines(old), split_lines(new), max_cost)
+
+
+def group_hunks(script: DiffScript, context: int) -> Iterator[List[Opcode]]:
+    """Opcodes grouped into hunks with up to context lines around changes (as difflib's get_grouped_opcodes)."""
+    codes = list(script.ops())
+    if not codes:
+        return
+    tag, i1, i2, j1, j2 = codes[0]
+    if tag == EQUAL:
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    tag, i1, i2, j1, j2 = codes[-1]
+    if tag == EQUAL:
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == EQUAL and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == EQUAL):
+        yield group
+
+
+def _range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+
+def _line(prefix: bytes, line: bytes) -> bytes:
+    if line.endswith(b"\n"):
+        return prefix + line + NO_NEWLINE
+    return prefix + line + b"\n"
+
+
+def format_hunk(group: List[Opcode], old: List[bytes], new: List[bytes]) -> bytes:
+    """A hunk from group_hunks in unified diff format."""
+    parts = [f"@@ -{_range(group[0][1], group[-1][2])} +{_range(group[0][3], group[-1][4])} @@\n".encode()]
+    for tag, i1, i2, j1, j2 in group:
+        if tag == EQUAL:
+            parts.extend(_line(b" ", line) for line in old[i1:i2])
+            continue
+        parts.extend(_line(b"-", line) for line in old[i1:i2])
+        parts.extend(_line(b"+", line) for line in new[j1:j2])
+    return b"".join(parts)
@@ -0,0 +1,415 @@
+"""
+Line index of large text relics, for reading a window of lines.
+
+Comments are anchored to line numbers and the viewer shows a window of
+lines at a time, so it should not have to download a whole multi-hundred-MB
+log. For text relics over LINE_INDEX_MIN_SIZE_MB the line_index job makes
+one pass over the content after upload and stores a sidecar object
+(line-indexes/{relic_id}):
+
+    header | checkpoint table | samples | checkpoint windows
+
+The samples are the byte offsets at which every LINE_INDEX_SAMPLE_LINES-th
+line starts, as a fixed-width array, so the two samples around a window
+are one small ranged read of the sidecar and the window itself one ranged
+read of the content, between them. Content stored gzip-compressed also gets
+zran checkpoints (backend.zran), and the read starts at the checkpoint
+before the window. Content stored zstd-compressed is a series of
+independent frames (compression.ZSTD_FRAME_SIZE); the checkpoints are
+their starts, and the read starts at the frame holding the window (zstd
+content stored as one frame, before frames were written, is decompressed
+from the start). Smaller relics are read whole.
+"""
+import asyncio
+import bisect
+import struct
+import sys
+import zlib
+from array import array
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from backend.archives import read_range, relic_range_opener, storage_range_opener
+from backend.blobs import stored_encoding, stream_content
+from backend.compression import decompress_stream, is_compressible, make_decompressor
+from backend.config import settings
+from backend.models import Relic, RelicLineIndex
+from backend.storage import storage_service
+from backend.zran import Checkpoint, GzipStream, ZranError, gunzip_slice, resume_offset
+
+SIDECAR_MAGIC = b"RLCLNIX1"
+# magic, sample interval, line count, content size, sample count, checkpoint count
+SIDECAR_HEADER = struct.Struct("<8sIQQII")
+# compressed offset, bits, uncompressed offset, window offset (from the first window), window length;
+# a zstd frame start has no bits and no window
+CHECKPOINT = struct.Struct("<QBQQI")
+SAMPLE = struct.Struct("<Q")
+# gzip checkpoints are taken about this often (in uncompressed bytes)
+CHECKPOINT_SPAN = 4 * 1024 * 1024
+# Longer lines are cut (in bytes) when returned
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class LineIndexError(Exception):
+    """The content cannot be read by line (damaged, or not text)."""
+
+
+class LineIndexPending(LineIndexError):
+    """The relic is queued for the line_index job, which has not indexed it yet."""
+
+
+class LineWindow(NamedTuple):
+    lines: List[str]
+    total: int  # Lines in the whole content
+
+
+def needs_line_index(relic: Relic) -> bool:
+    """Whether windows of this relic are read through a line index (else the content is read whole)."""
+    return (relic.size_bytes or 0) > settings.LINE_INDEX_MIN_SIZE_MB * 1024 * 1024
+
+
+class LineIndexBuilder:
+    """
+    One pass over text content, fed in order with write().
+
+    samples[i] is the offset at which line i * interval (0-based) starts.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.samples = array("Q", [0])
+        self.newlines = 0
+        self.size = 0
+        self._ends_with_newline = False
+
+    @property
+    def line_count(self) -> int:
+        return self.newlines + (1 if self.size and not self._ends_with_newline else 0)
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        newlines = self.newlines + data.count(b"\n")
+        # Line n starts after newline number n
+        target = len(self.samples) * self.interval
+        seen, position = self.newlines, 0
+        while target <= newlines:
+            for _ in range(target - seen):
+                position = data.index(b"\n", position) + 1
+            self.samples.append(self.size + position)
+            seen = target
+            target += self.interval
+        self.newlines = newlines
+        self.size += len(data)
+        self._ends_with_newline = data.endswith(b"\n")
+
+
+def encode_line_sidecar(builder: LineIndexBuilder, checkpoints: List[Tuple[int, int, int, bytes]]) -> bytes:
+    """Serialize a line index (checkpoint windows zlib-compressed)."""
+    table = bytearray()
+    windows = bytearray()
+    for in_offset, bits, out_offset, window in checkpoints:
+        table += CHECKPOINT.pack(in_offset, bits, out_offset, len(windows), len(window))
+        windows += window
+    samples = array("Q", builder.samples)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return (
+        SIDECAR_HEADER.pack(
+            SIDECAR_MAGIC, builder.interval, builder.line_count, builder.size, len(builder.samples), len(checkpoints)
+        )
+        + bytes(table) + samples.tobytes() + bytes(windows)
+    )
+
+
+def _write_gzip(stream: GzipStream, builder: LineIndexBuilder, checkpoints: list, data: bytes) -> None:
+    for piece in stream.pieces(data):
+        builder.write(piece)
+    for checkpoint in stream.checkpoints:
+        checkpoints.append((
+            checkpoint.in_offset, checkpoint.bits, checkpoint.out_offset, zlib.compress(checkpoint.window, 9)
+        ))
+    stream.checkpoints.clear()
+
+
+class ZstdFrames:
+    """Decompresses concatenated zstd frames fed in order, noting where each starts."""
+
+    def __init__(self):
+        self._decompressor = None
+        self._in_offset = 0  # Compressed offset of the data passed to pieces()
+        self._out_offset = 0
+        self.starts: List[Tuple[int, int]] = []  # (compressed offset, uncompressed offset)
+
+    @property
+    def complete(self) -> bool:
+        return self._decompressor is None and bool(self.starts)
+
+    def pieces(self, data: bytes):
+        while data:
+            if self._decompressor is None:
+                self._decompressor = make_decompressor("zstd")
+                self.starts.append((self._in_offset, self._out_offset))
+            try:
+                out = self._decompressor.decompress(data)
+            except Exception as e:
+                raise LineIndexError(f"Damaged zstd stream: {e}")
+            self._out_offset += len(out)
+            yield out
+            if not self._decompressor.eof:
+                self._in_offset += len(data)
+                return
+            rest = self._decompressor.unused_data
+            self._in_offset += len(data) - len(rest)
+            data = rest
+            self._decompressor = None
+
+
+def _write_zstd(frames: ZstdFrames, builder: LineIndexBuilder, data: bytes) -> None:
+    for piece in frames.pieces(data):
+        builder.write(piece)
+
+
+async def build_line_sidecar(
+    chunks: AsyncIterator[bytes], encoding: Optional[str], interval: int
+) -> Tuple[LineIndexBuilder, int, bytes]:
+    """
+    Index text content.
+
+    chunks is the stored (compressed) content when encoding is "gzip" or
+    "zstd", so that checkpoints can be taken, and the content itself
+    otherwise (encoding None).
+
+    Returns:
+        (builder, checkpoint count, sidecar bytes)
+
+    Raises:
+        LineIndexError: damaged or truncated compressed data
+    """
+    builder = LineIndexBuilder(interval)
+    checkpoints: List[Tuple[int, int, int, bytes]] = []
+    stream = GzipStream(span=CHECKPOINT_SPAN) if encoding == "gzip" else None
+    frames = ZstdFrames() if encoding == "zstd" else None
+    try:
+        async for chunk in chunks:
+            if stream is not None:
+                await asyncio.to_thread(_write_gzip, stream, builder, checkpoints, chunk)
+            elif frames is not None:
+                await asyncio.to_thread(_write_zstd, frames, builder, chunk)
+            else:
+                await asyncio.to_thread(builder.write, chunk)
+        if stream is not None and not stream.complete:
+            raise LineIndexError("Truncated gzip stream")
+        if frames is not None and not frames.complete:
+            raise LineIndexError("Truncated zstd stream")
+    except ZranError as e:
+        raise LineIndexError(str(e))
+    finally:
+        if stream is not None:
+            stream.close()
+        await chunks.aclose()
+    if frames is not None and len(frames.starts) > 1:
+        checkpoints = [(in_offset, 0, out_offset, b"") for in_offset, out_offset in frames.starts]
+    return builder, len(checkpoints), encode_line_sidecar(builder, checkpoints)
+
+
+async def index_relic_lines(relic: Relic) -> dict:
+    """
+    Build and upload a relic's line index; returns the relic_line_index column values.
+
+    The relic must be loaded with with_inline_content().
+    """
+    encoding = stored_encoding(relic)
+    if encoding:
+        chunks, _ = await storage_service.stream(relic.s3_key, cache=True)
+    else:
+        chunks, _ = await stream_content(relic)
+    builder, checkpoint_count, sidecar = await build_line_sidecar(
+        chunks, encoding, max(1, settings.LINE_INDEX_SAMPLE_LINES)
+    )
+    if builder.size != relic.size_bytes:
+        raise LineIndexError(f"Content is {builder.size} bytes, expected {relic.size_bytes}")
+
+    sidecar_key = f"line-indexes/{relic.id}"
+    await storage_service.upload(sidecar_key, sidecar)
+    return {
+        "status": "done",
+        "sidecar_key": sidecar_key,
+        "sample_interval": builder.interval,
+        "line_count": builder.line_count,
+        "sample_count": len(builder.samples),
+        "checkpoint_count": checkpoint_count,
+    }
+
+
+def _decode_line(line: bytes) -> str:
+    line = line[:MAX_LINE_LENGTH]
+    if line.endswith(b"\r"):
+        line = line[:-1]
+    return line.decode("utf-8", errors="replace")
+
+
+async def _window_lines(chunks: AsyncIterator[bytes], skip: int, count: int) -> List[str]:
+    """
+    Lines skip .. skip + count - 1 of a stream that starts at a line start.
+
+    The stream is read only until the window is complete. Lines longer than
+    MAX_LINE_LENGTH bytes are cut.
+    """
+    lines: List[str] = []
+    line = bytearray()
+    started = False  # The current line has bytes (matters for a last line without newline)
+    try:
+        async for chunk in chunks:
+            position = 0
+            if skip:
+                newlines = chunk.count(b"\n")
+                if newlines < skip:
+                    skip -= newlines
+                    continue
+                for _ in range(skip):
+                    position = chunk.index(b"\n", position) + 1
+                skip = 0
+            while True:
+                newline = chunk.find(b"\n", position)
+                stop = len(chunk) if newline < 0 else newline
+                if stop > position:
+                    started = True
+                    if len(line) < MAX_LINE_LENGTH:
+                        line += chunk[position:min(stop, position + MAX_LINE_LENGTH - len(line))]
+                if newline < 0:
+                    break
+                lines.append(_decode_line(bytes(line)))
+                line.clear()
+                started = False
+                position = newline + 1
+                if len(lines) == count:
+                    return lines
+    finally:
+        await chunks.aclose()
+    if started and not skip:
+        lines.append(_decode_line(bytes(line)))
+    return lines
+
+
+def _split_lines(data: bytes, start: int, count: int) -> LineWindow:
+    lines = data.split(b"\n")
+    if data.endswith(b"\n") or not data:
+        lines.pop()
+    return LineWindow([_decode_line(line) for line in lines[start:start + count]], len(lines))
+
+
+async def _gzip_window(relic: Relic, record: RelicLineIndex, open_sidecar, begin: int, end: int):
+    """Uncompressed bytes [begin, end) of gzip-stored content, read from the checkpoint before begin."""
+    points = await _read_checkpoints(record, open_sidecar)
+
+    checkpoint = None
+    at = bisect.bisect_right([point[2] for point in points], begin) - 1
+    if at >= 0:
+        in_offset, bits, out_offset, window_start, window_length = points[at]
+        window_at = _samples_at(record) + record.sample_count * SAMPLE.size + window_start
+        window = zlib.decompress(await read_range(open_sidecar, window_at, window_at + window_length - 1))
+        checkpoint = Checkpoint(in_offset, bits, out_offset, window)
+
+    # Output up to a checkpoint is complete once the input up to its offset is in
+    stored_end = relic.blob.stored_size_bytes - 1
+    following = [point for point in points if point[2] >= end]
+    if following:
+        stored_end = min(stored_end, following[0][0])
+    raw, _ = await storage_service.stream(relic.s3_key, byte_range=(resume_offset(checkpoint), stored_end))
+    return gunzip_slice(raw, checkpoint, begin, end)
+
+
+async def _read_checkpoints(record: RelicLineIndex, open_sidecar) -> list:
+    table = b""
+    if record.checkpoint_count:
+        table = await read_range(open_sidecar, SIDECAR_HEADER.size, _samples_at(record) - 1)
+    return [CHECKPOINT.unpack_from(table, i * CHECKPOINT.size) for i in range(record.checkpoint_count)]
+
+
+async def _zstd_window(relic: Relic, record: RelicLineIndex, open_sidecar, begin: int, end: int):
+    """Uncompressed bytes [begin, end) of zstd-stored content, read from the frame holding begin."""
+    points = await _read_checkpoints(record, open_sidecar)
+    at = max(bisect.bisect_right([point[2] for point in points], begin) - 1, 0)
+    in_offset, _, out_offset, _, _ = points[at]
+    # Frames are whole: the read ends where the first frame past the window starts
+    stored_end = relic.blob.stored_size_bytes - 1
+    following = [point for point in points if point[2] >= end]
+    if following:
+        stored_end = following[0][0] - 1
+    raw, _ = await storage_service.stream(relic.s3_key, byte_range=(in_offset, stored_end))
+    return _slice(decompress_stream(raw, "zstd"), begin - out_offset, end - begin)
+
+
+async def _slice(chunks: AsyncIterator[bytes], skip: int, length: int) -> AsyncIterator[bytes]:
+    """length bytes of a stream after the first skip."""
+    try:
+        async for chunk in chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            piece = chunk[skip:skip + length]
+            skip = 0
+            length -= len(piece)
+            yield piece
+            if not length:
+                return
+    finally:
+        await chunks.aclose()
+
+
+def _samples_at(record: RelicLineIndex) -> int:
+    return SIDECAR_HEADER.size + record.checkpoint_count * CHECKPOINT.size
+
+
+async def read_line_window(relic: Relic, record: Optional[RelicLineIndex], start: int, count: int) -> LineWindow:
+    """
+    Lines start .. start + count - 1 (0-based) of a relic's content.
+
+    The relic must be loaded with with_inline_content(); record is its
+    relic_line_index row, if any.
+
+    Raises:
+        LineIndexPending: the relic needs a line index the job has not built yet
+        LineIndexError: not text, the index could not be built, or the relic
+            was never queued for indexing (stored before it existed, and not
+            backfilled)
+    """
+    if not needs_line_index(relic):
+        chunks, _ = await stream_content(relic)
+        return _split_lines(b"".join([chunk async for chunk in chunks]), start, count)
+
+    if record is None or record.status in ("queued", "pending"):
+        if not is_compressible(relic.content_type):
+            raise LineIndexError("Large content can only be read by line when it has a text content type")
+        if record is None:
+            raise LineIndexError("The content has not been indexed for reading by line")
+        raise LineIndexPending("The content is still being indexed")
+    if record.status != "done":
+        raise LineIndexError(record.error or "The content cannot be read by line")
+    if start >= record.line_count:
+        return LineWindow([], record.line_count)
+
+    # The samples at or before the window's first line and at or after its end
+    interval = record.sample_interval
+    first = start // interval
+    after = -(-(start + count) // interval)
+    last = after if after < record.sample_count else first
+    open_sidecar = storage_range_opener(record.sidecar_key)
+    samples = await read_range(
+        open_sidecar, _samples_at(record) + first * SAMPLE.size, _samples_at(record) + (last + 1) * SAMPLE.size - 1
+    )
+    begin = SAMPLE.unpack_from(samples, 0)[0]
+    end = SAMPLE.unpack_from(samples, (last - first) * SAMPLE.size)[0] if last != first else relic.size_bytes
+
+    encoding = stored_encoding(relic)
+    if encoding == "gzip":
+        chunks = await _gzip_window(relic, record, open_sidecar, begin, end)
+    elif encoding == "zstd" and record.checkpoint_count:
+        chunks = await _zstd_window(relic, record, open_sidecar, begin, end)
+    else:
+        chunks = await relic_range_opener(relic)(begin, end - 1)
+    try:
+        lines = await _window_lines(chunks, start - first * interval, count)
+    except ZranError as e:
+        raise LineIndexError(str(e))
+    return LineWindow(lines, record.line_count)
@@ -4,12 +4,16 @@ from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from backend.config import settings
-from backend.database import init_db, async_engine
+from backend.database import init_db, async_engine, AsyncSessionLocal
 from backend.storage import storage_service
 from backend.backup import perform_backup
 from backend.scheduler import start_scheduler, shutdown_scheduler
+from backend.counters import access_counter
+from backend.derivatives import shutdown_render_pool
+from backend.diffs import shutdown_diff_pool
+from backend.utils import detect_trigram_support
 
-from backend.routes import health, users, relics, bookmarks, comments, spaces, reports, admin
+from backend.routes import health, users, relics, uploads, archives, previews, lines, diffs, bookmarks, comments, spaces, reports, admin
 
 # Configure logging
 logging.basicConfig(
@@ -46,6 +50,10 @@ async def startup_event():
     await storage_service.start()
     await storage_service.ensure_bucket()
 
+    if settings.SEARCH_MODE != "basic":
+        async with AsyncSessionLocal() as db:
+            if not await detect_trigram_support(db):
+                logger.warning("pg_trgm extension not installed: relevance ranking uses full-text matching only")
 
     # Start background scheduler (handles backups and relic cleanup)
     await start_scheduler()
@@ -68,6 +76,13 @@ async def shutdown_event():
         # Stop scheduler
         await shutdown_scheduler()
 
+    # Write any buffered access counts before the pool goes away
+    await access_counter.flush()
+
+    # Stop preview render and diff processes
+    shutdown_render_pool()
+    shutdown_diff_pool()
+
     # Dispose async engine connection pool
     await async_engine.dispose()
 
@@ -84,6 +99,11 @@ app.include_router(bookmarks.router)
 app.include_router(comments.router)
 app.include_router(spaces.router)
 app.include_router(reports.router)
+app.include_router(uploads.router)
+app.include_router(archives.router)
+app.include_router(previews.router)
+app.include_router(lines.router)
+app.include_router(diffs.router)
 app.include_router(relics.router)
 
 
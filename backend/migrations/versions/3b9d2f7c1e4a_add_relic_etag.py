@@ -0,0 +1,44 @@
+"""add relic.etag content validator
+
+Revision ID: 3b9d2f7c1e4a
+Revises: f4a8c2e91b7d
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f7c1e4a'
+down_revision: Union[str, Sequence[str], None] = 'f4a8c2e91b7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_etag() -> bool:
+    """Return True if relic.etag already exists."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return any(col['name'] == 'etag' for col in inspector.get_columns('relic'))
+
+
+def upgrade() -> None:
+    """Add relic.etag so raw content can be served with a strong ETag and answered with 304s.
+
+    Existing rows stay NULL; the raw endpoint falls back to the relic id, which is
+    equally strong because relic content never changes after upload.
+    """
+    if _has_etag():
+        print("Alembic Skip: relic.etag already exists")
+        return
+    op.add_column('relic', sa.Column('etag', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop relic.etag."""
+    if not _has_etag():
+        print("Alembic Skip: relic.etag does not exist")
+        return
+    op.drop_column('relic', 'etag')
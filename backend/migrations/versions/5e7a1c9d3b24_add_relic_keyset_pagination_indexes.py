@@ -0,0 +1,55 @@
+"""add composite indexes for keyset pagination of relic listings
+
+Revision ID: 5e7a1c9d3b24
+Revises: 8c1e5a7d2f90
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7a1c9d3b24'
+down_revision: Union[str, Sequence[str], None] = '8c1e5a7d2f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_relic_created_at_id', 'relic', ['created_at', 'id']),
+    ('ix_relic_name_id', 'relic', ['name', 'id']),
+    ('ix_relic_size_bytes_id', 'relic', ['size_bytes', 'id']),
+    ('ix_relic_access_count_id', 'relic', ['access_count', 'id']),
+    ('ix_relic_bookmark_count_id', 'relic', ['bookmark_count', 'id']),
+    ('ix_relic_user_id_created_at_id', 'relic', ['user_id', 'created_at', 'id']),
+    ('ix_user_bookmark_user_id_created_at_relic_id', 'user_bookmark', ['user_id', 'created_at', 'relic_id']),
+]
+
+
+def upgrade() -> None:
+    """Add (sort column, id) indexes so cursor pages seek instead of scanning past offset rows.
+
+    Built CONCURRENTLY outside the migration transaction so large relic tables
+    stay writable while the indexes build.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {
+        table: {idx['name'] for idx in inspector.get_indexes(table)}
+        for table in ('relic', 'user_bookmark')
+    }
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if name not in existing[table]:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+            else:
+                print(f"Alembic Skip: Index '{name}' already exists")
+
+
+def downgrade() -> None:
+    """Remove keyset pagination indexes."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
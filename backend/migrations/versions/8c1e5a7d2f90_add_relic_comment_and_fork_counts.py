@@ -0,0 +1,59 @@
+"""add denormalized relic.comments_count and relic.forks_count
+
+Revision ID: 8c1e5a7d2f90
+Revises: 3b9d2f7c1e4a
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1e5a7d2f90'
+down_revision: Union[str, Sequence[str], None] = '3b9d2f7c1e4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _relic_columns() -> set:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    return {col['name'] for col in inspector.get_columns('relic')}
+
+
+def upgrade() -> None:
+    """Add comments_count/forks_count so list pages no longer need per-page GROUP BY queries,
+    then backfill both from the comment and relic tables."""
+    columns = _relic_columns()
+    for name in ('comments_count', 'forks_count'):
+        if name in columns:
+            print(f"Alembic Skip: relic.{name} already exists")
+            continue
+        op.add_column(
+            'relic',
+            sa.Column(name, sa.Integer(), nullable=False, server_default=sa.text('0')),
+        )
+
+    # Backfill (also corrects columns that create_all() added empty)
+    op.execute("""
+        UPDATE relic SET comments_count = c.cnt
+        FROM (SELECT relic_id, COUNT(*) AS cnt FROM comment GROUP BY relic_id) AS c
+        WHERE relic.id = c.relic_id
+    """)
+    op.execute("""
+        UPDATE relic SET forks_count = f.cnt
+        FROM (SELECT fork_of, COUNT(*) AS cnt FROM relic WHERE fork_of IS NOT NULL GROUP BY fork_of) AS f
+        WHERE relic.id = f.fork_of
+    """)
+
+
+def downgrade() -> None:
+    """Drop the denormalized counters."""
+    columns = _relic_columns()
+    for name in ('forks_count', 'comments_count'):
+        if name not in columns:
+            print(f"Alembic Skip: relic.{name} does not exist")
+            continue
+        op.drop_column('relic', name)
@@ -0,0 +1,44 @@
+"""add upload_session.direct for presigned direct-to-S3 uploads
+
+Revision ID: a5e1c7d3f9b2
+Revises: f3d7a2c8e6b4
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5e1c7d3f9b2'
+down_revision: Union[str, Sequence[str], None] = 'f3d7a2c8e6b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Flag direct upload sessions; single-PUT direct uploads have no multipart upload id."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = {col['name']: col for col in inspector.get_columns('upload_session')}
+
+    if 'direct' not in columns:
+        op.add_column(
+            'upload_session',
+            sa.Column('direct', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        )
+    else:
+        print("Alembic Skip: Column 'upload_session.direct' already exists")
+
+    if not columns['s3_upload_id']['nullable']:
+        op.alter_column('upload_session', 's3_upload_id', existing_type=sa.String(), nullable=True)
+    else:
+        print("Alembic Skip: Column 'upload_session.s3_upload_id' already nullable")
+
+
+def downgrade() -> None:
+    """Drop direct sessions (they may lack a multipart upload id) and the flag."""
+    op.execute("DELETE FROM upload_session WHERE s3_upload_id IS NULL")
+    op.alter_column('upload_session', 's3_upload_id', existing_type=sa.String(), nullable=False)
+    op.drop_column('upload_session', 'direct')
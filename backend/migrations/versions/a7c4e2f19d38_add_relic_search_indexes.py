@@ -0,0 +1,69 @@
+"""add pg_trgm and full-text search indexes for relic search
+
+Revision ID: a7c4e2f19d38
+Revises: 5e7a1c9d3b24
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2f19d38'
+down_revision: Union[str, Sequence[str], None] = '5e7a1c9d3b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match backend.utils.RELIC_SEARCH_VECTOR_SQL
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B')"
+)
+
+TRGM_INDEXES = [
+    ('ix_relic_name_trgm', 'relic', "USING gin (name gin_trgm_ops)"),
+    ('ix_tag_name_trgm', 'tag', "USING gin (name gin_trgm_ops)"),
+]
+
+INDEXES = [
+    ('ix_relic_search_tsv', 'relic', f"USING gin (({SEARCH_VECTOR}))"),
+    ('ix_relic_id_pattern', 'relic', "(id varchar_pattern_ops)"),
+]
+
+
+def upgrade() -> None:
+    """Build the indexes behind SEARCH_MODE=fulltext so search stops sequentially scanning relic.
+
+    Built CONCURRENTLY outside the migration transaction so large relic tables
+    stay writable. Without permission to create pg_trgm the trigram indexes are
+    skipped; set SEARCH_MODE=basic in that case.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {
+        table: {idx['name'] for idx in inspector.get_indexes(table)}
+        for table in ('relic', 'tag')
+    }
+
+    with op.get_context().autocommit_block():
+        indexes = list(INDEXES)
+        try:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            indexes += TRGM_INDEXES
+        except Exception as e:
+            print(f"Alembic Skip: pg_trgm unavailable, trigram indexes not created ({e})")
+
+        for name, table, definition in indexes:
+            if name not in existing[table]:
+                op.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table} {definition}")
+            else:
+                print(f"Alembic Skip: Index '{name}' already exists")
+
+
+def downgrade() -> None:
+    """Remove relic search indexes (the pg_trgm extension is left installed)."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES + TRGM_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,46 @@
+"""add partial index on queued relic_derivative rows for the derivatives job
+
+Revision ID: a7d3e9f1c5b2
+Revises: f2c8a4e6b0d3
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9f1c5b2'
+down_revision: Union[str, Sequence[str], None] = 'f2c8a4e6b0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index the work queue of the derivatives job (queued and pending rows).
+
+    Existing relics are not queued here: run the backfill admin job for them.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {idx['name'] for idx in inspector.get_indexes('relic_derivative')}
+
+    if 'ix_relic_derivative_queue' in existing:
+        print("Alembic Skip: Index 'ix_relic_derivative_queue' already exists")
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_relic_derivative_queue', 'relic_derivative', ['created_at'],
+            postgresql_where=sa.text("status IN ('queued', 'pending')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Remove the queue index."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_relic_derivative_queue', table_name='relic_derivative', postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,43 @@
+"""add attempts to the background work queues
+
+Revision ID: b5e1d7a3f9c2
+Revises: e3a7c9f1b5d2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1d7a3f9c2'
+down_revision: Union[str, Sequence[str], None] = 'e3a7c9f1b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+QUEUE_TABLES = ('relic_derivative', 'blob_archive_index', 'relic_line_index')
+
+
+def _has_attempts(table: str) -> bool:
+    """Return True if table.attempts already exists."""
+    inspector = sa.inspect(op.get_bind())
+    return any(col['name'] == 'attempts' for col in inspector.get_columns(table))
+
+
+def upgrade() -> None:
+    """Count claims per queue row so content that keeps failing is given up on instead of retried forever."""
+    for table in QUEUE_TABLES:
+        if _has_attempts(table):
+            print(f"Alembic Skip: {table}.attempts already exists")
+            continue
+        op.add_column(table, sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade() -> None:
+    """Drop the attempt counters."""
+    for table in QUEUE_TABLES:
+        if not _has_attempts(table):
+            print(f"Alembic Skip: {table}.attempts does not exist")
+            continue
+        op.drop_column(table, 'attempts')
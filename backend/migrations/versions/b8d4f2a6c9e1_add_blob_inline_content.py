@@ -0,0 +1,41 @@
+"""add blob.content for inline storage of small relic content
+
+Revision ID: b8d4f2a6c9e1
+Revises: a5e1c7d3f9b2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a6c9e1'
+down_revision: Union[str, Sequence[str], None] = 'a5e1c7d3f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the nullable inline content column (existing blobs stay in S3)."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [col['name'] for col in inspector.get_columns('blob')]
+
+    if 'content' not in columns:
+        op.add_column('blob', sa.Column('content', sa.LargeBinary(), nullable=True))
+    else:
+        print("Alembic Skip: Column 'blob.content' already exists")
+
+
+def downgrade() -> None:
+    """Drop the column; refuses while inline content exists (move it to S3 first)."""
+    conn = op.get_bind()
+    inline = conn.execute(sa.text("SELECT count(*) FROM blob WHERE content IS NOT NULL")).scalar()
+    if inline:
+        raise RuntimeError(
+            f"{inline} blob(s) are stored inline; move them to S3 with "
+            "POST /api/v1/admin/storage/relocate?to=s3 before downgrading"
+        )
+    op.drop_column('blob', 'content')
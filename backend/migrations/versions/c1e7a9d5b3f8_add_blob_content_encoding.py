@@ -0,0 +1,45 @@
+"""add blob.content_encoding and blob.stored_size_bytes for compression at rest
+
+Revision ID: c1e7a9d5b3f8
+Revises: b8d4f2a6c9e1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1e7a9d5b3f8'
+down_revision: Union[str, Sequence[str], None] = 'b8d4f2a6c9e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the storage coding columns; existing blobs are stored as is."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [col['name'] for col in inspector.get_columns('blob')]
+
+    if 'content_encoding' not in columns:
+        op.add_column('blob', sa.Column('content_encoding', sa.String(), nullable=True))
+    else:
+        print("Alembic Skip: Column 'blob.content_encoding' already exists")
+
+    if 'stored_size_bytes' not in columns:
+        op.add_column('blob', sa.Column('stored_size_bytes', sa.BigInteger(), nullable=True))
+        op.execute("UPDATE blob SET stored_size_bytes = size_bytes")
+    else:
+        print("Alembic Skip: Column 'blob.stored_size_bytes' already exists")
+
+
+def downgrade() -> None:
+    """Drop the columns; refuses while compressed blobs exist (older code would serve them raw)."""
+    conn = op.get_bind()
+    encoded = conn.execute(sa.text("SELECT count(*) FROM blob WHERE content_encoding IS NOT NULL")).scalar()
+    if encoded:
+        raise RuntimeError(f"{encoded} blob(s) are stored compressed; downgrading would serve them undecoded")
+    op.drop_column('blob', 'stored_size_bytes')
+    op.drop_column('blob', 'content_encoding')
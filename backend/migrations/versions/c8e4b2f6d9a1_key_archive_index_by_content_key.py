@@ -0,0 +1,43 @@
+"""key blob_archive_index by content key so relics without a blob can be indexed
+
+Revision ID: c8e4b2f6d9a1
+Revises: a7d3e9f1c5b2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e4b2f6d9a1'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e9f1c5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Rename sha256 to content_key: the blob's sha256, or the relic's s3_key when it has no blob."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = {col['name'] for col in inspector.get_columns('blob_archive_index')}
+
+    if 'sha256' in columns:
+        op.alter_column(
+            'blob_archive_index', 'sha256',
+            new_column_name='content_key', type_=sa.String(), existing_type=sa.String(64), existing_nullable=False,
+        )
+    elif 'content_key' in columns:
+        print("Alembic Skip: column 'content_key' already exists on 'blob_archive_index'")
+    else:
+        print("Alembic Skip: column 'sha256' not found on 'blob_archive_index'")
+
+
+def downgrade() -> None:
+    """Drop the rows of relics without a blob (their sidecars stay in the bucket) and rename the column back."""
+    op.execute("DELETE FROM blob_archive_index WHERE length(content_key) <> 64")
+    op.alter_column(
+        'blob_archive_index', 'content_key',
+        new_column_name='sha256', type_=sa.String(64), existing_type=sa.String(), existing_nullable=False,
+    )
@@ -0,0 +1,44 @@
+"""add a trigram index on relic.description for substring search
+
+Revision ID: c9f3a1e7d5b8
+Revises: b5e1d7a3f9c2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9f3a1e7d5b8'
+down_revision: Union[str, Sequence[str], None] = 'b5e1d7a3f9c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index description ILIKE for SEARCH_MODE=fulltext, which matches substrings of descriptions again.
+
+    Needs pg_trgm (installed by a7c4e2f19d38 when permitted); without it the
+    description branch of search stays unindexed, like the name branch.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {idx['name'] for idx in inspector.get_indexes('relic')}
+
+    if 'ix_relic_description_trgm' in existing:
+        print("Alembic Skip: Index 'ix_relic_description_trgm' already exists")
+        return
+    if not conn.scalar(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")):
+        print("Alembic Skip: pg_trgm not installed, 'ix_relic_description_trgm' not created")
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY ix_relic_description_trgm ON relic USING gin (description gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Remove the description trigram index."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_relic_description_trgm")
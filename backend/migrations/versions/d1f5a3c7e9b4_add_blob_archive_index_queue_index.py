@@ -0,0 +1,46 @@
+"""add partial index on queued blob_archive_index rows for the archive_index job
+
+Revision ID: d1f5a3c7e9b4
+Revises: c8e4b2f6d9a1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f5a3c7e9b4'
+down_revision: Union[str, Sequence[str], None] = 'c8e4b2f6d9a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index the work queue of the archive_index job (queued and pending rows).
+
+    Tar relics without a row are not queued here: run the backfill admin job for them.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {idx['name'] for idx in inspector.get_indexes('blob_archive_index')}
+
+    if 'ix_blob_archive_index_queue' in existing:
+        print("Alembic Skip: Index 'ix_blob_archive_index_queue' already exists")
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_blob_archive_index_queue', 'blob_archive_index', ['created_at'],
+            postgresql_where=sa.text("format IN ('queued', 'pending')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Remove the queue index."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_blob_archive_index_queue', table_name='blob_archive_index', postgresql_concurrently=True, if_exists=True
+        )
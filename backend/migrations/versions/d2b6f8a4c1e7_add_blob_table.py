@@ -0,0 +1,57 @@
+"""add content-addressed blob table and relic.blob_sha256
+
+Revision ID: d2b6f8a4c1e7
+Revises: a7c4e2f19d38
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b6f8a4c1e7'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e2f19d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the refcounted blob table and link relics to it.
+
+    Existing relics keep blob_sha256 NULL and continue to own their objects;
+    only content stored from now on is deduplicated.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'blob' not in inspector.get_table_names():
+        op.create_table(
+            'blob',
+            sa.Column('sha256', sa.String(64), nullable=False),
+            sa.Column('s3_key', sa.String(), nullable=False),
+            sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+            sa.Column('etag', sa.String(), nullable=True),
+            sa.Column('ref_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('sha256'),
+        )
+    else:
+        print("Alembic Skip: Table 'blob' already exists")
+
+    columns = {col['name'] for col in inspector.get_columns('relic')}
+    if 'blob_sha256' not in columns:
+        op.add_column('relic', sa.Column('blob_sha256', sa.String(64), nullable=True))
+        op.create_foreign_key('relic_blob_sha256_fkey', 'relic', 'blob', ['blob_sha256'], ['sha256'])
+        op.create_index(op.f('ix_relic_blob_sha256'), 'relic', ['blob_sha256'], unique=False)
+    else:
+        print("Alembic Skip: Column 'relic.blob_sha256' already exists")
+
+
+def downgrade() -> None:
+    """Drop relic.blob_sha256 and the blob table."""
+    op.drop_index(op.f('ix_relic_blob_sha256'), table_name='relic')
+    op.drop_constraint('relic_blob_sha256_fkey', 'relic', type_='foreignkey')
+    op.drop_column('relic', 'blob_sha256')
+    op.drop_table('blob')
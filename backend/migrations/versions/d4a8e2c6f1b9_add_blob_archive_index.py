@@ -0,0 +1,43 @@
+"""add blob_archive_index for tar and tar.gz member indexes
+
+Revision ID: d4a8e2c6f1b9
+Revises: c1e7a9d5b3f8
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8e2c6f1b9'
+down_revision: Union[str, Sequence[str], None] = 'c1e7a9d5b3f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the archive index table; existing tar relics are indexed by the archive_index job."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'blob_archive_index' not in inspector.get_table_names():
+        op.create_table(
+            'blob_archive_index',
+            sa.Column('sha256', sa.String(64), nullable=False),
+            sa.Column('format', sa.String(), nullable=False),
+            sa.Column('sidecar_key', sa.String(), nullable=True),
+            sa.Column('entry_count', sa.Integer(), nullable=True),
+            sa.Column('checkpoint_count', sa.Integer(), nullable=True),
+            sa.Column('error', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('sha256'),
+        )
+    else:
+        print("Alembic Skip: Table 'blob_archive_index' already exists")
+
+
+def downgrade() -> None:
+    """Drop the table (sidecar objects under indexes/ are left in the bucket)."""
+    op.drop_table('blob_archive_index')
@@ -0,0 +1,46 @@
+"""add partial index on queued relic_line_index rows for the line_index job
+
+Revision ID: e3a7c9f1b5d2
+Revises: d1f5a3c7e9b4
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c9f1b5d2'
+down_revision: Union[str, Sequence[str], None] = 'd1f5a3c7e9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index the work queue of the line_index job (queued and pending rows).
+
+    Large text relics without a row are not queued here: run the backfill admin job for them.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {idx['name'] for idx in inspector.get_indexes('relic_line_index')}
+
+    if 'ix_relic_line_index_queue' in existing:
+        print("Alembic Skip: Index 'ix_relic_line_index_queue' already exists")
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_relic_line_index_queue', 'relic_line_index', ['created_at'],
+            postgresql_where=sa.text("status IN ('queued', 'pending')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Remove the queue index."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_relic_line_index_queue', table_name='relic_line_index', postgresql_concurrently=True, if_exists=True
+        )
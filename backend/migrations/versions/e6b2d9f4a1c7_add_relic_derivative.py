@@ -0,0 +1,46 @@
+"""add relic_derivative for thumbnails and text snippets
+
+Revision ID: e6b2d9f4a1c7
+Revises: d4a8e2c6f1b9
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2d9f4a1c7'
+down_revision: Union[str, Sequence[str], None] = 'd4a8e2c6f1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the derivative table; existing relics get previews from the derivatives job."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'relic_derivative' not in inspector.get_table_names():
+        op.create_table(
+            'relic_derivative',
+            sa.Column('relic_id', sa.String(32), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('kind', sa.String(), nullable=True),
+            sa.Column('thumbnail_key', sa.String(), nullable=True),
+            sa.Column('width', sa.Integer(), nullable=True),
+            sa.Column('height', sa.Integer(), nullable=True),
+            sa.Column('snippet', sa.Text(), nullable=True),
+            sa.Column('truncated', sa.Boolean(), nullable=True),
+            sa.Column('error', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('relic_id'),
+        )
+    else:
+        print("Alembic Skip: Table 'relic_derivative' already exists")
+
+
+def downgrade() -> None:
+    """Drop the table (thumbnail objects under derived/ are left in the bucket)."""
+    op.drop_table('relic_derivative')
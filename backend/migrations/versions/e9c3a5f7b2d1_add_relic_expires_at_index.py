@@ -0,0 +1,45 @@
+"""add partial index on relic.expires_at for the expired relic reaper
+
+Revision ID: e9c3a5f7b2d1
+Revises: d2b6f8a4c1e7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c3a5f7b2d1'
+down_revision: Union[str, Sequence[str], None] = 'd2b6f8a4c1e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index expires_at so the reaper seeks to expired rows instead of scanning relic.
+
+    Built CONCURRENTLY outside the migration transaction so large relic tables
+    stay writable while the index builds.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = {idx['name'] for idx in inspector.get_indexes('relic')}
+
+    if 'ix_relic_expires_at' in existing:
+        print("Alembic Skip: Index 'ix_relic_expires_at' already exists")
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_relic_expires_at', 'relic', ['expires_at'],
+            postgresql_where=sa.text('expires_at IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Remove the expires_at index."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_relic_expires_at', table_name='relic', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,45 @@
+"""add relic_line_index for windowed line access
+
+Revision ID: f2c8a4e6b0d3
+Revises: e6b2d9f4a1c7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a4e6b0d3'
+down_revision: Union[str, Sequence[str], None] = 'e6b2d9f4a1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the line index table; existing large text relics are indexed by the line_index job."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'relic_line_index' not in inspector.get_table_names():
+        op.create_table(
+            'relic_line_index',
+            sa.Column('relic_id', sa.String(32), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('sidecar_key', sa.String(), nullable=True),
+            sa.Column('sample_interval', sa.Integer(), nullable=True),
+            sa.Column('line_count', sa.BigInteger(), nullable=True),
+            sa.Column('sample_count', sa.Integer(), nullable=True),
+            sa.Column('checkpoint_count', sa.Integer(), nullable=True),
+            sa.Column('error', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('relic_id'),
+        )
+    else:
+        print("Alembic Skip: Table 'relic_line_index' already exists")
+
+
+def downgrade() -> None:
+    """Drop the table (sidecar objects under line-indexes/ are left in the bucket)."""
+    op.drop_table('relic_line_index')
@@ -0,0 +1,74 @@
+"""add upload_session and upload_part tables for resumable uploads
+
+Revision ID: f3d7a2c8e6b4
+Revises: e9c3a5f7b2d1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3d7a2c8e6b4'
+down_revision: Union[str, Sequence[str], None] = 'e9c3a5f7b2d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the resumable upload session table and its received-parts table."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'upload_session' not in tables:
+        op.create_table(
+            'upload_session',
+            sa.Column('id', sa.String(32), nullable=False),
+            sa.Column('user_id', sa.String(32), nullable=True),
+            sa.Column('relic_id', sa.String(32), nullable=False),
+            sa.Column('s3_key', sa.String(), nullable=False),
+            sa.Column('s3_upload_id', sa.String(), nullable=False),
+            sa.Column('upload_length', sa.BigInteger(), nullable=False),
+            sa.Column('part_size', sa.BigInteger(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False, server_default=sa.text("'open'")),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('content_type', sa.String(), nullable=False),
+            sa.Column('language_hint', sa.String(), nullable=True),
+            sa.Column('access_level', sa.String(), nullable=False),
+            sa.Column('expires_in', sa.String(), nullable=True),
+            sa.Column('tags', sa.Text(), nullable=True),
+            sa.Column('space_id', sa.String(32), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(op.f('ix_upload_session_user_id'), 'upload_session', ['user_id'], unique=False)
+        op.create_index(op.f('ix_upload_session_expires_at'), 'upload_session', ['expires_at'], unique=False)
+    else:
+        print("Alembic Skip: Table 'upload_session' already exists")
+
+    if 'upload_part' not in tables:
+        op.create_table(
+            'upload_part',
+            sa.Column('upload_id', sa.String(32), nullable=False),
+            sa.Column('part_number', sa.Integer(), nullable=False),
+            sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+            sa.Column('etag', sa.String(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['upload_id'], ['upload_session.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('upload_id', 'part_number'),
+        )
+    else:
+        print("Alembic Skip: Table 'upload_part' already exists")
+
+
+def downgrade() -> None:
+    """Drop the resumable upload tables (in-progress S3 multipart uploads are left to the bucket lifecycle)."""
+    op.drop_table('upload_part')
+    op.drop_index(op.f('ix_upload_session_expires_at'), table_name='upload_session')
+    op.drop_index(op.f('ix_upload_session_user_id'), table_name='upload_session')
+    op.drop_table('upload_session')
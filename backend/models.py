@@ -1,7 +1,7 @@
 """Database models for the relic application."""
-from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, Table, UniqueConstraint, text
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, LargeBinary, Text, Table, UniqueConstraint, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime
 import uuid
 from typing import Optional
@@ -72,6 +72,185 @@ class SpaceAccess(Base):
     )
 
 
+class Blob(Base):
+    """
+    Content-addressed S3 object shared by every relic with identical content.
+
+    Keyed by the SHA-256 of the content. The object keeps the key it was first
+    uploaded under; ref_count is the number of relics pointing at it and the
+    object is deleted when it drops to zero.
+
+    Content up to INLINE_CONTENT_MAX_SIZE may instead be stored inline in
+    content, in which case nothing exists at s3_key (it is kept so the blob
+    can be moved to S3 later, see blobs.relocate_blobs).
+    """
+    __tablename__ = "blob"
+
+    sha256 = Column(String(64), primary_key=True)
+    s3_key = Column(String, nullable=False)
+    size_bytes = Column(BigInteger)
+    etag = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, server_default=text("0"), default=0)
+    # Content-coding of the stored bytes ("zstd"/"gzip", see COMPRESS_AT_REST); NULL when
+    # stored as is. size_bytes is always the logical size, stored_size_bytes what is stored.
+    content_encoding = Column(String, nullable=True)
+    stored_size_bytes = Column(BigInteger, nullable=True)
+    # Inline content (small blobs only); NULL when the content lives in S3.
+    # Deferred: loaded only by readers that ask for it (blobs.with_inline_content)
+    content = deferred(Column(LargeBinary, nullable=True))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BlobArchiveIndex(Base):
+    """
+    Member index of tar or tar.gz content, built by the archive_index job.
+
+    content_key is the blob's sha256, or the relic's s3_key for content
+    stored without a blob (resumable uploads, forks of relics stored before
+    deduplication); see archives.archive_content_key. format is "queued"
+    from the relic's creation (or the backfill job), "pending" while a
+    worker builds it (created_at is then the claim time), "tar"/"tar.gz"
+    once the sidecar object at sidecar_key exists, or "none" when the
+    content is not an indexable archive (error says why). attempts counts
+    claims; content that keeps failing is recorded as "none" after
+    QUEUE_MAX_ATTEMPTS. Not a foreign key: rows outlive their content until
+    the daily reaper deletes them together with the sidecar.
+    """
+    __tablename__ = "blob_archive_index"
+    __table_args__ = (
+        # Work queue of the archive_index job; finished rows are not indexed
+        Index('ix_blob_archive_index_queue', 'created_at', postgresql_where=text("format IN ('queued', 'pending')")),
+    )
+
+    content_key = Column(String, primary_key=True)
+    format = Column(String, nullable=False)
+    sidecar_key = Column(String, nullable=True)
+    entry_count = Column(Integer, nullable=True)
+    checkpoint_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default=text("0"), default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RelicDerivative(Base):
+    """
+    Preview derived from a relic's content by the derivatives job.
+
+    status is "queued" from the relic's creation (or the backfill job),
+    "pending" while a worker derives it (created_at is then the claim time),
+    "done" once the thumbnail object at thumbnail_key (image, PDF and
+    Excalidraw relics) or the snippet (text relics) exists, or "none" when
+    no preview can be made (error says why). width/height are those of the
+    source: image pixels, PDF page points or drawing units. attempts counts
+    claims; a relic that keeps failing is recorded as "none" after
+    QUEUE_MAX_ATTEMPTS. Not a foreign key: rows outlive their relic until
+    the daily reaper deletes them together with the thumbnail.
+    """
+    __tablename__ = "relic_derivative"
+    __table_args__ = (
+        # Work queue of the derivatives job; finished rows are not indexed
+        Index('ix_relic_derivative_queue', 'created_at', postgresql_where=text("status IN ('queued', 'pending')")),
+    )
+
+    relic_id = Column(String(32), primary_key=True)
+    status = Column(String, nullable=False)
+    kind = Column(String, nullable=True)
+    thumbnail_key = Column(String, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    snippet = Column(Text, nullable=True)
+    truncated = Column(Boolean, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default=text("0"), default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RelicLineIndex(Base):
+    """
+    Line index of a large text relic, built by the line_index job.
+
+    status is "queued" from the relic's creation (or the backfill job),
+    "pending" while a worker builds it (created_at is then the claim time),
+    "done" once the sidecar object at sidecar_key exists (see
+    backend.line_index), or "none" when the content could not be indexed
+    (error says why). attempts counts claims; a relic that keeps failing is
+    recorded as "none" after QUEUE_MAX_ATTEMPTS. Not a foreign key: rows
+    outlive their relic until the daily reaper deletes them with the sidecar.
+    """
+    __tablename__ = "relic_line_index"
+    __table_args__ = (
+        # Work queue of the line_index job; finished rows are not indexed
+        Index('ix_relic_line_index_queue', 'created_at', postgresql_where=text("status IN ('queued', 'pending')")),
+    )
+
+    relic_id = Column(String(32), primary_key=True)
+    status = Column(String, nullable=False)
+    sidecar_key = Column(String, nullable=True)
+    sample_interval = Column(Integer, nullable=True)
+    line_count = Column(BigInteger, nullable=True)
+    sample_count = Column(Integer, nullable=True)
+    checkpoint_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default=text("0"), default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """
+    Resumable upload in progress, backed by an S3 multipart upload.
+
+    The session id is a 128-bit random token and, like a private relic URL,
+    grants access to the upload. Content is sent as fixed-size parts
+    (part_size bytes, the last one shorter) that may arrive in any order and
+    in parallel; each stored part is recorded in upload_part. Completing the
+    session completes the multipart upload at s3_key and creates relic_id
+    with the metadata captured here. Sessions idle past expires_at are
+    aborted by the upload_cleanup job.
+
+    Direct sessions are uploaded by the client straight to S3 through
+    presigned URLs: S3 (list_parts / head_object) is the record of what
+    arrived, and s3_upload_id is NULL when the whole object is sent as a
+    single PUT.
+    """
+    __tablename__ = "upload_session"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String(32), ForeignKey('users.id', ondelete="CASCADE"), nullable=True, index=True)
+    relic_id = Column(String(32), nullable=False)
+    s3_key = Column(String, nullable=False)
+    s3_upload_id = Column(String, nullable=True)
+    direct = Column(Boolean, nullable=False, server_default=text("false"), default=False)
+    upload_length = Column(BigInteger, nullable=False)
+    part_size = Column(BigInteger, nullable=False)
+    # "open" while parts are accepted, "completing" while the multipart upload is assembled
+    status = Column(String, nullable=False, server_default=text("'open'"), default="open")
+
+    # Relic metadata applied on completion
+    name = Column(String, nullable=True)
+    content_type = Column(String, nullable=False)
+    language_hint = Column(String, nullable=True)
+    access_level = Column(String, nullable=False, default="public")
+    expires_in = Column(String, nullable=True)
+    tags = Column(Text, nullable=True)  # comma-separated, as accepted by the raw upload endpoint
+    space_id = Column(String(32), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    parts = relationship("UploadPart", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+
+
+class UploadPart(Base):
+    """A stored part of an upload session; re-sending a part replaces it."""
+    __tablename__ = "upload_part"
+
+    upload_id = Column(String(32), ForeignKey('upload_session.id', ondelete="CASCADE"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    etag = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Relic(Base):
     """
     Relic model.
@@ -98,6 +277,11 @@ class Relic(Base):
 
     # Storage
     s3_key = Column(String)
+    # Strong validator for the (immutable) content, captured from S3 at upload time
+    etag = Column(String, nullable=True)
+    # Content blob this relic references (s3_key mirrors blob.s3_key); NULL for
+    # relics stored before deduplication, which own their object outright
+    blob_sha256 = Column(String(64), ForeignKey('blob.sha256'), nullable=True, index=True)
 
     # Access control
     # public: Listed in recents, discoverable
@@ -110,11 +294,34 @@ class Relic(Base):
     expires_at = Column(DateTime, nullable=True)
     access_count = Column(Integer, default=0)
     bookmark_count = Column(Integer, default=0)
+    # Denormalized counters maintained alongside the writes that change them
+    # (reconciled by the relic_counter_reconcile job)
+    comments_count = Column(Integer, nullable=False, server_default=text("0"), default=0)
+    forks_count = Column(Integer, nullable=False, server_default=text("0"), default=0)
 
     # Relationships
     tags = relationship("Tag", secondary=relic_tags, back_populates="relics", lazy="raise")
     spaces = relationship("Space", secondary=space_relics, back_populates="relics", lazy="raise")
     access_list = relationship("RelicAccess", back_populates="relic", cascade="all, delete-orphan", lazy="raise")
+    blob = relationship("Blob", lazy="raise")
+    derivative = relationship(
+        "RelicDerivative", primaryjoin="Relic.id == foreign(RelicDerivative.relic_id)",
+        uselist=False, viewonly=True, lazy="raise",
+    )
+
+    # (sort column, id) indexes back keyset pagination for each relic_sort_order option
+    __table_args__ = (
+        Index('ix_relic_created_at_id', 'created_at', 'id'),
+        Index('ix_relic_name_id', 'name', 'id'),
+        Index('ix_relic_size_bytes_id', 'size_bytes', 'id'),
+        Index('ix_relic_access_count_id', 'access_count', 'id'),
+        Index('ix_relic_bookmark_count_id', 'bookmark_count', 'id'),
+        Index('ix_relic_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        # Expired relic reaper; most relics never expire, so only rows with an expiry are indexed
+        Index('ix_relic_expires_at', 'expires_at', postgresql_where=text('expires_at IS NOT NULL')),
+        # Search indexes (pg_trgm GIN on name, tsvector GIN on name/description,
+        # id prefix) need the pg_trgm extension and are created by migration only
+    )
 
     @property
     def owner_name(self) -> Optional[str]:
@@ -187,6 +394,7 @@ class UserBookmark(Base):
     # Unique constraint to prevent duplicate bookmarks
     __table_args__ = (
         UniqueConstraint('user_id', 'relic_id', name='unique_user_relic_bookmark'),
+        Index('ix_user_bookmark_user_id_created_at_relic_id', 'user_id', 'created_at', 'relic_id'),
     )
 
 
@@ -1,7 +1,7 @@
 """Admin endpoints."""
 import logging
 from fastapi import APIRouter, Request, Depends, HTTPException, UploadFile, File, BackgroundTasks
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 
 logger = logging.getLogger(__name__)
 from sqlalchemy import func, case, select, update, delete
@@ -11,11 +11,18 @@ from typing import Optional
 
 from backend.config import settings
 from backend.database import get_db
-from backend.models import Relic, User, UserBookmark, RelicReport, Comment, Tag, Space
+from backend.models import Blob, Relic, User, UserBookmark, RelicReport, Comment, Tag, Space
 from backend.schemas import AdminGrant
-from backend.storage import storage_service
+from backend.storage import storage_service, upload_budget
+from backend.blobs import release_relic_content
+from backend.content_cache import content_cache
+from backend.archives import archive_index_cache
+from backend.diffs import diff_cache
+from backend.tasks import relocate_content
+from backend.counters import access_counter
+from backend.user_cache import user_cache
 from backend.dependencies import get_current_user, get_admin_user, is_admin_user
-from backend.utils import get_fork_counts, clamp_limit, apply_relic_search
+from backend.utils import clamp_limit, apply_relic_search, apply_relic_keyset, keyset_page, adjust_fork_count
 
 router = APIRouter(prefix="/api/v1/admin")
 
@@ -39,6 +46,8 @@ async def admin_list_all_relics(
     request: Request,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     access_level: Optional[str] = None,
     user_id: Optional[str] = None,
     search: Optional[str] = None,
@@ -76,39 +85,31 @@ async def admin_list_all_relics(
         else:
             stmt = stmt.where(False)
 
-    sort_field_map = {
-        "created_at": Relic.created_at,
-        "size_bytes": Relic.size_bytes,
-        "name": Relic.name,
-        "access_count": Relic.access_count,
-    }
-    sort_col = sort_field_map.get(sort_by, Relic.created_at)
-    order = sort_col.asc() if sort_order == "asc" else sort_col.desc()
-
-    total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_result.scalar()
-
-    relics_result = await db.execute(stmt.order_by(order).offset(offset).limit(limit))
-    relics = relics_result.unique().scalars().all()
-
-    # Fetch all counts in bulk (2 queries instead of N*2)
-    relic_ids = [r.id for r in relics]
-    comments_counts = {}
-
-    if relic_ids:
-        comments_result = await db.execute(
-            select(Comment.relic_id, func.count(Comment.id))
-            .where(Comment.relic_id.in_(relic_ids))
-            .group_by(Comment.relic_id)
+    # The admin UI sorts by "size_bytes" where the public endpoints use "size"
+    sort_overrides = {"size_bytes": Relic.size_bytes}
+    sort_order = "asc" if sort_order == "asc" else "desc"
+    try:
+        page_stmt = apply_relic_keyset(
+            stmt, sort_by, sort_order, limit, offset, cursor, sort_overrides, search=search
         )
-        comments_counts = {row[0]: row[1] for row in comments_result.all()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    forks_counts = await get_fork_counts(db, relic_ids)
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        total = total_result.scalar()
+
+    rows, next_cursor = keyset_page(
+        (await db.execute(page_stmt)).unique().all(), limit, sort_by, sort_order, sort_overrides, search=search
+    )
+    relics = [row[0] for row in rows]
 
     return {
         "total": total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
         "user_id": user_id,
         "relics": [
             {
@@ -121,10 +122,10 @@ async def admin_list_all_relics(
                 "content_type": r.content_type,
                 "size_bytes": r.size_bytes,
                 "access_level": r.access_level,
-                "access_count": r.access_count,
+                "access_count": access_counter.live_count(r),
                 "bookmark_count": r.bookmark_count,
-                "comments_count": comments_counts.get(r.id, 0),
-                "forks_count": forks_counts.get(r.id, 0),
+                "comments_count": r.comments_count,
+                "forks_count": r.forks_count,
                 "created_at": r.created_at,
                 "expires_at": r.expires_at,
                 "tags": [{"id": t.id, "name": t.name} for t in r.tags]
@@ -242,7 +243,10 @@ async def admin_get_stats(
         select(func.count(Comment.id)).scalar_subquery().label("total_comments"),
         select(func.count(UserBookmark.id)).scalar_subquery().label("total_bookmarks"),
         select(func.count(RelicReport.id)).scalar_subquery().label("total_reports"),
-        select(func.count(Space.id)).scalar_subquery().label("total_spaces")
+        select(func.count(Space.id)).scalar_subquery().label("total_spaces"),
+        # Deduplicated content: logical size vs bytes actually stored (compression at rest)
+        select(func.sum(Blob.size_bytes)).scalar_subquery().label("blob_size_bytes"),
+        select(func.sum(Blob.stored_size_bytes)).scalar_subquery().label("blob_stored_size_bytes")
     )
     result = await db.execute(stmt)
     stats = result.first()
@@ -255,6 +259,8 @@ async def admin_get_stats(
     return {
         "total_relics": stats.total_relics or 0,
         "total_size_bytes": stats.total_size_bytes or 0,
+        "blob_size_bytes": stats.blob_size_bytes or 0,
+        "blob_stored_size_bytes": stats.blob_stored_size_bytes or 0,
         "public_relics": stats.public_relics or 0,
         "private_relics": stats.private_relics or 0,
         "restricted_relics": stats.restricted_relics or 0,
@@ -263,7 +269,15 @@ async def admin_get_stats(
         "total_bookmarks": stats.total_bookmarks or 0,
         "total_reports": stats.total_reports or 0,
         "total_spaces": stats.total_spaces or 0,
-        "admin_count": len(admin_ids)
+        "admin_count": len(admin_ids),
+        # Upload part buffers currently held by this worker process
+        "upload_memory": upload_budget.snapshot(),
+        # Local content cache counters for this worker process
+        "content_cache": content_cache.snapshot(),
+        # Parsed archive listings held by this worker process
+        "archive_index_cache": archive_index_cache.snapshot(),
+        # Fork comparison edit scripts held by this worker process
+        "diff_cache": diff_cache.snapshot()
     }
 
 
@@ -296,16 +310,17 @@ async def admin_delete_user(
             detail="Cannot delete admin user"
         )
 
+    # Content objects no longer referenced by any relic, deleted after commit
+    unreferenced_keys = []
     if delete_relics:
         # Delete all relics owned by this user
         relics_result = await db.execute(select(Relic).where(Relic.user_id == user_id))
         user_relics = relics_result.scalars().all()
         for relic in user_relics:
-            try:
-                await storage_service.delete(relic.s3_key)
-            except Exception as e:
-                logger.error(f"Failed to delete file from S3: {e}")
+            parent_id = relic.fork_of
             await db.delete(relic)
+            unreferenced_keys.append(await release_relic_content(db, relic))
+            await adjust_fork_count(db, parent_id, -1)
     else:
         # Just disassociate relics from user
         await db.execute(
@@ -326,6 +341,10 @@ async def admin_delete_user(
     # Delete user
     await db.delete(user)
     await db.commit()
+    user_cache.invalidate(user_id)
+    failed = await storage_service.delete_many(key for key in unreferenced_keys if key)
+    if failed:
+        logger.warning(f"User {user_id} deleted but {len(failed)} unreferenced S3 object(s) were not removed")
 
     return {"message": f"User {user_id} deleted successfully"}
 
@@ -408,6 +427,7 @@ async def admin_add_admin(
 
     user.is_admin = True
     await db.commit()
+    user_cache.invalidate(user.id)
 
     return {
         "message": f"Admin privileges granted to {user.public_id}",
@@ -438,6 +458,7 @@ async def admin_grant_admin(
 
     user.is_admin = True
     await db.commit()
+    user_cache.invalidate(user_id)
 
     return {"message": f"User {user_id} granted admin privileges", "is_admin": True}
 
@@ -476,6 +497,7 @@ async def admin_revoke_admin(
 
     user.is_admin = False
     await db.commit()
+    user_cache.invalidate(user_id)
 
     return {"message": f"User {user_id} admin privileges revoked", "is_admin": False}
 
@@ -506,11 +528,54 @@ async def admin_get_config(
             "S3_ACCESS_KEY": settings.S3_ACCESS_KEY,
             "S3_SECRET_KEY": settings.S3_SECRET_KEY,
             "S3_BUCKET_NAME": settings.S3_BUCKET_NAME,
-            "S3_REGION": settings.S3_REGION
+            "S3_REGION": settings.S3_REGION,
+            "COMPRESS_AT_REST": settings.COMPRESS_AT_REST,
+            "COMPRESS_AT_REST_CODEC": settings.COMPRESS_AT_REST_CODEC,
+            "COMPRESS_AT_REST_LEVEL": settings.COMPRESS_AT_REST_LEVEL
         },
         "upload": {
             "MAX_UPLOAD_SIZE": settings.MAX_UPLOAD_SIZE,
-            "MAX_UPLOAD_SIZE_MB": settings.MAX_UPLOAD_SIZE / 1024 / 1024
+            "MAX_UPLOAD_SIZE_MB": settings.MAX_UPLOAD_SIZE / 1024 / 1024,
+            "UPLOAD_MEMORY_BUDGET_MB": settings.UPLOAD_MEMORY_BUDGET_MB,
+            "UPLOAD_MEMORY_WAIT_TIMEOUT": settings.UPLOAD_MEMORY_WAIT_TIMEOUT,
+            "RESUMABLE_UPLOAD_PART_SIZE_MB": settings.RESUMABLE_UPLOAD_PART_SIZE_MB,
+            "RESUMABLE_UPLOAD_TTL_HOURS": settings.RESUMABLE_UPLOAD_TTL_HOURS,
+            "DIRECT_UPLOAD_ENABLED": settings.DIRECT_UPLOAD_ENABLED,
+            "PRESIGNED_URL_EXPIRY": settings.PRESIGNED_URL_EXPIRY
+        },
+        "download": {
+            "DOWNLOAD_MODE": settings.DOWNLOAD_MODE,
+            "DOWNLOAD_OFFLOAD_MIN_SIZE": settings.DOWNLOAD_OFFLOAD_MIN_SIZE,
+            "DOWNLOAD_ACCEL_PREFIX": settings.DOWNLOAD_ACCEL_PREFIX,
+            "DOWNLOAD_URL_EXPIRY": settings.DOWNLOAD_URL_EXPIRY,
+            "INLINE_CONTENT_MAX_SIZE": settings.INLINE_CONTENT_MAX_SIZE,
+            "CONTENT_CACHE_DIR": settings.CONTENT_CACHE_DIR,
+            "CONTENT_CACHE_MAX_MB": settings.CONTENT_CACHE_MAX_MB,
+            "CONTENT_CACHE_MAX_OBJECT_MB": settings.CONTENT_CACHE_MAX_OBJECT_MB,
+            "ARCHIVE_MAX_ENTRIES": settings.ARCHIVE_MAX_ENTRIES,
+            "ARCHIVE_INDEX_CACHE_ENTRIES": settings.ARCHIVE_INDEX_CACHE_ENTRIES,
+            "ARCHIVE_INDEX_ENABLED": settings.ARCHIVE_INDEX_ENABLED,
+            "ARCHIVE_INDEX_INTERVAL": settings.ARCHIVE_INDEX_INTERVAL,
+            "ARCHIVE_CHECKPOINT_SPAN_MB": settings.ARCHIVE_CHECKPOINT_SPAN_MB
+        },
+        "previews": {
+            "DERIVATIVES_ENABLED": settings.DERIVATIVES_ENABLED,
+            "DERIVATIVE_INTERVAL": settings.DERIVATIVE_INTERVAL,
+            "DERIVATIVE_WORKERS": settings.DERIVATIVE_WORKERS,
+            "DERIVATIVE_THUMBNAIL_SIZE": settings.DERIVATIVE_THUMBNAIL_SIZE,
+            "DERIVATIVE_MAX_SOURCE_MB": settings.DERIVATIVE_MAX_SOURCE_MB,
+            "DERIVATIVE_SNIPPET_LINES": settings.DERIVATIVE_SNIPPET_LINES,
+            "LINE_INDEX_ENABLED": settings.LINE_INDEX_ENABLED,
+            "LINE_INDEX_MIN_SIZE_MB": settings.LINE_INDEX_MIN_SIZE_MB,
+            "LINE_INDEX_SAMPLE_LINES": settings.LINE_INDEX_SAMPLE_LINES,
+            "LINE_INDEX_INTERVAL": settings.LINE_INDEX_INTERVAL
+        },
+        "diffs": {
+            "DIFF_MAX_SIZE_MB": settings.DIFF_MAX_SIZE_MB,
+            "DIFF_WORKERS": settings.DIFF_WORKERS,
+            "DIFF_CACHE_OPCODES": settings.DIFF_CACHE_OPCODES,
+            "DIFF_CONCURRENCY": settings.DIFF_CONCURRENCY,
+            "DIFF_WAIT_TIMEOUT": settings.DIFF_WAIT_TIMEOUT
         },
         "backup": {
             "BACKUP_ENABLED": settings.BACKUP_ENABLED,
@@ -520,7 +585,9 @@ async def admin_get_config(
             "BACKUP_RETENTION_WEEKS": settings.BACKUP_RETENTION_WEEKS,
             "BACKUP_CLEANUP_ENABLED": settings.BACKUP_CLEANUP_ENABLED,
             "BACKUP_ON_STARTUP": settings.BACKUP_ON_STARTUP,
-            "BACKUP_ON_SHUTDOWN": settings.BACKUP_ON_SHUTDOWN
+            "BACKUP_ON_SHUTDOWN": settings.BACKUP_ON_SHUTDOWN,
+            "BACKUP_COMPRESSION": settings.BACKUP_COMPRESSION,
+            "BACKUP_COMPRESSION_LEVEL": settings.BACKUP_COMPRESSION_LEVEL
         },
         "admin": {
             "ADMIN_USER_IDS": settings.get_admin_user_ids()
@@ -614,6 +681,36 @@ async def admin_create_backup(
         return {"success": False, "message": "Backup operation failed"}
 
 
+@router.post("/storage/relocate", response_model=dict)
+async def admin_relocate_content(
+    to: str,
+    request: Request,
+    limit: int = 1000,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    [ADMIN] Move existing relic content between S3 and inline (Postgres) storage.
+
+    to=inline moves content up to INLINE_CONTENT_MAX_SIZE bytes out of S3;
+    to=s3 moves inline content above that size (all of it when inline
+    storage is disabled) back to S3. At most `limit` items are moved per
+    call; repeat until "moved" is 0. Requires admin privileges.
+    """
+    await get_admin_user(request, db)
+    if to not in ("inline", "s3"):
+        raise HTTPException(status_code=400, detail="to must be 'inline' or 's3'")
+    if to == "inline" and settings.INLINE_CONTENT_MAX_SIZE <= 0:
+        raise HTTPException(status_code=400, detail="Inline storage is disabled (INLINE_CONTENT_MAX_SIZE is 0)")
+
+    # The relocation runs its own short transactions around the S3 transfers
+    await db.close()
+    try:
+        return await relocate_content(to, max(1, limit))
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+
 @router.get("/backups/{filename}/download")
 async def admin_download_backup(
     filename: str,
@@ -625,23 +722,28 @@ async def admin_download_backup(
 
     Requires admin privileges.
     """
+    from backend.backup import BACKUP_CODECS, backup_codec, is_backup_filename
+
     await get_admin_user(request, db)
 
     # Validate filename format
-    if not filename.startswith('backup-') or not filename.endswith('.sql.gz'):
+    if not is_backup_filename(filename):
         raise HTTPException(status_code=400, detail="Invalid backup filename")
 
     key = f"db/{filename}"
+    # Don't hold a pooled connection for the length of the download
+    await db.close()
 
     try:
-        # Get the backup file from S3
-        data = await storage_service.download(key)
+        # Stream the backup file from S3
+        body, content_length = await storage_service.stream(key)
 
-        return Response(
-            content=data,
-            media_type="application/gzip",
+        return StreamingResponse(
+            body,
+            media_type=BACKUP_CODECS[backup_codec(filename)][1],
             headers={
-                "Content-Disposition": f"attachment; filename={filename}"
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Content-Length": str(content_length)
             }
         )
     except Exception as e:
@@ -666,12 +768,12 @@ async def admin_restore_backup(
 
     Requires admin privileges.
     """
-    from backend.backup import perform_restore
+    from backend.backup import perform_restore, is_backup_filename
     from backend.database import sync_engine
 
     await get_admin_user(request, db)
 
-    if not filename.startswith('backup-') or not filename.endswith('.sql.gz'):
+    if not is_backup_filename(filename):
         raise HTTPException(status_code=400, detail="Invalid backup filename")
 
     # Close the db session before restore terminates all connections.
@@ -680,6 +782,7 @@ async def admin_restore_backup(
     logger.warning(f"Admin restore initiated: {filename}")
     try:
         result = await perform_restore(filename, sync_engine)
+        user_cache.clear()
         return {"success": True, "message": result['message'], "filename": filename,
                 "log": result.get('log', ''), "stdout": result.get('stdout', ''), "stderr": result.get('stderr', '')}
     except Exception as e:
@@ -694,30 +797,31 @@ async def admin_restore_from_upload(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    [ADMIN] Restore the database from an uploaded .sql.gz file. DESTRUCTIVE.
+    [ADMIN] Restore the database from an uploaded .sql.gz or .sql.zst file. DESTRUCTIVE.
 
-    Accepts a gzip-compressed SQL dump (as produced by pg_dump).
+    Accepts a gzip- or zstd-compressed SQL dump (as produced by pg_dump).
     Terminates active connections, replaces all current data, recycles the pool.
 
     Requires admin privileges.
     """
-    from backend.backup import perform_restore_upload
+    from backend.backup import perform_restore_upload, backup_codec
     from backend.database import sync_engine
 
     await get_admin_user(request, db)
 
-    if not file.filename or not file.filename.endswith('.sql.gz'):
-        raise HTTPException(status_code=400, detail="File must be a .sql.gz backup")
+    if not file.filename or backup_codec(file.filename) is None:
+        raise HTTPException(status_code=400, detail="File must be a .sql.gz or .sql.zst backup")
 
-    compressed = await file.read()
-    if len(compressed) == 0:
+    if file.size == 0:
         raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
     await db.close()
 
-    logger.warning(f"Admin restore from upload initiated: {file.filename} ({len(compressed):,} bytes)")
+    # The multipart parser has spooled the upload to a temp file; it is streamed from there into psql
+    logger.warning(f"Admin restore from upload initiated: {file.filename} ({file.size or 0:,} bytes)")
     try:
-        result = await perform_restore_upload(compressed, file.filename, sync_engine)
+        result = await perform_restore_upload(file.read, file.filename, sync_engine, size=file.size)
+        user_cache.clear()
         return {"success": True, "message": result['message'], "filename": file.filename,
                 "log": result.get('log', ''), "stdout": result.get('stdout', ''), "stderr": result.get('stderr', '')}
     except Exception as e:
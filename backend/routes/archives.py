@@ -0,0 +1,151 @@
+"""
+Archive relic endpoints.
+
+ZIP, tar and tar.gz relics are browsed without downloading them:
+
+    GET /api/v1/relics/{id}/archive/entries          listing (prefix filter, offset/limit paging)
+    GET /api/v1/relics/{id}/archive/entries/{path}   one member, decompressed
+
+A ZIP listing comes from the archive's central directory, read with ranged
+requests; a tar listing from the index the archive_index job stores after
+upload (503 until it exists). Listings are cached, and a member is read
+from its own byte range only (see backend.archives). Access rules are
+those of the raw content.
+"""
+from typing import Optional
+import logging
+import mimetypes
+import urllib.parse
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.archives import (
+    ArchiveError, ArchiveNotIndexed, UnsupportedArchiveError, archive_content_key, relic_archive_index,
+    relic_member_stream,
+)
+from backend.blobs import with_inline_content
+from backend.database import get_db
+from backend.dependencies import get_readable_relic
+from backend.models import BlobArchiveIndex
+from backend.schemas import ArchiveEntryResponse, ArchiveListingResponse
+from backend.utils import clamp_limit
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/api/v1/relics")
+
+
+# Seconds clients are asked to wait for a tar index being built
+INDEX_RETRY_AFTER = 30
+
+
+def _archive_error(e: ArchiveError) -> HTTPException:
+    if isinstance(e, ArchiveNotIndexed):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(INDEX_RETRY_AFTER)})
+    return HTTPException(status_code=415 if isinstance(e, UnsupportedArchiveError) else 422, detail=str(e))
+
+
+async def _load_archive(db: AsyncSession, request: Request, relic_id: str, password: Optional[str]):
+    """Readable relic and its archive index row (if any), with the DB connection released."""
+    relic = await get_readable_relic(db, request, relic_id, password, with_inline_content())
+    record = await db.get(BlobArchiveIndex, archive_content_key(relic))
+    await db.close()
+    return relic, record
+
+
+@router.get("/{relic_id}/archive/entries", response_model=ArchiveListingResponse)
+async def list_archive_entries(
+    relic_id: str,
+    request: Request,
+    prefix: Optional[str] = None,
+    limit: int = 1000,
+    offset: int = 0,
+    password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List the members of an archive relic.
+
+    Entries are in archive order; prefix keeps only paths
+    starting with it (e.g. "docs/" for one directory and everything below).
+    """
+    relic, record = await _load_archive(db, request, relic_id, password)
+
+    try:
+        index = await relic_archive_index(relic, record)
+    except ArchiveError as e:
+        raise _archive_error(e)
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    entries = index.entries
+    if prefix:
+        entries = [entry for entry in entries if entry.path.startswith(prefix)]
+    limit = clamp_limit(limit, default=1000)
+    offset = max(offset, 0)
+    return ArchiveListingResponse(
+        format=index.format,
+        entries=[
+            ArchiveEntryResponse(
+                path=entry.path,
+                is_dir=entry.is_dir,
+                size=entry.size,
+                compressed_size=entry.compressed_size,
+                method=entry.method_name,
+                modified=entry.modified,
+            )
+            for entry in entries[offset:offset + limit]
+        ],
+        total=len(entries),
+        limit=limit,
+        offset=offset,
+    )
+
+
+@router.get("/{relic_id}/archive/entries/{path:path}")
+async def get_archive_entry(
+    relic_id: str,
+    path: str,
+    request: Request,
+    password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stream one member of an archive relic, decompressed.
+
+    Only the member's own bytes are read from storage (for tar.gz, from
+    the nearest checkpoint before it). A ZIP member that fails its CRC
+    check is cut off mid-stream (the response is incomplete).
+    """
+    relic, record = await _load_archive(db, request, relic_id, password)
+
+    try:
+        index = await relic_archive_index(relic, record)
+        entry = index.by_path.get(path)
+        if entry is None or entry.is_dir:
+            raise HTTPException(status_code=404, detail="Archive entry not found")
+        body = await relic_member_stream(relic, index, entry)
+    except HTTPException:
+        raise
+    except ArchiveError as e:
+        raise _archive_error(e)
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    filename = path.rsplit("/", 1)[-1]
+    headers = {
+        "Content-Length": str(entry.size),
+        "Content-Disposition": "inline; filename*=UTF-8''{filename}".format(
+            filename=urllib.parse.quote(filename, safe="")
+        ),
+        # Relic content is immutable, so is each member
+        "ETag": f'"{relic.etag or relic.id}-{entry.offset:x}"',
+        "Cache-Control": "private, no-cache",
+    }
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
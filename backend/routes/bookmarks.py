@@ -7,9 +7,11 @@ from datetime import datetime
 from typing import Optional
 
 from backend.database import get_db
-from backend.models import Relic, UserBookmark, Comment, User, Tag
+from backend.models import Relic, UserBookmark, User, Tag
+from backend.counters import access_counter
+from backend.derivatives import relic_preview, with_derivative
 from backend.dependencies import get_current_user
-from backend.utils import get_fork_counts, clamp_limit, apply_relic_search, relic_sort_order
+from backend.utils import clamp_limit, apply_relic_search, apply_relic_keyset, keyset_page
 
 router = APIRouter(prefix="/api/v1/bookmarks")
 
@@ -149,6 +151,8 @@ async def get_user_bookmarks(
     sort_order: str = "desc",
     limit: int = 25,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -168,7 +172,8 @@ async def get_user_bookmarks(
         Relic, UserBookmark.relic_id == Relic.id
     ).options(
         selectinload(Relic.tags),
-        joinedload(Relic.owner)
+        joinedload(Relic.owner),
+        with_derivative()
     ).where(
         UserBookmark.user_id == user.id
     )
@@ -186,30 +191,28 @@ async def get_user_bookmarks(
                 "total": 0,
                 "limit": limit,
                 "offset": offset,
+                "next_cursor": None,
             }
 
     if search:
         stmt = apply_relic_search(stmt, search)
 
-    order = relic_sort_order(sort_by, sort_order, {"created_at": UserBookmark.created_at})
-
-    total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_result.scalar()
-
-    rows = (await db.execute(stmt.order_by(order).offset(offset).limit(limit))).all()
-
-    relic_ids = [relic.id for _, relic in rows]
-    comments_counts = {}
-
-    if relic_ids:
-        comments_result = await db.execute(
-            select(Comment.relic_id, func.count(Comment.id))
-            .where(Comment.relic_id.in_(relic_ids))
-            .group_by(Comment.relic_id)
+    sort_overrides = {"created_at": UserBookmark.created_at}
+    try:
+        page_stmt = apply_relic_keyset(
+            stmt, sort_by, sort_order, limit, offset, cursor, sort_overrides, search=search
         )
-        comments_counts = {row[0]: row[1] for row in comments_result.all()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    forks_counts = await get_fork_counts(db, relic_ids)
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        total = total_result.scalar()
+
+    rows, next_cursor = keyset_page(
+        (await db.execute(page_stmt)).all(), limit, sort_by, sort_order, sort_overrides, search=search
+    )
 
     return {
         "user_id": user.id,
@@ -217,6 +220,7 @@ async def get_user_bookmarks(
         "total": total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
         "bookmarks": [
             {
                 "id": relic.id,
@@ -225,17 +229,18 @@ async def get_user_bookmarks(
                 "size_bytes": relic.size_bytes,
                 "created_at": relic.created_at,
                 "access_level": relic.access_level,
-                "access_count": relic.access_count,
+                "access_count": access_counter.live_count(relic),
                 "bookmark_count": relic.bookmark_count,
-                "comments_count": comments_counts.get(relic.id, 0),
-                "forks_count": forks_counts.get(relic.id, 0),
+                "comments_count": relic.comments_count,
+                "forks_count": relic.forks_count,
                 "bookmark_id": bookmark.id,
                 "bookmarked_at": bookmark.created_at,
                 "owner_name": relic.owner_name,
                 "owner_public_id": relic.owner_public_id,
-                "tags": [{"id": t.id, "name": t.name} for t in relic.tags]
+                "tags": [{"id": t.id, "name": t.name} for t in relic.tags],
+                "preview": relic_preview(relic)
             }
-            for bookmark, relic in rows
+            for bookmark, relic, *_ in rows
         ]
     }
 
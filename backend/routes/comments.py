@@ -1,7 +1,7 @@
 """Comment endpoints."""
 from fastapi import APIRouter, Request, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from typing import List, Optional
 
 from backend.database import get_db
@@ -45,6 +45,9 @@ async def create_comment(
         parent_id=comment.parent_id
     )
     db.add(db_comment)
+    await db.execute(
+        update(Relic).where(Relic.id == relic_id).values(comments_count=Relic.comments_count + 1)
+    )
     await db.commit()
     await db.refresh(db_comment)
 
@@ -159,5 +162,12 @@ async def delete_comment(
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
     await db.delete(comment)
+    await db.flush()
+    # Replies are deleted along with the comment, so recount rather than decrement
+    await db.execute(
+        update(Relic)
+        .where(Relic.id == relic_id)
+        .values(comments_count=select(func.count(Comment.id)).where(Comment.relic_id == relic_id).scalar_subquery())
+    )
     await db.commit()
     return {"status": "deleted"}
@@ -0,0 +1,149 @@
+"""
+Fork comparison.
+
+    GET /api/v1/relics/{id}/diff/{other_id}           unified diff, streamed hunk by hunk
+    GET /api/v1/relics/{id}/diff/{other_id}/summary   added/removed line counts only
+
+Both relics must be text. The diff is computed server-side (see
+backend.diffs) and cached per pair; a summary of a pair diffed before reads
+no content. Access rules are those of the raw content of both relics:
+password applies to relic_id, other_password to other_id.
+Requests that find DIFF_CONCURRENCY diffs holding content in memory for
+DIFF_WAIT_TIMEOUT seconds are answered 503 with Retry-After.
+"""
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.blobs import with_inline_content
+from backend.database import get_db
+from backend.dependencies import get_readable_relic
+from backend.diffs import DiffBusy, DiffError, diff_slot, read_pair, relic_diff, unified_diff
+from backend.line_diff import group_hunks
+from backend.schemas import RelicDiffSummaryResponse
+from backend.utils import etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/api/v1/relics")
+
+
+# Largest number of unchanged lines shown around each change
+MAX_CONTEXT = 100
+
+
+async def _load_pair(db: AsyncSession, request: Request, relic_id: str, other_id: str, password, other_password):
+    relic = await get_readable_relic(db, request, relic_id, password, with_inline_content())
+    other = await get_readable_relic(db, request, other_id, other_password, with_inline_content())
+    await db.close()
+    return relic, other
+
+
+def _busy_error(e: DiffBusy) -> HTTPException:
+    return HTTPException(
+        status_code=503, detail="Server is busy, retry later", headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def _validators(relic, other, kind: str) -> dict:
+    # Relic content is immutable, so is the diff of two relics
+    return {
+        "ETag": f'"{relic.etag or relic.id}-{other.etag or other.id}-{kind}"',
+        "Cache-Control": "private, no-cache",
+    }
+
+
+@router.get("/{relic_id}/diff/{other_id}")
+async def get_relic_diff(
+    relic_id: str,
+    other_id: str,
+    request: Request,
+    context: int = 3,
+    password: Optional[str] = None,
+    other_password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Line diff from relic_id to other_id in unified format (text/x-diff).
+
+    context is the number of unchanged lines around each change (0-100).
+    The body is empty when the contents are identical.
+    """
+    context = min(max(context, 0), MAX_CONTEXT)
+    relic, other = await _load_pair(db, request, relic_id, other_id, password, other_password)
+
+    validators = _validators(relic, other, f"diff-{context}")
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+
+    # Both contents stay in memory until the last hunk is sent
+    slot = None
+    try:
+        slot = await diff_slot()
+        contents = await read_pair(relic, other)
+        script = await relic_diff(relic, other, contents)
+    except Exception as e:
+        if slot is not None:
+            slot.release()
+        if isinstance(e, DiffBusy):
+            raise _busy_error(e)
+        if isinstance(e, DiffError):
+            raise HTTPException(status_code=422, detail=str(e))
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    headers = {
+        **validators,
+        "X-Diff-Additions": str(script.additions),
+        "X-Diff-Deletions": str(script.deletions),
+    }
+    return StreamingResponse(
+        unified_diff(relic, other, contents, script, context, slot),
+        media_type="text/x-diff; charset=utf-8",
+        headers=headers,
+    )
+
+
+@router.get("/{relic_id}/diff/{other_id}/summary", response_model=RelicDiffSummaryResponse)
+async def get_relic_diff_summary(
+    relic_id: str,
+    other_id: str,
+    request: Request,
+    response: Response,
+    context: int = 3,
+    password: Optional[str] = None,
+    other_password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Counts of the diff from relic_id to other_id; hunks is counted with the given context."""
+    context = min(max(context, 0), MAX_CONTEXT)
+    relic, other = await _load_pair(db, request, relic_id, other_id, password, other_password)
+
+    validators = _validators(relic, other, f"diff-summary-{context}")
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+
+    try:
+        script = await relic_diff(relic, other)
+    except DiffBusy as e:
+        raise _busy_error(e)
+    except DiffError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    response.headers.update(validators)
+    return RelicDiffSummaryResponse(
+        relic_id=relic.id,
+        other_id=other.id,
+        identical=not (script.additions or script.deletions),
+        additions=script.additions,
+        deletions=script.deletions,
+        hunks=sum(1 for _ in group_hunks(script, context)),
+        exact=script.exact,
+    )
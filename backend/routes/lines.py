@@ -0,0 +1,76 @@
+"""
+Windowed line access to text relics.
+
+    GET /api/v1/relics/{id}/lines?start=&count=   lines start .. start + count - 1
+
+Line numbers are 1-based, like comment line numbers. Large relics are read
+through the line index the line_index job builds after upload (503 until it
+exists): one small read of the index and one ranged read of the content,
+wherever in the file the window is (see backend.line_index). Access rules
+are those of the raw content.
+"""
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.blobs import with_inline_content
+from backend.database import get_db
+from backend.dependencies import get_readable_relic
+from backend.line_index import LineIndexError, LineIndexPending, needs_line_index, read_line_window
+from backend.models import RelicLineIndex
+from backend.schemas import RelicLinesResponse
+from backend.utils import clamp_limit, etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/api/v1/relics")
+
+
+# Seconds clients are asked to wait for a line index being built
+INDEX_RETRY_AFTER = 30
+
+
+@router.get("/{relic_id}/lines", response_model=RelicLinesResponse)
+async def get_relic_lines(
+    relic_id: str,
+    request: Request,
+    response: Response,
+    start: int = 1,
+    count: int = 100,
+    password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Read count lines of a text relic from line start on.
+
+    Line endings are removed (\\n and \\r\\n); lines over 64 KiB are cut.
+    Past the last line, lines is empty. total_lines is the line count of
+    the whole content.
+    """
+    start = max(start, 1)
+    count = clamp_limit(count, default=100)
+    relic = await get_readable_relic(db, request, relic_id, password, with_inline_content())
+    record = await db.get(RelicLineIndex, relic.id) if needs_line_index(relic) else None
+    await db.close()
+
+    # Relic content is immutable, so is every window of it
+    validators = {"ETag": f'"{relic.etag or relic.id}-lines-{start}-{count}"', "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+
+    try:
+        window = await read_line_window(relic, record, start - 1, count)
+    except LineIndexPending as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(INDEX_RETRY_AFTER)})
+    except LineIndexError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    response.headers.update(validators)
+    return RelicLinesResponse(start=start, lines=window.lines, total_lines=window.total)
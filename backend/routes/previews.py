@@ -0,0 +1,58 @@
+"""
+Relic preview endpoints.
+
+Listings carry each relic's preview (see backend.derivatives): a text
+snippet inline, or the URL of a thumbnail served here:
+
+    GET /api/v1/relics/{id}/thumbnail   WebP thumbnail (404 until it exists)
+
+Access rules are those of the raw content.
+"""
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import get_db
+from backend.dependencies import get_readable_relic
+from backend.derivatives import with_derivative
+from backend.storage import storage_service
+from backend.thumbnails import THUMBNAIL_CONTENT_TYPE
+from backend.utils import etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/api/v1/relics")
+
+
+@router.get("/{relic_id}/thumbnail")
+async def get_relic_thumbnail(
+    relic_id: str,
+    request: Request,
+    password: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Thumbnail of an image, PDF or Excalidraw relic, made in the background after upload."""
+    relic = await get_readable_relic(db, request, relic_id, password, with_derivative())
+    await db.close()
+
+    derivative = relic.derivative
+    if derivative is None or not derivative.thumbnail_key:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    # Thumbnails are made once and never change
+    validators = {"ETag": f'"{relic.etag or relic.id}-thumbnail"', "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+
+    try:
+        body, length = await storage_service.stream(derivative.thumbnail_key)
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+    return StreamingResponse(
+        body, media_type=THUMBNAIL_CONTENT_TYPE, headers={**validators, "Content-Length": str(length)}
+    )
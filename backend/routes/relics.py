@@ -1,24 +1,38 @@
 """Relic CRUD and content endpoints."""
-from fastapi import APIRouter, Request, Depends, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import selectinload, joinedload, contains_eager
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, or_, select, update
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from datetime import datetime
 from typing import Optional, List
+import hashlib
 import logging
+import secrets
 import urllib.parse
 
 from backend.config import settings
 from backend.database import get_db
-from backend.models import Relic, User, Tag, Space, Comment, RelicAccess, space_relics
+from backend.models import Relic, User, Tag, RelicAccess
 from backend.schemas import RelicResponse, RelicListResponse, RelicUpdate, RelicAccessAdd, RelicAccessEntry
-from backend.storage import storage_service, FileTooLargeError
-from backend.utils import parse_expiry_string, is_expired, hash_password, get_fork_count, get_fork_counts, clamp_limit, like_term, apply_relic_search, relic_sort_order
+from backend.storage import storage_service, FileTooLargeError, UploadBudgetExceeded
+from backend.blobs import (
+    upload_blob, register_blob, add_blob_reference, release_relic_content, delete_released_object,
+    with_inline_content, inline_content, stored_encoding, stream_content, BLOB_KEY_PREFIX,
+)
+from backend.content_cache import content_cache
+from backend.counters import access_counter
+from backend.derivatives import derivative_kind, relic_preview, with_derivative
+from backend.tasks import enqueue_background_work, request_derivation
+from backend.form_stream import StreamingForm, FormStreamError, multipart_openapi
+from backend.utils import (
+    parse_expiry_string, is_expired, hash_password, adjust_fork_count, clamp_limit,
+    like_term, apply_relic_search, apply_relic_keyset, keyset_page, parse_range_header, http_date, parse_http_date,
+    etag_matches, accepts_encoding
+)
 from backend.dependencies import (
     get_current_user, check_ownership_or_admin,
-    process_tags, generate_unique_relic_id, check_space_access
+    process_tags, generate_unique_relic_id,
+    create_relic_record, upload_busy_error, get_readable_relic
 )
 
 logger = logging.getLogger(__name__)
@@ -27,145 +41,121 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-async def _create_relic_record(
-    db: AsyncSession,
-    user: Optional[User],
-    relic_id: str,
-    s3_key: str,
-    size_bytes: int,
-    *,
-    name: Optional[str],
-    content_type: str,
-    language_hint: Optional[str],
-    access_level: str,
-    expires_in: Optional[str],
-    tags: Optional[List[str]],
-    space_id: Optional[str],
-) -> dict:
-    """Create the relic DB record after content is already in storage. Commits."""
-    expires_at = parse_expiry_string(expires_in)
-    tag_objects = await process_tags(db, tags) if tags else []
-
-    relic = Relic(
-        id=relic_id,
-        user_id=user.id if user else None,
-        name=name,
-        content_type=content_type,
-        language_hint=language_hint,
-        size_bytes=size_bytes,
-        s3_key=s3_key,
-        access_level=access_level,
-        created_at=datetime.utcnow(),
-        expires_at=expires_at
-    )
-
-    if tag_objects:
-        relic.tags = tag_objects
-
-    # Update user relic count (flushed with commit)
-    if user:
-        user.relic_count += 1
+def _form_tags(form: StreamingForm) -> Optional[List[str]]:
+    """Tags from repeated form fields, or one comma-separated value; None when absent."""
+    tags = form.getlist("tags") or None
+    if tags and len(tags) == 1 and ',' in tags[0]:
+        tags = [t.strip() for t in tags[0].split(',')]
+    return tags
 
-    db.add(relic)
 
-    # Add to space if space_id is provided
-    if space_id:
-        space_result = await db.execute(select(Space).where(Space.id == space_id))
-        space = space_result.scalar_one_or_none()
-        if space and user and await check_space_access(space, user.id, db, "editor"):
-            await db.flush()
-            await db.execute(pg_insert(space_relics).values(space_id=space.id, relic_id=relic.id).on_conflict_do_nothing())
+def _declared_length(request: Request) -> Optional[int]:
+    """Content-Length sent by the client, or None for chunked/absent; rejects it if over MAX_UPLOAD_SIZE."""
+    declared_length = request.headers.get("content-length")
+    if not declared_length or not declared_length.isdigit():
+        return None
+    if int(declared_length) > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="File too large")
+    return int(declared_length)
 
-    await db.commit()
 
-    return {
-        "id": relic.id,
-        "name": relic.name,
-        "content_type": relic.content_type,
-        "language_hint": relic.language_hint,
-        "url": f"/{relic.id}",
-        "created_at": relic.created_at,
-        "size_bytes": relic.size_bytes
-    }
+def _check_access_level(access_level: Optional[str]) -> None:
+    """Reject an access_level form value other than public/private/restricted (empty: not sent)."""
+    if access_level and access_level not in ("public", "private", "restricted"):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid access_level. Must be 'public', 'private', or 'restricted'."
+        )
 
 
-@router.post("/api/v1/relics", response_model=dict)
-async def create_relic(
-    request: Request,
-    file: Optional[UploadFile] = File(None),
-    name: Optional[str] = Form(None),
-    content_type: Optional[str] = Form(None),
-    language_hint: Optional[str] = Form(None),
-    access_level: str = Form("public"),
-    expires_in: Optional[str] = Form(None),
-    tags: Optional[List[str]] = Form(None),
-    space_id: Optional[str] = Form(None),
-    db: AsyncSession = Depends(get_db)
-):
+@router.post(
+    "/api/v1/relics",
+    response_model=dict,
+    openapi_extra=multipart_openapi(
+        "file", ["name", "content_type", "language_hint", "access_level", "expires_in", "tags", "space_id"],
+        required=True,
+    ),
+)
+async def create_relic(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Create a new relic.
 
-    Accepts either file upload or raw content in body.
+    Accepts a multipart form with a file part and optional fields: name,
+    content_type, language_hint, access_level, expires_in, tags, space_id.
+    The form is parsed as it arrives and the file part streams straight to
+    storage, so uploads are never spooled to local disk.
     """
-    # Normalize tags input - handle if it comes as comma-separated string in a single list element
-    if tags and len(tags) == 1 and ',' in tags[0]:
-        tags = [t.strip() for t in tags[0].split(',')]
-
-    # Validate access_level
-    if access_level not in ("public", "private", "restricted"):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid access_level. Must be 'public', 'private', or 'restricted'."
-        )
-
     # Validate user key if provided (anonymous creation is allowed)
     user = await get_current_user(request, db)
     if not user and request.headers.get("X-User-Key"):
         raise HTTPException(status_code=401, detail="Invalid user key")
 
+    # Reject oversized uploads before touching the body when the client declares a length;
+    # the declared length also sizes the multipart upload parts
+    declared_length = _declared_length(request)
+
+    try:
+        form = StreamingForm(request)
+        file = await form.next_file("file")
+    except FormStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Fields sent before the file are checked before any bytes are stored
+    _check_access_level(form.get("access_level"))
     if not file:
         raise HTTPException(status_code=400, detail="No content provided")
 
-    # Reject oversized uploads before touching the body when the client declares a length
-    declared_length = request.headers.get("content-length")
-    if declared_length and declared_length.isdigit() and int(declared_length) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=413, detail="File too large")
-
-    s3_key = None
+    uploaded = blob = None
     try:
-        if not content_type:
-            content_type = file.content_type or "application/octet-stream"
-        if not name:
-            name = file.filename
+        content_type = form.get("content_type") or file.content_type or "application/octet-stream"
 
         # Generate unique relic ID with collision handling
         relic_id = await generate_unique_relic_id(db)
 
+        # Return the pooled connection while the body streams; the session
+        # checks out a fresh one for the blob reference and record insert.
+        await db.close()
+
         # Stream to storage without buffering the whole file in memory;
-        # size limit is enforced as bytes flow through
-        s3_key = f"relics/{relic_id}"
-        size_bytes = await storage_service.upload_stream(
-            s3_key, file.read, content_type, max_size=settings.MAX_UPLOAD_SIZE
+        # size limit is enforced as bytes flow through. Duplicate content
+        # is discarded in favour of the existing blob.
+        uploaded = await upload_blob(
+            f"relics/{relic_id}", file.read, content_type,
+            max_size=settings.MAX_UPLOAD_SIZE, size_hint=declared_length,
         )
 
-        return await _create_relic_record(
-            db, user, relic_id, s3_key, size_bytes,
-            name=name, content_type=content_type, language_hint=language_hint,
-            access_level=access_level, expires_in=expires_in, tags=tags, space_id=space_id,
+        # Fields may also follow the file part
+        await form.finish()
+        _check_access_level(form.get("access_level"))
+        access_level = form.get("access_level") or "public"
+
+        blob = await register_blob(db, uploaded)
+
+        return await create_relic_record(
+            db, user, relic_id, blob.s3_key, blob.size_bytes,
+            name=form.get("name") or file.filename,
+            content_type=form.get("content_type") or content_type,
+            language_hint=form.get("language_hint"), access_level=access_level,
+            expires_in=form.get("expires_in"), tags=_form_tags(form), space_id=form.get("space_id"),
+            etag=blob.etag, blob_sha256=blob.sha256,
         )
 
-    except HTTPException:
+    except (HTTPException, FileTooLargeError, FormStreamError, UploadBudgetExceeded) as e:
+        if uploaded and blob is None:
+            await delete_released_object(uploaded.s3_key)
+        if isinstance(e, UploadBudgetExceeded):
+            raise upload_busy_error(e)
+        if isinstance(e, FileTooLargeError):
+            raise HTTPException(status_code=413, detail="File too large")
+        if isinstance(e, FormStreamError):
+            raise HTTPException(status_code=400, detail=str(e))
         raise
-    except FileTooLargeError:
-        raise HTTPException(status_code=413, detail="File too large")
     except Exception as e:
         await db.rollback()
         logger.error(f"Operation failed: {e}")
-        if s3_key:
-            try:
-                await storage_service.delete(s3_key)
-            except Exception:
-                logger.warning(f"Failed to clean up orphaned S3 object {s3_key}")
+        # The blob reference was rolled back; an object we created is now orphaned
+        if uploaded and (blob is None or blob.created):
+            await delete_released_object(blob.s3_key if blob else uploaded.s3_key)
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
 
@@ -185,8 +175,8 @@ async def create_relic_raw(
     """
     Create a relic from a raw request body (no multipart form).
 
-    This is the fast path for large uploads: the body streams straight to
-    storage with no multipart parsing and no temp-file spooling. Metadata
+    The body streams straight to storage with no multipart framing to
+    parse, which makes it the simplest path for scripted uploads. Metadata
     comes from query parameters (tags comma-separated); the content type
     from the Content-Type header unless overridden via ?content_type=.
 
@@ -205,10 +195,9 @@ async def create_relic_raw(
     if not user and request.headers.get("X-User-Key"):
         raise HTTPException(status_code=401, detail="Invalid user key")
 
-    # Reject oversized uploads before touching the body when the client declares a length
-    declared_length = request.headers.get("content-length")
-    if declared_length and declared_length.isdigit() and int(declared_length) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=413, detail="File too large")
+    # Reject oversized uploads before touching the body when the client declares a length;
+    # the declared length also sizes the multipart upload parts
+    declared_length = _declared_length(request)
 
     if not content_type:
         content_type = request.headers.get("content-type") or "application/octet-stream"
@@ -227,35 +216,38 @@ async def create_relic_raw(
         out, leftover = leftover[:n], leftover[n:]
         return out
 
-    s3_key = None
+    uploaded = blob = None
     try:
         relic_id = await generate_unique_relic_id(db)
-        s3_key = f"relics/{relic_id}"
-        size_bytes = await storage_service.upload_stream(
-            s3_key, read, content_type, max_size=settings.MAX_UPLOAD_SIZE
+        # No connection is held while the body streams
+        await db.close()
+        uploaded = await upload_blob(
+            f"relics/{relic_id}", read, content_type,
+            max_size=settings.MAX_UPLOAD_SIZE, size_hint=declared_length,
         )
-        if size_bytes == 0:
-            await storage_service.delete(s3_key)
+        if uploaded.size_bytes == 0:
+            await delete_released_object(uploaded.s3_key)
             raise HTTPException(status_code=400, detail="No content provided")
+        blob = await register_blob(db, uploaded)
 
-        return await _create_relic_record(
-            db, user, relic_id, s3_key, size_bytes,
+        return await create_relic_record(
+            db, user, relic_id, blob.s3_key, blob.size_bytes,
             name=name, content_type=content_type, language_hint=language_hint,
             access_level=access_level, expires_in=expires_in, tags=tag_list, space_id=space_id,
+            etag=blob.etag, blob_sha256=blob.sha256,
         )
 
     except HTTPException:
         raise
     except FileTooLargeError:
         raise HTTPException(status_code=413, detail="File too large")
+    except UploadBudgetExceeded as e:
+        raise upload_busy_error(e)
     except Exception as e:
         await db.rollback()
         logger.error(f"Operation failed: {e}")
-        if s3_key:
-            try:
-                await storage_service.delete(s3_key)
-            except Exception:
-                logger.warning(f"Failed to clean up orphaned S3 object {s3_key}")
+        if uploaded and (blob is None or blob.created):
+            await delete_released_object(blob.s3_key if blob else uploaded.s3_key)
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
 
@@ -263,10 +255,16 @@ async def create_relic_raw(
 async def get_relic(
     relic_id: str,
     request: Request,
+    response: Response,
     password: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get relic metadata."""
+    """
+    Get relic metadata.
+
+    Sends a weak ETag over the response (excluding the ever-changing
+    access_count) and answers a matching If-None-Match with 304.
+    """
     result = await db.execute(
         select(Relic).options(
             selectinload(Relic.tags),
@@ -304,95 +302,274 @@ async def get_relic(
                 raise HTTPException(status_code=403, detail="Access restricted")
     relic.can_edit = check_ownership_or_admin(relic, user, require_auth=False)
 
-    # Increment access count atomically
-    await db.execute(
-        update(Relic).where(Relic.id == relic_id).values(access_count=Relic.access_count + 1)
-    )
-    relic.access_count = (relic.access_count or 0) + 1  # keep local object in sync
-    await db.commit()
+    # Count the view in memory; the scheduler writes buffered counts in bulk
+    access_counter.increment(relic_id)
 
-    # Calculate counts
-    comments_result = await db.execute(
-        select(func.count(Comment.id)).where(Comment.relic_id == relic_id)
-    )
-    comments_count = comments_result.scalar()
     relic_response = RelicResponse.from_orm(relic)
-    relic_response.comments_count = comments_count or 0
-    relic_response.forks_count = await get_fork_count(db, relic_id)
+    relic_response.access_count = access_counter.live_count(relic)
+
+    # Metadata is mutable (name, tags, counts), so it is revalidated rather than cached
+    digest = hashlib.sha256(relic_response.model_dump_json(exclude={"access_count"}).encode()).hexdigest()
+    etag = f'W/"{digest[:32]}"'
+    validators = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=validators)
+    response.headers.update(validators)
     return relic_response
 
-@router.get("/{relic_id}")
-@router.get("/{relic_id}/raw")
-async def get_relic_raw(relic_id: str, request: Request, password: Optional[str] = None, db: AsyncSession = Depends(get_db)):
-    """Get raw relic content."""
-    result = await db.execute(
-        select(Relic).options(selectinload(Relic.access_list)).where(Relic.id == relic_id)
+
+def _content_etag(relic: Relic, content_encoding: Optional[str] = None) -> str:
+    """
+    Strong ETag for a relic's raw content.
+
+    Uses the S3 ETag captured at upload time; relics stored before that fall
+    back to the relic id, which is just as strong because content is immutable.
+    The compressed representation of content stored compressed gets its own
+    tag, as byte ranges and caches must not mix the two.
+    """
+    if content_encoding:
+        return f'"{relic.etag or relic.id}-{content_encoding}"'
+    return f'"{relic.etag or relic.id}"'
+
+
+def _content_cache_control(relic: Relic) -> str:
+    """Public, non-expiring, unprotected content never changes, so shared caches may keep it forever."""
+    if relic.access_level == "public" and not relic.password_hash and not relic.expires_at:
+        return "public, max-age=31536000, immutable"
+    return "private, no-cache"
+
+
+def _not_modified(request: Request, relic: Relic, etag: str) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no entity tags were sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date(request.headers.get("if-modified-since"))
+    return since is not None and relic.created_at.replace(microsecond=0) <= since
+
+
+def _if_range_matches(request: Request, relic: Relic, etag: str) -> bool:
+    """
+    Evaluate If-Range: True when the Range header may be honoured.
+
+    Entity tags use strong comparison (weak tags never match). A date matches
+    when it equals the Last-Modified we send (created_at to whole seconds).
+    """
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date(if_range)
+    return since is not None and since == relic.created_at.replace(microsecond=0)
+
+
+def _multipart_byteranges(relic: Relic, ranges: List[tuple], size: int, content_type: str):
+    """
+    Build a multipart/byteranges body that fetches each range with its own ranged GET.
+
+    Returns:
+        (async chunk iterator, exact body length in bytes, boundary)
+    """
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    content_length = (
+        sum(len(h) for h in part_headers)
+        + sum(end - start + 1 for start, end in ranges)
+        + len(closing)
     )
-    relic = result.scalar_one_or_none()
 
-    if not relic:
-        raise HTTPException(status_code=404, detail="Relic not found")
+    async def iterator():
+        for part_header, byte_range in zip(part_headers, ranges):
+            yield part_header
+            # Never reached for decoded content: ranges address the stored bytes
+            chunks, _ = await stream_content(relic, byte_range=byte_range, decode=False)
+            async for chunk in chunks:
+                yield chunk
+        yield closing
 
-    if is_expired(relic.expires_at):
-        raise HTTPException(status_code=410, detail="Relic has expired")
+    return iterator(), content_length, boundary
 
-    # Check password protection
-    if relic.password_hash:
-        if not password:
-            raise HTTPException(status_code=403, detail="This relic requires a password")
-        if hash_password(password) != relic.password_hash:
-            raise HTTPException(status_code=403, detail="Invalid password")
 
-    # Enforce restricted access
-    if relic.access_level == "restricted":
-        user = await get_current_user(request, db)
-        if not check_ownership_or_admin(relic, user, require_auth=False):
-            allowed_ids = {a.user_id for a in relic.access_list}
-            if not user or user.id not in allowed_ids:
-                raise HTTPException(status_code=403, detail="Access restricted")
+async def _offloaded_download(
+    relic: Relic, headers: dict, content_encoding: Optional[str] = None
+) -> Optional[Response]:
+    """
+    Hand a download off according to DOWNLOAD_MODE, or None to stream it here.
+
+    Access checks are done by the caller; S3 serves the stored bytes (ranges
+    included) either through nginx (accel) or directly to the client
+    (redirect), so the worker never touches the content. content_encoding
+    labels stored bytes that are sent compressed.
+    """
+    mode = settings.DOWNLOAD_MODE
+    if mode not in ("accel", "redirect") or (relic.size_bytes or 0) < settings.DOWNLOAD_OFFLOAD_MIN_SIZE:
+        return None
+    encoding_header = {"ResponseContentEncoding": content_encoding} if content_encoding else {}
+
+    if mode == "accel":
+        # Content-Encoding is not kept from this response, so S3 is asked to send it
+        url = urllib.parse.urlsplit(await storage_service.presign_get(
+            relic.s3_key, settings.DOWNLOAD_URL_EXPIRY, internal=True, response_headers=encoding_header,
+        ))
+        # nginx keeps Content-Type, Content-Disposition, Accept-Ranges and
+        # Cache-Control from this response and takes the body from S3
+        return Response(
+            media_type=relic.content_type,
+            headers={**headers, "X-Accel-Redirect": f"{settings.DOWNLOAD_ACCEL_PREFIX}{url.path}?{url.query}"},
+        )
+
+    # The key is in the URL the client sees. A blob deduplicated before content
+    # addressing is still keyed by the relic that stored it first, whose id is
+    # the access token of a private relic: stream those here instead.
+    if relic.s3_key != f"relics/{relic.id}" and not relic.s3_key.startswith(BLOB_KEY_PREFIX):
+        return None
+    url = await storage_service.presign_get(
+        relic.s3_key, settings.DOWNLOAD_URL_EXPIRY,
+        response_headers={
+            "ResponseContentType": relic.content_type or "application/octet-stream",
+            "ResponseContentDisposition": headers["Content-Disposition"],
+            "ResponseCacheControl": headers["Cache-Control"],
+            **encoding_header,
+        },
+    )
+    # The URL is a short-lived credential: the redirect itself must not be cached
+    return Response(status_code=307, headers={"Location": url, "Cache-Control": "no-store"})
+
+
+@router.get("/{relic_id}")
+@router.get("/{relic_id}/raw")
+async def get_relic_raw(relic_id: str, request: Request, password: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Get raw relic content.
+
+    Supports single and multi-range requests (206, multipart/byteranges) and
+    If-Range, so large downloads can seek and resume without refetching.
+    Conditional requests (If-None-Match / If-Modified-Since) are answered with
+    304 before storage is touched. Large relics may be handed off to nginx
+    or S3 instead of streamed (DOWNLOAD_MODE); small inline relics come
+    with this metadata query and never touch S3. Content stored compressed
+    is sent as stored (Content-Encoding) to clients that accept the codec
+    and decompressed here for the rest; multi-range requests for the
+    decompressed form are answered with the full content.
+    """
+    relic = await get_readable_relic(db, request, relic_id, password, with_inline_content())
+
+    # Compressed content goes out as stored unless the client cannot decode it
+    encoding = stored_encoding(relic)
+    send_encoded = encoding is not None and accepts_encoding(request.headers.get("accept-encoding"), encoding)
+    decode = encoding is not None and not send_encoded
+
+    etag = _content_etag(relic, encoding if send_encoded else None)
+    validators = {
+        "ETag": etag,
+        "Last-Modified": http_date(relic.created_at),
+        "Cache-Control": _content_cache_control(relic),
+    }
+    if encoding is not None:
+        validators["Vary"] = "Accept-Encoding"
+    if _not_modified(request, relic, etag):
+        return Response(status_code=304, headers=validators)
+
+    headers = {
+        **validators,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": "inline; filename*=UTF-8''{filename}".format(
+            filename=urllib.parse.quote(relic.name or relic.id, safe="")
+        ),
+    }
+    if send_encoded:
+        headers["Content-Encoding"] = encoding
+
+    # Large content can be served without passing through this process
+    inline = inline_content(relic) is not None
+    offloaded = None
+    if not (inline or decode):
+        offloaded = await _offloaded_download(relic, headers, encoding if send_encoded else None)
+    if offloaded is not None:
+        return offloaded
+
+    # Range requests: only honoured when size is known and If-Range (if any) still matches.
+    # Ranges address the representation sent, i.e. the stored bytes when sent compressed.
+    ranges = None
+    size = relic.blob.stored_size_bytes if send_encoded else relic.size_bytes
+    range_header = request.headers.get("range")
+    if range_header and size is not None and _if_range_matches(request, relic, etag):
+        ranges = parse_range_header(range_header, size)
+        if ranges == []:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+        if decode and len(ranges) > 1:
+            # Each part would decompress from the start again
+            ranges = None
+
+    # Authorization and metadata are settled: return the pooled connection
+    # before any bytes flow, so slow clients do not pin it for the whole
+    # download (relic stays usable with its loaded attributes).
+    await db.close()
 
     try:
-        body, content_length = await storage_service.stream(relic.s3_key)
+        if not ranges:
+            # Full reads of hot content come straight off the local cache
+            # (FileResponse applies its own Range handling, so only without one)
+            cached = content_cache.lookup(relic.s3_key) if not (range_header or inline or decode) else None
+            if cached is not None:
+                path, stat_result = cached
+                return FileResponse(
+                    path, media_type=relic.content_type, headers=headers, stat_result=stat_result,
+                )
+            body, content_length = await stream_content(relic, decode=decode)
+            headers["Content-Length"] = str(content_length)
+            return StreamingResponse(body, media_type=relic.content_type, headers=headers)
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            body, content_length = await stream_content(relic, byte_range=(start, end), decode=decode)
+            headers["Content-Length"] = str(content_length)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return StreamingResponse(body, status_code=206, media_type=relic.content_type, headers=headers)
+
+        body, content_length, boundary = _multipart_byteranges(relic, ranges, size, relic.content_type)
+        headers["Content-Length"] = str(content_length)
         return StreamingResponse(
             body,
-            media_type=relic.content_type,
-            headers={
-                "Content-Length": str(content_length),
-                "Content-Disposition": "inline; filename*=UTF-8''{filename}".format(
-                    filename=urllib.parse.quote(relic.name or relic.id, safe="")
-                ),
-            }
+            status_code=206,
+            media_type=f"multipart/byteranges; boundary={boundary}",
+            headers=headers,
         )
     except Exception as e:
         logger.error(f"Operation failed: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
 
-@router.post("/api/v1/relics/{relic_id}/fork", response_model=dict)
-async def fork_relic(
-    relic_id: str,
-    request: Request,
-    file: Optional[UploadFile] = File(None),
-    name: Optional[str] = Form(None),
-    access_level: Optional[str] = Form(None),
-    expires_in: Optional[str] = Form(None),
-    tags: Optional[List[str]] = Form(None),
-    db: AsyncSession = Depends(get_db)
-):
+@router.post(
+    "/api/v1/relics/{relic_id}/fork",
+    response_model=dict,
+    openapi_extra=multipart_openapi("file", ["name", "access_level", "expires_in", "tags"]),
+)
+async def fork_relic(relic_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Fork a relic (create new independent lineage).
 
     Creates a new relic with fork_of pointing to the original.
-    Fork belongs to forking user if key provided.
+    Fork belongs to forking user if key provided. Optional form fields:
+    file (new content, streamed to storage as it arrives), name,
+    access_level, expires_in, tags.
     """
-    # Normalize tags input
-    if tags and len(tags) == 1 and ',' in tags[0]:
-        tags = [t.strip() for t in tags[0].split(',')]
-
-    # Validate access_level
-    if access_level and access_level not in ['public', 'private', 'restricted']:
-        raise HTTPException(status_code=400, detail="Invalid access_level. Must be 'public', 'private', or 'restricted'")
-
     # Validate user key if provided (anonymous forking is allowed)
     user = await get_current_user(request, db)
     if not user and request.headers.get("X-User-Key"):
@@ -427,23 +604,61 @@ async def fork_relic(
             if not user or user.id not in allowed_ids:
                 raise HTTPException(status_code=403, detail="Access restricted")
 
-    s3_key = None
+    # Body is read only once access is settled
+    declared_length = _declared_length(request)
+    try:
+        form = StreamingForm(request)
+        file = await form.next_file("file")
+    except FormStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _check_access_level(form.get("access_level"))
+
+    # Object written by this request, deleted again if the fork is not created
+    owned_key = None
     try:
         # Generate unique new ID with collision handling
         new_id = await generate_unique_relic_id(db)
         s3_key = f"relics/{new_id}"
+        blob_sha256 = None
+        shared = None
 
+        # Return the pooled connection before any S3 transfer; the original
+        # keeps its loaded attributes and tags, and the session checks out a
+        # fresh connection for the inserts below.
+        await db.close()
+
+        uploaded = None
         if file:
-            # New content provided: stream it to storage
+            # New content provided: stream it to storage (deduplicated by content)
             content_type = file.content_type or original.content_type
-            size_bytes = await storage_service.upload_stream(
-                s3_key, file.read, content_type, max_size=settings.MAX_UPLOAD_SIZE
+            uploaded = await upload_blob(
+                s3_key, file.read, content_type,
+                max_size=settings.MAX_UPLOAD_SIZE, size_hint=declared_length,
             )
+            owned_key = uploaded.s3_key
+
+        # Fields may also follow the file part
+        await form.finish()
+        _check_access_level(form.get("access_level"))
+        name, access_level = form.get("name"), form.get("access_level")
+        expires_in, tags = form.get("expires_in"), _form_tags(form)
+
+        if uploaded:
+            blob = await register_blob(db, uploaded)
+            owned_key = blob.s3_key if blob.created else None
+            s3_key, size_bytes, etag, blob_sha256 = blob.s3_key, blob.size_bytes, blob.etag, blob.sha256
         else:
-            # Same content: server-side S3 copy, no data flows through the app
             content_type = original.content_type
             size_bytes = original.size_bytes or 0
-            await storage_service.copy(original.s3_key, s3_key, size_bytes, content_type)
+            if original.blob_sha256:
+                # Same content: reference the original's blob, nothing is copied
+                shared = await add_blob_reference(db, original.blob_sha256)
+            if shared:
+                s3_key, etag, blob_sha256 = shared.s3_key, shared.etag, shared.sha256
+            else:
+                # Relic stored before deduplication: server-side S3 copy
+                owned_key = s3_key
+                etag = await storage_service.copy(original.s3_key, s3_key, size_bytes, content_type)
 
         # Calculate expiry date if provided
         expires_at = None
@@ -465,6 +680,8 @@ async def fork_relic(
             language_hint=original.language_hint,
             size_bytes=size_bytes,
             s3_key=s3_key,
+            etag=etag,
+            blob_sha256=blob_sha256,
             fork_of=relic_id,
             access_level=access_level or original.access_level,
             expires_at=expires_at
@@ -474,12 +691,18 @@ async def fork_relic(
         if tag_objects:
             fork.tags = tag_objects
 
-        # Update user relic count (flushed with commit)
+        # Update user relic count atomically (user comes from the cache and is not session-bound)
         if user:
-            user.relic_count += 1
+            await db.execute(
+                update(User).where(User.id == user.id).values(relic_count=User.relic_count + 1)
+            )
 
         db.add(fork)
+        await adjust_fork_count(db, relic_id, 1)
+        await enqueue_background_work(db, fork)
         await db.commit()
+        if derivative_kind(fork.name, fork.content_type):
+            request_derivation()
 
         return {
             "id": fork.id,
@@ -491,18 +714,20 @@ async def fork_relic(
             "created_at": fork.created_at
         }
 
-    except HTTPException:
+    except (HTTPException, FileTooLargeError, FormStreamError, UploadBudgetExceeded) as e:
+        await db.rollback()
+        await delete_released_object(owned_key)
+        if isinstance(e, UploadBudgetExceeded):
+            raise upload_busy_error(e)
+        if isinstance(e, FileTooLargeError):
+            raise HTTPException(status_code=413, detail="File too large")
+        if isinstance(e, FormStreamError):
+            raise HTTPException(status_code=400, detail=str(e))
         raise
-    except FileTooLargeError:
-        raise HTTPException(status_code=413, detail="File too large")
     except Exception as e:
         await db.rollback()
         logger.error(f"Operation failed: {e}")
-        if s3_key:
-            try:
-                await storage_service.delete(s3_key)
-            except Exception:
-                logger.warning(f"Failed to clean up orphaned S3 object {s3_key}")
+        await delete_released_object(owned_key)
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
 
@@ -640,15 +865,11 @@ async def delete_relic(relic_id: str, request: Request, db: AsyncSession = Depen
     relic_user_id = relic.user_id
     was_owner = user and user.id == relic.user_id
 
-    # Delete file from S3 storage
-    try:
-        await storage_service.delete(relic.s3_key)
-    except Exception as e:
-        # Log error but don't fail the delete operation
-        logger.error(f"Failed to delete file from S3 for relic {relic_id}: {e}", exc_info=True)
-
-    # Hard delete in database
+    # Hard delete in database; the content object goes once no other relic references it
+    parent_id = relic.fork_of
     await db.delete(relic)
+    unreferenced_key = await release_relic_content(db, relic)
+    await adjust_fork_count(db, parent_id, -1)
 
     # Update owner's relic count atomically (not admin's count if admin is deleting)
     if relic_user_id:
@@ -659,6 +880,7 @@ async def delete_relic(relic_id: str, request: Request, db: AsyncSession = Depen
         )
 
     await db.commit()
+    await delete_released_object(unreferenced_key)
 
     logger.info(f"Relic {relic_id} deleted successfully by {'owner' if was_owner else 'admin'}")
 
@@ -669,16 +891,25 @@ async def delete_relic(relic_id: str, request: Request, db: AsyncSession = Depen
 async def list_relics(
     limit: int = 25,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     tag: Optional[str] = None,
     search: Optional[str] = None,
     sort_by: str = "created_at",
     sort_order: str = "desc",
     db: AsyncSession = Depends(get_db)
 ):
-    """List the most recent public relics with pagination."""
+    """
+    List the most recent public relics with pagination.
+
+    Pass next_cursor from a previous page as cursor to continue with keyset
+    pagination (offset is then ignored). include_total=false skips the count.
+    """
     limit = clamp_limit(limit)
     offset = max(0, offset)
-    stmt = select(Relic).options(selectinload(Relic.tags), joinedload(Relic.owner)).where(Relic.access_level == "public")
+    stmt = select(Relic).options(
+        selectinload(Relic.tags), joinedload(Relic.owner), with_derivative()
+    ).where(Relic.access_level == "public")
 
     if tag:
         tag_result = await db.execute(select(Tag).where(Tag.name == tag.strip().lower()))
@@ -686,40 +917,40 @@ async def list_relics(
         if tag_obj:
             stmt = stmt.where(Relic.tags.contains(tag_obj))
         else:
-            return {"relics": [], "total": 0, "limit": limit, "offset": offset}
+            return {"relics": [], "total": 0, "limit": limit, "offset": offset, "next_cursor": None}
 
     if search:
         stmt = apply_relic_search(stmt, search)
 
-    order = relic_sort_order(sort_by, sort_order)
-
-    total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_result.scalar()
-
-    relics_result = await db.execute(stmt.order_by(order).offset(offset).limit(limit))
-    relics = relics_result.scalars().all()
-
-    relic_ids = [r.id for r in relics]
-    comments_counts = {}
-
-    if relic_ids:
-        comments_result = await db.execute(
-            select(Comment.relic_id, func.count(Comment.id))
-            .where(Comment.relic_id.in_(relic_ids))
-            .group_by(Comment.relic_id)
+    try:
+        page_stmt = apply_relic_keyset(
+            stmt, sort_by, sort_order, limit, offset, cursor, search=search
         )
-        comments_counts = {row[0]: row[1] for row in comments_result.all()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    forks_counts = await get_fork_counts(db, relic_ids)
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        total = total_result.scalar()
+
+    rows, next_cursor = keyset_page(
+        (await db.execute(page_stmt)).all(), limit, sort_by, sort_order, search=search
+    )
 
     relic_responses = []
-    for relic in relics:
+    for relic, *_ in rows:
         relic_response = RelicResponse.from_orm(relic)
-        relic_response.comments_count = comments_counts.get(relic.id, 0)
-        relic_response.forks_count = forks_counts.get(relic.id, 0)
+        relic_response.access_count = access_counter.live_count(relic)
+        relic_response.comments_count = relic.comments_count
+        relic_response.forks_count = relic.forks_count
+        relic_response.preview = relic_preview(relic)
         relic_responses.append(relic_response)
 
-    return {"relics": relic_responses, "total": total, "limit": limit, "offset": offset}
+    return {
+        "relics": relic_responses, "total": total, "limit": limit, "offset": offset,
+        "next_cursor": next_cursor
+    }
 
 
 @router.get("/api/v1/relics/{relic_id}/access", response_model=dict)
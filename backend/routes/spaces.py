@@ -8,12 +8,14 @@ from datetime import datetime
 from typing import Optional, List
 
 from backend.database import get_db
-from backend.models import Relic, User, Space, SpaceAccess, space_relics, Comment, Tag
+from backend.models import Relic, User, Space, SpaceAccess, space_relics, Tag
 from backend.schemas import (
     RelicListResponse, SpaceCreate, SpaceUpdate, SpaceResponse,
     SpaceAccessBase, SpaceAccessResponse, SpaceTransferOwnership
 )
-from backend.utils import generate_relic_id, get_fork_counts, clamp_limit, like_term, apply_relic_search, relic_sort_order
+from backend.utils import generate_relic_id, clamp_limit, like_term, apply_relic_search, apply_relic_keyset, keyset_page
+from backend.counters import access_counter
+from backend.derivatives import relic_preview, with_derivative
 from backend.dependencies import get_current_user, get_space_role, check_space_access, get_space_relic_count, is_admin_user_id
 
 router = APIRouter(prefix="/api/v1/spaces")
@@ -359,6 +361,8 @@ async def get_space_relics(
     request: Request,
     limit: int = 25,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     search: Optional[str] = None,
     tag: Optional[str] = None,
     sort_by: str = "created_at",
@@ -381,7 +385,7 @@ async def get_space_relics(
     if not await check_space_access(space, user_id, db, "viewer", is_admin=is_admin):
         raise HTTPException(status_code=403, detail="Not authorized to view this space")
 
-    stmt = select(Relic).options(selectinload(Relic.tags), joinedload(Relic.owner)).join(
+    stmt = select(Relic).options(selectinload(Relic.tags), joinedload(Relic.owner), with_derivative()).join(
         space_relics, Relic.id == space_relics.c.relic_id
     ).where(
         space_relics.c.space_id == space_id
@@ -404,25 +408,22 @@ async def get_space_relics(
     if search:
         stmt = apply_relic_search(stmt, search)
 
-    order = relic_sort_order(sort_by, sort_order)
-
-    total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_result.scalar()
-
-    relics_result = await db.execute(stmt.order_by(order).offset(offset).limit(limit))
-    relics = relics_result.scalars().all()
-
-    relic_ids = [r.id for r in relics]
-    comments_counts = {}
-    if relic_ids:
-        comments_result = await db.execute(
-            select(Comment.relic_id, func.count(Comment.id))
-            .where(Comment.relic_id.in_(relic_ids))
-            .group_by(Comment.relic_id)
+    try:
+        page_stmt = apply_relic_keyset(
+            stmt, sort_by, sort_order, limit, offset, cursor, search=search
         )
-        comments_counts = {row[0]: row[1] for row in comments_result.all()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        total = total_result.scalar()
 
-    forks_counts = await get_fork_counts(db, relic_ids)
+    rows, next_cursor = keyset_page(
+        (await db.execute(page_stmt)).all(), limit, sort_by, sort_order, search=search
+    )
+    relics = [row[0] for row in rows]
 
     result = []
     for relic in relics:
@@ -438,17 +439,18 @@ async def get_space_relics(
             "access_level": relic.access_level,
             "created_at": relic.created_at,
             "expires_at": relic.expires_at,
-            "access_count": relic.access_count,
+            "access_count": access_counter.live_count(relic),
             "bookmark_count": relic.bookmark_count,
-            "comments_count": comments_counts.get(relic.id, 0),
-            "forks_count": forks_counts.get(relic.id, 0),
+            "comments_count": relic.comments_count,
+            "forks_count": relic.forks_count,
             "can_edit": can_edit,
             "owner_name": relic.owner_name,
             "owner_public_id": relic.owner_public_id,
-            "tags": [{"name": t.name, "id": t.id} for t in relic.tags]
+            "tags": [{"name": t.name, "id": t.id} for t in relic.tags],
+            "preview": relic_preview(relic)
         })
 
-    return {"relics": result, "total": total, "limit": limit, "offset": offset}
+    return {"relics": result, "total": total, "limit": limit, "offset": offset, "next_cursor": next_cursor}
 
 @router.post("/{space_id}/relics")
 async def add_relic_to_space(
@@ -0,0 +1,600 @@
+"""
+Resumable upload endpoints.
+
+A tus-style protocol on top of S3 multipart uploads, for files too large to
+send in one request:
+
+    POST   /api/v1/uploads                     create (Upload-Length header, relic metadata as query params)
+    PUT    /api/v1/uploads/{id}/parts/{n}      store part n (any order, in parallel)
+    PATCH  /api/v1/uploads/{id}                append at Upload-Offset (sequential clients)
+    HEAD   /api/v1/uploads/{id}                Upload-Offset to resume from
+    GET    /api/v1/uploads/{id}                state, including the parts received
+    POST   /api/v1/uploads/{id}/complete       assemble the parts and create the relic
+    DELETE /api/v1/uploads/{id}                abort
+
+With ?direct=true (DIRECT_UPLOAD_ENABLED) content bypasses the API: the
+client PUTs each part, or the whole object when it fits one part, to
+presigned S3 URLs from GET /api/v1/uploads/{id}/part-urls, and completion
+checks what S3 received.
+
+Content is split into parts of part_size bytes (the last one shorter), each
+stored as one S3 part and recorded in upload_part as it lands, so a dropped
+connection loses at most the part in flight. Sessions idle for
+RESUMABLE_UPLOAD_TTL_HOURS are aborted by the upload_cleanup job.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import logging
+import secrets
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models import User, UploadSession, UploadPart
+from backend.storage import storage_service, upload_budget, UploadBudgetExceeded, S3_MIN_PART_SIZE, S3_MAX_PARTS
+from backend.blobs import delete_released_object
+from backend.dependencies import (
+    get_current_user, is_admin_user, generate_unique_relic_id, create_relic_record, upload_busy_error
+)
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/api/v1/uploads")
+
+
+def resumable_part_size(upload_length: int) -> int:
+    """Part size for an upload: RESUMABLE_UPLOAD_PART_SIZE_MB, raised to whole MiB to fit S3's part limit."""
+    mib = 1024 * 1024
+    part_size = max(settings.RESUMABLE_UPLOAD_PART_SIZE_MB * mib, S3_MIN_PART_SIZE, -(-upload_length // S3_MAX_PARTS))
+    return -(-part_size // mib) * mib
+
+
+def _part_count(session: UploadSession) -> int:
+    return -(-session.upload_length // session.part_size)
+
+
+def _part_length(session: UploadSession, part_number: int) -> int:
+    """Exact size part_number must have: part_size, except for the shorter last part."""
+    if part_number < _part_count(session):
+        return session.part_size
+    return session.upload_length - (part_number - 1) * session.part_size
+
+
+def _received_offset(session: UploadSession, part_numbers) -> int:
+    """Bytes received without gaps from the start: where a sequential client resumes."""
+    received = set(part_numbers)
+    contiguous = 0
+    while contiguous + 1 in received:
+        contiguous += 1
+    return min(contiguous * session.part_size, session.upload_length)
+
+
+def _session_info(session: UploadSession, part_numbers: List[int]) -> dict:
+    return {
+        "id": session.id,
+        "relic_id": session.relic_id,
+        "upload_length": session.upload_length,
+        "part_size": session.part_size,
+        "part_count": _part_count(session),
+        "parts_received": sorted(part_numbers),
+        "offset": _received_offset(session, part_numbers),
+        "status": session.status,
+        "direct": session.direct,
+        "expires_at": session.expires_at,
+        "url": f"/api/v1/uploads/{session.id}",
+    }
+
+
+async def _received_parts(db: AsyncSession, session: UploadSession) -> List[int]:
+    """Part numbers received so far: recorded parts, or for direct uploads what S3 holds."""
+    if not session.direct:
+        return await _part_numbers(db, session.id)
+    if session.s3_upload_id:
+        parts = await storage_service.list_parts(session.s3_key, session.s3_upload_id)
+        return [number for number, _, size in parts if size == _part_length(session, number)]
+    stored = await storage_service.head(session.s3_key)
+    return [1] if stored and stored["size"] == session.upload_length else []
+
+
+def _parts_complete(session: UploadSession, parts: List[Tuple[int, str, int]]) -> bool:
+    """True when (number, etag, size) parts are exactly parts 1..part_count with the expected sizes."""
+    return len(parts) == _part_count(session) and all(
+        1 <= number <= _part_count(session) and size == _part_length(session, number)
+        for number, _, size in parts
+    )
+
+
+async def _reopen(db: AsyncSession, upload_id: str) -> None:
+    """Return a session claimed for completion to the open state."""
+    await db.execute(update(UploadSession).where(UploadSession.id == upload_id).values(status="open"))
+    await db.commit()
+
+
+async def _presign(session: UploadSession, part_number: int) -> str:
+    """Presigned URL for part_number of a direct upload (the whole object for single-PUT sessions)."""
+    if session.s3_upload_id is None:
+        return await storage_service.presign_put(session.s3_key, session.content_type, settings.PRESIGNED_URL_EXPIRY)
+    return await storage_service.presign_upload_part(
+        session.s3_key, session.s3_upload_id, part_number, settings.PRESIGNED_URL_EXPIRY
+    )
+
+
+def _offset_headers(session: UploadSession, offset: int) -> dict:
+    return {
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(session.upload_length),
+        "Upload-Part-Size": str(session.part_size),
+        "Cache-Control": "no-store",
+    }
+
+
+async def _load_session(db: AsyncSession, upload_id: str, request: Request) -> Tuple[UploadSession, Optional[User]]:
+    """
+    Fetch an upload session the caller may use.
+
+    The session id alone grants access to anonymous uploads; uploads created
+    with a user key also require that key (or an admin's).
+    """
+    user = await get_current_user(request, db)
+    if not user and request.headers.get("X-User-Key"):
+        raise HTTPException(status_code=401, detail="Invalid user key")
+
+    result = await db.execute(select(UploadSession).where(UploadSession.id == upload_id))
+    session = result.scalar_one_or_none()
+    if not session or session.expires_at <= datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.user_id and not (user and (user.id == session.user_id or is_admin_user(user))):
+        raise HTTPException(status_code=403, detail="Not authorized to access this upload")
+    return session, user
+
+
+async def _part_numbers(db: AsyncSession, upload_id: str) -> List[int]:
+    result = await db.execute(select(UploadPart.part_number).where(UploadPart.upload_id == upload_id))
+    return [row[0] for row in result.all()]
+
+
+async def _store_part(session: UploadSession, part_number: int, body: bytes) -> str:
+    """Upload one part to S3 (no DB connection needed); returns its ETag."""
+    return await storage_service.upload_part(session.s3_key, session.s3_upload_id, part_number, body)
+
+
+async def _record_part(db: AsyncSession, upload_id: str, part_number: int, size_bytes: int, etag: str) -> None:
+    """Persist a stored part and push back the session's expiry. Commits and returns the connection."""
+    now = datetime.utcnow()
+    await db.execute(
+        pg_insert(UploadPart)
+        .values(upload_id=upload_id, part_number=part_number, size_bytes=size_bytes, etag=etag, created_at=now)
+        .on_conflict_do_update(
+            index_elements=[UploadPart.upload_id, UploadPart.part_number],
+            set_={"size_bytes": size_bytes, "etag": etag, "created_at": now},
+        )
+    )
+    await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .values(expires_at=now + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS))
+    )
+    await db.commit()
+    await db.close()
+
+
+class _BodyReader:
+    """read(n) over the request stream that returns exactly n bytes unless the body ends first."""
+
+    def __init__(self, request: Request):
+        self._body = request.stream().__aiter__()
+        self._leftover = b""
+
+    async def read(self, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            if not self._leftover:
+                try:
+                    self._leftover = await self._body.__anext__()
+                except StopAsyncIteration:
+                    break
+            take = n - len(buf)
+            buf.extend(self._leftover[:take])
+            self._leftover = self._leftover[take:]
+        return bytes(buf)
+
+
+async def _reserve_part(size: int) -> int:
+    """Reserve part buffer memory from the shared upload budget, or answer 503."""
+    try:
+        return await upload_budget.acquire(size, timeout=settings.UPLOAD_MEMORY_WAIT_TIMEOUT)
+    except UploadBudgetExceeded as e:
+        raise upload_busy_error(e)
+
+
+@router.post("", response_model=dict, status_code=201)
+async def create_upload(
+    request: Request,
+    response: Response,
+    name: Optional[str] = None,
+    content_type: Optional[str] = None,
+    language_hint: Optional[str] = None,
+    access_level: str = "public",
+    expires_in: Optional[str] = None,
+    tags: Optional[str] = None,
+    space_id: Optional[str] = None,
+    direct: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Start a resumable upload.
+
+    The total size is given by the Upload-Length header; relic metadata is
+    given as query parameters, as for the raw upload endpoint, and applied
+    when the upload completes. The response carries the part size the
+    client must split the content into.
+
+    With direct=true the content goes straight to S3. A direct upload that
+    fits in one part is a single PUT of the whole object to upload_url
+    (sent with the same Content-Type); larger ones PUT each part to the
+    URLs from part-urls.
+    """
+    if direct and not settings.DIRECT_UPLOAD_ENABLED:
+        raise HTTPException(status_code=400, detail="Direct uploads are disabled")
+    if access_level not in ("public", "private", "restricted"):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid access_level. Must be 'public', 'private', or 'restricted'."
+        )
+
+    upload_length = request.headers.get("upload-length", "")
+    if not upload_length.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Length header required")
+    upload_length = int(upload_length)
+    if upload_length == 0:
+        raise HTTPException(status_code=400, detail="No content provided")
+    if upload_length > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    # Validate user key if provided (anonymous uploads are allowed)
+    user = await get_current_user(request, db)
+    if not user and request.headers.get("X-User-Key"):
+        raise HTTPException(status_code=401, detail="Invalid user key")
+
+    content_type = content_type or "application/octet-stream"
+    part_size = resumable_part_size(upload_length)
+    relic_id = await generate_unique_relic_id(db)
+    s3_key = f"relics/{relic_id}"
+    # A direct upload that fits one part needs no multipart upload, just a presigned PUT
+    single_put = direct and upload_length <= part_size
+    s3_upload_id = None if single_put else await storage_service.create_multipart(s3_key, content_type)
+
+    try:
+        now = datetime.utcnow()
+        session = UploadSession(
+            id=secrets.token_hex(16),
+            user_id=user.id if user else None,
+            relic_id=relic_id,
+            s3_key=s3_key,
+            s3_upload_id=s3_upload_id,
+            direct=direct,
+            upload_length=upload_length,
+            part_size=part_size,
+            status="open",
+            name=name,
+            content_type=content_type,
+            language_hint=language_hint,
+            access_level=access_level,
+            expires_in=expires_in,
+            tags=tags,
+            space_id=space_id,
+            created_at=now,
+            expires_at=now + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS),
+        )
+        db.add(session)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Operation failed: {e}")
+        if s3_upload_id:
+            await storage_service.abort_multipart(s3_key, s3_upload_id)
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    response.headers["Location"] = f"/api/v1/uploads/{session.id}"
+    response.headers.update(_offset_headers(session, 0))
+    info = _session_info(session, [])
+    if single_put:
+        info["upload_url"] = await _presign(session, 1)
+    return info
+
+
+@router.head("/{upload_id}")
+async def head_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Report the offset a sequential client should resume from (Upload-Offset header)."""
+    session, _ = await _load_session(db, upload_id, request)
+    offset = _received_offset(session, await _received_parts(db, session))
+    return Response(status_code=200, headers=_offset_headers(session, offset))
+
+
+@router.get("/{upload_id}", response_model=dict)
+async def get_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Upload state, including which parts have been received (for parallel clients)."""
+    session, _ = await _load_session(db, upload_id, request)
+    return _session_info(session, await _received_parts(db, session))
+
+
+@router.get("/{upload_id}/part-urls", response_model=dict)
+async def get_upload_part_urls(
+    upload_id: str,
+    request: Request,
+    start: int = 1,
+    count: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Presigned S3 URLs for parts start..start+count-1 of a direct upload.
+
+    Each URL accepts one PUT of exactly that part's bytes and expires after
+    PRESIGNED_URL_EXPIRY seconds; request fresh ones to resume later. For a
+    single-PUT upload the only URL is for the whole object and must be sent
+    with the upload's Content-Type.
+    """
+    session, _ = await _load_session(db, upload_id, request)
+    if not session.direct:
+        raise HTTPException(status_code=409, detail="Upload is not a direct upload")
+    if session.status != "open":
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+
+    # Handing out URLs is the only sign of life a direct upload gives the API
+    await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .values(expires_at=datetime.utcnow() + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS))
+    )
+    await db.commit()
+
+    first = max(start, 1)
+    last = min(first + min(max(count, 1), 1000), _part_count(session) + 1)
+    return {
+        "urls": [{"part_number": n, "url": await _presign(session, n)} for n in range(first, last)],
+        "content_type": session.content_type,
+        "expires_in": settings.PRESIGNED_URL_EXPIRY,
+    }
+
+
+@router.put("/{upload_id}/parts/{part_number}", response_model=dict)
+async def put_upload_part(upload_id: str, part_number: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Store part part_number (1-based) of an upload.
+
+    The body must be exactly part_size bytes, or the remainder for the last
+    part. Parts may be sent in any order and concurrently; sending a part
+    again replaces it.
+    """
+    session, _ = await _load_session(db, upload_id, request)
+    if session.direct:
+        raise HTTPException(status_code=409, detail="Direct uploads are sent to the presigned S3 URLs")
+    if session.status != "open":
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    if not 1 <= part_number <= _part_count(session):
+        raise HTTPException(status_code=400, detail=f"Part number must be between 1 and {_part_count(session)}")
+
+    expected = _part_length(session, part_number)
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) != expected:
+        raise HTTPException(status_code=400, detail=f"Part {part_number} must be {expected} bytes")
+
+    # No connection is held while the part streams in
+    await db.close()
+
+    reserved = await _reserve_part(expected)
+    upload_budget.active_uploads += 1
+    try:
+        reader = _BodyReader(request)
+        body = await reader.read(expected + 1)
+        if len(body) != expected:
+            raise HTTPException(status_code=400, detail=f"Part {part_number} must be {expected} bytes")
+        etag = await _store_part(session, part_number, body)
+    finally:
+        upload_budget.active_uploads -= 1
+        upload_budget.release(reserved)
+
+    try:
+        await _record_part(db, upload_id, part_number, expected, etag)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    return {"part_number": part_number, "size_bytes": expected, "etag": etag.strip('"')}
+
+
+@router.patch("/{upload_id}")
+async def patch_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Append content at Upload-Offset (tus-style sequential upload).
+
+    Upload-Offset must equal the offset reported by HEAD. The body is cut
+    into parts as it arrives and each full part is committed before the next
+    is read; a trailing partial part is discarded, so after an interruption
+    the client resumes from the last part boundary HEAD reports.
+    """
+    session, _ = await _load_session(db, upload_id, request)
+    if session.direct:
+        raise HTTPException(status_code=409, detail="Direct uploads are sent to the presigned S3 URLs")
+    if session.status != "open":
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+
+    offset = _received_offset(session, await _part_numbers(db, upload_id))
+    client_offset = request.headers.get("upload-offset", "")
+    if not client_offset.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Offset header required")
+    if int(client_offset) != offset:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload-Offset mismatch, upload is at {offset}",
+            headers=_offset_headers(session, offset),
+        )
+
+    # Each part is committed on its own; no connection is held while the body streams
+    await db.close()
+
+    reader = _BodyReader(request)
+    try:
+        while offset < session.upload_length:
+            part_number = offset // session.part_size + 1
+            expected = _part_length(session, part_number)
+            reserved = await _reserve_part(expected)
+            upload_budget.active_uploads += 1
+            try:
+                body = await reader.read(expected)
+                if len(body) < expected:
+                    break  # partial part: discarded, resumed from this part's start
+                etag = await _store_part(session, part_number, body)
+            finally:
+                upload_budget.active_uploads -= 1
+                upload_budget.release(reserved)
+            await _record_part(db, upload_id, part_number, expected, etag)
+            offset += expected
+        else:
+            if await reader.read(1):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Body exceeds Upload-Length",
+                    headers=_offset_headers(session, offset),
+                )
+    except ClientDisconnect:
+        # Parts committed so far stand; the client resumes from HEAD
+        logger.info(f"Client disconnected from upload {upload_id} at offset {offset}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Operation failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    return Response(status_code=204, headers=_offset_headers(session, offset))
+
+
+@router.post("/{upload_id}/complete", response_model=dict)
+async def complete_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Assemble the received parts into the relic's object and create the relic.
+
+    The stored object is checked with a HEAD request against the declared
+    Upload-Length and content type before the relic row is committed, which
+    is what makes direct uploads (never seen by the API) trustworthy.
+    """
+    session, _ = await _load_session(db, upload_id, request)
+    # Rollbacks below expire the instance; keep what is needed afterwards
+    s3_key, s3_upload_id, relic_id = session.s3_key, session.s3_upload_id, session.relic_id
+    upload_length, content_type = session.upload_length, session.content_type
+    # The relic belongs to whoever started the upload (the caller may be an admin)
+    owner = User(id=session.user_id) if session.user_id else None
+    relic_fields = dict(
+        name=session.name, content_type=content_type, language_hint=session.language_hint,
+        access_level=session.access_level, expires_in=session.expires_in,
+        tags=[t.strip() for t in session.tags.split(',') if t.strip()] if session.tags else None,
+        space_id=session.space_id,
+    )
+
+    # Claim the session so concurrent completions and late parts are refused
+    claimed = await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.status == "open")
+        .values(status="completing",
+                expires_at=datetime.utcnow() + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS))
+        .returning(UploadSession.id)
+    )
+    if claimed.first() is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Upload is already being completed")
+
+    parts = []
+    if not session.direct:
+        result = await db.execute(
+            select(UploadPart.part_number, UploadPart.etag, UploadPart.size_bytes)
+            .where(UploadPart.upload_id == upload_id)
+        )
+        parts = [tuple(row) for row in result.all()]
+    await db.commit()
+
+    # Assembling a large upload can take a while; hold no connection meanwhile
+    await db.close()
+    try:
+        if session.direct and s3_upload_id:
+            parts = await storage_service.list_parts(s3_key, s3_upload_id)
+        if s3_upload_id:
+            if not _parts_complete(session, parts):
+                await _reopen(db, upload_id)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Upload incomplete: {len(parts)} of {_part_count(session)} parts received",
+                )
+            await storage_service.complete_multipart(
+                s3_key, s3_upload_id, [(number, part_etag) for number, part_etag, _ in parts]
+            )
+        stored = await storage_service.head(s3_key)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Operation failed: {e}")
+        await _reopen(db, upload_id)
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+    if stored is None:
+        # Single-PUT direct upload not sent yet
+        await _reopen(db, upload_id)
+        raise HTTPException(status_code=400, detail="Upload incomplete: object not found")
+    if stored["size"] != upload_length or stored["content_type"] != content_type:
+        await delete_released_object(s3_key)
+        if s3_upload_id:
+            # The multipart upload is consumed; nothing is left to resume
+            await db.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+            await db.commit()
+        else:
+            await _reopen(db, upload_id)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Uploaded object ({stored['size']} bytes, {stored['content_type']}) does not match "
+                   f"the declared {upload_length} bytes, {content_type}",
+        )
+
+    try:
+        # The relic owns its object outright (blob_sha256 NULL): parts arrive
+        # out of order across requests, so there is no single pass to hash
+        await db.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+        return await create_relic_record(
+            db, owner, relic_id, s3_key, upload_length, etag=stored["etag"], **relic_fields
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Operation failed: {e}")
+        # The multipart upload is consumed; drop the session and its object
+        await db.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+        await db.commit()
+        await delete_released_object(s3_key)
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+
+@router.delete("/{upload_id}")
+async def delete_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Abort an upload and discard its parts."""
+    session, _ = await _load_session(db, upload_id, request)
+    result = await db.execute(
+        delete(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.status == "open")
+        .returning(UploadSession.id)
+    )
+    if result.first() is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    await db.commit()
+    if session.s3_upload_id:
+        await storage_service.abort_multipart(session.s3_key, session.s3_upload_id)
+    else:
+        # Single-PUT direct upload: the object may already be there
+        await delete_released_object(session.s3_key)
+    return {"message": "Upload aborted"}
@@ -1,6 +1,6 @@
 """User registration and management endpoints."""
 from fastapi import APIRouter, Request, Depends, HTTPException
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
 from datetime import datetime
@@ -8,10 +8,13 @@ from typing import Optional
 import secrets
 
 from backend.database import get_db
-from backend.models import Relic, User, Tag, Comment
+from backend.models import Relic, User, Tag
 from backend.schemas import UserNameUpdate
+from backend.counters import access_counter
+from backend.derivatives import relic_preview, with_derivative
 from backend.dependencies import get_current_user
-from backend.utils import get_fork_counts, clamp_limit, apply_relic_search, relic_sort_order
+from backend.user_cache import user_cache
+from backend.utils import clamp_limit, apply_relic_search, apply_relic_keyset, keyset_page
 
 router = APIRouter(prefix="/api/v1/user")
 
@@ -46,6 +49,7 @@ async def register_user(request: Request, db: AsyncSession = Depends(get_db)):
         if not existing_user.public_id:
             existing_user.public_id = await generate_public_id(db)
             await db.commit()
+            user_cache.invalidate(existing_user.id)
         return {
             "user_id": existing_user.id,
             "public_id": existing_user.public_id,
@@ -63,6 +67,8 @@ async def register_user(request: Request, db: AsyncSession = Depends(get_db)):
     )
     db.add(user)
     await db.commit()
+    # Drop any negative entry cached while the key was still unknown
+    user_cache.invalidate(user.id)
 
     return {
         "user_id": user.id,
@@ -83,6 +89,8 @@ async def get_user_relics(
     sort_order: str = "desc",
     limit: int = 25,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -96,7 +104,7 @@ async def get_user_relics(
     if not user:
         raise HTTPException(status_code=401, detail="Valid user key required")
 
-    stmt = select(Relic).options(selectinload(Relic.tags), joinedload(Relic.owner)).where(
+    stmt = select(Relic).options(selectinload(Relic.tags), joinedload(Relic.owner), with_derivative()).where(
         Relic.user_id == user.id
     )
 
@@ -121,32 +129,28 @@ async def get_user_relics(
                 "total": 0,
                 "limit": limit,
                 "offset": offset,
+                "next_cursor": None,
             }
 
     if search:
         stmt = apply_relic_search(stmt, search)
 
-    order = relic_sort_order(sort_by, sort_order)
-
-    total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_result.scalar()
-
-    relics_result = await db.execute(stmt.order_by(order).offset(offset).limit(limit))
-    relics = relics_result.scalars().all()
-
-    # Fetch all counts in bulk (2 queries instead of N*2)
-    relic_ids = [r.id for r in relics]
-    comments_counts = {}
-
-    if relic_ids:
-        comments_result = await db.execute(
-            select(Comment.relic_id, func.count(Comment.id))
-            .where(Comment.relic_id.in_(relic_ids))
-            .group_by(Comment.relic_id)
+    try:
+        page_stmt = apply_relic_keyset(
+            stmt, sort_by, sort_order, limit, offset, cursor, search=search
         )
-        comments_counts = {row[0]: row[1] for row in comments_result.all()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        total = total_result.scalar()
 
-    forks_counts = await get_fork_counts(db, relic_ids)
+    rows, next_cursor = keyset_page(
+        (await db.execute(page_stmt)).all(), limit, sort_by, sort_order, search=search
+    )
+    relics = [row[0] for row in rows]
 
     return {
         "user_id": user.id,
@@ -154,6 +158,7 @@ async def get_user_relics(
         "total": total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
         "relics": [
             {
                 "id": relic.id,
@@ -162,13 +167,14 @@ async def get_user_relics(
                 "size_bytes": relic.size_bytes,
                 "created_at": relic.created_at,
                 "access_level": relic.access_level,
-                "access_count": relic.access_count,
+                "access_count": access_counter.live_count(relic),
                 "bookmark_count": relic.bookmark_count,
-                "comments_count": comments_counts.get(relic.id, 0),
-                "forks_count": forks_counts.get(relic.id, 0),
+                "comments_count": relic.comments_count,
+                "forks_count": relic.forks_count,
                 "owner_name": relic.owner_name,
                 "owner_public_id": relic.owner_public_id,
-                "tags": [{"id": t.id, "name": t.name} for t in relic.tags]
+                "tags": [{"id": t.id, "name": t.name} for t in relic.tags],
+                "preview": relic_preview(relic)
             }
             for relic in relics
         ]
@@ -186,7 +192,8 @@ async def update_user_name(
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    user.name = name_update.name
+    await db.execute(update(User).where(User.id == user.id).values(name=name_update.name))
     await db.commit()
+    user_cache.invalidate(user.id)
 
-    return {"status": "updated", "name": user.name}
+    return {"status": "updated", "name": name_update.name}
@@ -5,6 +5,10 @@ Coordinates all periodic maintenance tasks including:
 - Database backups
 - Backup retention cleanup
 - Expired relic cleanup
+- Abandoned resumable upload cleanup
+- Write-behind flush of relic access counts
+- Reconciliation of denormalized relic counters
+- Tar archive indexing, line indexing and relic previews
 
 Note on log capture:
     Logs emitted by job functions (from modules under ``backend.*`` or
@@ -35,7 +39,11 @@ from apscheduler.triggers.interval import IntervalTrigger
 
 from backend.config import settings
 from backend.backup import perform_backup, cleanup_old_backups
-from backend.tasks import cleanup_expired_relics
+from backend.tasks import (
+    cleanup_expired_relics, abort_abandoned_uploads, reconcile_relic_counters, index_archives, derive_previews,
+    index_lines, backfill_background_work, reap_orphaned_derived_data,
+)
+from backend.counters import flush_access_counts
 
 logger = logging.getLogger('relic.scheduler')
 
@@ -61,6 +69,11 @@ _active_manual_runs: "set[str]" = set()
 # the single source of truth for "paused".
 paused_job_ids: "set[str]" = set()
 
+# High-frequency jobs kept out of ``job_history`` so they do not evict the
+# history of backups and cleanups from the bounded deque. They are scheduled
+# without ``wrap_job``; manual runs are still recorded.
+untracked_job_ids: "set[str]" = {'access_count_flush', 'archive_index', 'derivatives', 'line_index'}
+
 
 def _append_history(entry: dict) -> dict:
     """Append a history entry to the deque and the O(1) index, evicting oldest."""
@@ -73,8 +86,12 @@ def _append_history(entry: dict) -> dict:
 
 
 def _finish_history(run_id: str, *, success: bool, error: Optional[str] = None,
-                    traceback_str: Optional[str] = None) -> None:
-    """Mark a run terminal and compute duration from its start_time."""
+                    traceback_str: Optional[str] = None, metrics=None) -> None:
+    """Mark a run terminal and compute duration from its start_time.
+
+    Jobs may return a dict of run metrics (counts, throughput); it is stored
+    on the entry as ``metrics``. Other return values are ignored.
+    """
     entry = job_runs_index.get(run_id)
     if not entry:
         return
@@ -86,6 +103,8 @@ def _finish_history(run_id: str, *, success: bool, error: Optional[str] = None,
     except Exception:
         entry["duration"] = None
     entry["status"] = "success" if success else "failed"
+    if isinstance(metrics, dict):
+        entry["metrics"] = metrics
     if not success:
         entry["error"] = error
         entry["traceback"] = traceback_str
@@ -165,8 +184,8 @@ def wrap_job(func, job_id: str):
             run_id = _bind_run_id_for_scheduled_job(job_id)
             token = current_run_id.set(run_id)
             try:
-                await func(*args, **kwargs)
-                _finish_history(run_id, success=True)
+                result = await func(*args, **kwargs)
+                _finish_history(run_id, success=True, metrics=result)
             except Exception as exc:
                 import traceback as _tb
                 _finish_history(run_id, success=False,
@@ -181,8 +200,8 @@ def wrap_job(func, job_id: str):
         run_id = _bind_run_id_for_scheduled_job(job_id)
         token = current_run_id.set(run_id)
         try:
-            func(*args, **kwargs)
-            _finish_history(run_id, success=True)
+            result = func(*args, **kwargs)
+            _finish_history(run_id, success=True, metrics=result)
         except Exception as exc:
             import traceback as _tb
             _finish_history(run_id, success=False,
@@ -202,7 +221,7 @@ def scheduler_listener(event):
     are accepted but ignored.
     """
     try:
-        if event.code == EVENT_JOB_SUBMITTED:
+        if event.code == EVENT_JOB_SUBMITTED and event.job_id not in untracked_job_ids:
             job = scheduler.get_job(event.job_id) if scheduler else None
             job_name = job.name if job else event.job_id
             _append_history({
@@ -271,10 +290,10 @@ async def run_manual_job_wrapper(run_id: str, job_id: str, func, *args, **kwargs
     token = current_run_id.set(run_id)
     try:
         if inspect.iscoroutinefunction(func):
-            await func(*args, **kwargs)
+            result = await func(*args, **kwargs)
         else:
-            func(*args, **kwargs)
-        _finish_history(run_id, success=True)
+            result = func(*args, **kwargs)
+        _finish_history(run_id, success=True, metrics=result)
     except Exception as exc:
         import traceback as _tb
         _finish_history(
@@ -388,6 +407,105 @@ async def start_scheduler() -> None:
     )
     logger.info(f"Scheduled relic cleanup every {settings.RELIC_CLEANUP_INTERVAL} minutes")
 
+    # 3. Abort abandoned resumable uploads
+    scheduler.add_job(
+        func=wrap_job(abort_abandoned_uploads, 'upload_cleanup'),
+        trigger='interval',
+        minutes=settings.UPLOAD_CLEANUP_INTERVAL,
+        id='upload_cleanup',
+        name='Abandoned Upload Cleanup',
+        replace_existing=True
+    )
+    logger.info(f"Scheduled abandoned upload cleanup every {settings.UPLOAD_CLEANUP_INTERVAL} minutes")
+
+    # 4. Flush buffered relic access counts
+    scheduler.add_job(
+        func=flush_access_counts,
+        trigger='interval',
+        seconds=settings.ACCESS_COUNT_FLUSH_INTERVAL,
+        id='access_count_flush',
+        name='Access Count Flush',
+        replace_existing=True
+    )
+    logger.info(f"Scheduled access count flush every {settings.ACCESS_COUNT_FLUSH_INTERVAL} seconds")
+
+    # 5. Reconcile denormalized comment/fork counts daily at 4 AM
+    scheduler.add_job(
+        func=wrap_job(reconcile_relic_counters, 'relic_counter_reconcile'),
+        trigger=CronTrigger(hour=4, minute=0, timezone=settings.BACKUP_TIMEZONE),
+        id='relic_counter_reconcile',
+        name='Relic Counter Reconciliation',
+        replace_existing=True
+    )
+    logger.debug("Scheduled relic counter reconciliation at 04:00")
+
+    # 6. Index queued tar / tar.gz relics for member listing and extraction, in one worker at a time
+    # (frequent: kept out of job history)
+    if settings.ARCHIVE_INDEX_ENABLED:
+        scheduler.add_job(
+            func=index_archives,
+            trigger='interval',
+            seconds=settings.ARCHIVE_INDEX_INTERVAL,
+            id='archive_index',
+            name='Archive Indexing',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled archive indexing every {settings.ARCHIVE_INDEX_INTERVAL} seconds")
+    else:
+        logger.info("Archive indexing disabled via ARCHIVE_INDEX_ENABLED=false")
+
+    # 7. Previews (thumbnails, text snippets) of queued relics, in one worker at a time; new relics
+    # also request a run on upload, so this mostly catches up after restarts and failures
+    if settings.DERIVATIVES_ENABLED:
+        scheduler.add_job(
+            func=derive_previews,
+            trigger='interval',
+            seconds=settings.DERIVATIVE_INTERVAL,
+            id='derivatives',
+            name='Relic Previews',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled relic previews every {settings.DERIVATIVE_INTERVAL} seconds")
+    else:
+        logger.info("Relic previews disabled via DERIVATIVES_ENABLED=false")
+
+    # 8. Line indexes of queued large text relics, for windowed line reads, in one worker at a time
+    if settings.LINE_INDEX_ENABLED:
+        scheduler.add_job(
+            func=index_lines,
+            trigger='interval',
+            seconds=settings.LINE_INDEX_INTERVAL,
+            id='line_index',
+            name='Line Indexing',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled line indexing every {settings.LINE_INDEX_INTERVAL} seconds")
+    else:
+        logger.info("Line indexing disabled via LINE_INDEX_ENABLED=false")
+
+    # 9. Delete derived data (previews, indexes) left behind by deleted relics, daily at 4:30 AM
+    scheduler.add_job(
+        func=wrap_job(reap_orphaned_derived_data, 'derived_data_reap'),
+        trigger=CronTrigger(hour=4, minute=30, timezone=settings.BACKUP_TIMEZONE),
+        id='derived_data_reap',
+        name='Derived Data Reaper',
+        replace_existing=True
+    )
+    logger.debug("Scheduled derived data reaper at 04:30")
+
+    # 10. Queue relics created before previews and indexes existed; run from the admin jobs page
+    # (scheduled paused, so it never starts by itself)
+    scheduler.add_job(
+        func=wrap_job(backfill_background_work, 'backfill'),
+        trigger='interval',
+        weeks=1,
+        id='backfill',
+        name='Preview and Index Backfill',
+        next_run_time=None,
+        replace_existing=True
+    )
+    paused_job_ids.add('backfill')
+
     scheduler.start()
     logger.info("Background task scheduler started successfully")
 
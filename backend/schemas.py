@@ -108,6 +108,37 @@ class RelicUpdate(BaseModel):
     tags: Optional[List[str]] = None
 
 
+class RelicLinesResponse(BaseModel):
+    """A window of lines of a text relic."""
+    start: int  # 1-based number of the first line returned
+    lines: List[str]
+    total_lines: int
+
+
+class RelicDiffSummaryResponse(BaseModel):
+    """Size of the line diff from one relic to another."""
+    relic_id: str
+    other_id: str
+    identical: bool
+    additions: int
+    deletions: int
+    hunks: int
+    exact: bool  # False when the diff was too costly to minimize (changes shown coarser)
+
+
+class PreviewResponse(BaseModel):
+    """
+    Preview of a relic's content, shown in listings.
+
+    type is "image", "pdf" or "excalidraw" (preview has thumbnail_url;
+    metadata the source width/height) or "text" (preview has the first
+    lines as snippet; metadata says whether it was truncated).
+    """
+    type: str
+    metadata: dict
+    preview: Optional[dict] = None
+
+
 class RelicResponse(BaseModel):
     """Relic response schema."""
     id: str
@@ -128,6 +159,7 @@ class RelicResponse(BaseModel):
     owner_name: Optional[str] = None
     owner_public_id: Optional[str] = None
     tags: List[TagResponse] = []
+    preview: Optional[PreviewResponse] = None  # Listings only
 
     class Config:
         from_attributes = True
@@ -137,18 +169,30 @@ class RelicResponse(BaseModel):
 class RelicListResponse(BaseModel):
     """Relic list response schema."""
     relics: List[RelicResponse]
-    total: int = 0
+    total: Optional[int] = 0  # None when include_total=false
     limit: Optional[int] = None
     offset: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 
+class ArchiveEntryResponse(BaseModel):
+    """One member of an archive relic."""
+    path: str
+    is_dir: bool
+    size: int
+    compressed_size: int
+    method: str
+    modified: Optional[datetime] = None
 
-class PreviewResponse(BaseModel):
-    """Generic preview response."""
-    type: str
-    metadata: dict
-    preview: Optional[dict] = None
+
+class ArchiveListingResponse(BaseModel):
+    """Archive relic listing response schema."""
+    format: str
+    entries: List[ArchiveEntryResponse]
+    total: int
+    limit: int
+    offset: int
 
 
 class ErrorResponse(BaseModel):
@@ -1,28 +1,150 @@
 """Storage service for S3/MinIO integration using aiobotocore."""
 import asyncio
 import logging
-from typing import Optional
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
 
+from aiobotocore.config import AioConfig
 from aiobotocore.session import AioSession
 from botocore.exceptions import ClientError
 
 from backend.config import settings
+from backend.content_cache import content_cache
 
 logger = logging.getLogger(__name__)
 
 # Multipart part size: S3 minimum is 5 MiB (except last part), max 10,000 parts.
 # 16 MiB parts allow objects up to 156 GiB while keeping memory usage per upload at one part.
 MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10_000
 # copy_object is limited to 5 GiB; larger objects need multipart upload_part_copy
 S3_MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
 MULTIPART_COPY_CHUNK_SIZE = 1024 * 1024 * 1024
 DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# DeleteObjects accepts at most 1000 keys per request
+S3_DELETE_BATCH_SIZE = 1000
 
 
 class FileTooLargeError(Exception):
     """Raised when a streaming upload exceeds the allowed maximum size."""
 
 
+class UploadBudgetExceeded(Exception):
+    """Raised when a new upload cannot reserve part memory within the wait timeout."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Upload memory budget exhausted")
+        self.retry_after = retry_after
+
+
+class UploadMemoryBudget:
+    """
+    Process-wide byte budget that multipart part buffers reserve from.
+
+    upload_stream bounds memory per upload; this bounds the sum over all
+    concurrent uploads. Reservations are granted first come, first served,
+    so a large part is not starved by a stream of small ones. The counters
+    double as gauges for monitoring (see snapshot()).
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = max(limit_bytes, S3_MIN_PART_SIZE)
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+        self.active_uploads = 0
+        self.rejected_total = 0
+        self._waiters: "deque[Tuple[int, asyncio.Future]]" = deque()
+
+    async def acquire(self, n: int, timeout: Optional[float] = None) -> int:
+        """
+        Reserve n bytes (capped at the limit), waiting up to timeout seconds.
+
+        timeout=None waits indefinitely. Returns the reserved amount, which
+        must be passed back to release(). Raises UploadBudgetExceeded on timeout.
+        """
+        n = min(n, self.limit_bytes)
+        if not self._waiters and self.in_use_bytes + n <= self.limit_bytes:
+            self._take(n)
+            return n
+        if timeout is not None and timeout <= 0:
+            self.rejected_total += 1
+            raise UploadBudgetExceeded(settings.UPLOAD_MEMORY_RETRY_AFTER)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((n, future))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return n
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up: hand it back
+                self.release(n)
+            else:
+                future.cancel()
+                self._wake()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_total += 1
+                raise UploadBudgetExceeded(settings.UPLOAD_MEMORY_RETRY_AFTER)
+            raise
+
+    def release(self, n: int) -> None:
+        self.in_use_bytes -= n
+        self._wake()
+
+    def snapshot(self) -> dict:
+        """Current gauge values."""
+        return {
+            "limit_bytes": self.limit_bytes,
+            "in_use_bytes": self.in_use_bytes,
+            "peak_bytes": self.peak_bytes,
+            "waiting": sum(1 for _, f in self._waiters if not f.done()),
+            "active_uploads": self.active_uploads,
+            "rejected_total": self.rejected_total,
+        }
+
+    def _take(self, n: int) -> None:
+        self.in_use_bytes += n
+        self.peak_bytes = max(self.peak_bytes, self.in_use_bytes)
+
+    def _wake(self) -> None:
+        while self._waiters:
+            n, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use_bytes + n > self.limit_bytes:
+                break
+            self._waiters.popleft()
+            self._take(n)
+            future.set_result(None)
+
+
+def plan_multipart(size_hint: Optional[int], max_concurrency: int) -> Tuple[int, int]:
+    """
+    Choose (part size, parts in flight) for an upload of about size_hint bytes.
+
+    Without a hint the defaults apply. Small uploads get small parts and only
+    as much parallelism as they have parts, so they reserve little of the
+    budget; huge ones get parts large enough to stay within S3's part limit.
+    """
+    if not size_hint or size_hint <= 0:
+        return MULTIPART_CHUNK_SIZE, max_concurrency
+    mib = 1024 * 1024
+    part_size = min(MULTIPART_CHUNK_SIZE, size_hint // (max_concurrency + 1))
+    # Round up to whole MiB, respecting S3's minimum part size and maximum part count
+    part_size = max(part_size, S3_MIN_PART_SIZE, -(-size_hint // S3_MAX_PARTS))
+    part_size = -(-part_size // mib) * mib
+    parts = -(-size_hint // part_size)
+    return part_size, max(1, min(max_concurrency, parts - 1))
+
+
+def _strip_etag(etag: Optional[str]) -> Optional[str]:
+    """S3 returns ETags wrapped in double quotes; store them bare."""
+    return etag.strip('"') if etag else None
+
+
 class StorageService:
     """Async service for storing and retrieving relic content via S3-compatible APIs."""
 
@@ -32,21 +154,39 @@ class StorageService:
         self._session: Optional[AioSession] = None
         self._client = None
         self._client_context = None
+        # Signs presigned URLs for the endpoint clients reach (S3_PUBLIC_ENDPOINT_URL)
+        self._presign_client = None
+        self._presign_client_context = None
 
-    async def start(self) -> None:
-        """Create the aiobotocore session and S3 client. Call during app startup."""
-        self._session = AioSession()
-        self._client_context = self._session.create_client(
+    def _create_client(self, endpoint_url: str):
+        return self._session.create_client(
             's3',
-            endpoint_url=settings.S3_ENDPOINT_URL,
+            endpoint_url=endpoint_url,
             aws_access_key_id=settings.S3_ACCESS_KEY,
             aws_secret_access_key=settings.S3_SECRET_KEY,
             region_name=settings.S3_REGION,
+            # Presigned URLs otherwise default to legacy SigV2 query auth
+            config=AioConfig(signature_version='s3v4'),
         )
+
+    async def start(self) -> None:
+        """Create the aiobotocore session and S3 client. Call during app startup."""
+        self._session = AioSession()
+        self._client_context = self._create_client(settings.S3_ENDPOINT_URL)
         self._client = await self._client_context.__aenter__()
+        # The signature covers the host, so URLs handed to clients must be
+        # signed for the public endpoint when it differs from the internal one
+        public_endpoint = settings.S3_PUBLIC_ENDPOINT_URL
+        if public_endpoint and public_endpoint != settings.S3_ENDPOINT_URL:
+            self._presign_client_context = self._create_client(public_endpoint)
+            self._presign_client = await self._presign_client_context.__aenter__()
 
     async def close(self) -> None:
-        """Dispose the S3 client. Call during app shutdown."""
+        """Dispose the S3 clients. Call during app shutdown."""
+        if self._presign_client_context:
+            await self._presign_client_context.__aexit__(None, None, None)
+            self._presign_client_context = None
+            self._presign_client = None
         if self._client_context:
             await self._client_context.__aexit__(None, None, None)
             self._client_context = None
@@ -116,53 +256,100 @@ class StorageService:
         content_type: str = "application/octet-stream",
         max_size: Optional[int] = None,
         max_concurrency: int = 3,
-    ) -> int:
+        size_hint: Optional[int] = None,
+        wait_for_budget: bool = False,
+    ) -> Tuple[int, Optional[str]]:
         """
         Stream content to S3 via multipart upload with bounded memory.
 
+        Every part buffer is reserved from the process-wide upload_budget
+        before it is read and released once the part is stored.
+
         Args:
             key: S3 object key
             read: async callable read(n) -> bytes returning b'' at EOF
                   (e.g. UploadFile.read)
             content_type: MIME type
             max_size: if set, abort and raise FileTooLargeError once exceeded
-            max_concurrency: parts uploaded in parallel; memory per upload is
-                bounded by (max_concurrency + 1) * MULTIPART_CHUNK_SIZE
+            max_concurrency: upper bound on parts uploaded in parallel; memory
+                per upload is bounded by (concurrency + 1) * part size
+            size_hint: expected size (e.g. Content-Length), used to pick the
+                part size and concurrency (plan_multipart)
+            wait_for_budget: wait indefinitely for budget instead of raising
+                UploadBudgetExceeded after UPLOAD_MEMORY_WAIT_TIMEOUT
+                (for background jobs, which have no client to retry)
 
         Returns:
-            Total bytes uploaded
+            (total bytes uploaded, S3 ETag of the stored object without quotes)
         """
-        first = await self._read_part(read, MULTIPART_CHUNK_SIZE)
-        if max_size is not None and len(first) > max_size:
-            raise FileTooLargeError()
+        part_size, concurrency = plan_multipart(size_hint, max_concurrency)
+        budget = upload_budget
+        budget.active_uploads += 1
+        try:
+            # Only the first reservation can be refused: once an upload is
+            # under way its parts always complete, so waiting cannot deadlock
+            timeout = None if wait_for_budget else settings.UPLOAD_MEMORY_WAIT_TIMEOUT
+            reserved = await budget.acquire(part_size, timeout=timeout)
+            try:
+                first = await self._read_part(read, part_size)
+                if max_size is not None and len(first) > max_size:
+                    raise FileTooLargeError()
 
-        # Content fits in a single part — plain PUT is cheaper than multipart
-        if len(first) < MULTIPART_CHUNK_SIZE:
-            await self.client.put_object(
-                Bucket=self.bucket_name, Key=key, Body=first, ContentType=content_type,
+                # Content fits in a single part — plain PUT is cheaper than multipart
+                if len(first) < part_size:
+                    response = await self.client.put_object(
+                        Bucket=self.bucket_name, Key=key, Body=first, ContentType=content_type,
+                    )
+                    return len(first), _strip_etag(response.get('ETag'))
+            except BaseException:
+                budget.release(reserved)
+                raise
+            return await self._upload_parts(
+                key, read, content_type, max_size, part_size, concurrency, first, reserved,
             )
-            return len(first)
+        finally:
+            budget.active_uploads -= 1
 
-        mpu = await self.client.create_multipart_upload(
-            Bucket=self.bucket_name, Key=key, ContentType=content_type,
-        )
+    async def _upload_parts(
+        self, key: str, read, content_type: str, max_size: Optional[int],
+        part_size: int, concurrency: int, first: bytes, first_reserved: int,
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Multipart body of upload_stream; takes ownership of first's reservation.
+
+        Returns:
+            (total bytes uploaded, S3 ETag of the completed upload without quotes)
+        """
+        budget = upload_budget
+        try:
+            mpu = await self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=key, ContentType=content_type,
+            )
+        except BaseException:
+            budget.release(first_reserved)
+            raise
         upload_id = mpu['UploadId']
 
-        # Up to max_concurrency parts in flight; the semaphore bounds memory
-        # to (max_concurrency + 1) parts per upload
-        semaphore = asyncio.Semaphore(max_concurrency)
+        # Up to concurrency parts in flight; the semaphore bounds memory to
+        # (concurrency + 1) parts per upload, the budget bounds the total
+        semaphore = asyncio.Semaphore(concurrency)
         tasks = []
 
         async def put_part(part_number: int, body: bytes) -> dict:
-            try:
-                part = await self.client.upload_part(
-                    Bucket=self.bucket_name, Key=key,
-                    PartNumber=part_number, UploadId=upload_id, Body=body,
-                )
-                return {'ETag': part['ETag'], 'PartNumber': part_number}
-            finally:
+            part = await self.client.upload_part(
+                Bucket=self.bucket_name, Key=key,
+                PartNumber=part_number, UploadId=upload_id, Body=body,
+            )
+            return {'ETag': part['ETag'], 'PartNumber': part_number}
+
+        def part_done(reserved: int):
+            # Done callbacks also run for tasks cancelled before they started
+            def callback(_task):
+                budget.release(reserved)
                 semaphore.release()
+            return callback
 
+        reserved = first_reserved
         try:
             total = 0
             part_number = 1
@@ -176,16 +363,24 @@ class StorageService:
                     if t.done() and t.exception():
                         raise t.exception()
                 await semaphore.acquire()
-                tasks.append(asyncio.create_task(put_part(part_number, chunk)))
+                task = asyncio.create_task(put_part(part_number, chunk))
+                task.add_done_callback(part_done(reserved))
+                tasks.append(task)
+                reserved = 0
                 part_number += 1
-                chunk = await self._read_part(read, MULTIPART_CHUNK_SIZE)
+                reserved = await budget.acquire(part_size)
+                chunk = await self._read_part(read, part_size)
+            budget.release(reserved)
+            reserved = 0
             parts = list(await asyncio.gather(*tasks))
-            await self.client.complete_multipart_upload(
+            response = await self.client.complete_multipart_upload(
                 Bucket=self.bucket_name, Key=key, UploadId=upload_id,
                 MultipartUpload={'Parts': parts},
             )
-            return total
+            return total, _strip_etag(response.get('ETag'))
         except BaseException:
+            if reserved:
+                budget.release(reserved)
             for t in tasks:
                 t.cancel()
             await asyncio.gather(*tasks, return_exceptions=True)
@@ -197,14 +392,171 @@ class StorageService:
                 logger.warning(f"Failed to abort multipart upload {upload_id} for {key}: {abort_err}")
             raise
 
-    async def stream(self, key: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    # ----- Multipart primitives for client-driven (resumable) uploads -----
+
+    async def create_multipart(self, key: str, content_type: str) -> str:
+        """Start a multipart upload at key; returns its UploadId."""
+        response = await self.client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=key, ContentType=content_type,
+        )
+        return response['UploadId']
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        """Store one part of a multipart upload; returns its ETag (quoted, as S3 expects it back)."""
+        response = await self.client.upload_part(
+            Bucket=self.bucket_name, Key=key,
+            PartNumber=part_number, UploadId=upload_id, Body=body,
+        )
+        return response['ETag']
+
+    async def complete_multipart(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> Optional[str]:
+        """
+        Assemble a multipart upload from (part number, ETag) pairs.
+
+        Returns:
+            S3 ETag of the stored object without quotes
+        """
+        response = await self.client.complete_multipart_upload(
+            Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'ETag': etag, 'PartNumber': number} for number, etag in sorted(parts)
+            ]},
+        )
+        return _strip_etag(response.get('ETag'))
+
+    async def abort_multipart(self, key: str, upload_id: str) -> bool:
+        """Abort a multipart upload and free its parts; False if S3 refused (already gone counts as done)."""
+        try:
+            await self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                return True
+            logger.warning(f"Failed to abort multipart upload {upload_id} for {key}: {e}")
+            return False
+
+    async def list_parts(self, key: str, upload_id: str) -> List[Tuple[int, str, int]]:
+        """Parts S3 holds for a multipart upload, as (part number, ETag, size) sorted by part number."""
+        parts = []
+        paginator = self.client.get_paginator('list_parts')
+        async for page in paginator.paginate(Bucket=self.bucket_name, Key=key, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                parts.append((part['PartNumber'], part['ETag'], part['Size']))
+        return sorted(parts)
+
+    async def list_multipart_uploads(self, prefix: str = ''):
+        """
+        List in-progress multipart uploads under a prefix as an async generator.
+
+        Yields:
+            Dicts with keys: key, upload_id, initiated
+        """
+        paginator = self.client.get_paginator('list_multipart_uploads')
+        async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for upload in page.get('Uploads', []):
+                yield {
+                    'key': upload['Key'],
+                    'upload_id': upload['UploadId'],
+                    'initiated': upload['Initiated'],
+                }
+
+    # ----- Presigned URLs: clients transfer content directly with S3 -----
+
+    async def presign_put(self, key: str, content_type: str, expires_in: int) -> str:
+        """URL for a single PUT of the whole object; the client must send the same Content-Type."""
+        presigner = self._presign_client or self.client
+        return await presigner.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket_name, 'Key': key, 'ContentType': content_type},
+            ExpiresIn=expires_in,
+        )
+
+    async def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires_in: int) -> str:
+        """URL for a PUT of one part of a multipart upload."""
+        presigner = self._presign_client or self.client
+        return await presigner.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': self.bucket_name, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expires_in,
+        )
+
+    async def presign_get(
+        self,
+        key: str,
+        expires_in: int,
+        internal: bool = False,
+        response_headers: Optional[dict] = None,
+    ) -> str:
+        """
+        URL for a GET of the object.
+
+        Args:
+            internal: sign for S3_ENDPOINT_URL (for a proxy inside the deployment,
+                e.g. nginx X-Accel-Redirect) rather than the public endpoint
+            response_headers: S3 response header overrides, e.g.
+                {'ResponseContentType': ..., 'ResponseContentDisposition': ...}
+        """
+        presigner = self.client if internal else (self._presign_client or self.client)
+        return await presigner.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': key, **(response_headers or {})},
+            ExpiresIn=expires_in,
+        )
+
+    async def head(self, key: str) -> Optional[dict]:
+        """
+        Object metadata, or None if the object does not exist.
+
+        Returns:
+            Dict with keys: size, content_type, etag (without quotes)
+        """
+        try:
+            response = await self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {
+            'size': response['ContentLength'],
+            'content_type': response.get('ContentType'),
+            'etag': _strip_etag(response.get('ETag')),
+        }
+
+    async def stream(
+        self,
+        key: str,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        byte_range: Optional[Tuple[int, int]] = None,
+        cache: bool = False,
+    ):
         """
         Open an object for streaming download.
 
+        Args:
+            key: S3 object key
+            chunk_size: bytes per yielded chunk
+            byte_range: optional inclusive (start, end) offsets; only that slice
+                is fetched from S3 via a ranged GetObject
+            cache: read through content_cache: serve a cached copy if there is
+                one, otherwise cache the object while a full read streams
+
         Returns:
-            (async chunk iterator, content length in bytes)
+            (async chunk iterator, content length in bytes of the returned slice)
         """
-        response = await self.client.get_object(Bucket=self.bucket_name, Key=key)
+        if cache:
+            cached = content_cache.lookup(key)
+            if cached is not None:
+                path, stat_result = cached
+                length = stat_result.st_size if byte_range is None else byte_range[1] - byte_range[0] + 1
+                return content_cache.read(path, chunk_size, byte_range), length
+
+        started = time.time()
+        kwargs = {'Bucket': self.bucket_name, 'Key': key}
+        if byte_range is not None:
+            kwargs['Range'] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        response = await self.client.get_object(**kwargs)
         body = response['Body']
 
         async def iterator():
@@ -217,21 +569,27 @@ class StorageService:
             finally:
                 body.close()
 
+        if cache and byte_range is None and content_cache.admits(response['ContentLength']):
+            length = response['ContentLength']
+            return content_cache.fill(key, iterator(), length, started=started), length
         return iterator(), response['ContentLength']
 
-    async def copy(self, src_key: str, dst_key: str, size: int, content_type: str) -> None:
+    async def copy(self, src_key: str, dst_key: str, size: int, content_type: str) -> Optional[str]:
         """
         Server-side copy of an object — no data flows through the application.
 
         Objects over 5 GiB use multipart upload_part_copy (copy_object's hard limit).
+
+        Returns:
+            S3 ETag of the new object without quotes
         """
         source = {'Bucket': self.bucket_name, 'Key': src_key}
         if size <= S3_MAX_COPY_SIZE:
-            await self.client.copy_object(
+            response = await self.client.copy_object(
                 Bucket=self.bucket_name, Key=dst_key, CopySource=source,
                 MetadataDirective='REPLACE', ContentType=content_type,
             )
-            return
+            return _strip_etag(response.get('CopyObjectResult', {}).get('ETag'))
 
         mpu = await self.client.create_multipart_upload(
             Bucket=self.bucket_name, Key=dst_key, ContentType=content_type,
@@ -249,10 +607,11 @@ class StorageService:
                 )
                 parts.append({'ETag': part['CopyPartResult']['ETag'], 'PartNumber': part_number})
                 part_number += 1
-            await self.client.complete_multipart_upload(
+            response = await self.client.complete_multipart_upload(
                 Bucket=self.bucket_name, Key=dst_key, UploadId=upload_id,
                 MultipartUpload={'Parts': parts},
             )
+            return _strip_etag(response.get('ETag'))
         except Exception:
             try:
                 await self.client.abort_multipart_upload(
@@ -262,16 +621,20 @@ class StorageService:
                 logger.warning(f"Failed to abort multipart copy {upload_id} for {dst_key}: {abort_err}")
             raise
 
-    async def download(self, key: str) -> bytes:
+    async def download(self, key: str, cache: bool = False) -> bytes:
         """
         Download content from S3.
 
         Args:
             key: S3 object key
+            cache: read through content_cache (see stream)
 
         Returns:
             Content as bytes
         """
+        if cache:
+            body, _ = await self.stream(key, cache=True)
+            return b''.join([chunk async for chunk in body])
         try:
             response = await self.client.get_object(
                 Bucket=self.bucket_name,
@@ -283,7 +646,8 @@ class StorageService:
             raise Exception(f"Failed to download from S3: {e}")
 
     async def delete(self, key: str) -> None:
-        """Delete object from S3."""
+        """Delete object from S3 (and its cached copy)."""
+        content_cache.invalidate([key])
         try:
             await self.client.delete_object(
                 Bucket=self.bucket_name,
@@ -292,6 +656,32 @@ class StorageService:
         except ClientError as e:
             raise Exception(f"Failed to delete from S3: {e}")
 
+    async def delete_many(self, keys: Iterable[str]) -> List[str]:
+        """
+        Delete objects with batched DeleteObjects requests.
+
+        Returns the keys that could not be deleted; a failed batch is logged
+        and counted as failed rather than aborting the remaining batches.
+        """
+        keys = list(keys)
+        content_cache.invalidate(keys)
+        failed: List[str] = []
+        for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+            try:
+                response = await self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+                )
+            except ClientError as e:
+                logger.warning(f"DeleteObjects failed for {len(batch)} keys: {e}")
+                failed.extend(batch)
+                continue
+            for error in response.get('Errors', []):
+                logger.warning(f"Failed to delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                failed.append(error.get('Key'))
+        return failed
+
     async def exists(self, key: str) -> bool:
         """Check if object exists in S3."""
         try:
@@ -329,5 +719,6 @@ class StorageService:
                 }
 
 
-# Global storage service instance (client created lazily during startup)
+# Global upload part budget and storage service instance (client created lazily during startup)
+upload_budget = UploadMemoryBudget(settings.UPLOAD_MEMORY_BUDGET_MB * 1024 * 1024)
 storage_service = StorageService()
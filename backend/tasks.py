@@ -1,45 +1,859 @@
 """Background tasks for relic expiration and cleanup."""
+import asyncio
+import hashlib
 import logging
-from datetime import datetime, timezone
-from sqlalchemy import select
-from backend.database import AsyncSessionLocal
-from backend.models import Relic
+import time
+import zlib
+from contextlib import asynccontextmanager
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Tuple, Type
+from sqlalchemy import select, update, delete, exists, func, literal, and_, or_, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from backend.compression import FrameDecompressor, compressible_condition, is_compressible
+from backend.config import settings
+from backend.database import AsyncSessionLocal, async_engine
+from backend.models import Blob, BlobArchiveIndex, Relic, RelicDerivative, RelicLineIndex, Comment, UploadSession
 from backend.storage import storage_service
+from backend.blobs import (
+    blob_key, delete_released_objects, lock_blob_key, release_blob_references, stream_content, with_inline_content,
+)
+from backend.archives import ArchiveError, archive_content_key, build_tar_sidecar, looks_like_tar, tar_condition
+from backend.derivatives import DerivativeError, derivable, derivative_kind, derive
+from backend.line_index import LineIndexError, index_relic_lines, needs_line_index
+from backend.utils import adjust_fork_count
 
 logger = logging.getLogger(__name__)
 
+# Abandoned upload sessions aborted per transaction
+UPLOAD_CLEANUP_BATCH_SIZE = 500
+# Blobs (or pre-deduplication relics) moved per transaction by relocate_content
+RELOCATE_BATCH_SIZE = 100
+# Archives claimed at a time by archive_index (each is read in full)
+ARCHIVE_INDEX_BATCH_SIZE = 10
+# A claim older than this belongs to a worker that died or failed; the archive is indexed again
+ARCHIVE_INDEX_CLAIM_TIMEOUT = timedelta(hours=1)
+# Relics given a preview per derive_previews run
+DERIVE_BATCH_SIZE = 20
+# A claim older than this belongs to a worker that died or failed; the preview is made again
+DERIVE_CLAIM_TIMEOUT = timedelta(minutes=30)
+# Relics walked per backfill transaction
+BACKFILL_BATCH_SIZE = 1000
+# Relics claimed at a time by line_index (each is read in full)
+LINE_INDEX_BATCH_SIZE = 10
+# A claim older than this belongs to a worker that died or failed; the relic is indexed again
+LINE_INDEX_CLAIM_TIMEOUT = timedelta(hours=1)
+# Claims of a queue item (previews, archive and line indexes) before its failures are final
+QUEUE_MAX_ATTEMPTS = 3
 
-async def cleanup_expired_relics():
+
+async def cleanup_expired_relics() -> dict:
     """
     Background task to delete expired relics.
 
-    Runs periodically to hard-delete relics that have expired.
-    Soft-deleted relics are hard-deleted after 30 days.
+    Runs periodically to hard-delete relics that have expired, in batches of
+    EXPIRED_RELIC_BATCH_SIZE. Each batch is one short transaction: a
+    DELETE ... RETURNING over rows picked with FOR UPDATE SKIP LOCKED (so
+    overlapping runs split the work instead of blocking each other), plus
+    blob reference release and fork count adjustment. S3 objects that are
+    no longer referenced are removed with batched DeleteObjects calls after
+    the commit.
+
+    Returns run metrics, which the scheduler records on the job history entry.
     """
     logger.info("Starting expired relics cleanup...")
-    async with AsyncSessionLocal() as db:
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    batch_size = max(1, settings.EXPIRED_RELIC_BATCH_SIZE)
+    relics_deleted = objects_deleted = objects_failed = batches = 0
+    t_start = time.monotonic()
 
-        # Find expired relics
-        result = await db.execute(
-            select(Relic).where(Relic.expires_at <= now)
+    while True:
+        expired = (
+            select(Relic.id)
+            .where(Relic.expires_at <= now)
+            .order_by(Relic.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
         )
-        expired_relics = result.scalars().all()
-
-        for relic in expired_relics:
-            relic_id = relic.id
-            s3_key = relic.s3_key
+        async with AsyncSessionLocal() as db:
             try:
-                # Delete DB record first — if S3 delete later fails, the orphaned
+                # Delete DB rows first — if S3 delete later fails, the orphaned
                 # S3 object is harmless and reclaimable. The reverse order risks a
                 # zombie DB row that retries forever against a missing S3 object.
-                await db.delete(relic)
+                result = await db.execute(
+                    delete(Relic)
+                    .where(Relic.id.in_(expired))
+                    .returning(Relic.id, Relic.s3_key, Relic.blob_sha256, Relic.fork_of)
+                    .execution_options(synchronize_session=False)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+
+                # Relics stored before deduplication own their object outright;
+                # shared content stays until its last reference goes.
+                s3_keys = [row.s3_key for row in rows if not row.blob_sha256 and row.s3_key]
+                s3_keys += await release_blob_references(db, [row.blob_sha256 for row in rows if row.blob_sha256])
+
+                deleted_ids = {row.id for row in rows}
+                parents = Counter(row.fork_of for row in rows if row.fork_of and row.fork_of not in deleted_ids)
+                for parent_id, count in parents.items():
+                    await adjust_fork_count(db, parent_id, -count)
+
                 await db.commit()
-                try:
-                    await storage_service.delete(s3_key)
-                except Exception as s3_err:
-                    logger.warning(f"Relic {relic_id} removed from DB but S3 delete failed (orphaned object {s3_key}): {s3_err}")
-                logger.info(f"Expired relic {relic_id} permanently deleted")
             except Exception as e:
-                logger.error(f"Error cleaning up relic {relic_id}: {e}")
+                logger.error(f"Error cleaning up expired relics batch: {e}")
                 await db.rollback()
+                raise
+
+        batches += 1
+        relics_deleted += len(rows)
+        failed = await delete_released_objects(s3_keys) if s3_keys else []
+        objects_deleted += len(s3_keys) - len(failed)
+        objects_failed += len(failed)
+        if failed:
+            logger.warning(f"{len(failed)} expired relic object(s) removed from DB but not from S3 (orphaned)")
+        logger.debug(f"Expired relic batch {batches}: {len(rows)} relics, {len(s3_keys)} objects")
+
+        if len(rows) < batch_size:
+            break
+
+    elapsed = time.monotonic() - t_start
+    metrics = {
+        "relics_deleted": relics_deleted,
+        "objects_deleted": objects_deleted,
+        "objects_failed": objects_failed,
+        "batches": batches,
+        "elapsed_seconds": round(elapsed, 3),
+        "relics_per_second": round(relics_deleted / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logger.info(
+        f"Expired relics cleanup finished: {relics_deleted} relics, {objects_deleted} S3 objects deleted "
+        f"({objects_failed} failed) in {batches} batch(es), {elapsed:.2f}s"
+    )
+    return metrics
+
+
+async def abort_abandoned_uploads() -> dict:
+    """
+    Background task to abort resumable uploads nobody finished.
+
+    Upload sessions idle past their expires_at are deleted in batches (their
+    recorded parts go with them) and their S3 multipart uploads aborted, which
+    frees the stored parts; objects PUT by unfinalized direct uploads are
+    deleted. Multipart uploads under relics/ older than
+    RESUMABLE_UPLOAD_TTL_HOURS that no session tracks — left behind when a
+    process died mid-upload — are aborted as well.
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    logger.info("Starting abandoned upload cleanup...")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    sessions_aborted = untracked_aborted = abort_failed = 0
+
+    while True:
+        stale = (
+            select(UploadSession.id)
+            .where(UploadSession.expires_at <= now)
+            .limit(UPLOAD_CLEANUP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.execute(
+                    delete(UploadSession)
+                    .where(UploadSession.id.in_(stale))
+                    .returning(UploadSession.s3_key, UploadSession.s3_upload_id)
+                    .execution_options(synchronize_session=False)
+                )
+                rows = result.all()
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Error cleaning up abandoned uploads batch: {e}")
+                await db.rollback()
+                raise
+
+        # Single-PUT direct uploads have no multipart upload; remove whatever object they left
+        leftover = [row.s3_key for row in rows if not row.s3_upload_id]
+        failed = await storage_service.delete_many(leftover) if leftover else []
+        sessions_aborted += len(leftover) - len(failed)
+        abort_failed += len(failed)
+        for row in rows:
+            if not row.s3_upload_id:
+                continue
+            if await storage_service.abort_multipart(row.s3_key, row.s3_upload_id):
+                sessions_aborted += 1
+            else:
+                abort_failed += 1
+        if len(rows) < UPLOAD_CLEANUP_BATCH_SIZE:
+            break
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS)
+    async with AsyncSessionLocal() as db:
+        tracked = set((await db.execute(select(UploadSession.s3_upload_id))).scalars().all())
+    async for upload in storage_service.list_multipart_uploads(prefix="relics/"):
+        if upload['initiated'] >= cutoff or upload['upload_id'] in tracked:
+            continue
+        if await storage_service.abort_multipart(upload['key'], upload['upload_id']):
+            untracked_aborted += 1
+        else:
+            abort_failed += 1
+
+    logger.info(
+        f"Abandoned upload cleanup finished: {sessions_aborted} sessions and "
+        f"{untracked_aborted} untracked multipart uploads aborted ({abort_failed} failed)"
+    )
+    return {
+        "sessions_aborted": sessions_aborted,
+        "untracked_aborted": untracked_aborted,
+        "abort_failed": abort_failed,
+    }
+
+
+async def reconcile_relic_counters():
+    """
+    Background task to repair drift in denormalized relic counters.
+
+    comments_count and forks_count (and blob ref_count) are maintained
+    incrementally by the write paths; this recomputes them from the source
+    tables and rewrites only the rows that disagree.
+    """
+    logger.info("Starting relic counter reconciliation...")
+    fork = Relic.__table__.alias("fork")
+    comments = select(func.count(Comment.id)).where(Comment.relic_id == Relic.id).scalar_subquery()
+    forks = select(func.count(fork.c.id)).where(fork.c.fork_of == Relic.id).scalar_subquery()
+    refs = select(func.count(Relic.id)).where(Relic.blob_sha256 == Blob.sha256).scalar_subquery()
+
+    async with AsyncSessionLocal() as db:
+        comments_result = await db.execute(
+            update(Relic)
+            .where(Relic.comments_count.is_distinct_from(comments))
+            .values(comments_count=comments)
+            .execution_options(synchronize_session=False)
+        )
+        forks_result = await db.execute(
+            update(Relic)
+            .where(Relic.forks_count.is_distinct_from(forks))
+            .values(forks_count=forks)
+            .execution_options(synchronize_session=False)
+        )
+        # Only repairs counts; unreferenced blobs are left for an explicit cleanup
+        refs_result = await db.execute(
+            update(Blob)
+            .where(Blob.ref_count.is_distinct_from(refs))
+            .values(ref_count=refs)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    logger.info(
+        f"Relic counter reconciliation complete: {comments_result.rowcount} comment counts, "
+        f"{forks_result.rowcount} fork counts, {refs_result.rowcount} blob reference counts corrected"
+    )
+
+
+async def relocate_content(to: str, limit: int) -> dict:
+    """
+    Move existing relic content between S3 and inline storage.
+
+    to="inline" moves S3 content of at most INLINE_CONTENT_MAX_SIZE bytes into
+    the blob table. Relics stored before deduplication get a blob on the way,
+    shared with an existing one when the content matches. to="s3" moves
+    inline content larger than INLINE_CONTENT_MAX_SIZE (all of it when inline
+    storage is disabled) out to S3 at its content-addressed key. Each batch
+    commits before the S3 objects it made redundant are deleted, so an
+    interrupted run loses nothing and can simply be repeated. At most limit
+    items are moved per call.
+
+    Returns counts of items moved and skipped (unreadable or failing the
+    digest check; they are left where they are).
+    """
+    logger.info(f"Starting content relocation to {to}...")
+    max_size = settings.INLINE_CONTENT_MAX_SIZE
+    moved = skipped = objects_deleted = 0
+    objects_failed = []
+    skip = set()
+
+    if to == "s3":
+        oversized = Blob.size_bytes > max_size if max_size > 0 else true()
+        while moved < limit:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Blob.sha256, Blob.content)
+                    .where(Blob.content.is_not(None), oversized, Blob.sha256.not_in(list(skip)))
+                    .limit(min(RELOCATE_BATCH_SIZE, limit - moved))
+                )).all()
+            if not rows:
+                break
+            stored = []
+            for row in rows:
+                # Inline blobs registered before content addressing still carry a relic's key
+                key = blob_key(row.sha256)
+                async with AsyncSessionLocal() as db:
+                    try:
+                        await lock_blob_key(db, key)
+                        await storage_service.upload(key, row.content)
+                        result = await db.execute(
+                            update(Blob)
+                            .where(Blob.sha256 == row.sha256, Blob.content.is_not(None))
+                            .values(content=None, s3_key=key)
+                            .execution_options(synchronize_session=False)
+                        )
+                        if result.rowcount:
+                            await db.execute(
+                                update(Relic)
+                                .where(Relic.blob_sha256 == row.sha256)
+                                .values(s3_key=key)
+                                .execution_options(synchronize_session=False)
+                            )
+                        await db.commit()
+                        stored.append(row.sha256)
+                    except Exception as e:
+                        await db.rollback()
+                        logger.warning(f"Failed to move blob {row.sha256} to S3: {e}")
+                        skip.add(row.sha256)
+            moved += len(stored)
+        skipped = len(skip)
+
+    else:
+        # Blobs already deduplicated: only the placement changes
+        while moved < limit:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Blob.sha256, Blob.s3_key, Blob.content_encoding)
+                    .where(
+                        Blob.content.is_(None), Blob.size_bytes <= max_size,
+                        Blob.ref_count > 0, Blob.sha256.not_in(list(skip)),
+                    )
+                    .limit(min(RELOCATE_BATCH_SIZE, limit - moved))
+                )).all()
+            if not rows:
+                break
+            contents = {}
+            for row in rows:
+                data = await _read_verified(row.s3_key, row.sha256, row.content_encoding)
+                if data is None:
+                    skip.add(row.sha256)
+                else:
+                    contents[row.sha256] = (row.s3_key, data)
+            async with AsyncSessionLocal() as db:
+                for sha256, (_, data) in contents.items():
+                    await db.execute(
+                        update(Blob)
+                        .where(Blob.sha256 == sha256, Blob.content.is_(None))
+                        # Inline content is stored as is (TOAST compresses large values)
+                        .values(content=data, content_encoding=None, stored_size_bytes=len(data))
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+            keys = [key for key, _ in contents.values()]
+            objects_failed += await storage_service.delete_many(keys) if keys else []
+            objects_deleted += len(keys)
+            moved += len(contents)
+        skipped = len(skip)
+
+        # Relics stored before deduplication own their object: adopt it into a blob
+        skip = set()
+        while moved < limit:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Relic.id, Relic.s3_key, Relic.etag, Relic.name, Relic.content_type)
+                    .where(
+                        Relic.blob_sha256.is_(None), Relic.s3_key.is_not(None),
+                        Relic.size_bytes <= max_size, Relic.id.not_in(list(skip)),
+                    )
+                    .limit(min(RELOCATE_BATCH_SIZE, limit - moved))
+                )).all()
+            if not rows:
+                break
+            keys = []
+            for row in rows:
+                data = await _read_verified(row.s3_key)
+                if data is None:
+                    skip.add(row.id)
+                    continue
+                async with AsyncSessionLocal() as db:
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    stmt = pg_insert(Blob).values(
+                        sha256=sha256, s3_key=blob_key(sha256), size_bytes=len(data), stored_size_bytes=len(data),
+                        etag=row.etag or hashlib.md5(data).hexdigest(), ref_count=1, content=data,
+                    )
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + 1}
+                    )
+                    blob_key = (await db.execute(stmt.returning(Blob.s3_key))).scalar_one()
+                    result = await db.execute(
+                        update(Relic)
+                        .where(Relic.id == row.id, Relic.blob_sha256.is_(None))
+                        .values(blob_sha256=sha256, s3_key=blob_key)
+                        .execution_options(synchronize_session=False)
+                    )
+                    if result.rowcount != 1:
+                        # Deleted or adopted concurrently
+                        await db.rollback()
+                        skip.add(row.id)
+                        continue
+                    if looks_like_tar(row.name, row.content_type):
+                        # Now keyed by its blob; the index under the old key is reaped
+                        await _queue_archive_index(db, sha256)
+                    await db.commit()
+                # The content is now inline or in an existing blob; the old object is unused
+                keys.append(row.s3_key)
+                moved += 1
+            objects_failed += await storage_service.delete_many(keys) if keys else []
+            objects_deleted += len(keys)
+        skipped += len(skip)
+
+    objects_deleted -= len(objects_failed)
+    if objects_failed:
+        logger.warning(f"{len(objects_failed)} relocated object(s) could not be deleted from S3 (orphaned)")
+    logger.info(f"Content relocation to {to} finished: {moved} moved, {skipped} skipped")
+    return {
+        "to": to,
+        "moved": moved,
+        "skipped": skipped,
+        "objects_deleted": objects_deleted,
+        "objects_failed": len(objects_failed),
+    }
+
+
+async def _read_verified(
+    s3_key: str, sha256: Optional[str] = None, content_encoding: Optional[str] = None
+) -> Optional[bytes]:
+    """Object content (decompressed), or None (logged) if it cannot be read or does not match sha256."""
+    try:
+        data = await storage_service.download(s3_key)
+        if content_encoding:
+            data = FrameDecompressor(content_encoding).decompress(data)
+    except Exception as e:
+        logger.warning(f"Failed to read {s3_key} for relocation: {e}")
+        return None
+    if sha256 and hashlib.sha256(data).hexdigest() != sha256:
+        logger.warning(f"Object {s3_key} does not match blob digest {sha256}, left in S3")
+        return None
+    return data
+
+
+@asynccontextmanager
+async def exclusive_run(name: str) -> AsyncIterator[bool]:
+    """
+    Hold a Postgres advisory lock named after a job for the duration of a run.
+
+    Yields False when another worker (or process) holds it, so a job
+    scheduled in every worker runs in one at a time. The lock lives on its
+    own connection, outside any transaction, and ends with it.
+    """
+    key = zlib.crc32(f"relic:{name}".encode())
+    async with async_engine.connect() as conn:
+        owner = bool(await conn.scalar(select(func.pg_try_advisory_lock(key))))
+        await conn.commit()
+        try:
+            yield owner
+        finally:
+            if owner:
+                await conn.execute(select(func.pg_advisory_unlock(key)))
+                await conn.commit()
+
+
+async def claim_queued(db, key, status, created_at, attempts, stale_before: datetime, limit: int) -> List:
+    """
+    Claim up to limit rows of a work queue table (newest first) for this worker.
+
+    Rows are "queued", or "pending" with a claim older than stale_before
+    (its worker died). They become "pending" with created_at set to now
+    and attempts counted up. The partial index on queued and pending rows
+    serves the lookup, so an empty queue costs one index probe. Returns
+    (key, attempts) rows.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    queue = (
+        select(key)
+        .where(
+            # Repeats the partial index predicate so the planner picks it
+            status.in_(("queued", "pending")),
+            or_(status == "queued", created_at < stale_before),
+        )
+        .order_by(created_at.desc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(key.class_)
+        .where(key.in_(queue))
+        .values({status: "pending", created_at: now, attempts: attempts + 1})
+        .returning(key, attempts)
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def drain_queue(
+    key, status, interval: int, claim_timeout: timedelta, batch_size: int,
+    load, work, rejection: Type[Exception], object_field: str, label: str,
+) -> Tuple[int, int, int]:
+    """
+    Work through a queue table until it is empty or interval seconds have passed.
+
+    Claims batch_size rows at a time (claim_queued), loads each one's relic
+    with load(db, key) and records work(key, relic), the row's new values,
+    on it. Content that raises rejection is recorded as "none" and not read
+    again. Any other failure leaves the row pending, to be claimed again
+    after claim_timeout, until QUEUE_MAX_ATTEMPTS claims have been made;
+    it is then recorded as "none" as well. Rows whose relic is gone are
+    skipped (reap_orphaned_derived_data deletes them), and an object
+    written for a row deleted meanwhile (values[object_field]) is removed.
+    The caller holds the job's exclusive_run lock.
+
+    Returns (done, rejected, failed) counts.
+    """
+    table = key.class_
+    done = rejected = failed = 0
+    t_start = time.monotonic()
+    while time.monotonic() - t_start < interval:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        async with AsyncSessionLocal() as db:
+            claimed = await claim_queued(
+                db, key, status, table.created_at, table.attempts, now - claim_timeout, batch_size
+            )
+            await db.commit()
+        if not claimed:
+            break
+
+        for item, attempts in claimed:
+            async with AsyncSessionLocal() as db:
+                relic = await load(db, item)
+            if relic is None:
+                continue
+
+            try:
+                values = await work(item, relic)
+                done += 1
+            except rejection as e:
+                values = {status.key: "none", "error": str(e)[:500]}
+                rejected += 1
+            except Exception as e:
+                logger.error(f"{label} failed for {item} (attempt {attempts}): {e}")
+                failed += 1
+                if attempts < QUEUE_MAX_ATTEMPTS:
+                    continue
+                values = {status.key: "none", "error": f"Gave up after {attempts} attempts: {e}"[:500]}
+
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(table)
+                    .where(key == item)
+                    .values(**values, created_at=datetime.now(timezone.utc).replace(tzinfo=None))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            if result.rowcount != 1 and values.get(object_field):
+                # The relic was deleted (and its row reaped) meanwhile
+                await storage_service.delete_many([values[object_field]])
+
+    return done, rejected, failed
+
+
+async def _queue_archive_index(db, content_key: str) -> None:
+    """Queue content for the archive_index job (a no-op when it has a row: content is shared)."""
+    if settings.ARCHIVE_INDEX_ENABLED:
+        await db.execute(
+            pg_insert(BlobArchiveIndex)
+            .values(
+                content_key=content_key, format="queued", created_at=datetime.now(timezone.utc).replace(tzinfo=None)
+            )
+            .on_conflict_do_nothing()
+        )
+
+
+async def enqueue_background_work(db, relic: Relic) -> None:
+    """
+    Queue a new relic for the background jobs that apply to it: its
+    preview, archive index and line index.
+
+    Runs in the caller's transaction, before its commit; the caller then
+    calls request_derivation() when a preview was queued.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if settings.DERIVATIVES_ENABLED and derivative_kind(relic.name, relic.content_type):
+        await db.execute(
+            pg_insert(RelicDerivative)
+            .values(relic_id=relic.id, status="queued", created_at=now)
+            .on_conflict_do_nothing()
+        )
+    if looks_like_tar(relic.name, relic.content_type):
+        await _queue_archive_index(db, archive_content_key(relic))
+    if settings.LINE_INDEX_ENABLED and needs_line_index(relic) and is_compressible(relic.content_type):
+        await db.execute(
+            pg_insert(RelicLineIndex)
+            .values(relic_id=relic.id, status="queued", created_at=now)
+            .on_conflict_do_nothing()
+        )
+
+
+async def backfill_background_work() -> dict:
+    """
+    Background task to queue relics created before their background job existed.
+
+    Admin-triggered only (the job is scheduled paused): previews for
+    relics without a relic_derivative row, archive indexes for tar relics
+    whose content has no blob_archive_index row, line indexes for large text
+    relics without a relic_line_index row. Walks relic by primary key in
+    batches of BACKFILL_BATCH_SIZE, one short transaction each; queueing is
+    idempotent, so a run can be repeated or interrupted. The scheduled
+    jobs then work through the queue.
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    logger.info("Starting background work backfill...")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    previews = archives = lines = scanned = 0
+    last_id = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(
+                select(Relic.id).where(Relic.id > last_id).order_by(Relic.id).limit(BACKFILL_BATCH_SIZE)
+            )).scalars().all()
+            if not ids:
+                break
+            batch = and_(Relic.id > last_id, Relic.id <= ids[-1])
+            last_id = ids[-1]
+            scanned += len(ids)
+
+            if settings.DERIVATIVES_ENABLED:
+                result = await db.execute(
+                    pg_insert(RelicDerivative)
+                    .from_select(
+                        ["relic_id", "status", "created_at"],
+                        select(Relic.id, literal("queued"), literal(now)).where(batch, derivable()),
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(RelicDerivative.relic_id)
+                )
+                previews += len(result.all())
+            if settings.ARCHIVE_INDEX_ENABLED:
+                result = await db.execute(
+                    pg_insert(BlobArchiveIndex)
+                    .from_select(
+                        ["content_key", "format", "created_at"],
+                        select(func.coalesce(Relic.blob_sha256, Relic.s3_key), literal("queued"), literal(now))
+                        .where(batch, tar_condition())
+                        .distinct(),
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(BlobArchiveIndex.content_key)
+                )
+                archives += len(result.all())
+            if settings.LINE_INDEX_ENABLED:
+                result = await db.execute(
+                    pg_insert(RelicLineIndex)
+                    .from_select(
+                        ["relic_id", "status", "created_at"],
+                        select(Relic.id, literal("queued"), literal(now)).where(
+                            batch,
+                            Relic.size_bytes > settings.LINE_INDEX_MIN_SIZE_MB * 1024 * 1024,
+                            compressible_condition(Relic.content_type),
+                        ),
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(RelicLineIndex.relic_id)
+                )
+                lines += len(result.all())
+            await db.commit()
+
+    logger.info(
+        f"Backfill finished: {scanned} relics scanned, {previews} queued for previews, "
+        f"{archives} for archive indexing, {lines} for line indexing"
+    )
+    return {"scanned": scanned, "previews": previews, "archives": archives, "lines": lines}
+
+
+async def reap_orphaned_derived_data() -> dict:
+    """
+    Background task to delete derived data of relics that no longer exist.
+
+    relic_derivative, blob_archive_index and relic_line_index rows are not
+    foreign keys, so deleting a relic (or the last relic of a blob) leaves
+    its row and thumbnail or sidecar behind; this removes them (one
+    anti-join per table, daily, in one worker).
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    async with exclusive_run("reap_derived") as owner:
+        if not owner:
+            return {"skipped": True}
+        async with AsyncSessionLocal() as db:
+            thumbnails = (await db.execute(
+                delete(RelicDerivative)
+                .where(~exists().where(Relic.id == RelicDerivative.relic_id))
+                .returning(RelicDerivative.thumbnail_key)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            # Content is gone once no blob has the key, nor a relic stored without a blob
+            sidecars = (await db.execute(
+                delete(BlobArchiveIndex)
+                .where(
+                    ~exists().where(Blob.sha256 == BlobArchiveIndex.content_key),
+                    ~exists().where(Relic.s3_key == BlobArchiveIndex.content_key, Relic.blob_sha256.is_(None)),
+                )
+                .returning(BlobArchiveIndex.sidecar_key)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            line_sidecars = (await db.execute(
+                delete(RelicLineIndex)
+                .where(~exists().where(Relic.id == RelicLineIndex.relic_id))
+                .returning(RelicLineIndex.sidecar_key)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await db.commit()
+
+        keys = [key for key in (*thumbnails, *sidecars, *line_sidecars) if key]
+        failed = len(await storage_service.delete_many(keys)) if keys else 0
+    logger.info(
+        f"Derived data reaped: {len(thumbnails)} previews, {len(sidecars)} archive indexes, "
+        f"{len(line_sidecars)} line indexes"
+    )
+    return {
+        "previews_deleted": len(thumbnails),
+        "archive_indexes_deleted": len(sidecars),
+        "line_indexes_deleted": len(line_sidecars),
+        "objects_failed": failed,
+    }
+
+
+async def index_archives() -> dict:
+    """
+    Background task to build member indexes of tar and tar.gz relics.
+
+    Content of relics that look like tar archives (name or content type)
+    is queued with a "queued" blob_archive_index row when created
+    (enqueue_background_work) or by the backfill job. Rows are keyed by
+    archive_content_key: the blob, or the relic's own object for content
+    stored without one. One worker at a time works through the queue
+    (drain_queue) for up to ARCHIVE_INDEX_INTERVAL, reading each archive
+    once in full. The sidecar goes to indexes/{content key}; content that
+    turns out not to be an indexable archive is recorded as "none".
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    span = settings.ARCHIVE_CHECKPOINT_SPAN_MB * 1024 * 1024
+
+    async def load(db, key: str) -> Optional[Relic]:
+        return (await db.execute(
+            select(Relic).options(with_inline_content())
+            .where(or_(Relic.blob_sha256 == key, and_(Relic.s3_key == key, Relic.blob_sha256.is_(None))))
+            .limit(1)
+        )).scalars().first()
+
+    async def work(key: str, relic: Relic) -> dict:
+        sidecar_key = f"indexes/{key}"
+        chunks, _ = await stream_content(relic)
+        format, entry_count, checkpoint_count, sidecar = await build_tar_sidecar(
+            chunks, span, settings.ARCHIVE_MAX_ENTRIES
+        )
+        await storage_service.upload(sidecar_key, sidecar)
+        return {
+            "format": format, "sidecar_key": sidecar_key,
+            "entry_count": entry_count, "checkpoint_count": checkpoint_count,
+        }
+
+    async with exclusive_run("archive_index") as owner:
+        if not owner:
+            return {"skipped": True}
+        indexed, rejected, failed = await drain_queue(
+            BlobArchiveIndex.content_key, BlobArchiveIndex.format, settings.ARCHIVE_INDEX_INTERVAL,
+            ARCHIVE_INDEX_CLAIM_TIMEOUT, ARCHIVE_INDEX_BATCH_SIZE, load, work, ArchiveError,
+            "sidecar_key", "Archive indexing",
+        )
+
+    if indexed or rejected or failed:
+        logger.info(f"Archive indexing finished: {indexed} indexed, {rejected} not archives, {failed} failed")
+    return {"indexed": indexed, "rejected": rejected, "failed": failed}
+
+
+async def _load_relic(db, relic_id: str) -> Optional[Relic]:
+    """drain_queue loader for queues keyed by relic id."""
+    return await db.get(Relic, relic_id, options=[with_inline_content()])
+
+
+async def derive_previews() -> dict:
+    """
+    Background task to make relic previews (thumbnails and text snippets).
+
+    Relics are queued with a "queued" relic_derivative row when created
+    (enqueue_background_work) or by the backfill job. One worker at a time
+    works through the queue (drain_queue) for up to DERIVATIVE_INTERVAL.
+    See backend.derivatives. Content without a preview is recorded as
+    "none".
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    async with exclusive_run("derivatives") as owner:
+        if not owner:
+            return {"skipped": True}
+        derived, rejected, failed = await drain_queue(
+            RelicDerivative.relic_id, RelicDerivative.status, settings.DERIVATIVE_INTERVAL,
+            DERIVE_CLAIM_TIMEOUT, DERIVE_BATCH_SIZE, _load_relic, lambda relic_id, relic: derive(relic),
+            DerivativeError, "thumbnail_key", "Preview",
+        )
+
+    if derived or rejected or failed:
+        logger.info(f"Previews finished: {derived} derived, {rejected} without preview, {failed} failed")
+    return {"derived": derived, "rejected": rejected, "failed": failed}
+
+
+async def index_lines() -> dict:
+    """
+    Background task to build line indexes of large text relics.
+
+    Text relics over LINE_INDEX_MIN_SIZE_MB are queued with a "queued"
+    relic_line_index row when created (enqueue_background_work) or by the
+    backfill job. One worker at a time works through the queue
+    (drain_queue) for up to LINE_INDEX_INTERVAL, reading each relic once in
+    full. The sidecar goes to line-indexes/{relic_id} (see
+    backend.line_index).
+
+    Returns run metrics, which the scheduler records on the job history entry.
+    """
+    async with exclusive_run("line_index") as owner:
+        if not owner:
+            return {"skipped": True}
+        indexed, rejected, failed = await drain_queue(
+            RelicLineIndex.relic_id, RelicLineIndex.status, settings.LINE_INDEX_INTERVAL,
+            LINE_INDEX_CLAIM_TIMEOUT, LINE_INDEX_BATCH_SIZE, _load_relic,
+            lambda relic_id, relic: index_relic_lines(relic), LineIndexError, "sidecar_key", "Line indexing",
+        )
+
+    if indexed or rejected or failed:
+        logger.info(f"Line indexing finished: {indexed} indexed, {rejected} not indexable, {failed} failed")
+    return {"indexed": indexed, "rejected": rejected, "failed": failed}
+
+
+_derive_task: Optional[asyncio.Task] = None
+_derive_again = False
+
+
+def request_derivation() -> None:
+    """
+    Run derive_previews soon in this worker, so a new relic does not wait for the next scheduled run.
+
+    Requests made while a run is in progress add one more run after it.
+    """
+    global _derive_task, _derive_again
+    if not settings.DERIVATIVES_ENABLED:
+        return
+    if _derive_task is not None and not _derive_task.done():
+        _derive_again = True
+        return
+    _derive_task = asyncio.get_running_loop().create_task(_derive_requested())
+
+
+async def _derive_requested() -> None:
+    global _derive_again
+    while True:
+        _derive_again = False
+        try:
+            await derive_previews()
+        except Exception as e:
+            logger.error(f"Preview run failed: {e}")
+        if not _derive_again:
+            return
@@ -0,0 +1,188 @@
+"""
+Thumbnail rendering for the derivatives job.
+
+Each renderer takes the full content and a bounding box size and returns
+(WebP bytes, source width, source height), or raises ThumbnailError for
+content it cannot render. They are CPU-bound and run in worker processes
+(backend.derivatives), so this module imports nothing from the app.
+
+Images and Excalidraw drawings need Pillow; PDFs also need PyMuPDF, which
+is optional. Excalidraw scenes are drawn as wireframes (shapes, lines and
+text; no rotation, fill styles or embedded images).
+"""
+import io
+import json
+import math
+from typing import Tuple
+
+# Lossy WebP, small enough to inline in listings
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+THUMBNAIL_QUALITY = 80
+# Blank border around Excalidraw drawings, in thumbnail pixels
+DRAWING_PADDING = 8
+DRAWING_BACKGROUND = (255, 255, 255)
+DRAWING_STROKE = (30, 30, 30)
+
+
+class ThumbnailError(Exception):
+    """Content that cannot be rendered (corrupt, unsupported or too large)."""
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ThumbnailError("Thumbnails require the 'Pillow' package")
+    return Image
+
+
+def _encode(image) -> bytes:
+    if image.mode not in ("RGB", "RGBA"):
+        transparent = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return buffer.getvalue()
+
+
+def render_image(data: bytes, size: int, max_pixels: int) -> Tuple[bytes, int, int]:
+    """Thumbnail of a raster image (first frame), EXIF orientation applied."""
+    Image = _pillow()
+    from PIL import ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if width * height > max_pixels:
+                raise ThumbnailError(f"Image too large to render ({width}x{height})")
+            # JPEG decodes straight to a reduced scale; a no-op for other formats
+            image.draft("RGB", (size, size))
+            thumbnail = ImageOps.exif_transpose(image)
+            thumbnail.thumbnail((size, size))
+            return _encode(thumbnail), width, height
+    except ThumbnailError:
+        raise
+    except Exception as e:
+        raise ThumbnailError(f"Cannot decode image: {e}")
+
+
+def render_pdf(data: bytes, size: int, max_pixels: int) -> Tuple[bytes, int, int]:
+    """Thumbnail of the first page of a PDF; width/height are the page size in points."""
+    Image = _pillow()
+    try:
+        import fitz
+    except ImportError:
+        raise ThumbnailError("PDF thumbnails require the 'PyMuPDF' package")
+
+    try:
+        with fitz.open(stream=data, filetype="pdf") as document:
+            if document.page_count == 0:
+                raise ThumbnailError("PDF has no pages")
+            page = document[0]
+            width, height = page.rect.width, page.rect.height
+            if width <= 0 or height <= 0:
+                raise ThumbnailError("PDF page has no area")
+            zoom = size / max(width, height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            return _encode(image), round(width), round(height)
+    except ThumbnailError:
+        raise
+    except Exception as e:
+        raise ThumbnailError(f"Cannot render PDF: {e}")
+
+
+def _element_points(element: dict):
+    """Scene coordinates an element's outline goes through."""
+    x, y = float(element.get("x", 0)), float(element.get("y", 0))
+    if element.get("points"):
+        return [(x + float(px), y + float(py)) for px, py, *_ in element["points"]]
+    width, height = float(element.get("width", 0)), float(element.get("height", 0))
+    return [(x, y), (x + width, y + height)]
+
+
+def _color(value, default):
+    from PIL import ImageColor
+
+    if not value or value == "transparent":
+        return default
+    try:
+        return ImageColor.getrgb(value)
+    except ValueError:
+        return default
+
+
+def _draw_element(draw, element: dict, outline, scale: float) -> None:
+    from PIL import ImageFont
+
+    kind = element.get("type")
+    stroke = _color(element.get("strokeColor"), DRAWING_STROKE)
+    fill = _color(element.get("backgroundColor"), None)
+    line_width = max(1, round(float(element.get("strokeWidth", 1)) * scale))
+    left, top = min(x for x, _ in outline), min(y for _, y in outline)
+    right, bottom = max(x for x, _ in outline), max(y for _, y in outline)
+
+    if kind in ("rectangle", "frame", "image"):
+        draw.rectangle((left, top, right, bottom), outline=stroke, fill=fill, width=line_width)
+    elif kind == "ellipse":
+        draw.ellipse((left, top, right, bottom), outline=stroke, fill=fill, width=line_width)
+    elif kind == "diamond":
+        middle_x, middle_y = (left + right) / 2, (top + bottom) / 2
+        corners = [(middle_x, top), (right, middle_y), (middle_x, bottom), (left, middle_y)]
+        if fill:
+            draw.polygon(corners, fill=fill)
+        draw.line(corners + corners[:1], fill=stroke, width=line_width)
+    elif kind in ("line", "arrow", "freedraw") and len(outline) > 1:
+        draw.line(outline, fill=stroke, width=line_width, joint="curve")
+    elif kind == "text" and element.get("text"):
+        font_size = max(6, round(float(element.get("fontSize", 20)) * scale))
+        try:
+            font = ImageFont.load_default(size=font_size)
+        except TypeError:
+            # Pillow < 10.1: fixed-size bitmap font
+            font = ImageFont.load_default()
+        draw.multiline_text((left, top), str(element["text"]), fill=stroke, font=font)
+
+
+def render_excalidraw(data: bytes, size: int, max_pixels: int) -> Tuple[bytes, int, int]:
+    """Wireframe thumbnail of an Excalidraw scene; width/height are the drawing bounds."""
+    Image = _pillow()
+    from PIL import ImageDraw
+
+    try:
+        scene = json.loads(data)
+        elements = [
+            element for element in scene.get("elements") or []
+            if isinstance(element, dict) and not element.get("isDeleted")
+        ]
+        outlines = [_element_points(element) for element in elements]
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ThumbnailError(f"Not an Excalidraw scene: {e}")
+    points = [point for outline in outlines for point in outline]
+    if not points:
+        raise ThumbnailError("Drawing is empty")
+
+    min_x = min(x for x, _ in points)
+    min_y = min(y for _, y in points)
+    width = max(x for x, _ in points) - min_x
+    height = max(y for _, y in points) - min_y
+    scale = min(1.0, (size - 2 * DRAWING_PADDING) / max(width, height, 1))
+    canvas_size = (
+        math.ceil(width * scale) + 2 * DRAWING_PADDING,
+        math.ceil(height * scale) + 2 * DRAWING_PADDING,
+    )
+    app_state = scene.get("appState") if isinstance(scene.get("appState"), dict) else {}
+    image = Image.new("RGB", canvas_size, _color(app_state.get("viewBackgroundColor"), DRAWING_BACKGROUND))
+    draw = ImageDraw.Draw(image)
+
+    try:
+        for element, outline in zip(elements, outlines):
+            projected = [
+                ((x - min_x) * scale + DRAWING_PADDING, (y - min_y) * scale + DRAWING_PADDING)
+                for x, y in outline
+            ]
+            _draw_element(draw, element, projected, scale)
+    except Exception as e:
+        raise ThumbnailError(f"Cannot render drawing: {e}")
+    return _encode(image), round(width), round(height)
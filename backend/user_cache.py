@@ -0,0 +1,77 @@
+"""In-process cache of authenticated users keyed by X-User-Key."""
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from backend.config import settings
+from backend.models import User
+
+
+class CachedUser(NamedTuple):
+    """The User columns auth and permission checks need."""
+    id: str
+    public_id: Optional[str]
+    name: Optional[str]
+    is_admin: bool
+
+    def to_user(self) -> User:
+        """Build a fresh transient User so handlers never share one instance across requests."""
+        return User(id=self.id, public_id=self.public_id, name=self.name, is_admin=self.is_admin)
+
+
+class UserCache:
+    """
+    TTL + LRU cache of user lookups, including negative entries for unknown keys.
+
+    Writes that change a cached column (admin grant/revoke, rename, delete,
+    registration of a previously unknown key) must call ``invalidate``. The
+    cache is per process, so other workers may serve a stale entry for up to
+    ``ttl`` seconds (``negative_ttl`` for unknown keys).
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[CachedUser]]]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Optional[CachedUser]]:
+        """
+        Look up a user key.
+
+        Returns:
+            (hit, user) — user is None on a negative hit or a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, user
+
+    def put(self, key: str, user: Optional[CachedUser]) -> None:
+        """Cache a lookup result; None records that the key is unknown."""
+        ttl = self.ttl if user is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """Drop a cached entry after the user row changed."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry (e.g. after a database restore)."""
+        self._entries.clear()
+
+
+# Global per-process cache
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+)
@@ -1,7 +1,12 @@
 """Utility functions."""
+import base64
+import binascii
+import json
+import re
 import secrets
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, List, Tuple
 import hashlib
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -91,22 +96,100 @@ def like_term(value: str) -> str:
     return f"%{like_escape(value)}%"
 
 
+# Must stay identical to the ix_relic_search_tsv index expression, or the
+# planner cannot match it. Written as SQL so no bind parameters creep in.
+RELIC_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(relic.name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(relic.description, '')), 'B')"
+)
+
+
+def relic_search_query(search: str):
+    """Build a prefix-matching tsquery from the words in search, or None if it has none."""
+    from sqlalchemy import func, literal_column
+    words = re.findall(r"\w+", search.lower())
+    if not words:
+        return None
+    return func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{w}:*" for w in words))
+
+
 def apply_relic_search(stmt, search: str):
-    """Filter a Relic Select statement by search term across name, id, description, and tags."""
-    from backend.models import Relic, Tag
-    from sqlalchemy import select, or_
+    """Filter a Relic Select statement by search term across name, id, description, and tags.
+
+    In the default "fulltext" SEARCH_MODE each branch is a separate
+    index-backed lookup (pg_trgm on name and description substrings, the
+    tsvector index for word prefixes in any order, a prefix scan on id)
+    and the relic must appear in their union. Ids match by prefix only.
+    "basic" keeps the original unindexed ILIKE scan, ids included.
+    """
+    from backend.config import settings
+    from backend.models import Relic, Tag, relic_tags
+    from sqlalchemy import select, or_, union, literal_column
+    from sqlalchemy.dialects.postgresql import TSVECTOR
     term = like_term(search)
-    tag_sq = select(Relic.id).join(Relic.tags).where(Tag.name.ilike(term)).scalar_subquery()
-    return stmt.where(
-        or_(Relic.name.ilike(term), Relic.id.ilike(term), Relic.description.ilike(term), Relic.id.in_(tag_sq))
-    ).distinct()
+
+    if settings.SEARCH_MODE == "basic":
+        tag_sq = select(Relic.id).join(Relic.tags).where(Tag.name.ilike(term)).scalar_subquery()
+        return stmt.where(
+            or_(Relic.name.ilike(term), Relic.id.ilike(term), Relic.description.ilike(term), Relic.id.in_(tag_sq))
+        ).distinct()
+
+    branches = [
+        select(Relic.id).where(Relic.name.ilike(term)),
+        select(Relic.id).where(Relic.description.ilike(term)),
+        select(Relic.id).where(Relic.id.startswith(search.strip().lower(), autoescape=True)),
+        select(relic_tags.c.relic_id).join(Tag, Tag.id == relic_tags.c.tag_id).where(Tag.name.ilike(term)),
+    ]
+    query = relic_search_query(search)
+    if query is not None:
+        vector = literal_column(RELIC_SEARCH_VECTOR_SQL, type_=TSVECTOR)
+        branches.append(select(Relic.id).where(vector.op("@@")(query)))
+    return stmt.where(Relic.id.in_(union(*branches)))
+
+
+# Whether the pg_trgm extension is installed (set at startup by detect_trigram_support)
+trigram_available = True
+
+
+async def detect_trigram_support(db: AsyncSession) -> bool:
+    """
+    Check for pg_trgm, whose similarity() relic_search_rank uses.
+
+    The search migration skips the extension when the database user may
+    not create it; the rank then uses full-text matching only.
+    """
+    global trigram_available
+    from sqlalchemy import text
+    trigram_available = bool(await db.scalar(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")))
+    return trigram_available
+
+
+def relic_search_rank(search: str):
+    """Relevance score for sort_by=relevance, or None when search ranking is unavailable."""
+    from backend.config import settings
+    from backend.models import Relic
+    from sqlalchemy import Float, func, literal_column
+    from sqlalchemy.dialects.postgresql import TSVECTOR
+    if settings.SEARCH_MODE == "basic":
+        return None
+    rank = None
+    if trigram_available:
+        # Trigram similarity on the name keeps infix matches (which the tsquery misses) ranked
+        rank = func.coalesce(func.similarity(Relic.name, search, type_=Float), 0)
+    query = relic_search_query(search)
+    if query is not None:
+        vector = literal_column(RELIC_SEARCH_VECTOR_SQL, type_=TSVECTOR)
+        text_rank = func.ts_rank_cd(vector, query, type_=Float)
+        rank = text_rank if rank is None else rank + text_rank
+    return rank
 
 
-def relic_sort_order(sort_by: str, sort_order: str, overrides: dict = None):
-    """Return a SQLAlchemy order clause for common relic sort options.
+def relic_sort_column(sort_by: str, overrides: dict = None, search: Optional[str] = None):
+    """Resolve a sort key to (effective_key, column), falling back to created_at.
 
     overrides: dict mapping sort key names to alternative columns,
     e.g. {"created_at": ClientBookmark.created_at} for bookmarks.
+    search: enables the "relevance" sort key when given.
     """
     from backend.models import Relic
     sort_map = {
@@ -118,10 +201,120 @@ def relic_sort_order(sort_by: str, sort_order: str, overrides: dict = None):
     }
     if overrides:
         sort_map.update(overrides)
-    sort_col = sort_map.get(sort_by, sort_map["created_at"])
+    if search and sort_by == "relevance":
+        rank = relic_search_rank(search)
+        if rank is not None:
+            sort_map["relevance"] = rank
+    if sort_by not in sort_map:
+        sort_by = "created_at"
+    return sort_by, sort_map[sort_by]
+
+
+def relic_sort_order(sort_by: str, sort_order: str, overrides: dict = None, search: Optional[str] = None):
+    """Return a SQLAlchemy order clause for common relic sort options."""
+    _, sort_col = relic_sort_column(sort_by, overrides, search)
     return sort_col.desc() if sort_order == "desc" else sort_col.asc()
 
 
+def encode_cursor(sort_by: str, sort_order: str, value, relic_id: str) -> str:
+    """Encode the last row of a page as an opaque keyset pagination cursor."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, sort_order, value, relic_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, str, object, str]]:
+    """Decode a cursor from encode_cursor; returns None if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if (
+        not isinstance(payload, list) or len(payload) != 4
+        or not all(isinstance(payload[i], str) for i in (0, 1, 3))
+    ):
+        return None
+    return tuple(payload)
+
+
+def _keyset_predicate(sort_col, id_col, value, last_id: str, descending: bool):
+    """Rows strictly after (value, last_id) in (sort_col, id) order.
+
+    Postgres sorts NULL above every value (last when ascending, first when
+    descending), so nullable sort columns need explicit IS NULL branches.
+    """
+    from sqlalchemy import and_, or_, tuple_
+    if descending:
+        if value is None:
+            return or_(sort_col.isnot(None), and_(sort_col.is_(None), id_col < last_id))
+        return tuple_(sort_col, id_col) < tuple_(value, last_id)
+    if value is None:
+        return and_(sort_col.is_(None), id_col > last_id)
+    return or_(tuple_(sort_col, id_col) > tuple_(value, last_id), sort_col.is_(None))
+
+
+def apply_relic_keyset(stmt, sort_by: str, sort_order: str, limit: int, offset: int = 0,
+                       cursor: Optional[str] = None, overrides: dict = None, search: Optional[str] = None):
+    """
+    Order and page a relic Select for keyset pagination.
+
+    Rows are ordered by the sort column with Relic.id as a tiebreaker, and
+    one extra row is fetched so keyset_page can tell whether another page
+    exists. The sort value and id are appended to each row as cursor_value
+    and cursor_id. A cursor takes precedence over offset.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort
+    """
+    from backend.models import Relic
+    from sqlalchemy import asc, desc
+    sort_by, sort_col = relic_sort_column(sort_by, overrides, search)
+    descending = sort_order == "desc"
+
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if not decoded or decoded[:2] != (sort_by, "desc" if descending else "asc"):
+            raise ValueError("Invalid cursor")
+        value, last_id = decoded[2], decoded[3]
+        if value is not None:
+            python_type = sort_col.type.python_type
+            try:
+                if python_type is datetime:
+                    value = datetime.fromisoformat(value)
+                elif not isinstance(value, python_type) or isinstance(value, bool):
+                    raise ValueError("Invalid cursor")
+            except TypeError:
+                raise ValueError("Invalid cursor")
+        stmt = stmt.where(_keyset_predicate(sort_col, Relic.id, value, last_id, descending))
+    elif offset:
+        stmt = stmt.offset(offset)
+
+    direction = desc if descending else asc
+    return (
+        stmt.add_columns(sort_col.label("cursor_value"), Relic.id.label("cursor_id"))
+        .order_by(direction(sort_col), direction(Relic.id))
+        .limit(limit + 1)
+    )
+
+
+def keyset_page(rows: list, limit: int, sort_by: str, sort_order: str, overrides: dict = None,
+                search: Optional[str] = None):
+    """Trim the look-ahead row from an apply_relic_keyset result.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    sort_by, _ = relic_sort_column(sort_by, overrides, search)
+    last = rows[-1]
+    next_cursor = encode_cursor(
+        sort_by, "desc" if sort_order == "desc" else "asc", last.cursor_value, last.cursor_id
+    )
+    return rows, next_cursor
+
+
 def clamp_limit(limit: int, default: int = 25) -> int:
     """Clamp a pagination limit to [1, MAX_PAGE_LIMIT]."""
     if limit < 1:
@@ -129,27 +322,143 @@ def clamp_limit(limit: int, default: int = 25) -> int:
     return min(limit, MAX_PAGE_LIMIT)
 
 
-async def get_fork_counts(db: AsyncSession, relic_ids: List[str]) -> Dict[str, int]:
-    """Count direct forks for each relic. Returns {relic_id: count}."""
-    if not relic_ids:
-        return {}
+async def adjust_fork_count(db: AsyncSession, relic_id: Optional[str], delta: int) -> None:
+    """Atomically apply delta to a relic's denormalized forks_count (no-op for a None id)."""
+    if not relic_id:
+        return
     from backend.models import Relic
-    from sqlalchemy import select, func
-    result = await db.execute(
-        select(Relic.fork_of, func.count(Relic.id))
-        .where(Relic.fork_of.in_(relic_ids))
-        .group_by(Relic.fork_of)
-    )
-    return {row[0]: row[1] for row in result.all()}
+    from sqlalchemy import update
+    stmt = update(Relic).where(Relic.id == relic_id)
+    if delta < 0:
+        stmt = stmt.where(Relic.forks_count > 0)
+    await db.execute(stmt.values(forks_count=Relic.forks_count + delta))
 
 
-async def get_fork_count(db: AsyncSession, relic_id: str) -> int:
-    """Count direct forks of a single relic."""
-    from backend.models import Relic
-    from sqlalchemy import select, func
-    result = await db.execute(
-        select(func.count(Relic.id)).where(Relic.fork_of == relic_id)
-    )
-    return result.scalar() or 0
+# More ranges than this in one request is treated as abuse and the header is ignored
+MAX_BYTE_RANGES = 16
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse an HTTP Range header into inclusive (start, end) byte offsets.
+
+    Syntactically invalid headers and units other than bytes are ignored, as
+    RFC 9110 allows. Ranges are clamped to the object size, sorted, and
+    overlapping or adjacent ranges are coalesced.
+
+    Args:
+        header: Raw Range header value (e.g. "bytes=0-499,-200")
+        size: Total object size in bytes
+
+    Returns:
+        None if the header should be ignored (serve the full body),
+        [] if no range is satisfiable (416), otherwise (start, end) tuples
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # Suffix range: the final N bytes
+            if not last:
+                return None
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            ranges.append((max(size - suffix, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    if not ranges:
+        return []
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_BYTE_RANGES:
+        return None
+    return merged
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an IMF-fixdate HTTP header value."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
 
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse an HTTP date header into a naive UTC datetime, or None if malformed."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against a quoted entity tag.
+
+    Uses the weak comparison RFC 9110 requires for If-None-Match, so W/"x"
+    and "x" match each other. "*" matches any current representation.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def accepts_encoding(header: Optional[str], coding: str) -> bool:
+    """
+    Check an Accept-Encoding header for a content-coding (RFC 9110 section 12.5.3).
+
+    The coding is acceptable when listed, or covered by "*", with a non-zero
+    qvalue; an explicit q=0 entry for it wins over "*".
+    """
+    if not header:
+        return False
+    wildcard = None
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return bool(wildcard)
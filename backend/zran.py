@@ -0,0 +1,304 @@
+"""
+Random access into gzip streams, after zlib's examples/zran.c.
+
+One pass over a gzip stream records checkpoints at deflate block
+boundaries: the compressed position (byte, plus the bits of the previous
+byte that belong to the next block), the uncompressed position, and the
+32 KiB of output before it (the deflate window). Decompression can then
+resume at any checkpoint instead of at the start of the stream.
+
+Python's zlib module exposes neither block boundaries (Z_BLOCK) nor
+inflatePrime, so this drives the system zlib through ctypes. When it
+cannot be loaded, available() is False and gzip streams cannot be indexed.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+from typing import AsyncIterator, Iterator, List, NamedTuple, Optional
+
+WINDOW_SIZE = 32768
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_TRAILER_SIZE = 8
+GZIP_WBITS = 31
+RAW_WBITS = -15
+# Output is produced in pieces of at most this size
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+Z_OK = 0
+Z_STREAM_END = 1
+Z_BUF_ERROR = -5
+Z_NO_FLUSH = 0
+Z_BLOCK = 5
+# z_stream.data_type bits set by inflate(Z_BLOCK)
+BLOCK_BOUNDARY = 128
+LAST_BLOCK = 64
+
+
+class ZranError(Exception):
+    """Corrupt gzip data, or zlib refused an operation."""
+
+
+class Checkpoint(NamedTuple):
+    in_offset: int  # First compressed byte wholly after the boundary
+    bits: int  # Bits of the byte before in_offset that belong to the next block (0-7)
+    out_offset: int
+    window: bytes  # Up to WINDOW_SIZE bytes of output before out_offset
+
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [
+        ("next_in", ctypes.c_void_p),
+        ("avail_in", ctypes.c_uint),
+        ("total_in", ctypes.c_ulong),
+        ("next_out", ctypes.c_void_p),
+        ("avail_out", ctypes.c_uint),
+        ("total_out", ctypes.c_ulong),
+        ("msg", ctypes.c_char_p),
+        ("state", ctypes.c_void_p),
+        ("zalloc", ctypes.c_void_p),
+        ("zfree", ctypes.c_void_p),
+        ("opaque", ctypes.c_void_p),
+        ("data_type", ctypes.c_int),
+        ("adler", ctypes.c_ulong),
+        ("reserved", ctypes.c_ulong),
+    ]
+
+
+_libz = None
+_libz_loaded = False
+
+
+def _load():
+    global _libz, _libz_loaded
+    if not _libz_loaded:
+        _libz_loaded = True
+        path = ctypes.util.find_library("z")
+        try:
+            lib = ctypes.CDLL(path) if path else None
+        except OSError:
+            lib = None
+        if lib is not None:
+            stream_p = ctypes.POINTER(_ZStream)
+            lib.zlibVersion.restype = ctypes.c_char_p
+            lib.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+            lib.inflate.argtypes = [stream_p, ctypes.c_int]
+            lib.inflateEnd.argtypes = [stream_p]
+            lib.inflatePrime.argtypes = [stream_p, ctypes.c_int, ctypes.c_int]
+            lib.inflateSetDictionary.argtypes = [stream_p, ctypes.c_char_p, ctypes.c_uint]
+        _libz = lib
+    return _libz
+
+
+def available() -> bool:
+    """Whether the system zlib could be loaded."""
+    return _load() is not None
+
+
+class _Inflater:
+    """One zlib inflate stream, driven a call at a time."""
+
+    def __init__(self, wbits: int):
+        lib = _load()
+        if lib is None:
+            raise ZranError("The system zlib library is not available")
+        self._lib = lib
+        self._stream = _ZStream()
+        self._input = b""
+        self._output = ctypes.create_string_buffer(OUTPUT_CHUNK_SIZE)
+        self.raw = wbits < 0
+        self._open = False
+        ret = lib.inflateInit2_(ctypes.byref(self._stream), wbits, lib.zlibVersion(), ctypes.sizeof(_ZStream))
+        if ret != Z_OK:
+            raise ZranError(f"inflateInit2 failed ({ret})")
+        self._open = True
+
+    def feed(self, data: bytes) -> None:
+        """Set the next input; the previous input must have been used up (or is dropped)."""
+        self._input = data
+        self._stream.next_in = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+        self._stream.avail_in = len(data)
+
+    @property
+    def avail_in(self) -> int:
+        return self._stream.avail_in
+
+    @property
+    def data_type(self) -> int:
+        return self._stream.data_type
+
+    def unused(self) -> bytes:
+        """Input not consumed yet (what follows the end of the stream after Z_STREAM_END)."""
+        return self._input[len(self._input) - self._stream.avail_in:]
+
+    def inflate(self, flush: int):
+        """One inflate() call into a fresh output buffer; returns (output, zlib status)."""
+        stream = self._stream
+        stream.next_out = ctypes.cast(self._output, ctypes.c_void_p)
+        stream.avail_out = OUTPUT_CHUNK_SIZE
+        ret = self._lib.inflate(ctypes.byref(stream), flush)
+        if ret not in (Z_OK, Z_STREAM_END, Z_BUF_ERROR):
+            message = stream.msg.decode(errors="replace") if stream.msg else str(ret)
+            raise ZranError(f"Corrupt deflate data: {message}")
+        return ctypes.string_at(self._output, OUTPUT_CHUNK_SIZE - stream.avail_out), ret
+
+    def prime(self, bits: int, value: int) -> None:
+        if self._lib.inflatePrime(ctypes.byref(self._stream), bits, value) != Z_OK:
+            raise ZranError("inflatePrime failed")
+
+    def set_dictionary(self, window: bytes) -> None:
+        if window and self._lib.inflateSetDictionary(ctypes.byref(self._stream), window, len(window)) != Z_OK:
+            raise ZranError("inflateSetDictionary failed")
+
+    def close(self) -> None:
+        if self._open:
+            self._open = False
+            self._lib.inflateEnd(ctypes.byref(self._stream))
+
+    def __del__(self):
+        self.close()
+
+
+def resume_offset(checkpoint: Optional[Checkpoint]) -> int:
+    """Compressed offset input must start at to resume from checkpoint (0 for the start of the stream)."""
+    if checkpoint is None:
+        return 0
+    return checkpoint.in_offset - (1 if checkpoint.bits else 0)
+
+
+class GzipStream:
+    """
+    Incremental decompression of a gzip stream (members may be concatenated).
+
+    Feed consecutive compressed chunks to pieces(), starting at
+    resume_offset(checkpoint). With span > 0, checkpoints are recorded
+    about every span bytes of output (index building); trailing data that
+    is not another gzip member ends the stream.
+    """
+
+    def __init__(self, checkpoint: Optional[Checkpoint] = None, span: int = 0):
+        self.span = span
+        self.checkpoints: List[Checkpoint] = []
+        self.finished = False
+        self.out_offset = checkpoint.out_offset if checkpoint else 0
+        self._in_offset = resume_offset(checkpoint)
+        self._window = bytearray(checkpoint.window if checkpoint else b"")
+        self._last_checkpoint = self.out_offset
+        self._resume = checkpoint
+        self._trailer = 0
+        self._held = b""
+        self._inflater: Optional[_Inflater] = _Inflater(RAW_WBITS if checkpoint else GZIP_WBITS)
+
+    def pieces(self, data: bytes) -> Iterator[bytes]:
+        """Decompressed output of the next chunk of input, in pieces of at most OUTPUT_CHUNK_SIZE bytes."""
+        if self._resume is not None and data:
+            checkpoint, self._resume = self._resume, None
+            if checkpoint.bits:
+                self._inflater.prime(checkpoint.bits, data[0] >> (8 - checkpoint.bits))
+                data = data[1:]
+                self._in_offset += 1
+            self._inflater.set_dictionary(checkpoint.window)
+
+        while data and not self.finished:
+            if self._trailer:
+                n = min(self._trailer, len(data))
+                self._trailer -= n
+                self._in_offset += n
+                data = data[n:]
+                continue
+            if self._inflater is None:
+                # Between members: another one must start with the gzip magic
+                data = self._held + data
+                self._in_offset -= len(self._held)
+                if len(data) < len(GZIP_MAGIC):
+                    self._held = data
+                    self._in_offset += len(data)
+                    return
+                self._held = b""
+                if not data.startswith(GZIP_MAGIC):
+                    self.finished = True
+                    return
+                self._inflater = _Inflater(GZIP_WBITS)
+            data = yield from self._inflate(data)
+
+    @property
+    def complete(self) -> bool:
+        """Whether the input so far ended between members (nothing truncated)."""
+        return self.finished or (self._inflater is None and not self._trailer)
+
+    def close(self) -> None:
+        """Release zlib state."""
+        inflater, self._inflater = self._inflater, None
+        if inflater is not None:
+            inflater.close()
+        self.finished = True
+
+    def _inflate(self, data: bytes):
+        inflater = self._inflater
+        inflater.feed(data)
+        fed_end = self._in_offset + len(data)
+        while True:
+            out, ret = inflater.inflate(Z_BLOCK if self.span else Z_NO_FLUSH)
+            self._in_offset = fed_end - inflater.avail_in
+            if out:
+                self._output(out)
+                yield out
+            if ret == Z_STREAM_END:
+                rest = inflater.unused()
+                inflater.close()
+                self._inflater = None
+                if inflater.raw:
+                    # gzip mode checks the trailer itself; after a resume it is skipped
+                    self._trailer = GZIP_TRAILER_SIZE
+                return rest
+            data_type = inflater.data_type
+            if (
+                self.span
+                and data_type & BLOCK_BOUNDARY
+                and not data_type & LAST_BLOCK
+                and self.out_offset - self._last_checkpoint >= self.span
+            ):
+                self.checkpoints.append(
+                    Checkpoint(self._in_offset, data_type & 7, self.out_offset, bytes(self._window))
+                )
+                self._last_checkpoint = self.out_offset
+            if ret == Z_BUF_ERROR or (inflater.avail_in == 0 and len(out) < OUTPUT_CHUNK_SIZE):
+                return b""
+
+    def _output(self, out: bytes) -> None:
+        self.out_offset += len(out)
+        if len(out) >= WINDOW_SIZE:
+            self._window = bytearray(out[-WINDOW_SIZE:])
+        else:
+            self._window.extend(out)
+            del self._window[:-WINDOW_SIZE]
+
+
+async def gunzip_slice(
+    chunks: AsyncIterator[bytes], checkpoint: Optional[Checkpoint], start: int, stop: int
+) -> AsyncIterator[bytes]:
+    """
+    Uncompressed bytes [start, stop) of a gzip stream.
+
+    chunks is the compressed stream from resume_offset(checkpoint) on (and
+    is closed when done); decompression runs in a worker thread.
+    """
+    stream = GzipStream(checkpoint)
+    position = stream.out_offset
+    try:
+        async for chunk in chunks:
+            pieces = stream.pieces(chunk)
+            while True:
+                piece = await asyncio.to_thread(next, pieces, None)
+                if piece is None:
+                    break
+                end = position + len(piece)
+                if end > start:
+                    yield piece[max(start - position, 0):stop - position]
+                position = end
+                if position >= stop:
+                    return
+            if stream.finished:
+                break
+    finally:
+        stream.close()
+        await chunks.aclose()
@@ -1,7 +1,31 @@
-"""Search and filter benchmark."""
+"""Search and filter benchmark.
+
+The HTTP benchmark runs against whatever SEARCH_MODE the server is using, so
+comparing modes means running it once with SEARCH_MODE=basic and once with
+SEARCH_MODE=fulltext. Small seeded datasets fit in memory and hide the
+difference; seed a large corpus directly into Postgres first:
+
+    python3 -m scripts.benchmarks.test_search --database-url postgresql://... --seed 1000000
+    python3 -m scripts.benchmarks.test_search --database-url postgresql://... --explain
+
+--explain runs the basic and fulltext search predicates side by side with
+EXPLAIN ANALYZE against the same data, which isolates the index effect from
+HTTP and application overhead, and reports how many rows each mode matched
+(fulltext matches ids by prefix only, so id infixes are the one expected
+difference).
+"""
+import argparse
 import random
+import time
 from scripts.benchmarks.base import Benchmark
 
+# Word pools for the synthetic corpus; benchmark terms are drawn from them
+CORPUS_VERBS = ["draft", "final", "updated", "legacy", "refactored", "optimised", "broken", "working"]
+CORPUS_NOUNS = [
+    "auth middleware", "rate limiter", "db migration", "api client", "parser utility",
+    "config loader", "cache layer", "event handler", "data pipeline", "test fixture",
+]
+
 
 class SearchBenchmark(Benchmark):
     """Benchmark search and filter operations."""
@@ -16,18 +40,22 @@ class SearchBenchmark(Benchmark):
         **kwargs
     ):
         super().__init__(**kwargs)
-        self.search_terms = search_terms or ["draft", "config", "data", "auth", "test"]
+        self.search_terms = search_terms or ["draft", "config", "data", "auth", "test", "middle", "pipeline"]
         self.tags = tags or ["python", "code", "docs", "config", "data"]
 
     async def run_operation(self, client, operation_id):
-        """Randomly choose search, tag filter, or list operation."""
-        op_type = random.choice(["search", "tag", "list", "sort"])
+        """Randomly choose search, relevance search, tag filter, list, or sort operation."""
+        op_type = random.choice(["search", "relevance", "tag", "list", "sort"])
         headers = {"X-User-Key": self.user_key}
 
         if op_type == "search":
             term = random.choice(self.search_terms)
             url = f"{self.base_url}/api/v1/relics?search={term}&limit=25"
 
+        elif op_type == "relevance":
+            term = random.choice(self.search_terms)
+            url = f"{self.base_url}/api/v1/relics?search={term}&sort_by=relevance&limit=25&include_total=false"
+
         elif op_type == "tag":
             tag = random.choice(self.tags)
             url = f"{self.base_url}/api/v1/relics?tag={tag}&limit=25"
@@ -47,3 +75,116 @@ class SearchBenchmark(Benchmark):
             return True, None
         else:
             return False, f"Status {response.status_code}: {response.text[:100]}"
+
+
+# ---------------------------------------------------------------------------
+# Large-corpus seeding and query-plan comparison (direct database access)
+# ---------------------------------------------------------------------------
+
+# Same predicates apply_relic_search generates for each SEARCH_MODE
+BASIC_PREDICATE = """
+    relic.name ILIKE :term OR relic.id ILIKE :term OR relic.description ILIKE :term
+    OR relic.id IN (SELECT relic_tags.relic_id FROM relic_tags JOIN tag ON tag.id = relic_tags.tag_id
+                    WHERE tag.name ILIKE :term)
+"""
+FULLTEXT_PREDICATE = """
+    relic.id IN (
+        SELECT id FROM relic WHERE name ILIKE :term
+        UNION SELECT id FROM relic WHERE description ILIKE :term
+        UNION SELECT id FROM relic WHERE id LIKE :prefix
+        UNION SELECT relic_tags.relic_id FROM relic_tags JOIN tag ON tag.id = relic_tags.tag_id
+              WHERE tag.name ILIKE :term
+        UNION SELECT id FROM relic WHERE
+              setweight(to_tsvector('simple'::regconfig, coalesce(relic.name, '')), 'A') ||
+              setweight(to_tsvector('simple'::regconfig, coalesce(relic.description, '')), 'B')
+              @@ to_tsquery('simple'::regconfig, :tsquery)
+    )
+"""
+
+
+def seed_corpus(engine, count: int, batch_size: int = 50_000) -> None:
+    """Insert count synthetic public relics server-side (no S3 objects are created)."""
+    from sqlalchemy import text
+
+    verbs = "ARRAY[" + ",".join(f"'{v}'" for v in CORPUS_VERBS) + "]"
+    nouns = "ARRAY[" + ",".join(f"'{n}'" for n in CORPUS_NOUNS) + "]"
+    insert = text(f"""
+        INSERT INTO relic (id, name, description, content_type, size_bytes, s3_key, access_level,
+                           created_at, access_count, bookmark_count, comments_count, forks_count)
+        SELECT md5(random()::text || g::text),
+               ({verbs})[1 + (g % {len(CORPUS_VERBS)})] || ' ' || ({nouns})[1 + (g / 7 % {len(CORPUS_NOUNS)})]
+                   || ' v' || (g % 9 + 1),
+               'benchmark relic ' || g || ' for ' || ({nouns})[1 + (g / 3 % {len(CORPUS_NOUNS)})],
+               'text/plain', 1024, 'benchmark/missing', 'public',
+               now() - (g || ' seconds')::interval, g % 1000, g % 50, 0, 0
+        FROM generate_series(:start, :stop) AS g
+    """)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count) - 1
+            conn.execute(insert, {"start": start, "stop": stop})
+            print(f"   Seeded {stop + 1}/{count} relics")
+        conn.execute(text("ANALYZE relic"))
+    print(f"✅ Seeded {count} relics in {time.perf_counter() - started:.1f}s")
+
+
+def explain_search(engine, terms: list[str], runs: int = 3) -> dict[str, dict[str, float]]:
+    """EXPLAIN ANALYZE both search predicates for each term; returns median execution ms and match counts."""
+    from sqlalchemy import text
+
+    results: dict[str, dict[str, float]] = {}
+    with engine.connect() as conn:
+        for term in terms:
+            params = {
+                "term": f"%{term}%",
+                "prefix": f"{term.lower()}%",
+                "tsquery": " & ".join(f"{w}:*" for w in term.lower().split()),
+            }
+            results[term] = {}
+            for mode, predicate in (("basic", BASIC_PREDICATE), ("fulltext", FULLTEXT_PREDICATE)):
+                timings = []
+                for _ in range(runs):
+                    plan = conn.execute(
+                        text(
+                            "EXPLAIN (ANALYZE, FORMAT JSON) SELECT relic.id FROM relic "
+                            f"WHERE relic.access_level = 'public' AND ({predicate}) "
+                            "ORDER BY relic.created_at DESC, relic.id DESC LIMIT 26"
+                        ),
+                        params,
+                    ).scalar()
+                    timings.append(plan[0]["Execution Time"])
+                results[term][mode] = sorted(timings)[len(timings) // 2]
+                results[term][f"{mode}_matches"] = conn.execute(
+                    text(f"SELECT count(*) FROM relic WHERE relic.access_level = 'public' AND ({predicate})"),
+                    params,
+                ).scalar()
+            basic, fulltext = results[term]["basic"], results[term]["fulltext"]
+            speedup = basic / fulltext if fulltext else float("inf")
+            print(
+                f"   {term:<12} basic {basic:>10.2f}ms   fulltext {fulltext:>10.2f}ms   ({speedup:.1f}x)   "
+                f"matches {results[term]['basic_matches']} / {results[term]['fulltext_matches']}"
+            )
+    return results
+
+
+def main():
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description="Seed and compare relic search at scale")
+    parser.add_argument("--database-url", required=True, help="postgresql:// URL of the relic database")
+    parser.add_argument("--seed", type=int, default=0, help="Insert this many synthetic relics first")
+    parser.add_argument("--explain", action="store_true", help="Compare basic vs fulltext query plans")
+    parser.add_argument("--terms", nargs="*", default=["draft", "config", "middle", "pipeline", "auth"])
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url.replace("postgresql+asyncpg://", "postgresql://", 1))
+    if args.seed:
+        seed_corpus(engine, args.seed)
+    if args.explain:
+        print("🔬 Search predicate execution time (median of 3, first 26 rows by created_at):")
+        explain_search(engine, args.terms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 """Integration tests for admin endpoints."""
+import gzip
 import time
 import uuid
 import pytest
@@ -442,8 +443,11 @@ def test_admin_download_backup(http):
     filename = backups[0]["filename"]
     resp = http.get(f"/api/v1/admin/backups/{filename}/download", headers=ADMIN_HEADERS)
     assert resp.status_code == 200
-    assert resp.headers["content-type"] == "application/gzip"
+    assert resp.headers["content-type"] in ("application/gzip", "application/zstd")
     assert len(resp.content) > 0
+    if filename.endswith(".sql.gz"):
+        # Streamed gzip member must decompress to a complete pg_dump
+        assert b"PostgreSQL database dump complete" in gzip.decompress(resp.content)
 
 
 # ── POST /api/v1/admin/backups/{filename}/restore ────────────────────────────
@@ -545,6 +549,10 @@ def test_admin_run_job(http):
     assert final["status"] in ("success", "failed")
     assert isinstance(final["logs"], list)
     assert any("Starting expired relics cleanup..." in log for log in final["logs"])
+    if final["status"] == "success":
+        # The reaper reports its throughput on the history entry
+        assert final["metrics"]["relics_deleted"] >= 0
+        assert "relics_per_second" in final["metrics"]
 
 
 @pytest.mark.integration
@@ -59,6 +59,39 @@ def test_create_relic_invalid_access_level(http):
     assert resp.status_code == 400
 
 
+@pytest.mark.integration
+def test_create_relic_fields_after_file(http, registered_user):
+    """The form is parsed as it streams; fields sent after the file part still apply."""
+    key, _ = registered_user
+    content = bytes(range(256)) * 4096  # 1 MiB, spans many body chunks
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="late.bin"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + (
+        f"\r\n--{boundary}\r\n"
+        'Content-Disposition: form-data; name="name"\r\n\r\nLate Fields\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="access_level"\r\n\r\nprivate\r\n'
+        f"--{boundary}--\r\n"
+    ).encode()
+
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key, "Content-Type": f"multipart/form-data; boundary={boundary}"},
+        content=body,
+    )
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    meta = http.get(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key}).json()
+    assert meta["name"] == "Late Fields"
+    assert meta["access_level"] == "private"
+    assert http.get(f"/{relic_id}/raw").content == content
+
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
+
+
 @pytest.mark.integration
 def test_create_relic_with_tags(http, registered_user):
     key, _ = registered_user
@@ -171,6 +204,26 @@ def test_list_relics_with_search(http, registered_user):
     http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
 
 
+@pytest.mark.integration
+def test_list_relics_search_relevance(http, registered_user):
+    key, _ = registered_user
+    word = f"relevance{uuid.uuid4().hex[:8]}"
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": f"{word} notes", "description": "ranked", "access_level": "public"},
+        files={"file": ("test.txt", b"content", "text/plain")},
+    )
+    relic_id = resp.json()["id"]
+
+    # Word prefixes match and relevance is a valid sort when searching
+    resp_search = http.get("/api/v1/relics", params={"search": word[:-2], "sort_by": "relevance"})
+    assert resp_search.status_code == 200
+    assert relic_id in [r["id"] for r in resp_search.json()["relics"]]
+
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
+
+
 # ── Update ────────────────────────────────────────────────────────────────────
 
 @pytest.mark.integration
@@ -250,8 +303,64 @@ def test_fork_relic(http, created_relic, registered_user):
     fork = resp.json()
     assert fork["fork_of"] == original_id
     assert "created_at" in fork
+    assert http.get(f"/api/v1/relics/{original_id}").json()["forks_count"] == 1
 
     http.delete(f"/api/v1/relics/{fork['id']}", headers={"X-User-Key": key})
+    assert http.get(f"/api/v1/relics/{original_id}").json()["forks_count"] == 0
+
+
+@pytest.mark.integration
+def test_shared_content_survives_deleting_one_reference(http, registered_user):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    content = f"duplicate payload {uuid.uuid4().hex}".encode()
+
+    ids = []
+    for _ in range(2):
+        resp = http.post(
+            "/api/v1/relics",
+            headers=headers,
+            files={"file": ("dup.txt", content, "text/plain")},
+        )
+        ids.append(resp.json()["id"])
+    fork = http.post(f"/api/v1/relics/{ids[0]}/fork", headers=headers).json()
+
+    # Deduplicated uploads and an unchanged fork all reference one object
+    http.delete(f"/api/v1/relics/{ids[0]}", headers=headers)
+    assert http.get(f"/{ids[1]}/raw").content == content
+    assert http.get(f"/{fork['id']}/raw").content == content
+
+    http.delete(f"/api/v1/relics/{ids[1]}", headers=headers)
+    assert http.get(f"/{fork['id']}/raw").content == content
+
+    http.delete(f"/api/v1/relics/{fork['id']}", headers=headers)
+
+
+@pytest.mark.integration
+def test_content_survives_relocation(http, registered_user, admin_headers):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    content = f"small paste {uuid.uuid4().hex}".encode()
+    relic_id = http.post(
+        "/api/v1/relics", headers=headers, files={"file": ("small.txt", content, "text/plain")},
+    ).json()["id"]
+    inline_enabled = http.get("/api/v1/admin/config", headers=admin_headers).json()["download"]["INLINE_CONTENT_MAX_SIZE"] > 0
+
+    assert http.post("/api/v1/admin/storage/relocate", params={"to": "elsewhere"}, headers=admin_headers).status_code == 400
+    assert http.post("/api/v1/admin/storage/relocate", params={"to": "s3"}).status_code in (401, 403)
+
+    for to in ("s3", "inline", "s3"):
+        resp = http.post("/api/v1/admin/storage/relocate", params={"to": to}, headers=admin_headers)
+        if to == "inline" and not inline_enabled:
+            assert resp.status_code == 400
+            continue
+        assert resp.status_code == 200
+        assert http.get(f"/{relic_id}/raw").content == content
+        ranged = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=0-4"})
+        assert ranged.status_code == 206
+        assert ranged.content == content[:5]
+
+    http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
 
 
 @pytest.mark.integration
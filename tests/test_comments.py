@@ -199,6 +199,28 @@ def test_delete_comment(http, commenter, relic_for_comments):
     assert resp.status_code == 200
 
 
+@pytest.mark.integration
+def test_comments_count_tracks_create_and_delete(http, commenter, relic_for_comments):
+    _, headers = commenter
+    relic_id = relic_for_comments
+
+    parent = http.post(
+        f"/api/v1/relics/{relic_id}/comments",
+        headers=headers,
+        json={"line_number": 1, "content": "Parent"},
+    ).json()
+    http.post(
+        f"/api/v1/relics/{relic_id}/comments",
+        headers=headers,
+        json={"line_number": 1, "content": "Reply", "parent_id": parent["id"]},
+    )
+    assert http.get(f"/api/v1/relics/{relic_id}").json()["comments_count"] == 2
+
+    # Deleting the parent removes its reply too
+    http.delete(f"/api/v1/relics/{relic_id}/comments/{parent['id']}", headers=headers)
+    assert http.get(f"/api/v1/relics/{relic_id}").json()["comments_count"] == 0
+
+
 @pytest.mark.integration
 def test_delete_comment_not_author(http, commenter, relic_for_comments, registered_user):
     _, author_headers = commenter
@@ -0,0 +1,59 @@
+"""Integration tests for fork comparison (server-side diffs)."""
+import pytest
+
+
+def _create(http, key, name, content: bytes, content_type="text/plain"):
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": name, "access_level": "public"},
+        files={"file": (name, content, content_type)},
+    )
+    return resp.json()["id"]
+
+
+@pytest.mark.integration
+def test_fork_diff_and_summary(http, registered_user):
+    key, _ = registered_user
+    original = "".join(f"line {i}\n" for i in range(1, 101))
+    original_id = _create(http, key, "original.txt", original.encode())
+    resp = http.post(
+        f"/api/v1/relics/{original_id}/fork",
+        headers={"X-User-Key": key},
+        files={"file": ("fork.txt", original.replace("line 50\n", "line fifty\n").encode(), "text/plain")},
+    )
+    fork_id = resp.json()["id"]
+
+    resp = http.get(f"/api/v1/relics/{original_id}/diff/{fork_id}", params={"context": 1})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/x-diff")
+    assert resp.text.splitlines()[2:] == ["@@ -49,3 +49,3 @@", " line 49", "-line 50", "+line fifty", " line 51"]
+    cached = http.get(
+        f"/api/v1/relics/{original_id}/diff/{fork_id}", params={"context": 1},
+        headers={"If-None-Match": resp.headers["etag"]},
+    )
+    assert cached.status_code == 304
+
+    summary = http.get(f"/api/v1/relics/{original_id}/diff/{fork_id}/summary").json()
+    assert summary == {
+        "relic_id": original_id, "other_id": fork_id, "identical": False,
+        "additions": 1, "deletions": 1, "hunks": 1, "exact": True,
+    }
+    assert http.get(f"/api/v1/relics/{original_id}/diff/{original_id}/summary").json()["identical"] is True
+    assert http.get(f"/api/v1/relics/{original_id}/diff/{original_id}").content == b""
+
+    http.delete(f"/api/v1/relics/{fork_id}", headers={"X-User-Key": key})
+    http.delete(f"/api/v1/relics/{original_id}", headers={"X-User-Key": key})
+
+
+@pytest.mark.integration
+def test_diff_rejects_binary_and_missing(http, registered_user):
+    key, _ = registered_user
+    text_id = _create(http, key, "a.txt", b"hello\n")
+    binary_id = _create(http, key, "b.bin", b"\x00\x01\x02", "application/octet-stream")
+
+    assert http.get(f"/api/v1/relics/{text_id}/diff/{binary_id}").status_code == 422
+    assert http.get(f"/api/v1/relics/{text_id}/diff/does-not-exist/summary").status_code == 404
+
+    http.delete(f"/api/v1/relics/{binary_id}", headers={"X-User-Key": key})
+    http.delete(f"/api/v1/relics/{text_id}", headers={"X-User-Key": key})
@@ -0,0 +1,53 @@
+"""Integration tests for windowed line reads."""
+import time
+import pytest
+
+
+@pytest.mark.integration
+def test_small_relic_lines(http, registered_user):
+    key, _ = registered_user
+    content = "".join(f"line {i}\r\n" for i in range(1, 51))
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": "small.log", "access_level": "public"},
+        files={"file": ("small.log", content.encode(), "text/plain")},
+    )
+    relic_id = resp.json()["id"]
+
+    resp = http.get(f"/api/v1/relics/{relic_id}/lines", params={"start": 10, "count": 3})
+    assert resp.status_code == 200
+    assert resp.json() == {"start": 10, "lines": ["line 10", "line 11", "line 12"], "total_lines": 50}
+    cached = http.get(
+        f"/api/v1/relics/{relic_id}/lines", params={"start": 10, "count": 3},
+        headers={"If-None-Match": resp.headers["etag"]},
+    )
+    assert cached.status_code == 304
+    assert http.get(f"/api/v1/relics/{relic_id}/lines", params={"start": 60}).json()["lines"] == []
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
+
+
+@pytest.mark.integration
+def test_large_relic_lines_through_index(http, registered_user, admin_headers):
+    key, _ = registered_user
+    content = "".join(f"entry {i:07d} {'.' * (i % 80)}\n" for i in range(60_000))
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": "big.log", "access_level": "public"},
+        files={"file": ("big.log", content.encode(), "text/plain")},
+    )
+    relic_id = resp.json()["id"]
+
+    http.post("/api/v1/admin/jobs/line_index/run", headers=admin_headers)
+    for _ in range(30):
+        resp = http.get(f"/api/v1/relics/{relic_id}/lines", params={"start": 45_001, "count": 2})
+        if resp.status_code != 503:
+            break
+        assert resp.headers["retry-after"]
+        time.sleep(1)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["total_lines"] == 60_000
+    assert body["lines"] == [f"entry 0045000 {'.' * 40}", f"entry 0045001 {'.' * 41}"]
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
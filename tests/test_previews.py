@@ -0,0 +1,79 @@
+"""Integration tests for relic previews (thumbnails and text snippets)."""
+import struct
+import time
+import zlib
+import pytest
+
+
+def _png(width: int, height: int) -> bytes:
+    """A solid red RGB PNG."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">2I5B", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _listed_preview(http, key, relic_id):
+    relics = http.get("/api/v1/user/relics", headers={"X-User-Key": key}).json()["relics"]
+    return next(relic for relic in relics if relic["id"] == relic_id)["preview"]
+
+
+def _wait_for_preview(http, key, relic_id, admin_headers):
+    http.post("/api/v1/admin/jobs/derivatives/run", headers=admin_headers)
+    for _ in range(30):
+        preview = _listed_preview(http, key, relic_id)
+        if preview is not None:
+            return preview
+        time.sleep(1)
+    return None
+
+
+@pytest.mark.integration
+def test_text_relic_preview_snippet(http, registered_user, admin_headers):
+    key, _ = registered_user
+    content = "".join(f"line {i}\n" for i in range(50))
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": "lines.txt", "access_level": "public"},
+        files={"file": ("lines.txt", content.encode(), "text/plain")},
+    )
+    relic_id = resp.json()["id"]
+
+    preview = _wait_for_preview(http, key, relic_id, admin_headers)
+    assert preview["type"] == "text"
+    assert preview["metadata"]["truncated"] is True
+    assert preview["preview"]["snippet"].splitlines()[0] == "line 0"
+    assert http.get(f"/api/v1/relics/{relic_id}/thumbnail").status_code == 404
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
+
+
+@pytest.mark.integration
+def test_image_relic_thumbnail(http, registered_user, admin_headers):
+    key, _ = registered_user
+    resp = http.post(
+        "/api/v1/relics",
+        headers={"X-User-Key": key},
+        data={"name": "red.png", "access_level": "public"},
+        files={"file": ("red.png", _png(640, 480), "image/png")},
+    )
+    relic_id = resp.json()["id"]
+
+    preview = _wait_for_preview(http, key, relic_id, admin_headers)
+    assert preview["type"] == "image"
+    assert preview["metadata"] == {"width": 640, "height": 480}
+    assert preview["preview"]["thumbnail_url"] == f"/api/v1/relics/{relic_id}/thumbnail"
+
+    resp = http.get(preview["preview"]["thumbnail_url"])
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/webp"
+    assert resp.content[:4] == b"RIFF" and resp.content[8:12] == b"WEBP"
+    cached = http.get(preview["preview"]["thumbnail_url"], headers={"If-None-Match": resp.headers["etag"]})
+    assert cached.status_code == 304
+    http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
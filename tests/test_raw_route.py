@@ -31,3 +31,205 @@ def test_get_raw_via_root_route(http, relic_with_content):
     resp = http.get(f"/{relic_id}")
     assert resp.status_code == 200
     assert resp.content == content
+
+
+@pytest.mark.integration
+def test_raw_advertises_accept_ranges(http, relic_with_content):
+    relic_id, _ = relic_with_content
+    resp = http.get(f"/{relic_id}/raw")
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert "last-modified" in resp.headers
+
+
+@pytest.mark.integration
+def test_raw_single_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=4-10"})
+    assert resp.status_code == 206
+    assert resp.content == content[4:11]
+    assert resp.headers["content-range"] == f"bytes 4-10/{len(content)}"
+
+
+@pytest.mark.integration
+def test_raw_suffix_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=-4"})
+    assert resp.status_code == 206
+    assert resp.content == content[-4:]
+
+
+@pytest.mark.integration
+def test_raw_multi_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=0-2,8-10"})
+    assert resp.status_code == 206
+    assert resp.headers["content-type"].startswith("multipart/byteranges; boundary=")
+    assert content[0:3] in resp.content
+    assert content[8:11] in resp.content
+    assert f"Content-Range: bytes 8-10/{len(content)}".encode() in resp.content
+
+
+@pytest.mark.integration
+def test_raw_unsatisfiable_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": f"bytes={len(content) + 10}-"})
+    assert resp.status_code == 416
+    assert resp.headers["content-range"] == f"bytes */{len(content)}"
+
+
+@pytest.mark.integration
+def test_raw_if_range_mismatch_returns_full_body(http, relic_with_content):
+    relic_id, content = relic_with_content
+    resp = http.get(
+        f"/{relic_id}/raw",
+        headers={"Range": "bytes=0-3", "If-Range": "Thu, 01 Jan 1970 00:00:00 GMT"},
+    )
+    assert resp.status_code == 200
+    assert resp.content == content
+
+
+@pytest.mark.integration
+def test_raw_if_range_match_honours_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    last_modified = http.get(f"/{relic_id}/raw").headers["last-modified"]
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=0-3", "If-Range": last_modified})
+    assert resp.status_code == 206
+    assert resp.content == content[:4]
+
+
+@pytest.mark.integration
+def test_raw_sends_validators(http, relic_with_content):
+    relic_id, _ = relic_with_content
+    resp = http.get(f"/{relic_id}/raw")
+    assert resp.headers["etag"].startswith('"')
+    assert resp.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+
+@pytest.mark.integration
+def test_raw_if_none_match_returns_304(http, relic_with_content):
+    relic_id, _ = relic_with_content
+    etag = http.get(f"/{relic_id}/raw").headers["etag"]
+    resp = http.get(f"/{relic_id}/raw", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert resp.content == b""
+
+
+@pytest.mark.integration
+def test_raw_if_modified_since_returns_304(http, relic_with_content):
+    relic_id, _ = relic_with_content
+    last_modified = http.get(f"/{relic_id}/raw").headers["last-modified"]
+    resp = http.get(f"/{relic_id}/raw", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == 304
+
+
+@pytest.mark.integration
+def test_raw_if_range_etag_honours_range(http, relic_with_content):
+    relic_id, content = relic_with_content
+    etag = http.get(f"/{relic_id}/raw").headers["etag"]
+    resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=0-3", "If-Range": etag})
+    assert resp.status_code == 206
+    assert resp.content == content[:4]
+
+
+@pytest.mark.integration
+def test_metadata_if_none_match_returns_304(http, relic_with_content):
+    relic_id, _ = relic_with_content
+    etag = http.get(f"/api/v1/relics/{relic_id}").headers["etag"]
+    resp = http.get(f"/api/v1/relics/{relic_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+
+@pytest.mark.integration
+def test_stalled_downloads_do_not_exhaust_db_pool(http, registered_user):
+    """Hundreds of slow readers must not pin DB connections (pool is 20 + 10 overflow)."""
+    import asyncio
+    import os
+    import httpx
+
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    # Larger than socket buffers, so every response stays in flight while its reader stalls
+    resp = http.post("/api/v1/relics/raw?name=stall.bin", headers=headers, content=os.urandom(8 * 1024 * 1024))
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+
+    async def stall(client):
+        async with client.stream("GET", f"/{relic_id}/raw") as response:
+            async for _ in response.aiter_raw():
+                await asyncio.sleep(3600)
+
+    async def scenario():
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+        async with httpx.AsyncClient(base_url=http.base_url, timeout=60, limits=limits) as slow, \
+                httpx.AsyncClient(base_url=http.base_url, timeout=10) as fast:
+            stalled = [asyncio.create_task(stall(slow)) for _ in range(300)]
+            try:
+                await asyncio.sleep(3)
+                # Each of these needs a pooled connection; with sessions held by the
+                # stalled streams they would wait out pool_timeout (30s) and fail
+                return await asyncio.gather(*[fast.get(f"/api/v1/relics/{relic_id}") for _ in range(40)])
+            finally:
+                for task in stalled:
+                    task.cancel()
+                await asyncio.gather(*stalled, return_exceptions=True)
+
+    try:
+        responses = asyncio.run(scenario())
+        assert all(r.status_code == 200 for r in responses)
+    finally:
+        http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
+
+
+@pytest.mark.integration
+def test_large_download_whatever_the_mode(http, registered_user, admin_headers):
+    """Above the offload threshold content may come via nginx or a redirect; bytes and ranges are unchanged."""
+    import os
+
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    threshold = http.get("/api/v1/admin/config", headers=admin_headers).json()["download"]["DOWNLOAD_OFFLOAD_MIN_SIZE"]
+    content = os.urandom(threshold + 4096)
+    resp = http.post("/api/v1/relics/raw?name=offload.bin", headers=headers, content=content)
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    try:
+        resp = http.get(f"/{relic_id}/raw", timeout=60)
+        assert resp.status_code == 200
+        assert resp.content == content
+        assert "offload.bin" in resp.headers["content-disposition"]
+
+        resp = http.get(f"/{relic_id}/raw", headers={"Range": "bytes=100-199"})
+        assert resp.status_code == 206
+        assert resp.content == content[100:200]
+    finally:
+        http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
+
+
+@pytest.mark.integration
+def test_text_content_whatever_the_accepted_encoding(http, registered_user):
+    """Text may be stored compressed; every client still gets the original bytes, and ranges stay consistent."""
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    content = b"".join(b"%06d some log line that compresses well\n" % i for i in range(50_000))
+    resp = http.post("/api/v1/relics/raw?name=app.log&content_type=text/plain", headers=headers, content=content)
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    try:
+        etags = set()
+        for accept in ("identity", "gzip", "zstd", "gzip, zstd"):
+            resp = http.get(f"/{relic_id}/raw", headers={"Accept-Encoding": accept}, timeout=60)
+            assert resp.status_code == 200
+            assert resp.content == content
+            etags.add(resp.headers["etag"])
+            if resp.headers.get("content-encoding"):
+                assert "accept-encoding" in resp.headers["vary"].lower()
+
+        # Ranges of the identity representation address the original bytes
+        resp = http.get(f"/{relic_id}/raw", headers={"Accept-Encoding": "identity", "Range": "bytes=47-93"})
+        assert resp.status_code == 206
+        assert resp.content == content[47:94]
+        # At most two representations: as stored and decoded
+        assert len(etags) <= 2
+    finally:
+        http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
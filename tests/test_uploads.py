@@ -0,0 +1,152 @@
+"""Integration tests for resumable uploads."""
+import os
+import httpx
+import pytest
+
+
+def _start_upload(http, headers, length, **params):
+    resp = http.post("/api/v1/uploads", headers={**headers, "Upload-Length": str(length)}, params=params)
+    assert resp.status_code == 201
+    assert resp.headers["location"] == f"/api/v1/uploads/{resp.json()['id']}"
+    return resp.json()
+
+
+def _part_size(http, headers):
+    """Part size the server asks for (the same for any upload that fits 10,000 parts)."""
+    upload = _start_upload(http, headers, 1)
+    http.delete(upload["url"], headers=headers)
+    return upload["part_size"]
+
+
+@pytest.mark.integration
+def test_parallel_parts_out_of_order(http, registered_user):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    part_size = _part_size(http, headers)
+
+    content = os.urandom(part_size + 1000)
+    upload = _start_upload(http, headers, len(content), name="big.bin", content_type="application/octet-stream")
+    assert upload["part_count"] == 2
+
+    # Last part first: parts may arrive in any order
+    resp = http.put(f"{upload['url']}/parts/2", headers=headers, content=content[part_size:])
+    assert resp.status_code == 200
+    resp = http.head(upload["url"], headers=headers)
+    assert resp.headers["upload-offset"] == "0"
+
+    # Wrong size is refused
+    resp = http.put(f"{upload['url']}/parts/1", headers=headers, content=content[:100])
+    assert resp.status_code == 400
+
+    resp = http.put(f"{upload['url']}/parts/1", headers=headers, content=content[:part_size])
+    assert resp.status_code == 200
+    assert http.get(upload["url"], headers=headers).json()["parts_received"] == [1, 2]
+
+    resp = http.post(f"{upload['url']}/complete", headers=headers)
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    assert relic_id == upload["relic_id"]
+    assert resp.json()["size_bytes"] == len(content)
+
+    raw = http.get(f"/{relic_id}/raw", timeout=60)
+    assert raw.content == content
+    # The session is gone once the relic exists
+    assert http.get(upload["url"], headers=headers).status_code == 404
+    http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
+
+
+@pytest.mark.integration
+def test_patch_resumes_from_last_part(http, registered_user):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    part_size = _part_size(http, headers)
+
+    content = os.urandom(part_size + 5000)
+    upload = _start_upload(http, headers, len(content), name="resumed.bin")
+
+    # A body cut off inside the second part keeps only the complete first part
+    resp = http.patch(upload["url"], headers={**headers, "Upload-Offset": "0"}, content=content[:part_size + 100])
+    assert resp.status_code == 204
+    assert resp.headers["upload-offset"] == str(part_size)
+    assert http.head(upload["url"], headers=headers).headers["upload-offset"] == str(part_size)
+
+    # Appending at a stale offset is a conflict
+    resp = http.patch(upload["url"], headers={**headers, "Upload-Offset": "0"}, content=b"x")
+    assert resp.status_code == 409
+    assert resp.headers["upload-offset"] == str(part_size)
+
+    resp = http.patch(
+        upload["url"], headers={**headers, "Upload-Offset": str(part_size)}, content=content[part_size:]
+    )
+    assert resp.status_code == 204
+    assert resp.headers["upload-offset"] == str(len(content))
+
+    resp = http.post(f"{upload['url']}/complete", headers=headers)
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    assert http.get(f"/{relic_id}/raw", timeout=60).content == content
+    http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
+
+
+@pytest.mark.integration
+def test_incomplete_upload_cannot_complete(http, registered_user):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    upload = _start_upload(http, headers, 1024)
+    resp = http.post(f"{upload['url']}/complete", headers=headers)
+    assert resp.status_code == 400
+
+    resp = http.put(f"{upload['url']}/parts/1", headers=headers, content=b"x" * 1024)
+    assert resp.status_code == 200
+    resp = http.post(f"{upload['url']}/complete", headers=headers)
+    assert resp.status_code == 200
+    http.delete(f"/api/v1/relics/{resp.json()['id']}", headers=headers)
+
+
+@pytest.mark.integration
+def test_upload_requires_owner_and_can_be_aborted(http, registered_user, user_key):
+    key, _ = registered_user
+    upload = _start_upload(http, {"X-User-Key": key}, 1024)
+
+    http.post("/api/v1/user/register", headers={"X-User-Key": user_key})
+    assert http.get(upload["url"], headers={"X-User-Key": user_key}).status_code == 403
+    assert http.get(upload["url"]).status_code == 403
+
+    assert http.delete(upload["url"], headers={"X-User-Key": key}).status_code == 200
+    assert http.get(upload["url"], headers={"X-User-Key": key}).status_code == 404
+
+
+@pytest.mark.integration
+def test_upload_length_required_and_limited(http):
+    assert http.post("/api/v1/uploads").status_code == 400
+    assert http.post("/api/v1/uploads", headers={"Upload-Length": "0"}).status_code == 400
+    resp = http.post("/api/v1/uploads", headers={"Upload-Length": str(100 * 1024 ** 4)})
+    assert resp.status_code == 413
+
+
+@pytest.mark.integration
+def test_direct_upload_single_put(http, registered_user, admin_headers):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    enabled = http.get("/api/v1/admin/config", headers=admin_headers).json()["upload"]["DIRECT_UPLOAD_ENABLED"]
+    resp = http.post(
+        "/api/v1/uploads", headers={**headers, "Upload-Length": "11"},
+        params={"direct": "true", "content_type": "text/plain", "name": "direct.txt"},
+    )
+    if not enabled:
+        assert resp.status_code == 400
+        return
+    assert resp.status_code == 201
+    upload = resp.json()
+    assert upload["direct"] is True
+
+    # Nothing is in S3 yet
+    assert http.post(f"{upload['url']}/complete", headers=headers).status_code == 400
+
+    put = httpx.put(upload["upload_url"], content=b"hello world", headers={"Content-Type": "text/plain"})
+    assert put.status_code == 200
+    resp = http.post(f"{upload['url']}/complete", headers=headers)
+    assert resp.status_code == 200
+    relic_id = resp.json()["id"]
+    assert http.get(f"/{relic_id}/raw").content == b"hello world"
+    http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
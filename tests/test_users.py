@@ -76,6 +76,42 @@ def test_get_user_relics(http, registered_user):
     http.delete(f"/api/v1/relics/{relic_id}", headers={"X-User-Key": key})
 
 
+@pytest.mark.integration
+def test_get_user_relics_cursor_pagination(http, registered_user):
+    key, _ = registered_user
+    headers = {"X-User-Key": key}
+    created = []
+    for i in range(3):
+        resp = http.post(
+            "/api/v1/relics",
+            headers=headers,
+            data={"name": f"Page {i}"},
+            files={"file": ("page.txt", b"content", "text/plain")},
+        )
+        created.append(resp.json()["id"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "include_total": "false"}
+        if cursor:
+            params["cursor"] = cursor
+        data = http.get("/api/v1/user/relics", headers=headers, params=params).json()
+        assert data["total"] is None
+        seen.extend(r["id"] for r in data["relics"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(created)
+
+    resp = http.get("/api/v1/user/relics", headers=headers, params={"cursor": "bogus"})
+    assert resp.status_code == 400
+
+    for relic_id in created:
+        http.delete(f"/api/v1/relics/{relic_id}", headers=headers)
+
+
 @pytest.mark.integration
 def test_get_user_relics_missing_key(http):
     resp = http.get("/api/v1/user/relics")
@@ -1,6 +1,22 @@
+import asyncio
+import re
+import time
 import pytest
 from datetime import datetime
-from backend.utils import parse_expiry_string
+from backend.utils import parse_expiry_string, parse_range_header, encode_cursor, decode_cursor, accepts_encoding
+from backend.compression import CompressingReader, decompress_stream, is_compressible
+from backend.content_cache import ContentCache
+from backend import counters, diffs
+from backend.models import Relic
+from backend.archives import (
+    ArchiveError, UnsupportedArchiveError, read_zip_index, stream_member,
+    build_tar_sidecar, read_sidecar_index, stream_tar_member,
+)
+from backend.derivatives import DerivativeError, derivative_kind, text_snippet
+from backend.line_diff import EQUAL, diff_lines, format_hunk, group_hunks, split_lines
+from backend.line_index import LineIndexBuilder, build_line_sidecar, read_line_window, _window_lines
+from backend.thumbnails import ThumbnailError, render_excalidraw, render_image
+from backend.storage import UploadMemoryBudget, UploadBudgetExceeded, plan_multipart, MULTIPART_CHUNK_SIZE, S3_MAX_PARTS
 
 @pytest.mark.unit
 def test_parse_expiry_string_minutes():
@@ -56,3 +72,628 @@ def test_parse_expiry_string_invalid():
     assert parse_expiry_string("invalid") is None
     assert parse_expiry_string("10x") is None
     assert parse_expiry_string("abc") is None
+
+@pytest.mark.unit
+def test_parse_range_header_single_and_suffix():
+    assert parse_range_header("bytes=0-4", 10) == [(0, 4)]
+    assert parse_range_header("bytes=5-", 10) == [(5, 9)]
+    assert parse_range_header("bytes=-3", 10) == [(7, 9)]
+    assert parse_range_header("bytes=0-100", 10) == [(0, 9)]
+
+@pytest.mark.unit
+def test_parse_range_header_coalesces_overlaps():
+    assert parse_range_header("bytes=8-,0-1,1-3", 10) == [(0, 3), (8, 9)]
+    assert parse_range_header("bytes=0-1,2-3", 10) == [(0, 3)]
+
+@pytest.mark.unit
+def test_parse_range_header_unsatisfiable():
+    assert parse_range_header("bytes=20-", 10) == []
+    assert parse_range_header("bytes=-0", 10) == []
+    assert parse_range_header("bytes=0-", 0) == []
+
+@pytest.mark.unit
+def test_parse_range_header_ignored():
+    assert parse_range_header(None, 10) is None
+    assert parse_range_header("items=0-1", 10) is None
+    assert parse_range_header("bytes=5-2", 10) is None
+    assert parse_range_header("bytes=a-b", 10) is None
+    assert parse_range_header("bytes=" + ",".join(f"{i * 2}-{i * 2}" for i in range(40)), 100) is None
+
+@pytest.mark.unit
+def test_cursor_round_trip():
+    cursor = encode_cursor("created_at", "desc", datetime(2026, 1, 2, 3, 4, 5), "abc123")
+    assert decode_cursor(cursor) == ("created_at", "desc", "2026-01-02T03:04:05", "abc123")
+    assert decode_cursor(encode_cursor("name", "asc", None, "abc123")) == ("name", "asc", None, "abc123")
+
+@pytest.mark.unit
+def test_decode_cursor_rejects_garbage():
+    assert decode_cursor("not a cursor") is None
+    assert decode_cursor(encode_cursor("name", "asc", "x", "id")[:-4]) is None
+
+@pytest.mark.unit
+def test_plan_multipart_sizes_parts_from_hint():
+    mib = 1024 * 1024
+    assert plan_multipart(None, 3) == (MULTIPART_CHUNK_SIZE, 3)
+    # Small uploads: minimum part size, no more parallelism than parts
+    assert plan_multipart(1024, 3) == (5 * mib, 1)
+    # Huge uploads: parts grow to stay within the S3 part count limit
+    part_size, _ = plan_multipart(100 * 1024 * mib, 3)
+    assert part_size * S3_MAX_PARTS >= 100 * 1024 * mib
+
+@pytest.mark.unit
+async def test_upload_budget_waits_then_rejects():
+    mib = 1024 * 1024
+    budget = UploadMemoryBudget(10 * mib)
+    assert await budget.acquire(8 * mib) == 8 * mib
+    with pytest.raises(UploadBudgetExceeded):
+        await budget.acquire(5 * mib, timeout=0)
+    waiter = asyncio.ensure_future(budget.acquire(5 * mib, timeout=5))
+    await asyncio.sleep(0)
+    assert budget.snapshot()["waiting"] == 1
+    budget.release(8 * mib)
+    assert await waiter == 5 * mib
+    assert budget.snapshot()["in_use_bytes"] == 5 * mib
+    assert budget.snapshot()["rejected_total"] == 1
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.unit
+async def test_diff_slots_bound_concurrent_diffs(monkeypatch):
+    monkeypatch.setattr(diffs, "_diff_slots", asyncio.Semaphore(1))
+    monkeypatch.setattr(diffs.settings, "DIFF_WAIT_TIMEOUT", 0.05)
+    slot = await diffs.diff_slot()
+    with pytest.raises(diffs.DiffBusy):
+        await diffs.diff_slot()
+    slot.release()
+    slot.release()  # released once only
+    slot = await diffs.diff_slot()
+    with pytest.raises(diffs.DiffBusy):
+        await diffs.diff_slot()
+    # A slot nobody released comes back with the object
+    del slot
+    (await diffs.diff_slot()).release()
+
+
+@pytest.mark.unit
+async def test_access_counter_counts_each_view_once(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    relic = Relic(id="abc123", access_count=5)
+    counter = counters.AccessCounter(flush_threshold=1000)
+    read_before_close = []
+
+    class Session:
+        """Stands in for the database: commit applies the flushed deltas to relic."""
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            read_before_close.append(counter.live_count(relic))
+
+        async def execute(self, stmt):
+            sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            self.deltas = {relic_id: int(delta) for relic_id, delta in re.findall(r"\('(\w+)', (\d+)\)", sql)}
+
+        async def commit(self):
+            relic.access_count += self.deltas.get(relic.id, 0)
+
+    monkeypatch.setattr(counters, "AsyncSessionLocal", Session)
+    counter.increment(relic.id)
+    counter.increment(relic.id)
+    counter.increment("other")
+    assert relic.access_count == 5
+    assert counter.live_count(relic) == 7
+
+    assert await counter.flush() == 2
+    assert relic.access_count == 7
+    # Committed views are no longer pending, even while the session is closing
+    assert read_before_close == [7]
+    assert counter.live_count(relic) == 7
+    assert await counter.flush() == 0
+
+    class FailingSession(Session):
+        async def commit(self):
+            raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(counters, "AsyncSessionLocal", FailingSession)
+    counter.increment(relic.id)
+    assert await counter.flush() == 0
+    # Merged back for the next flush
+    assert relic.access_count == 7
+    assert counter.live_count(relic) == 8
+
+
+@pytest.mark.unit
+async def test_content_cache_fills_on_complete_read_only(tmp_path):
+    cache = ContentCache(str(tmp_path), 1024, 1024)
+    assert cache.lookup("relics/a") is None
+
+    # An abandoned read leaves nothing behind
+    body = cache.fill("relics/a", _chunks(b"abc", b"def"), 6)
+    assert await body.__anext__() == b"abc"
+    await body.aclose()
+    assert cache.lookup("relics/a") is None
+    assert list(tmp_path.iterdir()) == []
+
+    assert b"".join([c async for c in cache.fill("relics/a", _chunks(b"abc", b"def"), 6)]) == b"abcdef"
+    path, stat_result = cache.lookup("relics/a")
+    assert stat_result.st_size == 6
+    assert b"".join([c async for c in cache.read(path, 4, byte_range=(1, 4))]) == b"bcde"
+
+    cache.invalidate(["relics/a"])
+    assert cache.lookup("relics/a") is None
+
+
+@pytest.mark.unit
+async def test_content_cache_invalidate_cancels_fill_in_progress(tmp_path):
+    cache = ContentCache(str(tmp_path), 1024, 1024)
+    body = cache.fill("relics/a", _chunks(b"abc", b"def"), 6)
+    assert await body.__anext__() == b"abc"
+    # Deleted while the read streams: the fill must not republish it
+    cache.invalidate(["relics/a"])
+    assert b"".join([c async for c in body]) == b"def"
+    assert cache.lookup("relics/a") is None
+
+    # A read started after the invalidation caches again
+    async for _ in cache.fill("relics/a", _chunks(b"abcdef"), 6, started=time.time() + 10):
+        pass
+    assert cache.lookup("relics/a") is not None
+
+
+@pytest.mark.unit
+async def test_content_cache_evicts_least_recently_used(tmp_path):
+    import os
+    cache = ContentCache(str(tmp_path), 1000, 400)
+    assert not cache.admits(401)
+    for i, key in enumerate(["relics/a", "relics/b"]):
+        async for _ in cache.fill(key, _chunks(b"x" * 400), 400):
+            pass
+        # Distinct recency stamps without sleeping
+        os.utime(cache.path_for(key), (i, i))
+    cache.lookup("relics/a")
+
+    async for _ in cache.fill("relics/c", _chunks(b"x" * 400), 400):
+        pass
+    assert cache.lookup("relics/b") is None
+    assert cache.lookup("relics/a") is not None
+    assert cache.lookup("relics/c") is not None
+    assert cache.snapshot()["evictions"] == 1
+
+
+@pytest.mark.unit
+def test_accepts_encoding():
+    assert accepts_encoding("gzip, deflate, br, zstd", "zstd")
+    assert not accepts_encoding("gzip, deflate", "zstd")
+    assert not accepts_encoding("zstd;q=0, gzip", "zstd")
+    assert accepts_encoding("*", "zstd")
+    assert not accepts_encoding("*, zstd;q=0", "zstd")
+    assert not accepts_encoding(None, "gzip")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+async def test_compressing_reader_round_trip(codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    data = b"line of text\n" * 200_000
+    chunks = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+
+    async def read(n):
+        return chunks.pop(0) if chunks else b""
+
+    reader = CompressingReader(read, codec, 3)
+    compressed = bytearray()
+    while True:
+        part = await reader.read(64 * 1024)
+        if not part:
+            break
+        compressed.extend(part)
+    assert reader.raw_bytes == len(data)
+    assert len(compressed) < len(data) // 10
+
+    async def stored():
+        for i in range(0, len(compressed), 4096):
+            yield bytes(compressed[i:i + 4096])
+
+    assert b"".join([c async for c in decompress_stream(stored(), codec)]) == data
+
+
+@pytest.mark.unit
+def test_is_compressible():
+    assert is_compressible("text/plain; charset=utf-8")
+    assert is_compressible("application/json")
+    assert is_compressible("application/vnd.api+json")
+    assert not is_compressible("image/png")
+    assert not is_compressible(None)
+
+
+def _zip_opener(data: bytes, reads: list):
+    """OpenRange over in-memory bytes, recording each (start, end) read."""
+    async def open_range(start, end):
+        reads.append((start, end))
+
+        async def chunks():
+            for i in range(start, end + 1, 1000):
+                yield data[i:min(i + 1000, end + 1)]
+        return chunks()
+    return open_range
+
+
+def _build_zip(members, comment=b"", prefix=b""):
+    import io
+    import zipfile
+    buffer = io.BytesIO()
+    buffer.write(prefix)
+    with zipfile.ZipFile(buffer, "a" if prefix else "w") as archive:
+        for name, content, method in members:
+            archive.writestr(zipfile.ZipInfo(name, (2024, 5, 6, 7, 8, 10)), content, compress_type=method)
+        archive.comment = comment
+    return buffer.getvalue()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "comment,prefix", [(b"", b""), (b"c" * 10000, b""), (b"", b"#!stub\n" * 100)], ids=["plain", "comment", "prefixed"]
+)
+async def test_zip_index_and_member_extraction(comment, prefix):
+    import os
+    import zipfile
+    payload = os.urandom(200_000) + b"text " * 100_000
+    data = _build_zip([
+        ("docs/", b"", zipfile.ZIP_STORED),
+        ("docs/readme.txt", b"hello", zipfile.ZIP_STORED),
+        ("big.bin", payload, zipfile.ZIP_DEFLATED),
+        ("caf\u00e9.bz2.txt", b"bzip " * 1000, zipfile.ZIP_BZIP2),
+        ("empty", b"", zipfile.ZIP_DEFLATED),
+    ], comment=comment, prefix=prefix)
+
+    reads = []
+    index = await read_zip_index(_zip_opener(data, reads), len(data), max_entries=100)
+    assert [e.path for e in index.entries] == ["docs/", "docs/readme.txt", "big.bin", "caf\u00e9.bz2.txt", "empty"]
+    assert index.by_path["docs/"].is_dir
+    assert index.by_path["big.bin"].size == len(payload)
+    assert index.by_path["big.bin"].method_name == "deflate"
+    assert index.by_path["docs/readme.txt"].modified == datetime(2024, 5, 6, 7, 8, 10)
+    # Only the tail of the archive is read: one probe, two when a long comment hides the EOCD
+    assert len(reads) == (2 if comment else 1)
+    assert all(start > len(data) - 70_000 for start, _ in reads)
+
+    for path, expected in [("docs/readme.txt", b"hello"), ("big.bin", payload),
+                           ("caf\u00e9.bz2.txt", b"bzip " * 1000), ("empty", b"")]:
+        reads = []
+        body = await stream_member(_zip_opener(data, reads), index.by_path[path])
+        assert b"".join([c async for c in body]) == expected
+        assert sum(end - start + 1 for start, end in reads) < index.by_path[path].compressed_size + 200
+
+
+@pytest.mark.unit
+async def test_zip_index_rejects_bad_input():
+    import zipfile
+    data = b"not a zip" * 1000
+    with pytest.raises(ArchiveError):
+        await read_zip_index(_zip_opener(data, []), len(data), max_entries=100)
+
+    data = _build_zip([(f"f{i}", b"x", zipfile.ZIP_STORED) for i in range(5)])
+    with pytest.raises(ArchiveError):
+        await read_zip_index(_zip_opener(data, []), len(data), max_entries=4)
+
+
+@pytest.mark.unit
+async def test_zip_member_crc_and_method_checks():
+    import zipfile
+    data = bytearray(_build_zip([("a.txt", b"a" * 100, zipfile.ZIP_STORED), ("b.xz", b"b", zipfile.ZIP_LZMA)]))
+    index = await read_zip_index(_zip_opener(bytes(data), []), len(data), max_entries=100)
+    with pytest.raises(UnsupportedArchiveError):
+        await stream_member(_zip_opener(bytes(data), []), index.by_path["b.xz"])
+
+    # Corrupt one byte of the stored member
+    entry = index.by_path["a.txt"]
+    data[entry.offset + 30 + len("a.txt") + 10] ^= 0xFF
+    body = await stream_member(_zip_opener(bytes(data), []), entry)
+    with pytest.raises(ArchiveError):
+        async for _ in body:
+            pass
+
+
+def _build_tar(members, gzip_level=None):
+    import io
+    import tarfile
+    buffer = io.BytesIO()
+    mode = "w:gz" if gzip_level is not None else "w"
+    kwargs = {"compresslevel": gzip_level} if gzip_level is not None else {}
+    with tarfile.open(fileobj=buffer, mode=mode, format=tarfile.PAX_FORMAT, **kwargs) as archive:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.mtime = 1700000000
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                archive.addfile(info)
+            else:
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("gzip_level", [None, 6], ids=["tar", "tar.gz"])
+async def test_tar_index_and_member_extraction(gzip_level):
+    import random
+    rng = random.Random(7)
+    words = [rng.randbytes(3).hex() for _ in range(300)]
+    members = [
+        ("dir", None),
+        ("dir/" + "long-name-" * 20 + ".txt", b"long name"),
+        ("caf\u00e9.txt", b"utf-8 name"),
+    ] + [
+        (f"data/{i}.txt", " ".join(rng.choice(words) for _ in range(60_000)).encode())
+        for i in range(8)
+    ]
+    data = _build_tar(members, gzip_level)
+
+    async def stored():
+        for i in range(0, len(data), 64 * 1024):
+            yield data[i:i + 64 * 1024]
+
+    format, count, checkpoints, sidecar = await build_tar_sidecar(stored(), 256 * 1024, max_entries=100)
+    assert format == ("tar.gz" if gzip_level else "tar")
+    assert count == len(members)
+    assert (checkpoints > 5) if gzip_level else checkpoints == 0
+
+    index = await read_sidecar_index(_zip_opener(sidecar, []))
+    assert [e.path for e in index.entries] == ["dir/"] + [name for name, _ in members[1:]]
+    assert index.by_path["dir/"].is_dir
+    assert index.by_path["data/3.txt"].modified == datetime(2023, 11, 14, 22, 13, 20)
+
+    for name, content in members[1:]:
+        reads = []
+        body = await stream_tar_member(
+            _zip_opener(data, reads), _zip_opener(sidecar, []), index, index.by_path[name], len(data)
+        )
+        chunks = []
+        async for chunk in body:
+            chunks.append(chunk)
+        assert b"".join(chunks) == content
+        if not gzip_level:
+            assert reads == [(index.by_path[name].offset, index.by_path[name].offset + len(content) - 1)]
+
+    # A late tar.gz member starts from a checkpoint, not from the beginning
+    if gzip_level:
+        reads = []
+        body = await stream_tar_member(
+            _zip_opener(data, reads), _zip_opener(sidecar, []), index, index.by_path["data/7.txt"], len(data)
+        )
+        async for _ in body:
+            pass
+        assert reads[0][0] > len(data) // 2
+
+
+@pytest.mark.unit
+async def test_tar_index_rejects_non_tar():
+    async def chunks(data):
+        yield data
+
+    with pytest.raises(ArchiveError):
+        await build_tar_sidecar(chunks(b"x" * 4096), 1024 * 1024, max_entries=100)
+    data = _build_tar([("a", b"1"), ("b", b"2")])
+    with pytest.raises(ArchiveError):
+        await build_tar_sidecar(chunks(data), 1024 * 1024, max_entries=1)
+    with pytest.raises(ArchiveError):
+        await build_tar_sidecar(chunks(data[:700]), 1024 * 1024, max_entries=100)
+
+
+@pytest.mark.unit
+def test_derivative_kind():
+    assert derivative_kind("photo.jpg", "image/jpeg") == "image"
+    assert derivative_kind("doc.pdf", "application/pdf") == "pdf"
+    assert derivative_kind("board.excalidraw", "application/json") == "excalidraw"
+    assert derivative_kind(None, "application/vnd.excalidraw+json") == "excalidraw"
+    assert derivative_kind("notes.txt", "text/plain; charset=utf-8") == "text"
+    assert derivative_kind("data.json", "application/json") == "text"
+    assert derivative_kind("blob.bin", "application/octet-stream") is None
+    assert derivative_kind("archive.zip", "application/zip") is None
+
+
+@pytest.mark.unit
+def test_text_snippet():
+    text = "".join(f"line {i}\n" for i in range(20)).encode()
+    assert text_snippet(text, 5, complete=True) == ("line 0\nline 1\nline 2\nline 3\nline 4", True)
+    assert text_snippet(b"a\nb\n", 5, complete=True) == ("a\nb", False)
+    # A head cut mid-line (and mid-character) drops the partial line
+    assert text_snippet("first\nsecond \u00e9".encode()[:-1], 5, complete=False) == ("first", True)
+    assert text_snippet("\ufeffbom".encode(), 5, complete=True) == ("bom", False)
+    with pytest.raises(DerivativeError):
+        text_snippet(b"\x89PNG\r\n\x1a\n\x00\x00", 5, complete=True)
+
+
+@pytest.mark.unit
+def test_render_image_thumbnail():
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 600), (200, 40, 40)).save(buffer, "JPEG")
+    thumbnail, width, height = render_image(buffer.getvalue(), 320, 64 * 1024 * 1024)
+    assert (width, height) == (1200, 600)
+    with Image.open(io.BytesIO(thumbnail)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (320, 160)
+
+    with pytest.raises(ThumbnailError):
+        render_image(buffer.getvalue(), 320, 1000)
+    with pytest.raises(ThumbnailError):
+        render_image(b"not an image", 320, 64 * 1024 * 1024)
+
+
+@pytest.mark.unit
+def test_render_excalidraw_thumbnail():
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    import json
+    scene = {
+        "type": "excalidraw",
+        "elements": [
+            {"type": "rectangle", "x": 0, "y": 0, "width": 400, "height": 200, "backgroundColor": "#a5d8ff"},
+            {"type": "ellipse", "x": 500, "y": 100, "width": 100, "height": 100},
+            {"type": "arrow", "x": 400, "y": 100, "points": [[0, 0], [100, 50]]},
+            {"type": "text", "x": 20, "y": 20, "text": "hello", "fontSize": 20},
+            {"type": "rectangle", "x": 5000, "y": 5000, "width": 10, "height": 10, "isDeleted": True},
+        ],
+        "appState": {"viewBackgroundColor": "#ffffff"},
+    }
+    thumbnail, width, height = render_excalidraw(json.dumps(scene).encode(), 320, 0)
+    assert (width, height) == (600, 200)
+    with Image.open(io.BytesIO(thumbnail)) as image:
+        assert image.size[0] <= 320 and image.size[1] < image.size[0]
+
+    with pytest.raises(ThumbnailError):
+        render_excalidraw(b'{"elements": []}', 320, 0)
+    with pytest.raises(ThumbnailError):
+        render_excalidraw(b"[1, 2]", 320, 0)
+
+
+@pytest.mark.unit
+def test_line_index_builder_samples():
+    builder = LineIndexBuilder(interval=2)
+    for piece in (b"a\nbb\n", b"c", b"\nd\n\ne"):
+        builder.write(piece)
+    data = b"a\nbb\nc\nd\n\ne"
+    assert list(builder.samples) == [0, 5, 9]
+    assert all(data[offset - 1:offset] == b"\n" for offset in builder.samples[1:])
+    assert (builder.size, builder.line_count) == (len(data), 6)
+
+    builder = LineIndexBuilder(interval=1000)
+    builder.write(b"one\ntwo\n")
+    assert builder.line_count == 2
+
+
+@pytest.mark.unit
+async def test_window_lines_skips_and_cuts():
+    async def chunks(*pieces):
+        for piece in pieces:
+            yield piece
+
+    assert await _window_lines(chunks(b"a\nb", b"\r\nc\nd"), 1, 10) == ["b", "c", "d"]
+    assert await _window_lines(chunks(b"a\nb\n", b"c\n"), 0, 2) == ["a", "b"]
+    assert await _window_lines(chunks(b"a\n"), 3, 2) == []
+    long_line = await _window_lines(chunks(b"x" * 100_000, b"y" * 100_000 + b"\n"), 0, 1)
+    assert long_line == ["x" * 64 * 1024]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("encoding", [None, "gzip", "zstd"], ids=["plain", "gzip", "zstd"])
+async def test_line_window_reads_through_index(encoding, monkeypatch):
+    import gzip
+    import io
+    import random
+    from types import SimpleNamespace
+    from backend import compression, line_index
+
+    if encoding == "zstd":
+        pytest.importorskip("zstandard")
+    rng = random.Random(5)
+    text = b"".join(
+        b"line %d %s\n" % (i, rng.randbytes(rng.randrange(150)).hex().encode()) for i in range(30_000)
+    ) + b"last"
+    lines = [line.decode() for line in text.split(b"\n")]
+    if encoding == "zstd":
+        monkeypatch.setattr(compression, "ZSTD_FRAME_SIZE", 256 * 1024)
+        monkeypatch.setattr(compression, "COMPRESS_READ_SIZE", 64 * 1024)
+        source = io.BytesIO(text)
+
+        async def read(n):
+            return source.read(n)
+
+        reader = CompressingReader(read, "zstd", 3)
+        stored = b""
+        while part := await reader.read(1024 * 1024):
+            stored += part
+    else:
+        stored = gzip.compress(text) if encoding == "gzip" else text
+    objects = {"content": stored}
+    monkeypatch.setattr(line_index, "CHECKPOINT_SPAN", 256 * 1024)
+
+    async def stream(key, byte_range=None, cache=False):
+        start, end = byte_range or (0, len(objects[key]) - 1)
+        return await _zip_opener(objects[key], reads)(start, end), end - start + 1
+
+    monkeypatch.setattr(line_index.storage_service, "stream", stream)
+    monkeypatch.setattr(line_index, "stored_encoding", lambda relic: encoding)
+    monkeypatch.setattr(line_index, "relic_range_opener", lambda relic: line_index.storage_range_opener("content"))
+
+    reads = []
+    builder, checkpoints, objects["sidecar"] = await build_line_sidecar(
+        await _zip_opener(stored, [])(0, len(stored) - 1), encoding, 500
+    )
+    assert builder.line_count == len(lines) and builder.size == len(text)
+    assert (checkpoints > 5) if encoding else checkpoints == 0
+
+    relic = SimpleNamespace(
+        size_bytes=len(text), s3_key="content", content_type="text/plain",
+        blob=SimpleNamespace(stored_size_bytes=len(stored)),
+    )
+    record = SimpleNamespace(
+        status="done", sidecar_key="sidecar", sample_interval=500, line_count=builder.line_count,
+        sample_count=len(builder.samples), checkpoint_count=checkpoints, error=None,
+    )
+    for start, count in [(0, 5), (499, 2), (12_345, 100), (29_990, 50), (len(lines), 5)]:
+        reads = []
+        window = await read_line_window(relic, record, start, count)
+        assert window.lines == lines[start:start + count]
+        assert window.total == len(lines)
+        # Only the neighbourhood of the window is read, not the whole content
+        assert sum(end - begin + 1 for begin, end in reads) < len(stored) // 4
+
+
+def _apply_script(script, old, new):
+    """new rebuilt from old and the script, checking that opcodes are contiguous."""
+    lines, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in script.ops():
+        assert (i1, j1) == (i, j)
+        if tag == EQUAL:
+            assert old[i1:i2] == new[j1:j2]
+        lines += old[i1:i2] if tag == EQUAL else new[j1:j2]
+        i, j = i2, j2
+    assert (i, j) == (len(old), len(new))
+    return lines
+
+
+@pytest.mark.unit
+def test_line_diff_scripts_rebuild_new_side():
+    import random
+    rng = random.Random(11)
+    for _ in range(300):
+        vocab = [b"x%d" % i for i in range(rng.choice([2, 20, 500]))] + [b"", b"}"]
+        old = [rng.choice(vocab) for _ in range(rng.randrange(80))]
+        new = list(old)
+        for _ in range(rng.randrange(6)):
+            position = rng.randrange(len(new) + 1)
+            new[position:position + rng.randrange(3)] = [rng.choice(vocab + [b"edit"])]
+        for max_cost in (10 ** 9, rng.randrange(40)):
+            script = diff_lines(old, new, max_cost)
+            assert _apply_script(script, old, new) == new
+            assert script.additions - script.deletions == len(new) - len(old)
+
+    old = [b"line %d" % i for i in range(1000)]
+    new = old[:500] + [b"added"] + old[501:]
+    script = diff_lines(old, new, 10 ** 9)
+    assert (script.additions, script.deletions, script.exact) == (1, 1, True)
+    assert not diff_lines(old, [b"other"] * 10, 0).exact
+
+
+@pytest.mark.unit
+def test_line_diff_unified_format():
+    old = split_lines(b"a\nb\nc\nd\ne\nf\ng\nh")
+    new = split_lines(b"a\nB\nc\nd\ne\nf\ng\nh\n")
+    assert old[-1] == b"h\n" and new[-1] == b"h"
+    script = diff_lines(old, new, 10 ** 9)
+    hunks = [format_hunk(group, old, new) for group in group_hunks(script, 1)]
+    assert hunks == [
+        b"@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n",
+        b"@@ -7,2 +7,2 @@\n g\n-h\n\\ No newline at end of file\n+h\n",
+    ]
+    assert list(group_hunks(diff_lines(old, old, 10 ** 9), 3)) == []
+    assert format_hunk(next(group_hunks(diff_lines([], [b"x"], 10 ** 9), 3)), [], [b"x"]) == b"@@ -0,0 +1 @@\n+x\n"
+